@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+记忆整合基准
+
+写入 N 条分属若干话题的知识，用模拟延迟的假 LLM 对比:
+1. 旧做法: 最近 50 条拼成一个 Prompt，追加一条 [Summary]，不删除任何条目
+2. 预聚类: 按字符 shingle 相似度聚类，逐簇并发摘要，摘要替换原条目、原条目移入冷存储
+指标: 热层条数、单个 Prompt 最大长度、LLM 调用次数与墙钟耗时、聚类本身耗时
+
+用法: python tests/benchmarks/bench_consolidation.py [--count 500] [--latency 0.5] [--workers 4]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from xingchen.config.prompts import MEMORY_SUMMARY_PROMPT
+from xingchen.memory.service import MemoryService
+from tests.conftest import make_knowledge_db
+from xingchen.memory.services.consolidator import MemoryConsolidator, cluster_texts
+
+TOPICS = [
+    ("用户喜欢吃", ["苹果", "火锅", "寿司", "烤鸭", "螺蛳粉", "榴莲", "饺子", "拉面"]),
+    ("用户最近在学", ["Python", "吉他", "日语", "游泳", "摄影", "素描", "围棋", "Rust"]),
+    ("用户的同事小王", ["爱喝咖啡", "住在海淀", "养了一只狗", "下个月结婚", "喜欢跑步", "是产品经理"]),
+    ("用户周末经常去", ["爬山", "图书馆", "看电影", "逛公园", "打羽毛球", "露营"]),
+    ("用户的妈妈", ["在杭州生活", "喜欢种花", "每天散步", "会做红烧肉", "爱看越剧", "退休了"]),
+    ("用户计划明年去", ["日本旅行", "考驾照", "换工作", "学潜水", "看极光", "搬家"]),
+]
+
+
+class FakeLLM:
+    """固定延迟的假 LLM: 把簇内每两条合成一行"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.max_prompt = 0
+
+    def chat(self, messages, **kwargs):
+        prompt = messages[0]["content"]
+        self.calls += 1
+        self.max_prompt = max(self.max_prompt, len(prompt))
+        time.sleep(self.latency)
+        facts = [line[2:] for line in prompt.splitlines() if line.startswith("- ")]
+        lines = ["；".join(facts[i:i + 2]) + " (整合)" for i in range(0, len(facts), 2)]
+        return SimpleNamespace(content="\n".join(lines))
+
+
+class _NoVectorStorage:
+    def is_available(self):
+        return False
+
+
+def make_service(root: str, count: int, rng: random.Random) -> MemoryService:
+    """绕过单例与向量库"""
+    db = make_knowledge_db(os.path.join(root, "knowledge.db"))
+    svc = MemoryService.__new__(MemoryService)
+    svc.knowledge_db = db
+    svc.vector_storage = _NoVectorStorage()
+    svc.vector_indexer = None
+    svc.long_term = []
+    svc._long_term_dirty = False
+    for i in range(count):
+        prefix, objects = rng.choice(TOPICS)
+        db.add_knowledge(f"{prefix}{rng.choice(objects)}，第 {i} 次提到")
+    return svc
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        svc = make_service(os.path.join(root, "old"), args.count, random.Random(5))
+        rows_before = len(svc.knowledge_db.get_knowledge(limit=args.count * 2))
+        llm = FakeLLM(args.latency)
+        start = time.perf_counter()
+        recent = svc.knowledge_db.get_knowledge(limit=50)
+        prompt = MEMORY_SUMMARY_PROMPT.format(context="\n".join(f"- {m['content']}" for m in recent))
+        llm.chat([{"role": "user", "content": prompt}])
+        svc.knowledge_db.add_knowledge("[Summary] ...", category="summary")
+        old = (len(svc.knowledge_db.get_knowledge(limit=args.count * 2)), len(prompt), llm.calls,
+               time.perf_counter() - start)
+
+        svc = make_service(os.path.join(root, "new"), args.count, random.Random(5))
+        items = svc.knowledge_db.get_knowledge(limit=args.count)
+        start = time.perf_counter()
+        clusters = cluster_texts([item["content"] for item in items])
+        cluster_ms = (time.perf_counter() - start) * 1000
+        llm = FakeLLM(args.latency)
+        start = time.perf_counter()
+        with patch("xingchen.memory.services.consolidator.settings.CONSOLIDATION_CANDIDATES", args.count):
+            MemoryConsolidator(svc, llm, max_workers=args.workers).consolidate()
+        new = (len(svc.knowledge_db.get_knowledge(limit=args.count * 2)), llm.max_prompt, llm.calls,
+               time.perf_counter() - start)
+
+    print(f"{args.count} 条知识，聚类 {cluster_ms:.1f} ms，{len(clusters)} 个簇 "
+          f"(>= 3 条的 {sum(len(c) >= 3 for c in clusters)} 个)")
+    print(f"\n{'mode':<14}{'rows':>12}{'max prompt':>12}{'calls':>8}{'wall(s)':>10}")
+    for label, (rows, prompt_len, calls, wall) in (("single prompt", old), ("clustered", new)):
+        print(f"{label:<14}{f'{rows_before}->{rows}':>12}{prompt_len:>12}{calls:>8}{wall:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
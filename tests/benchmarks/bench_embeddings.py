@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+嵌入后端基准测试 (default ONNX 模型 vs 离线哈希嵌入)
+
+对比:
+1. 冷启动: 首次嵌入耗时 (包含模型加载)
+2. 延迟: 单条查询嵌入、32 条批量嵌入
+3. 召回: 合成中英混合记忆库上的 recall@k (每条查询有唯一正确记忆)
+4. 一致性: 两个后端 top-k 结果的重合度 (仅当默认模型可用时)
+
+默认模型需要下载 ONNX 权重，离线环境下自动跳过并只报告哈希嵌入。
+
+用法: python tests/benchmarks/bench_embeddings.py [--distractors 2000] [--k 5] [--dim 512]
+"""
+import os
+import sys
+import time
+import argparse
+import random
+
+import numpy as np
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from chromadb.utils import embedding_functions
+from xingchen.memory.storage.hashing_embedding import HashingEmbeddingFunction
+
+
+# (记忆, 查询) 对: 查询与记忆只部分共享字面
+LABELLED = [
+    ("用户的猫叫小白，是一只三岁的英短", "猫叫什么名字"),
+    ("用户每天早上喜欢喝一杯美式咖啡", "早上喝什么咖啡"),
+    ("用户在上海的一家互联网公司做后端开发", "用户在哪里工作"),
+    ("用户的生日是十一月三号", "生日是哪天"),
+    ("The user prefers Python over Java for scripting", "which language for scripting"),
+    ("用户正在学习 Rust 的所有权机制", "Rust 学到哪了"),
+    ("服务器部署在阿里云杭州节点，使用 Docker Compose", "服务器怎么部署的"),
+    ("用户对花生过敏，不能吃含花生的食物", "有什么过敏"),
+    ("用户周末经常去西湖边跑步", "周末一般做什么运动"),
+    ("The user's favorite band is Radiohead", "favorite band"),
+    ("用户的女儿今年上小学二年级", "女儿几年级"),
+    ("用户最近在读《三体》第二部", "最近在读什么书"),
+    ("用户的笔记本是 MacBook Pro M3", "用的什么电脑"),
+    ("用户讨厌下雨天，会觉得心情低落", "下雨天心情怎么样"),
+    ("用户计划明年春天去日本京都旅行", "旅行计划"),
+    ("The database backup runs every night at 3am", "when does the backup run"),
+    ("用户习惯用 Vim 写代码，不喜欢 IDE", "用什么编辑器写代码"),
+    ("用户的母亲住在成都，每月视频一次", "母亲住在哪里"),
+    ("用户养了一盆绿萝放在办公桌上", "办公桌上有什么植物"),
+    ("用户在 GitHub 上维护一个开源的日志库", "开源项目是什么"),
+]
+
+_FILLER_ZH = "今天 明天 天气 会议 项目 代码 电影 音乐 晚饭 朋友 同事 周末 学习 工作 旅行 运动 书籍 游戏 手机 城市".split()
+_FILLER_EN = "meeting project deploy release coffee music movie weekend travel book server cache queue index".split()
+
+
+def make_distractors(count: int, seed: int = 7):
+    """生成与查询无关但字面相近的干扰记忆"""
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(count):
+        words = rng.sample(_FILLER_ZH, 4) + rng.sample(_FILLER_EN, 2)
+        rng.shuffle(words)
+        docs.append("用户提到" + "，".join(words))
+    return docs
+
+
+def load_default():
+    try:
+        ef = embedding_functions.DefaultEmbeddingFunction()
+        start = time.perf_counter()
+        ef(["warm up"])
+        return ef, (time.perf_counter() - start) * 1000
+    except Exception as e:
+        print(f"  [跳过] 默认模型不可用: {str(e).splitlines()[0][:100]}")
+        return None, None
+
+
+def embed_matrix(ef, texts, batch: int = 64):
+    vectors = []
+    for start in range(0, len(texts), batch):
+        vectors.extend(ef(texts[start:start + batch]))
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def measure_latency(ef, queries, repeat: int = 50):
+    single = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        ef([queries[i % len(queries)]])
+        single.append((time.perf_counter() - start) * 1000)
+    batch = []
+    texts = (queries * 4)[:32]
+    for _ in range(max(repeat // 5, 3)):
+        start = time.perf_counter()
+        ef(texts)
+        batch.append((time.perf_counter() - start) * 1000)
+    return float(np.median(single)), float(np.median(batch))
+
+
+def evaluate(ef, corpus, queries, k: int):
+    """recall@k 与 top-k 结果 (语料中前 len(queries) 条是各查询的正确答案)"""
+    doc_matrix = embed_matrix(ef, corpus)
+    query_matrix = embed_matrix(ef, queries)
+    scores = query_matrix @ doc_matrix.T
+    topk = np.argsort(-scores, axis=1)[:, :k]
+    hits = sum(1 for i, row in enumerate(topk) if i in row)
+    return hits / len(queries), topk
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--distractors", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=512)
+    args = parser.parse_args()
+
+    corpus = [doc for doc, _ in LABELLED] + make_distractors(args.distractors)
+    queries = [query for _, query in LABELLED]
+    print(f"语料 {len(corpus)} 条，查询 {len(queries)} 条，k={args.k}")
+
+    backends = {}
+    start = time.perf_counter()
+    hashing = HashingEmbeddingFunction(dim=args.dim)
+    hashing(["warm up"])
+    backends["hashing"] = (hashing, (time.perf_counter() - start) * 1000)
+
+    default, cold_ms = load_default()
+    if default is not None:
+        backends["default"] = (default, cold_ms)
+
+    results = {}
+    print(f"\n{'backend':<10}{'cold(ms)':>10}{'1q(ms)':>10}{'32q(ms)':>10}{'index(s)':>10}{'recall@k':>10}")
+    for name, (ef, cold) in backends.items():
+        single_ms, batch_ms = measure_latency(ef, queries)
+        start = time.perf_counter()
+        recall, topk = evaluate(ef, corpus, queries, args.k)
+        index_s = time.perf_counter() - start
+        results[name] = topk
+        print(f"{name:<10}{cold:>10.1f}{single_ms:>10.3f}{batch_ms:>10.2f}{index_s:>10.2f}{recall:>10.2f}")
+
+    if "default" in results:
+        overlap = np.mean([
+            len(set(a) & set(b)) / args.k for a, b in zip(results["hashing"], results["default"])
+        ])
+        print(f"\n哈希嵌入与默认模型 top-{args.k} 重合度: {overlap:.2f}")
+
+
+if __name__ == "__main__":
+    main()
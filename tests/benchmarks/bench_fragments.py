@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+TopicManager 片段写入吞吐基准
+
+对比:
+1. 逐条 add_fragment (每条一次指纹查询 + 一次 Chroma 写入)
+2. 批量 add_fragments (每批一次指纹查询 + 新增/更新各一次 Chroma 写入)
+
+语料中约 30% 为重复内容，覆盖"更新已有片段"路径。
+使用离线哈希嵌入，排除模型推理对结果的干扰。
+
+用法: python tests/benchmarks/bench_fragments.py [--count 2000] [--batch 64] [--dup 0.3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import chromadb
+from xingchen.memory.storage.topic_manager import TopicManager
+from xingchen.memory.storage.fragment_index import FragmentIndex
+from xingchen.memory.storage.hashing_embedding import HashingEmbeddingFunction
+
+
+def make_manager(root: str) -> TopicManager:
+    """绕过单例，在临时目录中创建实例"""
+    manager = TopicManager.__new__(TopicManager)
+    manager.client = chromadb.PersistentClient(path=root)
+    ef = HashingEmbeddingFunction()
+    for name in ("topics", "tasks"):
+        setattr(manager, name, manager.client.get_or_create_collection(f"{name}__hashing", embedding_function=ef))
+    manager.fragments = manager.client.get_or_create_collection("fragments__hashing", embedding_function=ef)
+    manager.fragment_index = FragmentIndex(os.path.join(root, "fragment_index.db"))
+    manager._initialized = True
+    return manager
+
+
+def make_items(count: int, dup_ratio: float, seed: int = 3):
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        if items and rng.random() < dup_ratio:
+            items.append(dict(rng.choice(items)))
+        else:
+            items.append({
+                "content": f"用户在第 {i} 次对话中提到了话题 {rng.randint(0, 50)} 的细节 #{i}",
+                "topic_id": f"topic_{i % 20}",
+                "category": rng.choice(["memory", "preference", "fact"]),
+            })
+    return items
+
+
+def run_single(items):
+    with tempfile.TemporaryDirectory() as root:
+        manager = make_manager(root)
+        start = time.perf_counter()
+        for item in items:
+            manager.add_fragment(**item)
+        elapsed = time.perf_counter() - start
+        return elapsed, manager.fragments.count()
+
+
+def run_batched(items, batch: int):
+    with tempfile.TemporaryDirectory() as root:
+        manager = make_manager(root)
+        start = time.perf_counter()
+        for offset in range(0, len(items), batch):
+            manager.add_fragments(items[offset:offset + batch])
+        elapsed = time.perf_counter() - start
+        return elapsed, manager.fragments.count()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--dup", type=float, default=0.3)
+    args = parser.parse_args()
+
+    items = make_items(args.count, args.dup)
+    print(f"写入 {len(items)} 条片段 (重复率约 {args.dup:.0%})")
+
+    single_s, single_count = run_single(items)
+    batch_s, batch_count = run_batched(items, args.batch)
+    assert single_count == batch_count, "两种写入方式的去重结果应一致"
+
+    print(f"{'mode':<18}{'total(s)':>10}{'frag/s':>12}{'stored':>10}")
+    print(f"{'add_fragment':<18}{single_s:>10.2f}{len(items) / single_s:>12.0f}{single_count:>10}")
+    print(f"{'add_fragments/' + str(args.batch):<18}{batch_s:>10.2f}{len(items) / batch_s:>12.0f}{batch_count:>10}")
+    print(f"加速比: {single_s / batch_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+GraphIndex 基准测试 (合成 1M 边图)
+
+对比:
+1. 内存 CSR 快照: 构建耗时、BFS、双向最短路径、k 跳邻域、扩散激活
+2. 旧实现: 逐节点调用 get_related_nodes 的 SQLite BFS (仅采样少量查询)
+
+用法: python tests/benchmarks/bench_graph_index.py [--edges 1000000] [--nodes 200000] [--skip-sqlite]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import sqlite3
+
+import numpy as np
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from tests.conftest import make_knowledge_db
+from xingchen.memory.storage.knowledge.graph_index import GraphIndex
+from xingchen.memory.storage.knowledge.activation import SpreadingActivation
+
+
+def make_graph(num_nodes: int, num_edges: int, seed: int = 42):
+    """生成带幂律度分布的合成图"""
+    rng = np.random.default_rng(seed)
+    # Zipf 采样让少数节点成为枢纽，更接近真实知识图谱
+    oversample = int(num_edges * 1.8)
+    src = (rng.zipf(1.6, oversample) - 1) % num_nodes
+    dst = rng.integers(0, num_nodes, oversample)
+    keep = src != dst
+    src, dst = src[keep].astype(np.int32), dst[keep].astype(np.int32)
+    # 去重 (source, target) 以匹配 edges 表的唯一约束
+    pairs = np.unique(src.astype(np.int64) * num_nodes + dst)
+    pairs = rng.permutation(pairs)[:num_edges]
+    src, dst = (pairs // num_nodes).astype(np.int32), (pairs % num_nodes).astype(np.int32)
+    weights = rng.uniform(0.3, 1.0, len(src)).astype(np.float32)
+    return src, dst, weights
+
+
+def timed(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return result, float(np.median(samples)), float(np.percentile(samples, 95))
+
+
+def sqlite_bfs_path(db, source, target, max_len=3):
+    """旧版 GraphMemory.get_path 逻辑 (list.pop(0) + 逐节点 SQL)"""
+    queue = [(source, [source])]
+    visited = set()
+    while queue:
+        (vertex, path) = queue.pop(0)
+        if len(path) > max_len:
+            continue
+        if vertex not in visited:
+            visited.add(vertex)
+            for info in db.get_related_nodes(vertex, limit=20):
+                neighbor = info["neighbor"]
+                if neighbor == target:
+                    return path + [target]
+                queue.append((neighbor, path + [neighbor]))
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--nodes", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--skip-sqlite", action="store_true")
+    args = parser.parse_args()
+
+    src, dst, weights = make_graph(args.nodes, args.edges)
+    names = [f"n{i}" for i in range(args.nodes)]
+    print(f"合成图: {args.nodes} 节点, {len(src)} 边")
+
+    t0 = time.perf_counter()
+    index = GraphIndex.from_arrays(src, dst, weights, node_names=names)
+    print(f"[CSR] 构建耗时: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(7)
+    pairs = [(names[a], names[b]) for a, b in rng.integers(0, args.nodes, (args.queries, 2))]
+
+    it = iter(pairs * 5)
+    _, med, p95 = timed(lambda: index.shortest_path(*next(it), max_depth=3, min_weight=0.5), args.queries)
+    print(f"[CSR] 双向最短路径 (≤3 跳): median {med:.3f} ms, p95 {p95:.3f} ms")
+
+    it = iter(pairs * 5)
+    reached, med, p95 = timed(lambda: index.bfs(next(it)[0], max_depth=2, min_weight=0.5), args.queries)
+    print(f"[CSR] BFS (2 层): median {med:.3f} ms, p95 {p95:.3f} ms (末次到达 {len(reached)} 节点)")
+
+    it = iter(pairs * 5)
+    _, med, p95 = timed(lambda: index.k_hop(next(it)[0], k=2), args.queries)
+    print(f"[CSR] k 跳邻域 (k=2): median {med:.3f} ms, p95 {p95:.3f} ms")
+
+    engine = SpreadingActivation(index, steps=3, min_weight=0.3, budget_ms=5.0)
+    it = iter(pairs * 5)
+    result, med, p95 = timed(lambda: engine.activate([next(it)[0]]), args.queries)
+    print(f"[CSR] 扩散激活 (3 步): median {med:.3f} ms, p95 {p95:.3f} ms (末次 {len(result['nodes'])} 节点)")
+
+    t0 = time.perf_counter()
+    for i in range(10000):
+        index.add_edge(f"new{i}", names[i % args.nodes], "RELATED_TO", 0.9)
+    print(f"[CSR] 增量写入 10k 边: {(time.perf_counter() - t0) * 1000:.1f} ms (pending={index.stats()['pending_edges']})")
+
+    if args.skip_sqlite:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_knowledge_db(os.path.join(tmp, "bench_knowledge.db"))
+        t0 = time.perf_counter()
+        conn = sqlite3.connect(db.db_path)
+        conn.executemany("INSERT OR IGNORE INTO nodes (name) VALUES (?)", ((n,) for n in names))
+        conn.executemany(
+            "INSERT INTO edges (source, target, relation, weight) VALUES (?, ?, 'RELATED_TO', ?)",
+            ((names[a], names[b], float(w)) for a, b, w in zip(src, dst, weights)),
+        )
+        conn.commit()
+        conn.close()
+        print(f"[SQLite] 导入耗时: {(time.perf_counter() - t0):.1f} s")
+
+        t0 = time.perf_counter()
+        db.get_graph_index()
+        print(f"[CSR] 从 SQLite 构建快照: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        sample = pairs[:10]
+        it = iter(sample)
+        _, med, p95 = timed(lambda: sqlite_bfs_path(db, *next(it)), len(sample))
+        print(f"[SQLite] 逐节点 BFS 路径 (≤3 跳, 10 次采样): median {med:.1f} ms, p95 {p95:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
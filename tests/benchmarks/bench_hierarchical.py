@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+层级检索基准 (Topic → Task → Fragment vs 全量片段检索)
+
+合成数据: 每个话题有自己的专属词表，片段与查询都由话题词 + 通用词组成。
+对比:
+1. 延迟: 全量 fragments.query vs HierarchicalRetriever.retrieve (预热后的中位数 / P95)
+2. 精度: precision@k (结果片段属于查询所在话题的比例)
+3. 冷启动交互路径: 未预热时 retrieve(cold_load=False) 退化为全量检索，缺失话题在后台加载
+
+使用离线哈希嵌入，不依赖模型下载。
+
+用法: python tests/benchmarks/bench_hierarchical.py [--fragments 100000] [--topics 200] [--queries 50] [--k 5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import chromadb
+from xingchen.memory.storage.topic_manager import TopicManager
+from xingchen.memory.storage.fragment_index import FragmentIndex
+from xingchen.memory.storage.hashing_embedding import HashingEmbeddingFunction
+from xingchen.memory.services.hierarchical_retriever import HierarchicalRetriever
+
+
+_CJK_START = 0x4E00
+
+
+def make_vocab(rng: random.Random, count: int, used: set):
+    """生成互不重复的二字词"""
+    words = []
+    while len(words) < count:
+        word = chr(_CJK_START + rng.randrange(20000)) + chr(_CJK_START + rng.randrange(20000))
+        if word not in used:
+            used.add(word)
+            words.append(word)
+    return words
+
+
+def make_manager(root: str) -> TopicManager:
+    """绕过单例，在临时目录中创建实例"""
+    manager = TopicManager.__new__(TopicManager)
+    manager.client = chromadb.PersistentClient(path=root)
+    ef = HashingEmbeddingFunction()
+    manager.topics = manager.client.get_or_create_collection("topics__hashing", metadata={"hnsw:space": "cosine"}, embedding_function=ef)
+    manager.tasks = manager.client.get_or_create_collection("tasks__hashing", metadata={"hnsw:space": "cosine"}, embedding_function=ef)
+    manager.fragments = manager.client.get_or_create_collection("fragments__hashing", metadata={"hnsw:space": "cosine"}, embedding_function=ef)
+    manager.embedding_functions = {"topics": ef, "tasks": ef, "fragments": ef}
+    manager.fragment_index = FragmentIndex(os.path.join(root, "fragment_index.db"))
+    manager._topic_catalog = None
+    manager._initialized = True
+    return manager
+
+
+def populate(manager: TopicManager, num_topics: int, num_fragments: int, seed: int = 11):
+    rng = random.Random(seed)
+    used = set()
+    generic = make_vocab(rng, 200, used)
+    vocabs, task_ids = [], []
+    for t in range(num_topics):
+        vocab = make_vocab(rng, 24, used)
+        vocabs.append(vocab)
+        topic_id = manager.create_topic(f"话题{t}", " ".join(vocab))
+        # 每个话题 4 个任务，各自占用词表的一段
+        task_ids.append([manager.create_task(topic_id, f"任务{t}-{k}", " ".join(vocab[k * 6:(k + 1) * 6])) for k in range(4)])
+
+    batch = []
+    start = time.perf_counter()
+    for i in range(num_fragments):
+        t = rng.randrange(num_topics)
+        k = rng.randrange(4)
+        words = rng.sample(vocabs[t][k * 6:(k + 1) * 6], 2) + rng.sample(vocabs[t], 2) + rng.sample(generic, 4)
+        rng.shuffle(words)
+        batch.append({
+            "content": " ".join(words) + f" #{i}",
+            "topic_id": f"topic_{manager._generate_id(f'话题{t}')}",
+            "task_id": task_ids[t][k],
+        })
+        if len(batch) >= 2000:
+            manager.add_fragments(batch)
+            batch = []
+    if batch:
+        manager.add_fragments(batch)
+    print(f"写入 {num_fragments} 条片段耗时 {time.perf_counter() - start:.1f}s")
+    return vocabs, generic
+
+
+def make_queries(vocabs, generic, count: int, seed: int = 5):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        t = rng.randrange(len(vocabs))
+        # 查询混入通用词: 全量检索容易被共享通用词的其他话题片段干扰
+        words = rng.sample(vocabs[t], 2) + rng.sample(generic, 2)
+        rng.shuffle(words)
+        queries.append((t, " ".join(words)))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fragments", type=int, default=100000)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        manager = make_manager(root)
+        vocabs, generic = populate(manager, args.topics, args.fragments)
+        # 缓存覆盖全部片段，测的是预热后的稳态延迟
+        retriever = HierarchicalRetriever(manager, cache_rows=args.fragments)
+        queries = make_queries(vocabs, generic, args.queries)
+        topic_of = {f"topic_{manager._generate_id(f'话题{t}')}": t for t in range(args.topics)}
+
+        # 预热: 层级检索预加载按话题分组的片段向量
+        manager.fragments.query(query_texts=[queries[0][1]], n_results=args.k)
+
+        start = time.perf_counter()
+        rows = retriever.warm()
+        print(f"层级检索预热: {rows} 行向量，耗时 {time.perf_counter() - start:.1f}s")
+        retriever.retrieve(queries[0][1], limit=args.k)
+
+        stats = {"flat": ([], []), "hierarchical": ([], [])}
+        for t, query in queries:
+            start = time.perf_counter()
+            flat = manager._format_query_results(manager.fragments.query(query_texts=[query], n_results=args.k))
+            stats["flat"][0].append((time.perf_counter() - start) * 1000)
+            stats["flat"][1].append(np.mean([topic_of.get(f["metadata"]["topic_id"]) == t for f in flat]) if flat else 0.0)
+
+            start = time.perf_counter()
+            hier = retriever.retrieve(query, limit=args.k)
+            stats["hierarchical"][0].append((time.perf_counter() - start) * 1000)
+            stats["hierarchical"][1].append(np.mean([topic_of.get(f["metadata"]["topic_id"]) == t for f in hier]) if hier else 0.0)
+
+        # 冷启动交互路径: 缓存为空，请求内不加载
+        cold = HierarchicalRetriever(manager, cache_rows=args.fragments)
+        cold_latency = []
+        for _, query in queries:
+            start = time.perf_counter()
+            cold.retrieve(query, limit=args.k, cold_load=False)
+            cold_latency.append((time.perf_counter() - start) * 1000)
+        cold.wait_for_loads()
+        stats["hier-cold"] = (cold_latency, [])
+
+        print(f"\n{'mode':<14}{'p50(ms)':>10}{'p95(ms)':>10}{'precision@k':>14}")
+        for mode, (latency, precision) in stats.items():
+            shown = f"{np.mean(precision):>14.3f}" if precision else f"{'-':>14}"
+            print(f"{mode:<14}{np.median(latency):>10.2f}{np.percentile(latency, 95):>10.2f}{shown}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 对冲请求基准
+
+两个本地假提供商: 主提供商 fake_a 有一部分请求落入长尾 (额外延迟)，备选 fake_b 正常。
+先发出 --warmup 个请求积累首 token 延迟样本，再依次发出交互请求 (流式，与 F脑一致)，对比:
+1. plain: 只请求主提供商
+2. hedged: 主提供商超过首 token 延迟的 p95 仍未开始输出时，向 fake_b 发出对冲请求
+指标: 端到端耗时 (中位数 / P95 / P99) 与额外请求比例
+
+用法: python tests/benchmarks/bench_llm_hedging.py [--requests 200] [--latency 0.1] [--tail-rate 0.03] [--tail-latency 2]
+"""
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import xingchen.utils.llm_registry as llm_registry_module
+from xingchen.config.settings import settings
+from xingchen.utils.fake_llm_server import FakeLLMServer
+from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.llm_registry import LLMRegistry
+from xingchen.utils.llm_scheduler import Priority
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def run(hedge: bool, args, primary: FakeLLMServer, backup: FakeLLMServer) -> dict:
+    llm_registry_module._llm_registry_instance = LLMRegistry(rate_limits={})
+    client = LLMClient(provider="fake_a", priority=Priority.INTERACTIVE, hedge=hedge)
+    for _ in range(args.warmup):
+        client.chat_stream(MESSAGES)
+    primary.requests = backup.requests = 0
+    latencies = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        client.chat_stream(MESSAGES)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50": percentile(latencies, 0.50), "p95": percentile(latencies, 0.95), "p99": percentile(latencies, 0.99),
+        "extra": backup.requests / args.requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--tail-rate", type=float, default=0.03)
+    parser.add_argument("--tail-latency", type=float, default=2.0)
+    args = parser.parse_args()
+
+    settings.LLM_FALLBACK_PROVIDERS = {"fake_a": ["fake_b"]}
+    settings.LLM_HEDGE_MIN_DELAY = 0.05
+    with FakeLLMServer(latency=args.latency, tail_rate=args.tail_rate, tail_latency=args.tail_latency) as a, \
+            FakeLLMServer(latency=args.latency) as b:
+        os.environ["FAKE_A_LLM_BASE_URL"] = a.base_url
+        os.environ["FAKE_B_LLM_BASE_URL"] = b.base_url
+        print(f"{'mode':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'extra req':>12}")
+        for name, hedge in (("plain", False), ("hedged", True)):
+            r = run(hedge, args, a, b)
+            print(f"{name:>8}{r['p50']:>10.0f}{r['p95']:>10.0f}{r['p99']:>10.0f}{r['extra']:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+提示词 token 预算基准
+
+构造与 Driver 相同结构的上下文 (CONTEXT_HISTORY_WINDOW 条历史 + 长期记忆 + 画像 + 技能 + 工具列表)，
+历史消息长度逐档增加，对比:
+1. naive: 原样拼接
+2. budgeted: PromptBudget 按分段优先级裁剪到 PROMPT_TARGET_TOKENS["driver"]
+指标: 近似 prompt tokens (按 qwen 系数) 与每次组装的额外耗时
+
+用法: python tests/benchmarks/bench_prompt_budget.py [--memories 40] [--rounds 200]
+"""
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from xingchen.config.settings import settings
+from xingchen.utils.prompt_budget import PromptBudget, Section, count_message_tokens, count_tokens
+
+PROVIDER = "qwen"
+
+
+def make_context(message_chars: int, memories: int):
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"第{i}句: " + "对话内容" * (message_chars // 4)}
+               for i in range(settings.CONTEXT_HISTORY_WINDOW)]
+    long_term = "\n".join(f"- 记忆{i}: " + "关于用户的事实" * 8 for i in range(memories))
+    profile = "【当前用户画像 (Active Profile)】:\n- 名字: 张三\n- 职业: 工程师"
+    skills = "【相关技能推荐】:\n" + "\n".join(f"- skill{i}: " + "技能描述" * 10 for i in range(3))
+    tools = "\n".join(f"- tool{i}: " + "工具描述" * 8 for i in range(12))
+    return history, long_term, profile, skills, tools
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--memories", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'msg chars':>10}{'naive tok':>12}{'budget tok':>12}{'saved':>8}{'overhead(us)':>14}")
+    for message_chars in (50, 200, 800, 2000):
+        history, long_term, profile, skills, tools = make_context(message_chars, args.memories)
+        naive = count_message_tokens(history, PROVIDER) + sum(
+            count_tokens(part, PROVIDER) for part in (long_term, profile, skills, tools))
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            budget = PromptBudget("driver", provider=PROVIDER)
+            budget.fit([
+                Section("history", history, keep="last", note=False),
+                Section.from_text("profile", profile),
+                Section.from_text("long_term", long_term),
+                Section.from_text("skills", skills),
+                Section.from_text("tools", tools),
+            ])
+        overhead_us = (time.perf_counter() - start) / args.rounds * 1e6
+        fitted = budget.last_report["total"]
+        print(f"{message_chars:>10}{naive:>12}{fitted:>12}{1 - fitted / naive:>8.0%}{overhead_us:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+启动快照基准
+
+不同数据规模下，对比启动时重建派生内存结构 (长期记忆缓存、别名表、图谱 CSR) 的耗时:
+1. rebuild: 逐行查询 SQLite 重建
+2. snapshot: 从启动快照恢复 (版本戳校验 + mmap 懒加载)
+
+用法: python tests/benchmarks/bench_startup_snapshot.py [--sizes 2000,20000,100000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from unittest.mock import patch
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from xingchen.memory.service import MemoryService
+from xingchen.memory.storage.knowledge_db import KnowledgeDB
+from tests.conftest import make_knowledge_db
+from xingchen.utils.snapshot import StartupSnapshot
+
+_CJK_START = 0x4E00
+
+
+def make_db(root: str, size: int, rng: random.Random) -> KnowledgeDB:
+    """绕过单例；知识 size 条，实体 size/10 个，边 size 条"""
+    db = make_knowledge_db(os.path.join(root, "knowledge.db"))
+    word = lambda n: "".join(chr(_CJK_START + rng.randrange(20000)) for _ in range(n))
+    with db._get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO knowledge (content_hash, content, category, created_at) VALUES (?, ?, 'fact', datetime('now'))",
+            [(f"h{i}", f"{word(12)} 记忆{i}") for i in range(size)]
+        )
+        conn.executemany(
+            "INSERT INTO entities (name, entity_type, aliases) VALUES (?, 'person', ?)",
+            [(f"实体{i}", f'["{word(3)}", "{word(2)}"]') for i in range(size // 10)]
+        )
+        nodes = [f"节点{i}" for i in range(max(size // 5, 2))]
+        conn.executemany("INSERT INTO nodes (name) VALUES (?)", [(n,) for n in nodes])
+        edges = {(rng.choice(nodes), rng.choice(nodes)) for _ in range(size)}
+        conn.executemany(
+            "INSERT OR IGNORE INTO edges (source, target, relation, weight) VALUES (?, ?, 'RELATED_TO', ?)",
+            [(s, t, rng.random()) for s, t in edges if s != t]
+        )
+        conn.commit()
+    return db
+
+
+def cold_start(db: KnowledgeDB, snapshot: StartupSnapshot) -> float:
+    """模拟一次启动: 长期记忆缓存 + 别名表 + 图谱索引"""
+    start = time.perf_counter()
+    with patch("xingchen.memory.service.startup_snapshot", snapshot), \
+            patch("xingchen.memory.storage.knowledge.graph_store.startup_snapshot", snapshot):
+        svc = MemoryService.__new__(MemoryService)
+        svc.knowledge_db = db
+        svc.long_term = svc._load_long_term()
+        svc._alias_cache = {}
+        svc._load_alias_cache()
+        db._graph_index = None
+        db.get_graph_index()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="2000,20000,100000")
+    args = parser.parse_args()
+
+    print(f"{'size':>8}{'rebuild(ms)':>14}{'snapshot(ms)':>14}{'file(KB)':>10}")
+    for size in [int(x) for x in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as root:
+            db = make_db(root, size, random.Random(size))
+            path = os.path.join(root, "startup_snapshot.bin")
+            rebuild = cold_start(db, StartupSnapshot(path))
+
+            writer = StartupSnapshot(path)
+            svc = MemoryService.__new__(MemoryService)
+            svc.knowledge_db = db
+            writer.register("long_term", lambda: db.snapshot_stamp("knowledge"),
+                            lambda: svc._build_snapshot_section(["knowledge"], svc._read_long_term_rows))
+            writer.register("alias_cache", lambda: db.snapshot_stamp("entities"),
+                            lambda: svc._build_snapshot_section(["entities"], svc._read_alias_cache))
+            writer.register("graph", lambda: db.snapshot_stamp("graph"), db.build_graph_snapshot)
+            writer.save()
+
+            snapshot = cold_start(db, StartupSnapshot(path))
+            print(f"{size:>8}{rebuild:>14.1f}{snapshot:>14.1f}{os.path.getsize(path) / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+记忆冷热分层基准
+
+写入 N 条知识 (少量"常用"条目被反复访问)，对比分层前后:
+1. 热层词法检索延迟 (中位数 / P95)
+2. 冷层召回延迟
+3. 常用条目是否留在热层
+
+用法: python tests/benchmarks/bench_tiering.py [--count 50000] [--capacity 5000] [--queries 200]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from xingchen.memory.storage.knowledge_db import KnowledgeDB
+from tests.conftest import make_knowledge_db
+from xingchen.memory.services.retriever import HybridRetriever
+
+_CJK_START = 0x4E00
+
+
+def make_db(root: str) -> KnowledgeDB:
+    """绕过单例，在临时目录中创建实例"""
+    return make_knowledge_db(os.path.join(root, "knowledge.db"))
+
+
+def populate(db: KnowledgeDB, count: int, rng: random.Random):
+    rows = []
+    for i in range(count):
+        words = "".join(chr(_CJK_START + rng.randrange(20000)) for _ in range(12))
+        rows.append((f"h{i}", f"{words} 记忆{i}", "fact", None, rng.uniform(0.3, 1.0)))
+    with db._get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO knowledge (content_hash, content, category, source, confidence, created_at) "
+            "VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime', '-' || abs(random() % 365) || ' days'))",
+            rows
+        )
+        conn.commit()
+
+
+def measure(retriever: HybridRetriever, queries):
+    latency = {"hot": [], "archive": []}
+    for query in queries:
+        retriever.retrieve(query, limit=5)
+        latency["hot"].append(retriever.last_timings["lexical_ms"])
+        if "archive_ms" in retriever.last_timings:
+            latency["archive"].append(retriever.last_timings["archive_ms"])
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--capacity", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as root:
+        db = make_db(root)
+        populate(db, args.count, rng)
+        retriever = HybridRetriever(db)
+        # 查询取某条记忆中的连续四个字
+        with db._get_conn() as conn:
+            contents = [row[0] for row in conn.execute("SELECT content FROM knowledge")]
+        queries = []
+        for _ in range(args.queries):
+            content = rng.choice(contents)
+            start = rng.randrange(9)
+            queries.append(content[start:start + 4])
+
+        # 常用条目: 反复访问
+        popular = rng.sample(range(1, args.count + 1), 100)
+        for _ in range(5):
+            db.record_access(popular)
+        before = measure(retriever, queries)
+
+        start = time.perf_counter()
+        stats = db.run_memory_tiering(hot_capacity=args.capacity)
+        print(f"分层: 热层 {stats['hot_before']} -> {stats['hot_after']} 条，归档 {stats['archived']} 条，"
+              f"耗时 {time.perf_counter() - start:.1f}s，最长持锁 {stats['max_lock_ms']:.1f} ms")
+        kept = len(db.get_knowledge_by_ids(popular))
+        print(f"常用条目留在热层: {kept}/{len(popular)}")
+
+        # 只测检索延迟，关掉回迁以免查询改变分层
+        db.promote_archived = lambda ids, archive_db_path=None: {}
+        after = measure(retriever, queries)
+
+        print(f"\n{'stage':<22}{'p50(ms)':>10}{'p95(ms)':>10}")
+        for label, values in (("hot (before)", before["hot"]), ("hot (after)", after["hot"]),
+                              ("archive (after)", after["archive"])):
+            print(f"{label:<22}{np.median(values):>10.2f}{np.percentile(values, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+分阶段启动基准
+
+每种模式在独立子进程中冷启动 XingChenApp，对比:
+1. serial: 全部组件同步初始化 (STARTUP_BACKGROUND_WARMUP=False)
+2. background: 首轮回复必需的组件同步就绪，其余后台并行预热
+指标: ready = initialize() 返回 (可以响应输入) 的耗时；warm = 全部组件预热完成的耗时
+
+注意: 使用 settings 中的数据目录 (data/)，与正常启动一致
+用法: python tests/benchmarks/bench_warmup.py [--rounds 3]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# 添加项目根目录到 sys.path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(PROJECT_ROOT)
+
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from xingchen.config.settings import settings
+settings.STARTUP_BACKGROUND_WARMUP = {background}
+from xingchen.app import app_context
+app_context.initialize()
+ready = time.perf_counter()
+app_context.wait_until_warm(300)
+warm = time.perf_counter()
+app_context.cycle_manager.stop()
+print("RESULT " + json.dumps({{"ready": (ready - start) * 1000, "warm": (warm - start) * 1000}}))
+"""
+
+
+def run_once(background: bool) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(background=background)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=600,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(proc.stderr[-2000:])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':>12}{'ready(ms)':>12}{'warm(ms)':>12}")
+    for name, background in (("serial", False), ("background", True)):
+        results = [run_once(background) for _ in range(args.rounds)]
+        ready = sorted(r["ready"] for r in results)[len(results) // 2]
+        warm = sorted(r["warm"] for r in results)[len(results) // 2]
+        print(f"{name:>12}{ready:>12.0f}{warm:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
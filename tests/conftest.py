@@ -21,6 +21,27 @@ def clean_memory_data(tmp_path):
     yield test_memory_dir
 
 
+def make_knowledge_db(db_path):
+    """
+    绕过单例，在指定路径创建独立的 KnowledgeDB 实例
+    (KnowledgeDB.__new__ 会返回全局单例，这里直接分配对象，避免改写全局库的路径)
+    """
+    from xingchen.memory.storage.knowledge_db import KnowledgeDB
+
+    db = object.__new__(KnowledgeDB)
+    db.db_path = str(db_path)
+    db._initialized = False
+    db._init_db()
+    db._initialized = True
+    return db
+
+
+@pytest.fixture(scope="function")
+def tmp_knowledge_db(tmp_path):
+    """临时目录中的独立 KnowledgeDB (冷存储 archive.db 随之落在同一目录)"""
+    return make_knowledge_db(tmp_path / "test_knowledge.db")
+
+
 @pytest.fixture(scope="function")
 def clean_wal(tmp_path):
     """
@@ -0,0 +1,69 @@
+"""
+测试 Compressor 并行压缩: 异步路径在同一事件循环中并发全部 LLM 任务，结果与线程池路径一致
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from xingchen.config.settings import settings
+from xingchen.core.navigator_components.compressor import Compressor
+
+
+def _reply(messages):
+    prompt = messages[-1]["content"]
+    return SimpleNamespace(content="日记正文" if "日记" in prompt else "[]", tool_calls=None)
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, messages, **kwargs):
+        self.calls += 1
+        return _reply(messages)
+
+
+class FakeAsyncLLM:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def chat(self, messages, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        return _reply(messages)
+
+
+@pytest.fixture
+def compressor():
+    comp = Compressor(FakeLLM(), MagicMock())
+    with patch.object(Compressor, "_classify_to_hierarchy", return_value="ok"):
+        yield comp
+
+
+class TestCompressorParallel:
+    """测试并行压缩的两种执行方式"""
+
+    def test_async_path_runs_llm_tasks_concurrently(self, compressor, monkeypatch):
+        monkeypatch.setattr(settings, "COMPRESSOR_ASYNC", True)
+        fake = FakeAsyncLLM()
+        compressor._async_llm = fake
+
+        diary = compressor.run_compression_tasks_parallel("平静", "晚上", "用户: 你好")
+
+        assert diary == "日记正文"
+        assert fake.max_in_flight == 5
+        assert compressor.llm.calls == 0
+        compressor.memory.write_diary_entry.assert_called_once_with("日记正文")
+
+    def test_thread_path(self, compressor, monkeypatch):
+        monkeypatch.setattr(settings, "COMPRESSOR_ASYNC", False)
+
+        diary = compressor.run_compression_tasks_parallel("平静", "晚上", "用户: 你好")
+
+        assert diary == "日记正文"
+        assert compressor.llm.calls == 5
+        compressor.memory.write_diary_entry.assert_called_once_with("日记正文")
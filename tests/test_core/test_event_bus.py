@@ -98,3 +98,20 @@ class TestEventBusPublish:
         assert len(set(event_ids)) == 5  # 所有 ID 唯一
         
         print(f"✅ 批量发布成功，{len(event_ids)} 个事件")
+
+    def test_publish_without_persist(self, clean_event_bus):
+        """测试瞬时事件只通知订阅者、不落盘"""
+        import threading
+        bus = clean_event_bus
+        received = threading.Event()
+        bus.subscribe(lambda e: e.type == "driver_response_delta" and received.set())
+
+        event = Event(
+            type=EventType.DRIVER_RESPONSE_DELTA,
+            source="test",
+            payload={"delta": "你", "content": "你", "seq": 1},
+            meta={}
+        )
+        assert bus.publish(event, persist=False) is None
+        assert received.wait(5)
+        assert bus.get_events(event_type="driver_response_delta") == []
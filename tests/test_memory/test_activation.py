@@ -0,0 +1,108 @@
+"""
+测试 SpreadingActivation (扩散激活) 模块
+"""
+import threading
+
+import pytest
+import numpy as np
+from xingchen.memory.storage.knowledge.graph_index import GraphIndex
+from xingchen.memory.storage.knowledge.activation import SpreadingActivation
+
+
+@pytest.fixture
+def index():
+    """用户 - Python - 编程 - 电脑；用户 - 咖啡 (弱关系)"""
+    index = GraphIndex()
+    index.add_edge("用户", "Python", "likes", 1.0)
+    index.add_edge("Python", "编程", "is_a", 1.0)
+    index.add_edge("编程", "电脑", "uses", 1.0)
+    index.add_edge("用户", "咖啡", "drinks", 0.2)
+    index.compact()
+    return index
+
+
+class TestSpreadingActivation:
+    """测试激活传播"""
+
+    def test_activation_decays_with_distance(self, index):
+        engine = SpreadingActivation(index, budget_ms=1000, steps=3, decay=0.6)
+        activation = engine.run(["用户"])
+        ids = index.node_ids
+        assert activation[ids["Python"]] > activation[ids["编程"]] > activation[ids["电脑"]] > 0
+
+    def test_min_weight_blocks_weak_edges(self, index):
+        engine = SpreadingActivation(index, budget_ms=1000, min_weight=0.5)
+        result = engine.activate(["用户"])
+        names = [n["name"] for n in result["nodes"]]
+        assert "咖啡" not in names
+        assert names[0] == "Python"
+
+    def test_steps_limit_hops(self, index):
+        engine = SpreadingActivation(index, budget_ms=1000, steps=1)
+        names = [n["name"] for n in engine.activate(["用户"])["nodes"]]
+        assert "编程" not in names
+
+    def test_edges_returned(self, index):
+        result = SpreadingActivation(index, budget_ms=1000).activate(["用户"], top_n=2)
+        assert {"source": "用户", "target": "Python", "relation": "likes", "weight": 1.0} in result["edges"]
+
+    def test_budget_stops_early(self, index):
+        activation = SpreadingActivation(index, steps=3, budget_ms=0).run(["用户"])
+        assert activation[index.node_ids["编程"]] == 0
+
+    def test_hub_does_not_propagate(self, index):
+        engine = SpreadingActivation(index, steps=2, budget_ms=1000, max_fan_out=1)
+        activation = engine.run(["电脑"])
+        # 编程 有两条边，超过 max_fan_out，只接收激活
+        assert activation[index.node_ids["编程"]] > 0
+        assert activation[index.node_ids["Python"]] == 0
+
+    def test_unknown_seed(self, index):
+        result = SpreadingActivation(index, budget_ms=1000).activate(["不存在"])
+        assert result["nodes"] == []
+
+    def test_pending_edges_participate(self, index):
+        index.add_edge("电脑", "显卡", "has", 1.0)
+        engine = SpreadingActivation(index, budget_ms=1000, steps=1)
+        names = [n["name"] for n in engine.activate(["电脑"])["nodes"]]
+        assert "显卡" in names
+
+    def test_concurrent_writer(self):
+        """Navigator 线程持续 add_edge / compact 时激活传播不越界"""
+        index = GraphIndex.from_arrays(np.arange(199), np.arange(1, 200))
+        engine = SpreadingActivation(index, budget_ms=1000, steps=3, max_frontier=10000)
+        stop, errors = threading.Event(), []
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                index.add_edge(str(i % 200), f"新节点{i}", "RELATED_TO", 1.0)
+                if i % 50 == 0:
+                    index.compact()
+                i += 1
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for _ in range(300):
+                try:
+                    engine.activate(["0", "50", "100", "150"])
+                except Exception as e:  # noqa: BLE001
+                    errors.append(e)
+        finally:
+            stop.set()
+            thread.join()
+        assert errors == []
+
+
+class TestSeedExtraction:
+    """测试从文本中识别种子实体"""
+
+    def test_find_nodes_in_text(self, index):
+        assert set(index.find_nodes_in_text("我最近在学Python编程")) == {"Python", "编程"}
+
+    def test_longer_match_wins(self):
+        index = GraphIndex()
+        index.add_edge("机器学习", "深度学习", "includes", 1.0)
+        index.add_edge("学习", "成长", "leads_to", 1.0)
+        assert index.find_nodes_in_text("我喜欢机器学习") == ["机器学习"]
@@ -71,3 +71,49 @@ class TestAutoClassifier:
                 
                 assert result["topic_name"] == "未分类"
                 assert result["confidence"] == 0.0
+
+    def test_existing_topic_uses_catalog(self):
+        """选择已有话题时按名称精确查找，不做向量检索"""
+        with patch('xingchen.memory.services.auto_classifier.LLMClient'):
+            classifier = AutoClassifier()
+            mock_tm = Mock()
+            mock_tm.list_topics.return_value = [{"id": "topic_1", "name": "Python编程", "description": ""}]
+            mock_tm.find_topic_by_name.return_value = "topic_1"
+            classifier.topic_manager = mock_tm
+
+            assert classifier._get_existing_topics_str() == "- Python编程"
+            result = classifier._process_classification({"topic_name": "Python编程", "is_new_topic": False}, True)
+
+            assert result["topic_id"] == "topic_1"
+            mock_tm.search_topics.assert_not_called()
+            mock_tm.create_topic.assert_not_called()
+
+    def test_paraphrased_topic_reuses_existing(self):
+        """LLM 改写已有话题名称时，新建前先语义匹配已有话题"""
+        with patch('xingchen.memory.services.auto_classifier.LLMClient'):
+            classifier = AutoClassifier()
+            mock_tm = Mock()
+            mock_tm.find_topic_by_name.return_value = None
+            mock_tm.search_topics.return_value = [{"id": "topic_1", "distance": 0.05}]
+            classifier.topic_manager = mock_tm
+
+            result = classifier._process_classification({"topic_name": "Python 编程", "is_new_topic": False}, True)
+
+            assert result["topic_id"] == "topic_1"
+            mock_tm.search_topics.assert_called_once_with("Python 编程", limit=1)
+            mock_tm.create_topic.assert_not_called()
+
+    def test_distant_topic_is_created(self):
+        """语义上最接近的话题也相距过远时才新建"""
+        with patch('xingchen.memory.services.auto_classifier.LLMClient'):
+            classifier = AutoClassifier()
+            mock_tm = Mock()
+            mock_tm.find_topic_by_name.return_value = None
+            mock_tm.search_topics.return_value = [{"id": "topic_1", "distance": 0.9}]
+            mock_tm.create_topic.return_value = "topic_2"
+            classifier.topic_manager = mock_tm
+
+            result = classifier._process_classification({"topic_name": "园艺", "is_new_topic": False}, True)
+
+            assert result["topic_id"] == "topic_2"
+            mock_tm.create_topic.assert_called_once()
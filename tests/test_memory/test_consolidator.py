@@ -0,0 +1,130 @@
+"""
+测试 MemoryConsolidator (预聚类 + 逐簇摘要替换)
+"""
+import pytest
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from xingchen.memory.service import MemoryService
+from xingchen.memory.models import LongTermMemoryEntry
+from xingchen.memory.services.consolidator import MemoryConsolidator, cluster_texts, parse_summary_lines
+
+
+class _NoVectorStorage:
+    def is_available(self):
+        return False
+
+
+class FakeLLM:
+    """按簇内容返回固定摘要，记录并发峰值"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def chat(self, messages, **kwargs):
+        prompt = messages[0]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if "苹果" in prompt:
+            return SimpleNamespace(content="1. 用户爱吃水果，尤其是苹果、香蕉和西瓜")
+        if "北京" in prompt:
+            return SimpleNamespace(content="- 用户住在北京朝阳区，在海淀上班")
+        return SimpleNamespace(content="")
+
+
+@pytest.fixture
+def service(tmp_knowledge_db):
+    """绕过单例与向量库，只保留 KnowledgeDB 与长期记忆缓存"""
+    svc = MemoryService.__new__(MemoryService)
+    svc.knowledge_db = tmp_knowledge_db
+    svc.vector_storage = _NoVectorStorage()
+    svc.vector_indexer = None
+    svc.long_term = []
+    svc._long_term_dirty = False
+    return svc
+
+
+def _seed(svc):
+    facts = [
+        "用户喜欢吃苹果", "用户喜欢吃香蕉", "用户喜欢吃西瓜", "用户喜欢吃妈妈做的苹果派",
+        "用户住在北京", "用户住在北京朝阳区", "用户住在北京，在海淀上班",
+        "用户的猫叫豆豆",
+    ]
+    for fact in facts:
+        svc.long_term.append(LongTermMemoryEntry(content=fact))
+    return [svc.knowledge_db.add_knowledge(fact) for fact in facts]
+
+
+class TestClustering:
+    """测试预聚类"""
+
+    def test_groups_by_topic(self):
+        texts = ["用户喜欢吃苹果", "用户喜欢吃香蕉", "用户住在北京", "用户住在北京朝阳区", "今天天气很好"]
+        clusters = cluster_texts(texts, threshold=0.35)
+        assert [0, 1] in clusters
+        assert [2, 3] in clusters
+        assert [4] in clusters
+
+    def test_cluster_size_capped(self):
+        texts = [f"用户喜欢吃苹果{i}" for i in range(10)]
+        clusters = cluster_texts(texts, threshold=0.3, max_size=4)
+        assert max(len(c) for c in clusters) == 4
+        assert sorted(i for c in clusters for i in c) == list(range(10))
+
+    def test_parse_summary_lines(self):
+        assert parse_summary_lines("1. 甲\n2、乙\n\n- 丙\n丁") == ["甲", "乙", "丙", "丁"]
+
+
+class TestConsolidate:
+    """测试逐簇摘要替换"""
+
+    def test_clusters_replaced_and_archived(self, service):
+        ids = _seed(service)
+        llm = FakeLLM()
+        with patch("xingchen.memory.services.consolidator.settings.CONSOLIDATION_MIN_CANDIDATES", 1):
+            stats = MemoryConsolidator(service, llm).consolidate()
+
+        # 每个簇一次 LLM 调用，单独成簇的条目不调用
+        assert len(llm.prompts) == stats["clusters"] == 2
+        assert all("猫" not in p for p in llm.prompts)
+        assert stats["replaced"] == 7
+        assert stats["added"] == 2
+
+        contents = {item["content"] for item in service.knowledge_db.get_knowledge()}
+        assert contents == {"用户的猫叫豆豆", "用户爱吃水果，尤其是苹果、香蕉和西瓜", "用户住在北京朝阳区，在海淀上班"}
+        assert service.knowledge_db.get_tier_stats()["archive"]["count"] == 7
+        assert service.knowledge_db.search_archive_terms(["苹果派"])[0]["id"] == ids[3]
+        assert "用户喜欢吃苹果" not in [e.content for e in service.long_term]
+
+    def test_calls_run_concurrently(self, service):
+        _seed(service)
+        llm = FakeLLM(delay=0.2)
+        with patch("xingchen.memory.services.consolidator.settings.CONSOLIDATION_MIN_CANDIDATES", 1):
+            MemoryConsolidator(service, llm, max_workers=2).consolidate()
+        assert llm.peak == 2
+
+    def test_useless_summary_keeps_originals(self, service):
+        _seed(service)
+        llm = FakeLLM()
+        llm.chat = lambda messages: SimpleNamespace(content="\n".join(["甲", "乙", "丙", "丁", "戊"]))
+        with patch("xingchen.memory.services.consolidator.settings.CONSOLIDATION_MIN_CANDIDATES", 1):
+            stats = MemoryConsolidator(service, llm).consolidate()
+        assert stats["replaced"] == 0
+        assert len(service.knowledge_db.get_knowledge()) == 8
+
+    def test_too_few_candidates_is_noop(self, service):
+        _seed(service)
+        llm = FakeLLM()
+        stats = MemoryConsolidator(service, llm).consolidate()
+        assert stats["clusters"] == 0
+        assert llm.prompts == []
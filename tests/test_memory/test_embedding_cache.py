@@ -0,0 +1,92 @@
+"""
+测试 EmbeddingCache / CachedEmbeddingFunction
+"""
+import pytest
+import os
+import numpy as np
+from chromadb.api.types import EmbeddingFunction, Documents
+from xingchen.memory.storage.embedding_cache import EmbeddingCache, CachedEmbeddingFunction
+
+
+class CountingEmbeddingFunction(EmbeddingFunction[Documents]):
+    """按文本长度生成确定性向量，并记录被调用的文本"""
+
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, input):
+        self.seen.extend(input)
+        return [np.full(4, len(text), dtype=np.float32) for text in input]
+
+    @staticmethod
+    def name():
+        return "counting"
+
+    def get_config(self):
+        return {}
+
+    @staticmethod
+    def build_from_config(config):
+        return CountingEmbeddingFunction()
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return os.path.join(tmp_path, "embedding_cache.db")
+
+
+@pytest.fixture
+def cached(cache_path):
+    base = CountingEmbeddingFunction()
+    return base, CachedEmbeddingFunction(base, EmbeddingCache(cache_path))
+
+
+class TestCachedEmbeddingFunction:
+    """测试缓存命中"""
+
+    def test_repeated_text_hits_cache(self, cached):
+        base, ef = cached
+        first = ef(["苹果", "香蕉"])
+        second = ef(["香蕉", "苹果"])
+        assert base.seen == ["苹果", "香蕉"]
+        assert np.allclose(second[0], first[1])
+        assert ef.stats()["hot_hits"] == 2
+
+    def test_duplicates_in_batch_embedded_once(self, cached):
+        base, ef = cached
+        result = ef(["a", "bb", "a"])
+        assert base.seen == ["a", "bb"]
+        assert len(result) == 3
+        assert np.allclose(result[0], result[2])
+
+    def test_persists_across_restart(self, cached, cache_path):
+        _, ef = cached
+        ef(["持久化"])
+        base2 = CountingEmbeddingFunction()
+        ef2 = CachedEmbeddingFunction(base2, EmbeddingCache(cache_path))
+        ef2(["持久化"])
+        assert base2.seen == []
+        assert ef2.stats()["disk_hits"] == 1
+
+    def test_model_isolation(self, cached, cache_path):
+        _, ef = cached
+        ef(["文本"])
+        base2 = CountingEmbeddingFunction()
+        other = CachedEmbeddingFunction(base2, EmbeddingCache(cache_path), model_id="other-model")
+        other(["文本"])
+        assert base2.seen == ["文本"]
+
+    def test_lru_eviction(self, cache_path):
+        base = CountingEmbeddingFunction()
+        ef = CachedEmbeddingFunction(base, EmbeddingCache(cache_path, hot_size=2))
+        ef(["a", "bb", "ccc"])
+        assert ef.stats()["hot_size"] == 2
+        # 被挤出热层的条目仍可从磁盘命中
+        ef(["a"])
+        assert base.seen == ["a", "bb", "ccc"]
+        assert ef.stats()["disk_hits"] == 1
+
+    def test_name_passthrough(self, cached):
+        _, ef = cached
+        assert ef.name() == "counting"
+        assert ef.model_id == "counting"
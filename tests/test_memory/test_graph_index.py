@@ -0,0 +1,100 @@
+"""
+测试 GraphIndex (CSR 邻接快照) 模块
+"""
+import pytest
+import numpy as np
+from xingchen.memory.storage.knowledge.graph_index import GraphIndex
+
+
+@pytest.fixture
+def chain_db(tmp_knowledge_db):
+    """A - B - C - D 链 + 一条低权重捷径 A - D"""
+    db = tmp_knowledge_db
+    db.add_edge("A", "B", "knows", weight=1.0)
+    db.add_edge("B", "C", "knows", weight=1.0)
+    db.add_edge("C", "D", "likes", weight=0.9)
+    db.add_edge("A", "D", "weak", weight=0.1)
+    return db
+
+
+class TestGraphIndexQueries:
+    """测试遍历查询"""
+
+    def test_build_from_db(self, chain_db):
+        index = chain_db.get_graph_index()
+        assert index.stats()["nodes"] == 4
+        assert index.stats()["edges"] == 4
+
+    def test_shortest_path_respects_min_weight(self, chain_db):
+        index = chain_db.get_graph_index()
+        assert index.shortest_path("A", "D") == ["A", "D"]
+        assert index.shortest_path("A", "D", min_weight=0.5) == ["A", "B", "C", "D"]
+        assert index.shortest_path("A", "D", max_depth=2, min_weight=0.5) == []
+
+    def test_path_is_undirected(self, chain_db):
+        index = chain_db.get_graph_index()
+        assert index.shortest_path("D", "B", min_weight=0.5) == ["D", "C", "B"]
+
+    def test_bfs_and_k_hop(self, chain_db):
+        index = chain_db.get_graph_index()
+        depths = index.bfs("A", max_depth=3, min_weight=0.5)
+        assert depths == {"A": 0, "B": 1, "C": 2, "D": 3}
+        assert index.k_hop("A", k=2, min_weight=0.5) == ["B", "C"]
+
+    def test_neighbors_direction(self, chain_db):
+        index = chain_db.get_graph_index()
+        neighbors = {n["neighbor"]: n for n in index.neighbors("B")}
+        assert neighbors["A"]["direction"] == "in"
+        assert neighbors["C"]["direction"] == "out"
+
+    def test_unknown_node(self, chain_db):
+        index = chain_db.get_graph_index()
+        assert index.shortest_path("A", "不存在") == []
+        assert index.bfs("不存在") == {}
+
+
+class TestGraphIndexIncremental:
+    """测试增量更新"""
+
+    def test_add_edge_updates_snapshot(self, chain_db):
+        index = chain_db.get_graph_index()
+        chain_db.add_edge("D", "E", "knows", weight=1.0)
+        assert index.shortest_path("A", "E", min_weight=0.5) == []
+        assert index.shortest_path("C", "E", min_weight=0.5) == ["C", "D", "E"]
+
+    def test_weight_update_in_place(self, chain_db):
+        index = chain_db.get_graph_index()
+        chain_db.add_edge("A", "D", "weak", weight=0.8)
+        assert index.shortest_path("A", "D", min_weight=0.5) == ["A", "D"]
+        assert index.stats()["edges"] == 4
+
+    def test_write_during_build_not_lost(self, chain_db):
+        """构建期间提交的边 (跳过了增量更新) 触发重建，不会从快照中丢失"""
+        from unittest.mock import patch
+
+        build = GraphIndex.from_db
+        calls = []
+
+        def racing_build(conn):
+            index = build(conn)
+            if not calls:
+                chain_db.add_edge("D", "E", "knows", weight=1.0)
+            calls.append(index)
+            return index
+
+        with patch.object(GraphIndex, "from_db", side_effect=racing_build):
+            index = chain_db.get_graph_index()
+
+        assert len(calls) == 2
+        assert index.shortest_path("C", "E", min_weight=0.5) == ["C", "D", "E"]
+
+    def test_compact_preserves_queries(self, chain_db):
+        index = chain_db.get_graph_index()
+        chain_db.add_edge("D", "E", "knows", weight=1.0)
+        index.compact()
+        assert index.stats()["pending_edges"] == 0
+        assert index.shortest_path("C", "E", min_weight=0.5) == ["C", "D", "E"]
+
+    def test_from_arrays(self):
+        index = GraphIndex.from_arrays(np.array([0, 1, 2]), np.array([1, 2, 3]))
+        assert index.shortest_path("0", "3") == ["0", "1", "2", "3"]
@@ -0,0 +1,178 @@
+"""
+测试 GraphMaintenanceMixin (图谱衰减 / 归档 / 孤立节点清理)
+"""
+import pytest
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from xingchen.managers.deep_clean import DeepCleanManager
+
+
+@pytest.fixture
+def archive_path(tmp_path):
+    return os.path.join(tmp_path, "archive.db")
+
+
+def _age_edge(db, source, target, days):
+    """把边的最近激活时间往前拨"""
+    with db._get_conn() as conn:
+        conn.execute(
+            "UPDATE edges SET last_activated = datetime('now', ?) WHERE source = ? AND target = ?",
+            (f"-{days} days", source, target)
+        )
+        conn.commit()
+
+
+def _age_nodes(db, hours):
+    with db._get_conn() as conn:
+        conn.execute("UPDATE nodes SET last_activated = datetime('now', ?)", (f"-{hours} hours",))
+        conn.commit()
+
+
+def _weight(db, source, target):
+    edges = db.get_edges(source=source, target=target)
+    return edges[0]["weight"] if edges else None
+
+
+class TestGraphDecay:
+    """测试时间衰减"""
+
+    def test_half_life(self, tmp_knowledge_db, archive_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.8)
+        _age_edge(db, "A", "B", 30)
+        db.run_graph_maintenance(archive_db_path=archive_path, half_life_days=30)
+        assert _weight(db, "A", "B") == pytest.approx(0.4, rel=1e-3)
+
+    def test_fresh_edges_untouched(self, tmp_knowledge_db, archive_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.8)
+        db.run_graph_maintenance(archive_db_path=archive_path)
+        assert _weight(db, "A", "B") == pytest.approx(0.8, rel=1e-3)
+
+    def test_since_avoids_double_decay(self, tmp_knowledge_db, archive_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.8)
+        _age_edge(db, "A", "B", 60)
+        # 上次维护在 30 天前: 只衰减最近 30 天
+        since = datetime.now() - timedelta(days=30)
+        db.run_graph_maintenance(archive_db_path=archive_path, since=since, half_life_days=30)
+        assert _weight(db, "A", "B") == pytest.approx(0.4, rel=1e-3)
+
+    def test_repeated_runs_decay_once(self, tmp_knowledge_db, archive_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.8)
+        _age_edge(db, "A", "B", 30)
+        # 不传 since 时依赖库内衰减水位
+        db.run_graph_maintenance(archive_db_path=archive_path, half_life_days=30)
+        db.run_graph_maintenance(archive_db_path=archive_path, half_life_days=30)
+        assert _weight(db, "A", "B") == pytest.approx(0.4, rel=1e-3)
+
+    def test_interrupted_run_resumes_without_double_decay(self, tmp_knowledge_db, archive_path, monkeypatch):
+        db = tmp_knowledge_db
+        targets = [f"T{i}" for i in range(5)]
+        for target in targets:
+            db.add_edge("A", target, "knows", weight=0.8)
+            _age_edge(db, "A", target, 30)
+
+        # 第二块执行时失败: 第一块已提交，衰减水位尚未推进
+        run_chunk = db._run_chunk
+        calls = []
+
+        def failing_chunk(*args):
+            calls.append(1)
+            if len(calls) == 2:
+                raise sqlite3.OperationalError("database is locked")
+            return run_chunk(*args)
+
+        monkeypatch.setattr(db, "_run_chunk", failing_chunk)
+        with pytest.raises(sqlite3.OperationalError):
+            db.run_graph_maintenance(archive_db_path=archive_path, half_life_days=30, chunk_size=2)
+        monkeypatch.setattr(db, "_run_chunk", run_chunk)
+
+        db.run_graph_maintenance(archive_db_path=archive_path, half_life_days=30, chunk_size=2)
+        for target in targets:
+            assert _weight(db, "A", target) == pytest.approx(0.4, rel=1e-3)
+
+    def test_upsert_refreshes_activation(self, tmp_knowledge_db, archive_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.8)
+        _age_edge(db, "A", "B", 30)
+        db.add_edge("A", "B", "knows", weight=0.8)
+        db.run_graph_maintenance(archive_db_path=archive_path, half_life_days=30)
+        assert _weight(db, "A", "B") == pytest.approx(0.8, rel=1e-3)
+
+
+class TestGraphPruning:
+    """测试归档与孤立节点清理"""
+
+    def test_weak_edges_archived(self, tmp_knowledge_db, archive_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.9)
+        for i in range(5):
+            db.add_edge("A", f"X{i}", "weak", weight=0.01)
+        stats = db.run_graph_maintenance(archive_db_path=archive_path, chunk_size=2)
+        assert stats["archived"] == 5
+        assert db.get_stats()["edges"] == 1
+        conn = sqlite3.connect(archive_path)
+        rows = conn.execute("SELECT source, relation, target, meta FROM pruned_relations").fetchall()
+        conn.close()
+        assert len(rows) == 5
+        assert '"weight":0.01' in rows[0][3]
+
+    def test_orphans_removed_after_grace(self, tmp_knowledge_db, archive_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.9)
+        db.add_edge("A", "X", "weak", weight=0.01)
+        db.add_node("Fresh")
+        stats = db.run_graph_maintenance(archive_db_path=archive_path)
+        # 宽限期内的孤立节点保留
+        assert stats["orphans_removed"] == 0
+
+        _age_nodes(db, 48)
+        stats = db.run_graph_maintenance(archive_db_path=archive_path)
+        assert stats["orphans_removed"] == 2
+        assert db.get_stats()["nodes"] == 2
+
+    def test_invalidates_graph_index(self, tmp_knowledge_db, archive_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.9)
+        db.add_edge("A", "C", "weak", weight=0.01)
+        assert db.get_graph_index().shortest_path("A", "C") == ["A", "C"]
+        db.run_graph_maintenance(archive_db_path=archive_path)
+        assert db.get_graph_index().shortest_path("A", "C") == []
+
+
+class TestDeepCleanGraphDecay:
+    """测试 DeepCleanManager 重复触发时图谱只衰减一次"""
+
+    def _manager(self, db, tmp_path):
+        manager = DeepCleanManager.__new__(DeepCleanManager)
+        manager.memory_service = MagicMock(knowledge_db=db)
+        manager.memory_service.dedupe_knowledge.return_value = {}
+        manager.memory_service.run_memory_tiering.return_value = {}
+        manager.consolidator = MagicMock()
+        manager.consolidator.consolidate.return_value = {}
+        manager.running = False
+        manager.last_clean_time = None
+        manager.state_path = os.path.join(tmp_path, "deep_clean_state.json")
+        manager.archive_db_path = os.path.join(tmp_path, "archive.db")
+        return manager
+
+    def test_repeated_deep_clean_decays_once(self, tmp_knowledge_db, tmp_path, monkeypatch):
+        from xingchen.config.settings import settings
+        monkeypatch.setattr(settings, "GRAPH_DECAY_HALF_LIFE_DAYS", 30)
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.8)
+        _age_edge(db, "A", "B", 30)
+        manager = self._manager(db, tmp_path)
+
+        manager.perform_deep_clean("manual")
+        assert manager.last_clean_time is not None
+        manager.perform_deep_clean("manual")
+        assert _weight(db, "A", "B") == pytest.approx(0.4, rel=1e-3)
+
+        # 进程重启后 (内存中的维护时间丢失) 依旧不会重复衰减
+        self._manager(db, tmp_path).perform_deep_clean("scheduled")
+        assert _weight(db, "A", "B") == pytest.approx(0.4, rel=1e-3)
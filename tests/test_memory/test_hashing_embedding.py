@@ -0,0 +1,98 @@
+"""
+测试 HashingEmbeddingFunction 与嵌入后端选择
+"""
+import pytest
+import numpy as np
+import chromadb
+from xingchen.config.settings import settings
+from xingchen.memory.storage.hashing_embedding import HashingEmbeddingFunction
+from xingchen.memory.storage.embedding_cache import (
+    CachedEmbeddingFunction, backend_for, get_embedding_function, resolve_collection
+)
+
+
+@pytest.fixture
+def ef():
+    return HashingEmbeddingFunction(dim=256)
+
+
+def _cos(a, b):
+    return float(np.dot(a, b))
+
+
+class TestHashingEmbedding:
+    """哈希嵌入的基本性质"""
+
+    def test_deterministic_and_normalized(self, ef):
+        a, b = ef(["用户喜欢喝咖啡", "用户喜欢喝咖啡"])
+        assert a.shape == (256,)
+        assert np.allclose(a, b)
+        assert np.linalg.norm(a) == pytest.approx(1.0, rel=1e-5)
+
+    def test_stable_across_instances(self, ef):
+        """哈希不依赖进程随机种子，持久化后的向量可与新计算的向量比较"""
+        other = HashingEmbeddingFunction(dim=256)
+        assert np.allclose(ef(["Python 脚本"])[0], other(["Python 脚本"])[0])
+
+    def test_overlap_ranks_higher(self, ef):
+        query, related, unrelated = ef(["用户喜欢喝咖啡吗", "用户每天早上喜欢喝一杯咖啡", "今天的天气预报说会下雨"])
+        assert _cos(query, related) > _cos(query, unrelated) + 0.2
+
+    def test_mixed_language(self, ef):
+        query, related, unrelated = ef(["docker 部署", "用 Docker Compose 部署服务", "周末去爬山"])
+        assert _cos(query, related) > _cos(query, unrelated)
+
+    def test_whitespace_and_case_normalized(self, ef):
+        a, b = ef(["Hello   World", "hello world"])
+        assert np.allclose(a, b)
+
+    def test_empty_text(self, ef):
+        vec = ef([""])[0]
+        assert not vec.any()
+
+    def test_config_round_trip(self, ef):
+        rebuilt = HashingEmbeddingFunction.build_from_config(ef.get_config())
+        assert rebuilt.dim == 256
+        assert np.allclose(rebuilt(["abc"])[0], ef(["abc"])[0])
+
+
+class TestChromaIntegration:
+    """作为 Chroma embedding_function 使用"""
+
+    def test_persist_and_reopen(self, tmp_path, ef):
+        client = chromadb.PersistentClient(path=str(tmp_path))
+        col = client.get_or_create_collection("mem__hashing", metadata={"hnsw:space": "cosine"}, embedding_function=ef)
+        col.add(ids=["a", "b"], documents=["用户的猫叫小白", "服务器部署在上海机房"])
+
+        reopened = chromadb.PersistentClient(path=str(tmp_path)).get_or_create_collection(
+            "mem__hashing", metadata={"hnsw:space": "cosine"}, embedding_function=HashingEmbeddingFunction(dim=256)
+        )
+        result = reopened.query(query_texts=["猫叫什么名字"], n_results=1)
+        assert result["ids"][0] == ["a"]
+
+
+class TestBackendSelection:
+    """后端选择与集合命名"""
+
+    def test_default_backend(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "default")
+        monkeypatch.setattr(settings, "EMBEDDING_BACKEND_OVERRIDES", {})
+        name, ef = resolve_collection("fragments")
+        assert name == "fragments"
+        assert isinstance(ef, CachedEmbeddingFunction)
+
+    def test_per_collection_override(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "default")
+        monkeypatch.setattr(settings, "EMBEDDING_BACKEND_OVERRIDES", {"fragments": "hashing"})
+        name, ef = resolve_collection("fragments")
+        assert name == "fragments__hashing"
+        assert isinstance(ef, HashingEmbeddingFunction)
+        assert resolve_collection("topics")[0] == "topics"
+
+    def test_unknown_backend_falls_back(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "bogus")
+        monkeypatch.setattr(settings, "EMBEDDING_BACKEND_OVERRIDES", {})
+        assert backend_for("topics") == "default"
+
+    def test_shared_instance(self):
+        assert get_embedding_function("hashing") is get_embedding_function("hashing")
@@ -0,0 +1,148 @@
+"""
+测试 HierarchicalRetriever 层级检索
+"""
+import pytest
+import os
+import threading
+import chromadb
+from xingchen.memory.storage.topic_manager import TopicManager
+from xingchen.memory.storage.fragment_index import FragmentIndex
+from xingchen.memory.storage.hashing_embedding import HashingEmbeddingFunction
+from xingchen.memory.services.hierarchical_retriever import HierarchicalRetriever
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """离线哈希嵌入的临时 TopicManager (绕过单例)"""
+    manager = TopicManager.__new__(TopicManager)
+    db_path = os.path.join(tmp_path, "test_topic_db")
+    os.makedirs(db_path, exist_ok=True)
+    ef = HashingEmbeddingFunction(dim=256)
+    manager.client = chromadb.PersistentClient(path=db_path)
+    manager.topics = manager.client.get_or_create_collection(name="topics__hashing", metadata={"hnsw:space": "cosine"}, embedding_function=ef)
+    manager.tasks = manager.client.get_or_create_collection(name="tasks__hashing", metadata={"hnsw:space": "cosine"}, embedding_function=ef)
+    manager.fragments = manager.client.get_or_create_collection(name="fragments__hashing", metadata={"hnsw:space": "cosine"}, embedding_function=ef)
+    manager.embedding_functions = {"topics": ef, "tasks": ef, "fragments": ef}
+    manager.fragment_index = FragmentIndex(os.path.join(db_path, "fragment_index.db"))
+    manager._topic_catalog = None
+    manager._initialized = True
+    return manager
+
+
+@pytest.fixture
+def populated(manager):
+    cooking = manager.create_topic("烹饪", "红烧肉 糖醋排骨 火候 酱油")
+    coding = manager.create_topic("编程", "Python 函数 调试 报错")
+    braise = manager.create_task(cooking, "红烧肉", "红烧肉 炖煮 冰糖")
+    manager.add_fragments([
+        {"content": "红烧肉 要用 冰糖 炒糖色", "topic_id": cooking, "task_id": braise},
+        {"content": "红烧肉 炖煮 一个半小时", "topic_id": cooking, "task_id": braise},
+        {"content": "糖醋排骨 先炸 再 裹汁", "topic_id": cooking},
+        {"content": "Python 函数 报错 要看 traceback", "topic_id": coding},
+        {"content": "Python 调试 可以 用 pdb", "topic_id": coding},
+    ])
+    return {"manager": manager, "cooking": cooking, "coding": coding, "braise": braise}
+
+
+class TestHierarchicalRetrieve:
+    """测试由粗到细检索"""
+
+    def test_results_stay_in_selected_topic(self, populated):
+        retriever = HierarchicalRetriever(populated["manager"])
+        results = retriever.retrieve("Python 报错 怎么 调试", limit=2, top_topics=1)
+
+        assert len(results) == 2
+        assert all(r["metadata"]["topic_id"] == populated["coding"] for r in results)
+        assert all(r["topic"] == "编程" for r in results)
+        assert "total_ms" in retriever.last_timings
+
+    def test_task_bonus_tags_results(self, populated):
+        retriever = HierarchicalRetriever(populated["manager"])
+        results = retriever.retrieve("红烧肉 冰糖 炖煮", limit=3, top_topics=1)
+
+        assert results[0]["metadata"]["task_id"] == populated["braise"]
+        assert results[0]["task"] == "红烧肉"
+        assert results[0]["score"] >= results[-1]["score"]
+
+    def test_flat_fallback_without_topics(self, manager):
+        manager.add_fragment(content="未分类的 片段 内容")
+        results = HierarchicalRetriever(manager).retrieve("片段 内容", limit=3)
+
+        assert len(results) == 1
+        assert results[0]["topic"] is None
+
+    def test_empty_query(self, manager):
+        assert HierarchicalRetriever(manager).retrieve("") == []
+
+
+class TestHierarchicalCache:
+    """测试缓存失效与预热"""
+
+    def test_new_fragment_invalidates_topic_cache(self, populated):
+        manager = populated["manager"]
+        retriever = HierarchicalRetriever(manager)
+        retriever.retrieve("Python 调试", limit=5, top_topics=1)
+
+        new_id = manager.add_fragment(content="Python 调试 断点 技巧", topic_id=populated["coding"])
+        results = retriever.retrieve("Python 调试 断点", limit=5, top_topics=1)
+        assert new_id in [r["id"] for r in results]
+
+    def test_new_topic_refreshes_layer(self, populated):
+        manager = populated["manager"]
+        retriever = HierarchicalRetriever(manager)
+        retriever.retrieve("红烧肉", limit=1)
+
+        garden = manager.create_topic("园艺", "月季 修剪 施肥")
+        manager.add_fragment(content="月季 花后 修剪 施肥", topic_id=garden)
+        results = retriever.retrieve("月季 修剪", limit=1, top_topics=1)
+        assert results[0]["topic"] == "园艺"
+
+    def test_cold_topics_fall_back_and_load_in_background(self, populated):
+        retriever = HierarchicalRetriever(populated["manager"])
+        results = retriever.retrieve("Python 报错 怎么 调试", limit=2, top_topics=1, cold_load=False)
+
+        # 缓存未就绪: 本轮走全量检索，仍然返回结果
+        assert len(results) == 2
+        assert "Python" in results[0]["document"]
+        retriever.wait_for_loads(timeout=5)
+        assert populated["coding"] in retriever._fragments
+
+        retriever.retrieve("Python 报错 怎么 调试", limit=2, top_topics=1, cold_load=False)
+        assert not retriever._pending
+
+    def test_unchanged_index_skips_count_queries(self, populated):
+        from unittest.mock import patch
+
+        manager = populated["manager"]
+        retriever = HierarchicalRetriever(manager)
+        retriever.retrieve("Python 调试", limit=2, top_topics=1)
+        with patch.object(manager.fragment_index, "count", side_effect=AssertionError("count called")):
+            assert retriever.retrieve("Python 调试", limit=2, top_topics=1)
+
+    def test_warm_preloads_fragments(self, populated):
+        retriever = HierarchicalRetriever(populated["manager"])
+        assert retriever.warm() == 5
+        assert retriever.warm(max_rows=1) == 0
+
+    def test_concurrent_warm_and_retrieve(self, populated):
+        """后台预热与检索并发时 LRU 计数保持一致"""
+        retriever = HierarchicalRetriever(populated["manager"], cache_rows=3)
+        errors = []
+
+        def worker(fn):
+            try:
+                for _ in range(30):
+                    fn()
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(retriever.warm,)),
+                   threading.Thread(target=worker, args=(lambda: retriever.retrieve("红烧肉 冰糖", limit=2),)),
+                   threading.Thread(target=worker, args=(lambda: retriever.retrieve("Python 调试", limit=2),))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert retriever._cached_rows == sum(len(entry.ids) for entry in retriever._fragments.values())
@@ -15,7 +15,7 @@ from xingchen.memory.storage.diary import DiaryStorage
 
 
 @pytest.fixture
-def memory_service(tmp_path):
+def memory_service(tmp_path, tmp_knowledge_db):
     """创建测试用的 MemoryService 实例，使用隔离的临时目录"""
     from xingchen.config.settings import settings
     
@@ -35,7 +35,7 @@ def memory_service(tmp_path):
     json_storage = JsonStorage(str(test_dir / "test_long_term.json"))
     diary_storage = DiaryStorage(str(test_dir / "test_diary.md"))
     
-    service = MemoryService(vector_storage, json_storage, diary_storage)
+    service = MemoryService(vector_storage, json_storage, diary_storage, knowledge_db=tmp_knowledge_db)
     return service
 
 
@@ -73,6 +73,20 @@ class TestMemoryServiceShortTerm:
         
         print(f"✅ 获取最近历史成功，返回 {len(history)} 条")
 
+    def test_short_term_char_limit(self, memory_service, monkeypatch):
+        """测试短期记忆总字符数上限 (SHORT_TERM_MAX_CHARS)"""
+        from xingchen.config.settings import settings
+        monkeypatch.setattr(settings, "SHORT_TERM_MAX_CHARS", 100)
+
+        for i in range(10):
+            memory_service.add_short_term("user", f"{i}" * 30)
+
+        assert sum(len(e.content) for e in memory_service.short_term) <= 100
+        assert memory_service.short_term[-1].content == "9" * 30
+
+        memory_service.add_short_term("assistant", "长" * 500)  # 单条超限时仍保留最新一条
+        assert [e.content for e in memory_service.short_term] == ["长" * 500]
+
 
 class TestMemoryServiceLongTerm:
     """测试长期记忆功能"""
@@ -95,6 +109,24 @@ class TestMemoryServiceLongTerm:
         
         print(f"✅ 长期记忆添加成功，当前 {len(memory_service.long_term)} 条")
     
+    def test_near_duplicate_not_reindexed(self, tmp_path, tmp_knowledge_db):
+        """并入已有条目的改写不覆盖其向量，也不重复进入长期记忆缓存"""
+        from unittest.mock import MagicMock
+
+        db = tmp_knowledge_db
+        service = MemoryService(ChromaStorage(str(tmp_path / "chroma"), connect=False),
+                                JsonStorage(str(tmp_path / "long_term.json")),
+                                DiaryStorage(str(tmp_path / "diary.md")), knowledge_db=db, warm_up=False)
+        service.vector_indexer = MagicMock()
+        initial_count = len(service.long_term)
+
+        assert service.add_long_term("用户在学习 Python 编程") is not None
+        assert service.add_long_term("用户正在学习Python编程。") is None
+
+        assert len(service.long_term) == initial_count + 1
+        assert service.vector_indexer.enqueue.call_count == 1
+        assert service.vector_indexer.enqueue.call_args[0][1] == "用户在学习 Python 编程"
+
     def test_search_long_term(self, memory_service):
         """测试搜索长期记忆"""
         # 添加一些事实
@@ -107,3 +139,115 @@ class TestMemoryServiceLongTerm:
         assert any("苹果" in item.content for item in results)
         
         print(f"✅ 长期记忆搜索成功，返回 {len(results)} 条结果")
+
+
+class TestMemoryServiceStartupSnapshot:
+    """测试启动快照恢复长期记忆与别名缓存"""
+
+    def test_restore_from_snapshot(self, memory_service, tmp_path):
+        from unittest.mock import patch
+        from xingchen.utils.snapshot import StartupSnapshot
+
+        memory_service.add_long_term("快照测试: 用户养了一只猫", category="fact")
+        memory_service.save_alias("快照小王", "王小明")
+        snapshot = StartupSnapshot(str(tmp_path / "startup_snapshot.bin"))
+        with patch("xingchen.memory.service.startup_snapshot", snapshot):
+            service = MemoryService(memory_service.vector_storage, memory_service.json_storage,
+                                    memory_service.diary_storage, knowledge_db=memory_service.knowledge_db)
+            service.close()
+            assert snapshot.save()
+
+            restored = MemoryService(memory_service.vector_storage, memory_service.json_storage,
+                                     memory_service.diary_storage, knowledge_db=memory_service.knowledge_db)
+            restored.close()
+
+        assert snapshot.stats["hits"] == 2
+        assert [e.content for e in restored.long_term] == [e.content for e in service.long_term]
+        assert restored._alias_cache["快照小王"] == "王小明"
+
+
+class TestMemoryServiceWarmup:
+    """测试分阶段启动: 向量库与别名缓存推迟到后台预热"""
+
+    def test_deferred_warm_up(self, tmp_path, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        db.add_entity("王小明", entity_type="person", aliases=["预热小王"])
+
+        vector_storage = ChromaStorage(str(tmp_path / "deferred_chroma"), connect=False)
+        service = MemoryService(vector_storage, JsonStorage(str(tmp_path / "long_term.json")),
+                                DiaryStorage(str(tmp_path / "diary.md")), knowledge_db=db, warm_up=False)
+
+        # 预热前: 向量检索与别名解析降级，长期记忆缓存已可用
+        assert not vector_storage.is_available()
+        assert service.vector_indexer is None
+        assert service.search_alias("预热小王来了") is None
+        assert not service.alias_readiness.is_ready
+
+        service.warm_alias_cache()
+        assert vector_storage.connect()
+        service.start_vector_indexer()
+        try:
+            assert service.alias_readiness.is_ready
+            assert vector_storage.readiness.is_ready
+            assert service.search_alias("预热小王来了")[1] == "王小明"
+            assert service.vector_indexer is not None
+        finally:
+            service.close()
+
+
+class TestMemoryServiceMaintenance:
+    """测试归档/合并后长期记忆缓存同步剔除对应条目"""
+
+    @pytest.fixture
+    def service(self, tmp_path, tmp_knowledge_db):
+        return MemoryService(ChromaStorage(str(tmp_path / "chroma"), connect=False),
+                             JsonStorage(str(tmp_path / "long_term.json")),
+                             DiaryStorage(str(tmp_path / "diary.md")), knowledge_db=tmp_knowledge_db, warm_up=False)
+
+    def test_tiering_prunes_long_term(self, service, tmp_path):
+        from unittest.mock import patch
+
+        for i in range(10):
+            service.add_long_term(f"分层测试事实 {i}")
+        service._long_term_dirty = False
+        with patch("xingchen.memory.storage.knowledge.tiering.settings.MEMORY_HOT_CAPACITY", 8):
+            stats = service.run_memory_tiering(archive_db_path=str(tmp_path / "archive.db"))
+
+        assert stats["archived"] == 3
+        hot = {item["content"] for item in service.knowledge_db.get_knowledge()}
+        assert {e.content for e in service.long_term} == hot
+        assert service._long_term_dirty
+
+    def test_dedupe_prunes_long_term(self, service):
+        from unittest.mock import patch
+
+        with patch("xingchen.memory.storage.knowledge.knowledge_store.settings.KNOWLEDGE_NEAR_DUP_ENABLED", False):
+            service.add_long_term("用户的生日是五月三日")
+            service.add_long_term("用户的生日是五月三日。")
+        assert len(service.long_term) == 2
+
+        stats = service.dedupe_knowledge()
+
+        assert stats["merged"] == 1
+        assert [e.content for e in service.long_term] == ["用户的生日是五月三日"]
+
+    def test_keyword_miss_recalls_archived(self, service):
+        from unittest.mock import patch
+
+        service.add_long_term("用户小时候养过一只叫豆豆的狗")
+        with service.knowledge_db._get_conn() as conn:
+            conn.execute("UPDATE knowledge SET created_at = datetime('now', 'localtime', '-400 days')")
+            conn.commit()
+        for i in range(5):
+            service.add_long_term(f"分层测试事实 {i}")
+        with patch("xingchen.memory.storage.knowledge.tiering.settings.MEMORY_HOT_CAPACITY", 5):
+            service.run_memory_tiering()
+        assert "用户小时候养过一只叫豆豆的狗" not in {e.content for e in service.long_term}
+        service._long_term_dirty = False
+
+        # 默认的关键词检索在热层未命中，回落到冷存储并把条目放回长期记忆缓存
+        assert service.get_relevant_long_term("豆豆") == ["用户小时候养过一只叫豆豆的狗"]
+        assert "用户小时候养过一只叫豆豆的狗" in {e.content for e in service.long_term}
+        assert service._long_term_dirty
+        assert service.get_relevant_long_term("豆豆") == ["用户小时候养过一只叫豆豆的狗"]
+        assert [e.content for e in service.long_term].count("用户小时候养过一只叫豆豆的狗") == 1
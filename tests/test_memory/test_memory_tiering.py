@@ -0,0 +1,134 @@
+"""
+测试 MemoryTieringMixin (冷热分层 / 冷层召回与回迁)
+"""
+import os
+import sqlite3
+from xingchen.memory.services.retriever import HybridRetriever
+
+
+def _age_knowledge(db, knowledge_id, days):
+    with db._get_conn() as conn:
+        conn.execute(
+            "UPDATE knowledge SET created_at = datetime('now', 'localtime', ?) WHERE id = ?",
+            (f"-{days} days", knowledge_id)
+        )
+        conn.commit()
+
+
+def _archive_count(db):
+    conn = sqlite3.connect(db.archive_db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM raw_memories").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestAccessStats:
+    """测试访问统计"""
+
+    def test_record_and_flush(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        knowledge_id = db.add_knowledge("用户喜欢猫")
+        db.record_access([knowledge_id])
+        db.record_access([knowledge_id])
+
+        assert db.get_knowledge_by_ids([knowledge_id])[0]["access_count"] == 0
+        assert db.flush_access_stats() == 1
+        item = db.get_knowledge_by_ids([knowledge_id])[0]
+        assert item["access_count"] == 2
+        assert item["last_accessed"]
+
+
+class TestTiering:
+    """测试分层迁移"""
+
+    def test_under_capacity_is_noop(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        db.add_knowledge("只有一条")
+        stats = db.run_memory_tiering(hot_capacity=10)
+        assert stats["archived"] == 0
+        assert not os.path.exists(db.archive_db_path)
+
+    def test_lowest_scores_are_archived(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        ids = [db.add_knowledge(f"事实 {i}", confidence=0.5) for i in range(10)]
+        for knowledge_id in ids[:5]:
+            _age_knowledge(db, knowledge_id, 365)
+        # 旧但常用的条目应当留下
+        for _ in range(20):
+            db.record_access([ids[0]])
+
+        stats = db.run_memory_tiering(hot_capacity=8, batch_size=2)
+
+        # 回落到容量的 90% (7 条)
+        assert stats["hot_after"] == 7
+        assert stats["archived"] == 3
+        assert set(stats["archived_ids"]) <= set(ids[1:5])
+        assert _archive_count(db) == 3
+
+    def test_hot_tier_stays_bounded(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        for round_no in range(3):
+            for i in range(20):
+                db.add_knowledge(f"第 {round_no} 轮事实 {i}")
+            db.run_memory_tiering(hot_capacity=20, batch_size=7)
+            assert db.get_tier_stats()["hot"]["count"] <= 20
+
+        stats = db.get_tier_stats()
+        assert stats["hot"]["count"] + stats["archive"]["count"] == 60
+
+    def test_migrates_legacy_archive_table(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        conn = sqlite3.connect(db.archive_db_path)
+        conn.execute("CREATE TABLE raw_memories (id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT, "
+                     "category TEXT, created_at TEXT, archived_at TEXT)")
+        conn.commit()
+        conn.close()
+        for i in range(5):
+            db.add_knowledge(f"事实 {i}")
+
+        assert db.run_memory_tiering(hot_capacity=2)["archived"] == 4
+        assert db.search_archive_terms(["事实"])
+
+
+class TestArchiveRecall:
+    """测试冷层召回与回迁"""
+
+    def test_query_hit_promotes_archived_item(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        old = db.add_knowledge("用户小时候养过一只叫豆豆的狗")
+        _age_knowledge(db, old, 400)
+        for i in range(5):
+            db.add_knowledge(f"最近的事实 {i}")
+        db.run_memory_tiering(hot_capacity=5)
+        assert db.get_knowledge_by_ids([old]) == []
+
+        results = HybridRetriever(db).retrieve("豆豆", limit=3)
+
+        assert results[0]["content"] == "用户小时候养过一只叫豆豆的狗"
+        assert results[0]["promoted"] is True
+        assert "archive" in results[0]["sources"]
+        promoted = db.get_knowledge_by_ids([results[0]["id"]])[0]
+        assert promoted["access_count"] == 1
+        assert _archive_count(db) == 1
+
+    def test_promote_merges_duplicate_content(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        for i in range(3):
+            db.add_knowledge(f"事实 {i}")
+        db.run_memory_tiering(hot_capacity=1)
+        archived = db.search_archive_terms(["事实 0"])[0]
+        current = db.add_knowledge("事实 0")
+
+        promoted = db.promote_archived([archived["archive_id"]])
+        assert promoted == {archived["archive_id"]: current}
+
+    def test_tier_latency_recorded(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        db.add_knowledge("用户喜欢猫")
+        retriever = HybridRetriever(db)
+        retriever.retrieve("猫")
+
+        latency = retriever.tier_latency()
+        assert latency["hot"]["queries"] == 1
+        assert latency["archive"]["queries"] == 1
@@ -0,0 +1,99 @@
+"""
+测试知识近重复检测 (MinHash LSH)
+"""
+from unittest.mock import patch
+from xingchen.memory.storage.knowledge.near_dup import content_bands, near_duplicate_score
+
+
+class TestSimilarity:
+    """测试相似度与 LSH 签名"""
+
+    def test_punctuation_and_width_variants(self):
+        assert near_duplicate_score("DeepSeek R1 于 2025年 1月发布", "DeepSeek R1 于 2025 年 1 月发布。") == 1.0
+        assert near_duplicate_score("用户在学习 Python 编程", "用户正在学习Python编程") > 0.75
+
+    def test_negation_and_numbers_are_not_duplicates(self):
+        assert near_duplicate_score("用户喜欢吃苹果", "用户不喜欢吃苹果") == 0.0
+        assert near_duplicate_score("用户今年 3 岁", "用户今年 33 岁") == 0.0
+
+    def test_bands_are_stable(self):
+        assert content_bands("用户喜欢吃苹果") == content_bands("用户喜欢吃苹果！")
+        assert content_bands("") == []
+
+
+class TestNearDuplicateWrites:
+    """测试写入时合并"""
+
+    def test_paraphrase_merges_into_existing(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        first = db.add_knowledge("用户在学习 Python 编程", confidence=0.6)
+        second = db.add_knowledge("用户正在学习Python编程。", confidence=0.9)
+
+        assert second == first
+        items = db.get_knowledge()
+        assert len(items) == 1
+        assert items[0]["confidence"] == 0.9
+
+    def test_upsert_reports_created(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        knowledge_id, created = db.upsert_knowledge("用户在学习 Python 编程")
+        assert created
+        assert db.upsert_knowledge("用户正在学习Python编程。") == (knowledge_id, False)
+        assert db.upsert_knowledge("用户在学习 Python 编程") == (knowledge_id, False)
+
+    def test_other_category_not_merged(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        db.add_knowledge("用户在学习 Python 编程", category="fact")
+        db.add_knowledge("用户在学习 Python 编程。", category="experience")
+        assert len(db.get_knowledge()) == 2
+
+    def test_distinct_facts_kept(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        db.add_knowledge("用户喜欢吃苹果")
+        db.add_knowledge("用户不喜欢吃苹果")
+        db.add_knowledge("用户住在北京")
+        assert len(db.get_knowledge()) == 3
+
+    def test_delete_removes_index(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        knowledge_id = db.add_knowledge("用户养了一只猫")
+        db.delete_knowledge(knowledge_id)
+        assert db.add_knowledge("用户养了一只猫。") != knowledge_id
+        assert len(db.get_knowledge()) == 1
+
+
+class TestBackfill:
+    """测试存量回填"""
+
+    def test_backfill_merges_existing_duplicates(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        with patch("xingchen.memory.storage.knowledge.knowledge_store.settings.KNOWLEDGE_NEAR_DUP_ENABLED", False):
+            first = db.add_knowledge("用户的生日是五月三日", confidence=0.5)
+            db.add_knowledge("用户的生日是五月三日。", confidence=0.9)
+            db.add_knowledge("用户住在北京")
+        assert len(db.get_knowledge()) == 3
+
+        stats = db.backfill_near_duplicates(batch_size=2)
+
+        assert stats["merged"] == 1
+        assert stats["indexed"] == 2
+        items = {item["id"]: item for item in db.get_knowledge()}
+        assert len(items) == 2
+        assert items[first]["confidence"] == 0.9
+        # 回填后新写入的改写同样能被识别
+        assert db.add_knowledge("用户住在北京！") in items
+
+    def test_backfill_is_incremental(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        db.add_knowledge("用户喜欢猫")
+        assert db.backfill_near_duplicates()["indexed"] == 0
+
+    def test_backfill_marks_empty_signatures(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        with patch("xingchen.memory.storage.knowledge.knowledge_store.settings.KNOWLEDGE_NEAR_DUP_ENABLED", False):
+            db.add_knowledge("。。。")
+            db.add_knowledge("   ")
+        assert db.backfill_near_duplicates()["indexed"] == 2
+        assert db.backfill_near_duplicates()["indexed"] == 0
+        db.add_knowledge("！！")
+        assert db.backfill_near_duplicates()["indexed"] == 0
@@ -0,0 +1,94 @@
+"""
+测试 HybridRetriever (词法 + 向量 RRF 融合)
+"""
+import pytest
+import time
+from xingchen.memory.services.retriever import HybridRetriever
+
+
+class FakeVectorStorage:
+    """按预设顺序返回命中的向量库替身"""
+
+    def __init__(self, ranked_ids=None, available=True, delay=0.0, error=None):
+        self.ranked_ids = ranked_ids or []
+        self.available = available
+        self.delay = delay
+        self.error = error
+
+    def is_available(self):
+        return self.available
+
+    def query_memories(self, query, n_results=10):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [
+            {"id": f"ltm_{i}", "document": "", "metadata": {"knowledge_id": i}, "distance": 0.1 * rank}
+            for rank, i in enumerate(self.ranked_ids[:n_results])
+        ]
+
+
+@pytest.fixture
+def facts(tmp_knowledge_db):
+    db = tmp_knowledge_db
+    ids = {
+        "apple": db.add_knowledge("用户喜欢吃苹果和香蕉"),
+        "fruit": db.add_knowledge("用户每天早上吃水果"),
+        "code": db.add_knowledge("用户在学习 Python 编程"),
+    }
+    return db, ids
+
+
+class TestHybridRetriever:
+    """测试混合检索"""
+
+    def test_lexical_only_when_vector_unavailable(self, facts):
+        db, ids = facts
+        retriever = HybridRetriever(db, FakeVectorStorage([ids["fruit"]], available=False))
+        results = retriever.retrieve("苹果", limit=5)
+        assert [r["id"] for r in results] == [ids["apple"]]
+        assert results[0]["sources"] == ["lexical"]
+
+    def test_vector_only_hits_are_hydrated(self, facts):
+        db, ids = facts
+        retriever = HybridRetriever(db, FakeVectorStorage([ids["fruit"]]))
+        results = retriever.retrieve("苹果", limit=5)
+        assert {r["id"] for r in results} == {ids["apple"], ids["fruit"]}
+        fruit = next(r for r in results if r["id"] == ids["fruit"])
+        assert fruit["content"] == "用户每天早上吃水果"
+        assert fruit["sources"] == ["vector"]
+
+    def test_rrf_prefers_items_found_by_both(self, facts):
+        db, ids = facts
+        retriever = HybridRetriever(db, FakeVectorStorage([ids["fruit"], ids["apple"]]))
+        results = retriever.retrieve("苹果", limit=5)
+        assert results[0]["id"] == ids["apple"]
+        assert results[0]["sources"] == ["lexical", "vector"]
+
+    def test_confidence_penalty(self, facts):
+        db, ids = facts
+        db.update_knowledge_confidence(ids["apple"], 0.0)
+        retriever = HybridRetriever(db, FakeVectorStorage([ids["fruit"], ids["apple"]]))
+        results = retriever.retrieve("苹果", limit=5)
+        # 低置信度的双路命中被压到单路命中之后
+        assert results[0]["id"] == ids["fruit"]
+
+    def test_stale_vector_hits_skipped(self, facts):
+        db, ids = facts
+        retriever = HybridRetriever(db, FakeVectorStorage([9999]))
+        assert [r["id"] for r in retriever.retrieve("苹果")] == [ids["apple"]]
+
+    def test_vector_failure_degrades(self, facts):
+        db, ids = facts
+        retriever = HybridRetriever(db, FakeVectorStorage([ids["fruit"]], error=RuntimeError("boom")))
+        assert [r["id"] for r in retriever.retrieve("苹果")] == [ids["apple"]]
+
+    def test_vector_timeout_degrades(self, facts, monkeypatch):
+        from xingchen.config.settings import settings
+        monkeypatch.setattr(settings, "HYBRID_VECTOR_TIMEOUT", 0.05)
+        db, ids = facts
+        retriever = HybridRetriever(db, FakeVectorStorage([ids["fruit"]], delay=0.5))
+        assert [r["id"] for r in retriever.retrieve("苹果")] == [ids["apple"]]
+        assert "vector_ms" not in retriever.last_timings
+        assert "lexical_ms" in retriever.last_timings
@@ -0,0 +1,157 @@
+"""
+测试 TopicCentroids 与 AutoClassifier 快速通道
+"""
+import pytest
+import os
+import numpy as np
+from unittest.mock import Mock, patch
+from xingchen.config.settings import settings
+from xingchen.memory.services.topic_centroids import TopicCentroids, calibrate, load_calibration
+from xingchen.memory.services.auto_classifier import AutoClassifier
+
+
+def _cluster(center, count, noise, rng):
+    return [center + rng.normal(0, noise, center.shape) for _ in range(count)]
+
+
+@pytest.fixture
+def centers():
+    rng = np.random.default_rng(0)
+    return rng.normal(0, 1, (3, 32)).astype(np.float32)
+
+
+@pytest.fixture
+def centroids(tmp_path, centers):
+    index = TopicCentroids(os.path.join(tmp_path, "centroids.npz"), space="fragments")
+    rng = np.random.default_rng(1)
+    for i, center in enumerate(centers):
+        for vec in _cluster(center, 5, 0.1, rng):
+            index.add(vec, f"topic_{i}", f"话题{i}", task_id=f"task_{i}", task_name=f"任务{i}")
+    return index
+
+
+class TestTopicCentroids:
+    """测试质心索引"""
+
+    def test_match_topics(self, centroids, centers):
+        matches = centroids.match_topics(centers[1])
+        assert matches[0][0] == "topic_1"
+        assert matches[0][1] > 0.9
+        assert matches[0][1] > matches[1][1]
+
+    def test_min_samples_filters_topics(self, centroids, centers):
+        centroids.add(centers[2] * -1, "topic_new", "新话题")
+        assert all(t != "topic_new" for t, _ in centroids.match_topics(-centers[2], min_samples=3))
+
+    def test_match_task_within_topic(self, centroids, centers):
+        task_id, sim = centroids.match_task(centers[0], "topic_0")
+        assert task_id == "task_0"
+        assert sim > 0.9
+
+    def test_save_and_load(self, centroids, centers, tmp_path):
+        centroids.save()
+        loaded = TopicCentroids(centroids.path, space="fragments")
+        assert loaded.load()
+        assert loaded.topics["topic_0"]["count"] == 5
+        assert loaded.tasks["task_0"]["topic_id"] == "topic_0"
+        assert loaded.match_topics(centers[0])[0][0] == "topic_0"
+
+    def test_save_is_debounced(self, centroids, centers):
+        centroids.save()
+        centroids.add(centers[0], "topic_0")
+        assert not centroids.save_if_due(every=2, interval=3600)
+        centroids.add(centers[0], "topic_0")
+        assert centroids.save_if_due(every=2, interval=3600)
+
+        loaded = TopicCentroids(centroids.path, space="fragments")
+        assert loaded.load()
+        assert loaded.topics["topic_0"]["count"] == 7
+        # 有未落盘更新且超过间隔时同样保存
+        centroids.add(centers[0], "topic_0")
+        assert centroids.save_if_due(every=100, interval=0)
+        assert not centroids.save_if_due(every=100, interval=0)
+
+    def test_space_change_invalidates(self, centroids):
+        centroids.save()
+        assert not TopicCentroids(centroids.path, space="fragments__hashing").load()
+
+
+class TestCalibration:
+    """测试离线校准"""
+
+    def test_calibrate_separable_topics(self, centers):
+        rng = np.random.default_rng(2)
+        vectors, labels = [], []
+        for i, center in enumerate(centers):
+            for vec in _cluster(center, 30, 0.2, rng):
+                vectors.append(vec)
+                labels.append(f"topic_{i}")
+
+        result = calibrate(np.array(vectors), labels, target_precision=0.95)
+        assert "error" not in result
+        assert result["precision"] >= 0.95
+        assert result["coverage"] > 0.9
+
+    def test_calibrate_needs_two_topics(self, centers):
+        result = calibrate(np.array([centers[0]] * 5), ["topic_0"] * 5)
+        assert "error" in result
+
+    def test_load_calibration_missing(self, tmp_path):
+        assert load_calibration(os.path.join(tmp_path, "missing.json")) is None
+
+    def test_load_calibration_defaults(self, tmp_path):
+        path = os.path.join(tmp_path, "calibration.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"min_sim": 0.6}')
+        assert load_calibration(path) == {"min_sim": 0.6, "margin": settings.CLASSIFY_FAST_MARGIN}
+
+
+class TestFastPath:
+    """测试两级分类"""
+
+    @pytest.fixture
+    def classifier(self, centroids):
+        with patch('xingchen.memory.services.auto_classifier.LLMClient'):
+            classifier = AutoClassifier()
+        classifier.topic_manager = Mock()
+        classifier._centroids = centroids
+        classifier._thresholds = {"min_sim": 0.8, "margin": 0.1}
+        return classifier
+
+    def test_confident_match_skips_llm(self, classifier, centers):
+        with patch.object(classifier, "_embed", return_value=centers[2]):
+            result = classifier.classify("内容")
+
+        assert result["topic_id"] == "topic_2"
+        assert result["task_id"] == "task_2"
+        assert result["source"] == "centroid"
+        classifier.llm.chat.assert_not_called()
+        assert classifier.stats()["hit_rate"] == 1.0
+
+    def test_uncalibrated_falls_back_to_llm(self, classifier, centers, tmp_path):
+        classifier._thresholds = None
+        classifier.llm.chat.return_value = Mock(content='{"topic_name": "话题2", "is_new_topic": false, "confidence": 0.8}')
+        classifier.topic_manager.find_topic_by_name.return_value = "topic_2"
+        classifier.topic_manager.list_topics.return_value = []
+
+        with patch.object(settings, "CLASSIFY_CALIBRATION_PATH", os.path.join(tmp_path, "missing.json")), \
+                patch.object(classifier, "_embed", return_value=centers[2]):
+            result = classifier.classify("内容")
+
+        assert result["source"] == "llm"
+        assert classifier._thresholds is None
+        assert classifier._centroids.topics["topic_2"]["count"] == 6
+
+    def test_ambiguous_falls_back_to_llm_and_learns(self, classifier, centers):
+        classifier.llm.chat.return_value = Mock(content='{"topic_name": "话题0", "is_new_topic": false, "confidence": 0.8}')
+        classifier.topic_manager.find_topic_by_name.return_value = "topic_0"
+        classifier.topic_manager.list_topics.return_value = []
+        ambiguous = (centers[0] + centers[1]) / 2
+
+        with patch.object(classifier, "_embed", return_value=ambiguous):
+            result = classifier.classify("内容")
+
+        assert result["source"] == "llm"
+        assert result["topic_id"] == "topic_0"
+        assert classifier._centroids.topics["topic_0"]["count"] == 6
+        assert classifier.stats()["llm_calls"] == 1
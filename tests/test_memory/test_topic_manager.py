@@ -6,6 +6,7 @@ import os
 import shutil
 import tempfile
 from xingchen.memory.storage.topic_manager import TopicManager
+from xingchen.memory.storage.fragment_index import FragmentIndex
 
 
 @pytest.fixture
@@ -24,6 +25,8 @@ def temp_topic_manager(tmp_path):
     manager.topics = manager.client.get_or_create_collection(name="topics")
     manager.tasks = manager.client.get_or_create_collection(name="tasks")
     manager.fragments = manager.client.get_or_create_collection(name="fragments")
+    manager.fragment_index = FragmentIndex(os.path.join(db_path, "fragment_index.db"))
+    manager._topic_catalog = None
     manager._initialized = True
     
     return manager
@@ -87,3 +90,140 @@ class TestFragmentOperations:
         )
         
         assert frag_id.startswith("frag_")
+
+
+@pytest.fixture
+def offline_topic_manager(temp_topic_manager):
+    """各集合改用离线哈希嵌入，无需下载默认模型"""
+    from xingchen.memory.storage.hashing_embedding import HashingEmbeddingFunction
+    manager = temp_topic_manager
+    ef = HashingEmbeddingFunction(dim=64)
+    manager.topics = manager.client.get_or_create_collection(name="topics__hashing", embedding_function=ef)
+    manager.tasks = manager.client.get_or_create_collection(name="tasks__hashing", embedding_function=ef)
+    manager.fragments = manager.client.get_or_create_collection(name="fragments__hashing", embedding_function=ef)
+    return manager
+
+
+class TestFragmentIndex:
+    """测试片段元数据侧索引"""
+
+    def _add(self, manager, content, day, topic_id=None, weight=None):
+        meta = {"last_activated": f"2024-01-{day:02d}T00:00:00"}
+        if weight is not None:
+            meta["weight"] = weight
+        return manager.add_fragment(content=content, topic_id=topic_id, meta=meta)
+
+    def test_recent_is_globally_ordered(self, offline_topic_manager):
+        manager = offline_topic_manager
+        # 最新的片段最先写入，旧实现只取 limit*10 条再排序会漏掉它
+        newest = self._add(manager, "最新的片段", 28)
+        for i in range(25):
+            self._add(manager, f"较早的片段 {i}", 1)
+
+        recent = manager.get_recent_fragments(limit=2)
+        assert recent[0]["id"] == newest
+        assert recent[0]["document"] == "最新的片段"
+        assert len(recent) == 2
+
+    def test_top_weighted_and_topic_filter(self, offline_topic_manager):
+        manager = offline_topic_manager
+        heavy = self._add(manager, "重要片段", 2, topic_id="topic_a", weight=1.8)
+        self._add(manager, "普通片段", 3, topic_id="topic_a")
+        other = self._add(manager, "其他话题", 4, topic_id="topic_b", weight=1.9)
+
+        assert manager.get_top_fragments(limit=1)[0]["id"] == other
+        assert manager.get_top_fragments(limit=1, topic_id="topic_a")[0]["id"] == heavy
+        listed = manager.list_topic_fragments("topic_a")
+        assert [f["document"] for f in listed] == ["普通片段", "重要片段"]
+
+    def test_update_refreshes_index(self, offline_topic_manager):
+        manager = offline_topic_manager
+        frag_id = manager.add_fragment(content="重复提到的事")
+        manager.add_fragment(content="重复提到的事")
+
+        row = manager.fragment_index.get_many([frag_id])[frag_id]
+        assert row["mention_count"] == 2
+        assert row["weight"] == pytest.approx(1.1)
+
+    def test_rebuild_from_chroma(self, offline_topic_manager, tmp_path):
+        manager = offline_topic_manager
+        for i in range(5):
+            manager.add_fragment(content=f"片段 {i}")
+
+        manager.fragment_index = FragmentIndex(os.path.join(tmp_path, "fresh_index.db"))
+        manager._sync_fragment_index(page_size=2)
+        assert manager.fragment_index.count() == 5
+
+    def test_stale_entries_are_dropped(self, offline_topic_manager):
+        manager = offline_topic_manager
+        frag_id = manager.add_fragment(content="会被外部删除的片段")
+        manager.fragments.delete(ids=[frag_id])
+
+        assert manager.get_recent_fragments() == []
+        assert manager.fragment_index.count() == 0
+
+
+class TestBatchFragments:
+    """测试批量写入与指纹去重"""
+
+    def test_batch_adds_and_merges(self, offline_topic_manager):
+        manager = offline_topic_manager
+        ids = manager.add_fragments([
+            {"content": "用户喜欢猫", "category": "preference"},
+            {"content": "用户住在杭州"},
+            {"content": "用户喜欢猫", "category": "preference"},
+        ])
+
+        assert ids[0] == ids[2]
+        assert manager.fragments.count() == 2
+        meta = manager.fragments.get(ids=[ids[0]])["metadatas"][0]
+        assert meta["mention_count"] == 2
+        assert meta["weight"] == pytest.approx(1.1)
+
+    def test_dedup_across_days(self, offline_topic_manager):
+        """旧片段 id 带的是昨天的日期，同内容再次写入应命中同一条"""
+        manager = offline_topic_manager
+        fingerprint = manager._fingerprint("用户每天跑步")
+        old_id = f"frag_20240101_{fingerprint}"
+        meta = {
+            "mention_count": 3, "weight": 1.2, "fingerprint": fingerprint, "category": "memory",
+            "topic_id": "none", "task_id": "none", "last_activated": "2024-01-01T00:00:00", "emotion_tag": "happy",
+        }
+        manager.fragments.add(ids=[old_id], documents=["用户每天跑步"], metadatas=[meta])
+        manager.fragment_index.upsert(old_id, meta)
+
+        assert manager.add_fragment("用户每天跑步") == old_id
+        assert manager.fragments.count() == 1
+        stored = manager.fragments.get(ids=[old_id])["metadatas"][0]
+        assert stored["mention_count"] == 4
+        assert stored["emotion_tag"] == "happy"
+        assert manager.fragment_index.get_many([old_id])[old_id]["mention_count"] == 4
+
+    def test_weight_is_capped(self, offline_topic_manager):
+        manager = offline_topic_manager
+        frag_id = manager.add_fragments([{"content": "反复提到"}] * 30)[0]
+        assert manager.fragments.get(ids=[frag_id])["metadatas"][0]["weight"] == pytest.approx(2.0)
+
+    def test_empty_batch(self, offline_topic_manager):
+        assert offline_topic_manager.add_fragments([]) == []
+
+
+class TestTopicCatalog:
+    """测试话题目录"""
+
+    def test_catalog_loaded_from_existing_topics(self, offline_topic_manager):
+        manager = offline_topic_manager
+        manager.topics.add(ids=["topic_x"], documents=["旧话题描述"], metadatas=[{"name": "旧话题", "type": "topic"}])
+
+        assert manager.find_topic_by_name("旧话题") == "topic_x"
+        assert manager.list_topics() == [{"id": "topic_x", "name": "旧话题", "description": "旧话题描述"}]
+
+    def test_create_topic_updates_catalog(self, offline_topic_manager):
+        manager = offline_topic_manager
+        assert manager.list_topics() == []
+
+        topic_id = manager.create_topic("Python编程", "Python 相关")
+        assert manager.find_topic_by_name(" python编程 ") == topic_id
+        assert manager.find_topic_by_name("Python 编程") == topic_id
+        assert manager.find_topic_by_name("Ｐｙｔｈｏｎ编程") == topic_id
+        assert manager.find_topic_by_name("不存在") is None
@@ -0,0 +1,117 @@
+"""
+测试 VectorIndexer (后台批量向量索引)
+"""
+import pytest
+import os
+import json
+from xingchen.memory.services.vector_indexer import VectorIndexer
+
+
+class FakeVectorStorage:
+    """记录 upsert 调用的向量库替身"""
+
+    def __init__(self, fail_times=0):
+        self.docs = {}
+        self.calls = []
+        self.fail_times = fail_times
+
+    def is_available(self):
+        return True
+
+    def upsert_memories(self, ids, documents, metadatas=None):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("embedding model unavailable")
+        self.calls.append(list(ids))
+        for doc_id, doc in zip(ids, documents):
+            self.docs[doc_id] = doc
+        return True
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return os.path.join(tmp_path, "chroma", "index_checkpoint.json")
+
+
+def _add(db, indexer, content):
+    knowledge_id = db.add_knowledge(content)
+    if indexer is not None:
+        indexer.enqueue(knowledge_id, content)
+    return knowledge_id
+
+
+class TestVectorIndexer:
+    """测试批量索引与检查点"""
+
+    def test_flush_indexes_and_persists_checkpoint(self, tmp_knowledge_db, checkpoint_path):
+        store = FakeVectorStorage()
+        indexer = VectorIndexer(tmp_knowledge_db, store, checkpoint_path, batch_size=3)
+        ids = [_add(tmp_knowledge_db, indexer, f"事实 {i}") for i in range(7)]
+        assert indexer.flush(timeout=2)
+        assert set(store.docs) == {f"ltm_{i}" for i in ids}
+        assert [len(c) for c in store.calls] == [3, 3, 1]
+        assert indexer.checkpoint == max(ids)
+        with open(checkpoint_path) as f:
+            assert json.load(f)["checkpoint"] == max(ids)
+        assert indexer.stats()["lag"] == 0
+
+    def test_restart_catches_up_from_checkpoint(self, tmp_knowledge_db, checkpoint_path):
+        store = FakeVectorStorage()
+        first = VectorIndexer(tmp_knowledge_db, store, checkpoint_path)
+        indexed = _add(tmp_knowledge_db, first, "已索引")
+        first.flush(timeout=2)
+        # 模拟崩溃: 写入 KnowledgeDB 后未来得及进入向量库
+        lost = _add(tmp_knowledge_db, None, "崩溃前写入")
+
+        store.calls.clear()
+        second = VectorIndexer(tmp_knowledge_db, store, checkpoint_path)
+        assert second.checkpoint == indexed
+        second.start()
+        try:
+            assert second.flush(timeout=5)
+        finally:
+            second.stop()
+        assert store.calls == [[f"ltm_{lost}"]]
+        assert second.checkpoint == lost
+
+    def test_queue_overflow_recovers_from_db(self, tmp_knowledge_db, checkpoint_path):
+        store = FakeVectorStorage()
+        indexer = VectorIndexer(tmp_knowledge_db, store, checkpoint_path, queue_size=2, batch_size=10)
+        ids = [_add(tmp_knowledge_db, indexer, f"事实 {i}") for i in range(5)]
+        assert indexer.stats()["dropped"] == 3
+        assert indexer.flush(timeout=2)
+        assert set(store.docs) == {f"ltm_{i}" for i in ids}
+        assert indexer.checkpoint == max(ids)
+
+    def test_failed_batch_does_not_advance_checkpoint(self, tmp_knowledge_db, checkpoint_path):
+        store = FakeVectorStorage(fail_times=1)
+        indexer = VectorIndexer(tmp_knowledge_db, store, checkpoint_path)
+        knowledge_id = _add(tmp_knowledge_db, indexer, "事实")
+        indexer._process_once(force=True)
+        assert indexer.checkpoint == 0
+        assert indexer.stats()["failures"] == 1
+        assert indexer.flush(timeout=2)
+        assert indexer.checkpoint == knowledge_id
+
+    def test_background_thread(self, tmp_knowledge_db, checkpoint_path):
+        store = FakeVectorStorage()
+        indexer = VectorIndexer(tmp_knowledge_db, store, checkpoint_path, batch_window=0.05)
+        indexer.start()
+        try:
+            ids = [_add(tmp_knowledge_db, indexer, f"事实 {i}") for i in range(3)]
+            assert indexer.flush(timeout=5)
+        finally:
+            indexer.stop()
+        assert set(store.docs) == {f"ltm_{i}" for i in ids}
+
+    def test_direct_write_below_enqueued_is_indexed(self, tmp_knowledge_db, checkpoint_path):
+        store = FakeVectorStorage()
+        indexer = VectorIndexer(tmp_knowledge_db, store, checkpoint_path)
+        # 绕过 enqueue 直接写库 (如 KnowledgeIntegrator)，随后一条正常入队
+        direct = _add(tmp_knowledge_db, None, "直接写入")
+        queued = _add(tmp_knowledge_db, indexer, "正常入队")
+        assert indexer.flush(timeout=2)
+        assert set(store.docs) == {f"ltm_{direct}", f"ltm_{queued}"}
+        assert indexer.checkpoint == queued
+        # 已入库的条目不会在回表时重复嵌入
+        assert sorted(sum(store.calls, [])) == sorted([f"ltm_{direct}", f"ltm_{queued}"])
@@ -0,0 +1,178 @@
+"""
+测试 xingchen/utils/async_llm_client.py 与 async_runner.py
+验证连接复用、共享的并发上限、异步重试、取消与后台事件循环
+"""
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import xingchen.utils.llm_registry as llm_registry_module
+from xingchen.utils.async_llm_client import AsyncLLMClient
+from xingchen.utils.llm_registry import LLMRegistry
+from xingchen.utils.async_runner import AsyncRunner
+
+
+def _response(content):
+    message = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class FakeCompletions:
+    """记录在途请求数的假 completions 接口"""
+
+    def __init__(self, delay=0.05, fail_times=0):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail_times:
+                self.fail_times -= 1
+                raise ConnectionError("boom")
+            return _response(kwargs["messages"][-1]["content"])
+        finally:
+            self.in_flight -= 1
+
+
+def _client(completions, provider="qwen"):
+    client = AsyncLLMClient(provider=provider)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return client
+
+
+class TestAsyncLLMClient:
+    """测试 AsyncLLMClient"""
+
+    async def test_concurrency_capped_per_provider(self, monkeypatch):
+        monkeypatch.setattr(llm_registry_module, "_llm_registry_instance",
+                            LLMRegistry(max_concurrency=16, provider_limits={"qwen": 2}, rate_limits={}))
+        completions = FakeCompletions(delay=0.05)
+        client = _client(completions)
+
+        replies = await asyncio.gather(*[
+            client.chat([{"role": "user", "content": f"q{i}"}]) for i in range(6)
+        ])
+
+        assert [r.content for r in replies] == [f"q{i}" for i in range(6)]
+        assert completions.max_in_flight == 2
+
+    async def test_retry_backoff_does_not_block_loop(self):
+        completions = FakeCompletions(delay=0, fail_times=1)
+        client = _client(completions)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        reply, _ = await asyncio.gather(
+            client.chat([{"role": "user", "content": "hi"}], retry_backoff_base=0.1), ticker()
+        )
+        assert reply.content == "hi"
+        assert completions.calls == 2
+        assert len(ticks) == 5  # 退避期间其他协程照常运行
+
+    async def test_cancellation_propagates_without_retry(self):
+        completions = FakeCompletions(delay=10)
+        client = _client(completions)
+
+        task = asyncio.create_task(client.chat([{"role": "user", "content": "hi"}]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert completions.calls == 1
+        assert completions.in_flight == 0
+
+    async def test_shared_client_per_loop(self):
+        with patch("xingchen.utils.async_llm_client.AsyncOpenAI", create=True) as openai_cls:
+            a = AsyncLLMClient(provider="qwen")
+            b = AsyncLLMClient(provider="qwen", model="qwen-max")
+            assert a.client is b.client
+            assert openai_cls.call_count == 1
+
+    async def test_stream_deltas(self):
+        def chunk(text):
+            delta = SimpleNamespace(content=text, tool_calls=None)
+            return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+        async def stream():
+            for text in ("早", "上好"):
+                yield chunk(text)
+
+        completions = MagicMock()
+
+        async def create(**kwargs):
+            assert kwargs["stream"] is True
+            return stream()
+
+        completions.create = create
+        received = []
+        message = await _client(completions).chat_stream([{"role": "user", "content": "hi"}],
+                                                         on_delta=received.append)
+        assert received == ["早", "上好"]
+        assert message.content == "早上好"
+
+
+class TestAsyncRunner:
+    """测试后台事件循环"""
+
+    def test_run_and_timeout_cancels(self):
+        runner = AsyncRunner(name="TestLoop")
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        try:
+            assert runner.run(asyncio.sleep(0, result=42)) == 42
+            with pytest.raises(TimeoutError):
+                runner.run(slow(), timeout=0.05)
+            deadline = time.time() + 2
+            while not cancelled and time.time() < deadline:
+                time.sleep(0.01)
+            assert cancelled == [True]
+        finally:
+            runner.stop()
+
+
+class TestDriverAsyncToolLoop:
+    """测试 Driver 的异步工具循环"""
+
+    async def test_tool_round_then_reply(self):
+        from xingchen.core.driver import Driver
+
+        tool_call = SimpleNamespace(id="call_1", type="function",
+                                    function=SimpleNamespace(name="get_time", arguments="{}"))
+        responses = iter([
+            SimpleNamespace(content=None, tool_calls=[tool_call]),
+            SimpleNamespace(content='{"reply": "现在十点"}', tool_calls=None),
+        ])
+
+        async def chat(messages, **kwargs):
+            return next(responses)
+
+        driver = Driver.__new__(Driver)
+        driver.async_llm = SimpleNamespace(chat=chat)
+        driver._execute_tool = MagicMock(return_value="10:00")
+        messages = [{"role": "user", "content": "几点了"}]
+
+        raw = await driver._acall_llm_with_tools(messages, tools=[{}], stream_id=None)
+
+        assert raw == '{"reply": "现在十点"}'
+        driver._execute_tool.assert_called_once_with(tool_call)
+        assert messages[-1] == {"role": "tool", "tool_call_id": "call_1", "name": "get_time", "content": "10:00"}
@@ -0,0 +1,147 @@
+"""
+测试 LLM 响应缓存 (LLMResponseCache) 与 LLMClient.chat 的缓存开关
+"""
+import os
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from openai.types.chat import ChatCompletionMessage
+from xingchen.utils.llm_cache import LLMResponseCache
+from xingchen.utils.llm_client import LLMClient
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(os.path.join(tmp_path, "llm_cache.db"), ttl=3600, max_entries=3)
+
+
+def _message(content):
+    return ChatCompletionMessage(role="assistant", content=content)
+
+
+class TestLLMResponseCache:
+    """测试存取、过期与淘汰"""
+
+    def test_round_trip(self, cache):
+        key = cache.make_key("deepseek", "deepseek-chat", [{"role": "user", "content": "你好"}], None, 0.3)
+        assert cache.get(key, site="demo") is None
+        cache.put(key, _message("你好呀"), site="demo")
+
+        hit = cache.get(key, site="demo")
+        assert hit.content == "你好呀"
+        assert hit.tool_calls is None
+        stats = cache.stats()
+        assert stats["sites"]["demo"] == {"hits": 1, "misses": 1}
+        assert stats["hit_rate"] == 0.5
+
+    def test_key_covers_parameters(self, cache):
+        messages = [{"role": "user", "content": "分类"}]
+        keys = {
+            cache.make_key("deepseek", "m", messages, None, 0.3),
+            cache.make_key("deepseek", "m", messages, None, 0.7),
+            cache.make_key("qwen", "m", messages, None, 0.3),
+            cache.make_key("deepseek", "m", messages, [{"type": "function"}], 0.3),
+        }
+        assert len(keys) == 4
+
+    def test_ttl_expiry(self, cache):
+        cache.put("k", _message("旧回复"))
+        cache.ttl = 0
+        time.sleep(0.01)
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self, cache):
+        for i in range(3):
+            cache.put(f"k{i}", _message(str(i)))
+            time.sleep(0.01)
+        cache.get("k0")  # k0 最近被使用，k1 最久未使用
+        cache.put("k3", _message("3"))
+        assert cache.get("k1") is None
+        assert cache.get("k0").content == "0"
+        assert cache.stats()["evictions"] == 1
+
+    def test_empty_reply_not_cached(self, cache):
+        assert not cache.put("empty", _message(None))
+        assert not cache.put("blank", _message("  "))
+        assert not cache.put("invalid", _message("不是 JSON"), validate=lambda m: m.content.startswith("["))
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["rejected"] == 3
+
+    def test_invalidate(self, cache):
+        cache.put("k", _message("回复"))
+        cache.invalidate("k")
+        assert cache.get("k") is None
+
+
+class TestLLMClientCache:
+    """测试 LLMClient.chat 的按调用点缓存"""
+
+    def _client(self, cache, delay=0.0, replies=None):
+        client = LLMClient()
+        sdk = MagicMock()
+        replies = list(replies or [])
+
+        def create(**kwargs):
+            time.sleep(delay)
+            content = replies.pop(0) if replies else "缓存测试回复"
+            return MagicMock(choices=[MagicMock(message=_message(content))])
+
+        sdk.chat.completions.create.side_effect = create
+        client.client = sdk
+        return client, sdk
+
+    def test_identical_calls_hit_cache(self, cache):
+        client, sdk = self._client(cache)
+        messages = [{"role": "user", "content": "提取别名"}]
+        with patch("xingchen.utils.llm_cache.llm_cache", cache):
+            first = client.chat(messages, temperature=0.3, cache="extract_aliases")
+            second = client.chat(messages, temperature=0.3, cache="extract_aliases")
+            # 未开启缓存的调用不受影响
+            client.chat(messages, temperature=0.3)
+        assert first.content == second.content == "缓存测试回复"
+        assert sdk.chat.completions.create.call_count == 2
+        assert cache.stats()["sites"]["extract_aliases"] == {"hits": 1, "misses": 1}
+
+    def test_concurrent_identical_calls_coalesced(self, cache):
+        client, sdk = self._client(cache, delay=0.1)
+        messages = [{"role": "user", "content": "分类这段对话"}]
+        with patch("xingchen.utils.llm_cache.llm_cache", cache):
+            threads = [threading.Thread(target=client.chat, args=(messages,), kwargs={"cache": "auto_classifier"})
+                       for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert sdk.chat.completions.create.call_count == 1
+
+    def test_disabled_by_setting(self, cache):
+        client, sdk = self._client(cache)
+        messages = [{"role": "user", "content": "提取事实"}]
+        with patch("xingchen.utils.llm_cache.llm_cache", cache), \
+                patch("xingchen.utils.llm_client.settings.LLM_CACHE_ENABLED", False):
+            client.chat(messages, cache="extract_facts")
+            client.chat(messages, cache="extract_facts")
+        assert sdk.chat.completions.create.call_count == 2
+
+    def test_unparsable_reply_retried(self, cache):
+        client, sdk = self._client(cache, replies=["", "不是 JSON", "[]"])
+        messages = [{"role": "user", "content": "提取别名"}]
+        is_list = lambda m: m.content.startswith("[")
+        with patch("xingchen.utils.llm_cache.llm_cache", cache):
+            assert client.chat(messages, cache="extract_aliases", validate=is_list).content == ""
+            assert client.chat(messages, cache="extract_aliases", validate=is_list).content == "不是 JSON"
+            assert client.chat(messages, cache="extract_aliases", validate=is_list).content == "[]"
+            assert client.chat(messages, cache="extract_aliases", validate=is_list).content == "[]"
+        assert sdk.chat.completions.create.call_count == 3
+
+    def test_stale_invalid_entry_replaced(self, cache):
+        client, sdk = self._client(cache, replies=["[1]"])
+        messages = [{"role": "user", "content": "提取别名"}]
+        key = cache.make_key(client.provider, client.model, messages, None, 0.7)
+        cache.put(key, _message("旧的坏回复"))
+        with patch("xingchen.utils.llm_cache.llm_cache", cache):
+            reply = client.chat(messages, cache="extract_aliases", validate=lambda m: m.content.startswith("["))
+        assert reply.content == "[1]"
+        assert cache.get(key).content == "[1]"
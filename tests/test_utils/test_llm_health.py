@@ -0,0 +1,219 @@
+"""
+测试 xingchen/utils/llm_health.py
+验证延迟直方图、熔断器状态转换，以及对本地假提供商的故障转移与对冲请求 (同步 / 异步 / 流式)
+"""
+import time
+import httpx
+import openai
+import pytest
+from unittest.mock import MagicMock
+
+import xingchen.utils.llm_registry as llm_registry_module
+from xingchen.config.settings import settings
+from xingchen.utils.async_llm_client import AsyncLLMClient, aclose_clients
+from xingchen.utils.fake_llm_server import FakeLLMServer
+from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.llm_health import CircuitBreaker, LatencyHistogram, ProviderHealth, is_provider_failure
+from xingchen.utils.llm_registry import LLMRegistry
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _status_error(cls, status):
+    response = httpx.Response(status, request=httpx.Request("POST", "http://fake/v1/chat/completions"))
+    return cls(f"HTTP {status}", response=response, body=None)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """独立的注册表 + 两个假提供商 fake_a (主) / fake_b (备选)"""
+    reg = LLMRegistry(max_concurrency=8, provider_limits={}, rate_limits={}, interactive_reserved=0)
+    monkeypatch.setattr(llm_registry_module, "_llm_registry_instance", reg)
+    monkeypatch.setattr(settings, "LLM_FALLBACK_PROVIDERS", {"fake_a": ["fake_b"]})
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DEFAULT_DELAY", 0.1)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.05)
+    return reg
+
+
+@pytest.fixture
+def providers(registry, monkeypatch):
+    with FakeLLMServer(latency=0.02) as a, FakeLLMServer(latency=0.02) as b:
+        monkeypatch.setenv("FAKE_A_LLM_BASE_URL", a.base_url)
+        monkeypatch.setenv("FAKE_B_LLM_BASE_URL", b.base_url)
+        yield a, b
+
+
+class TestLatencyHistogram:
+    """测试延迟直方图"""
+
+    def test_percentiles_follow_samples(self):
+        hist = LatencyHistogram(window=1000)
+        for _ in range(95):
+            hist.record(100)
+        for _ in range(5):
+            hist.record(2000)
+        assert 100 <= hist.percentile(0.5) < 130
+        assert 100 <= hist.percentile(0.95) < 130
+        assert hist.percentile(0.99) >= 2000
+
+    def test_window_halves_old_samples(self):
+        hist = LatencyHistogram(window=100)
+        for _ in range(100):
+            hist.record(100)
+        for _ in range(100):
+            hist.record(3000)
+        assert hist.total <= 100
+        assert hist.percentile(0.5) >= 3000  # 近况占多数
+
+    def test_hedge_delay_uses_quantile(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 10)
+        health = ProviderHealth("qwen")
+        assert health.hedge_delay() == settings.LLM_HEDGE_DEFAULT_DELAY
+        for _ in range(20):
+            health.record_success(800)
+        assert 0.8 <= health.hedge_delay() < 1.0
+
+
+class TestCircuitBreaker:
+    """测试熔断器状态转换"""
+
+    def test_open_half_open_closed(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failures=2, cooldown=10, clock=lambda: now[0])
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == breaker.OPEN and not breaker.allow()
+
+        now[0] = 11
+        assert breaker.allow()          # 半开: 放行一个探测请求
+        assert not breaker.allow()
+        breaker.record_failure()        # 探测失败，重新熔断
+        assert breaker.state == breaker.OPEN
+
+        now[0] = 22
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == breaker.CLOSED
+
+
+class TestErrorClassification:
+    """测试提供商故障与请求错误的区分"""
+
+    def test_classification(self):
+        request = httpx.Request("POST", "http://fake")
+        assert is_provider_failure(ConnectionError("reset"))
+        assert is_provider_failure(openai.APITimeoutError(request=request))
+        assert is_provider_failure(openai.APIConnectionError(request=request))
+        assert is_provider_failure(_status_error(openai.RateLimitError, 429))
+        assert is_provider_failure(_status_error(openai.InternalServerError, 503))
+        assert not is_provider_failure(_status_error(openai.BadRequestError, 400))
+        assert not is_provider_failure(_status_error(openai.AuthenticationError, 401))
+        assert not is_provider_failure(ValueError("bad"))
+
+    def test_client_error_not_retried_and_breaker_closed(self, registry):
+        client = LLMClient(provider="fake_a")
+        sdk = MagicMock()
+        sdk.chat.completions.create.side_effect = _status_error(openai.BadRequestError, 400)
+        client.client = sdk
+        for _ in range(3):
+            with pytest.raises(openai.BadRequestError):
+                client.chat(MESSAGES, retry_backoff_base=0)
+        assert sdk.chat.completions.create.call_count == 3  # 每次只发一次，不重试、不转移
+        health = registry.handle("fake_a").health.snapshot()
+        assert health["state"] == "closed"
+        assert health["failures"] == 0 and health["client_errors"] == 3
+
+    async def test_async_client_error_not_retried(self, registry):
+        client = AsyncLLMClient(provider="fake_a")
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            raise _status_error(openai.BadRequestError, 400)
+
+        client.client = MagicMock()
+        client.client.chat.completions.create = create
+        with pytest.raises(openai.BadRequestError):
+            await client.chat(MESSAGES, retry_backoff_base=0)
+        assert len(calls) == 1
+        assert registry.handle("fake_a").health.snapshot()["failures"] == 0
+
+
+class TestFailover:
+    """测试熔断与故障转移"""
+
+    def test_failing_provider_fails_over_without_backoff(self, providers, registry):
+        a, b = providers
+        a.error_rate = 1.0
+        client = LLMClient(provider="fake_a")
+
+        start = time.perf_counter()
+        reply = client.chat(MESSAGES, retry_backoff_base=5)
+        assert time.perf_counter() - start < 2  # 转到 fake_b 时不等待退避
+        assert "echo: hi" in reply.content
+
+        client.chat(MESSAGES)  # 第二次失败后 fake_a 熔断
+        requests_before = a.requests
+        for _ in range(3):
+            client.chat(MESSAGES)
+        assert a.requests == requests_before  # 熔断期间不再请求 fake_a
+
+        health = registry.stats()["providers"]["fake_a"]["health"]
+        assert health["state"] == "open"
+        assert health["failovers"] >= 3
+
+    def test_fallback_without_key_is_skipped(self, registry, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_FALLBACK_PROVIDERS", {"fake_a": ["zhipu"]})
+        monkeypatch.delenv("ZHIPU_API_KEY", raising=False)
+        chain = registry.fallback_chain(registry.handle("fake_a"))
+        assert [h.name for h in chain] == ["fake_a"]
+
+
+class TestHedging:
+    """测试对冲请求"""
+
+    def test_slow_primary_hedged(self, providers, registry):
+        a, b = providers
+        a.latency = 1.0
+        client = LLMClient(provider="fake_a", hedge=True)
+
+        start = time.perf_counter()
+        reply = client.chat(MESSAGES)
+        assert time.perf_counter() - start < 0.6
+        assert "echo: hi" in reply.content
+        health = registry.handle("fake_a").health.snapshot()
+        assert health["hedged"] == 1 and health["hedge_wins"] == 1
+        assert health["state"] == "closed"  # 慢不等于失败
+
+    def test_fast_primary_not_hedged(self, providers, registry):
+        a, b = providers
+        client = LLMClient(provider="fake_a", hedge=True)
+        client.chat(MESSAGES)
+        assert b.requests == 0
+
+    def test_stream_hedge_delivers_single_copy(self, providers, registry):
+        a, b = providers
+        a.latency = 1.0
+        deltas = []
+        client = LLMClient(provider="fake_a", hedge=True)
+        message = client.chat_stream(MESSAGES, on_delta=deltas.append)
+        assert "".join(deltas) == message.content
+        assert "echo: hi" in message.content
+        assert registry.handle("fake_a").health.snapshot()["hedge_wins"] == 1
+
+    async def test_async_stream_hedge_cancels_loser(self, providers, registry):
+        a, b = providers
+        a.latency = 1.0
+        deltas = []
+        client = AsyncLLMClient(provider="fake_a", hedge=True)
+        start = time.perf_counter()
+        message = await client.chat_stream(MESSAGES, on_delta=deltas.append)
+        elapsed = time.perf_counter() - start
+        await aclose_clients()
+
+        assert elapsed < 0.6
+        assert "".join(deltas) == message.content
+        assert registry.in_flight == 0  # 落败的一路已取消并归还名额
+        assert registry.handle("fake_a").health.snapshot()["failures"] == 0
@@ -0,0 +1,108 @@
+"""
+测试 xingchen/utils/llm_registry.py
+验证按提供商共享客户端、全局/提供商并发上限 (同步与异步共用) 以及指标
+"""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+import xingchen.utils.llm_registry as llm_registry_module
+from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.llm_registry import LLMRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """独立的注册表 (不污染全局单例)"""
+    reg = LLMRegistry(max_concurrency=2, provider_limits={"qwen": 1, "deepseek": 4},
+                      rate_limits={}, interactive_reserved=0)
+    monkeypatch.setattr(llm_registry_module, "_llm_registry_instance", reg)
+    return reg
+
+
+class TestSharedClients:
+    """测试客户端共享"""
+
+    def test_clients_shared_per_provider_models_per_call_site(self, registry):
+        with patch("xingchen.utils.llm_client.OpenAI", side_effect=lambda **kwargs: MagicMock()) as openai_cls:
+            driver_llm = LLMClient(provider="qwen", model="qwen-max")
+            classifier_llm = LLMClient(provider="qwen")
+            navigator_llm = LLMClient(provider="deepseek", model="deepseek-reasoner")
+
+            assert driver_llm.client is classifier_llm.client
+            assert navigator_llm.client is not driver_llm.client
+            assert openai_cls.call_count == 2
+        assert driver_llm.model == "qwen-max"
+        assert classifier_llm.model != "qwen-max"
+
+
+class TestConcurrencyLimits:
+    """测试并发上限"""
+
+    def test_global_cap_across_providers(self, registry):
+        peak = []
+
+        def call():
+            with registry.slot("deepseek", "deepseek-chat"):
+                peak.append(registry.in_flight)
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert max(peak) == 2
+        stats = registry.stats()["providers"]["deepseek"]
+        assert stats["requests"] == 6
+        assert stats["max_in_flight"] == 2
+        assert stats["waited"] >= 4
+        assert stats["models"] == {"deepseek-chat": 6}
+
+    async def test_async_waits_for_sync_holder(self, registry):
+        released = threading.Event()
+        holding = threading.Event()
+
+        def hold():
+            with registry.slot("qwen"):
+                holding.set()
+                released.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        holding.wait(5)
+
+        async def acquire():
+            async with registry.aslot("qwen"):
+                return time.perf_counter()
+
+        task = asyncio.create_task(acquire())
+        await asyncio.sleep(0.05)
+        assert not task.done()  # 提供商上限为 1，被同步请求占用
+
+        released_at = time.perf_counter()
+        released.set()
+        acquired_at = await asyncio.wait_for(task, 5)
+        thread.join()
+        assert acquired_at >= released_at
+        assert registry.in_flight == 0
+
+    async def test_cancelled_waiter_leaves_no_trace(self, registry):
+        async with registry.aslot("qwen"):
+            task = asyncio.create_task(registry.aslot("qwen").__aenter__())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        assert registry.in_flight == 0
+        assert registry.scheduler._waiting == []
+
+    def test_errors_recorded(self, registry):
+        with pytest.raises(ConnectionError):
+            with registry.slot("deepseek"):
+                raise ConnectionError("reset")
+        stats = registry.stats()["providers"]["deepseek"]
+        assert stats["errors"] == 1 and stats["in_flight"] == 0
@@ -0,0 +1,148 @@
+"""
+测试 xingchen/utils/llm_scheduler.py
+验证优先级放行顺序、交互预留名额、令牌桶限速、取消，以及对本地假提供商的端到端调度
+"""
+import asyncio
+import threading
+import time
+import pytest
+
+import xingchen.utils.llm_registry as llm_registry_module
+from xingchen.utils.fake_llm_server import FakeLLMServer
+from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.llm_registry import LLMRegistry
+from xingchen.utils.llm_scheduler import LLMScheduler, Priority
+
+
+def _scheduler(**kwargs):
+    params = dict(max_in_flight=1, provider_limits={}, rate_limits={}, interactive_reserved=0)
+    params.update(kwargs)
+    return LLMScheduler(**params)
+
+
+def _start_waiter(scheduler, priority, order, label):
+    def run():
+        scheduler.acquire("qwen", priority)
+        order.append(label)
+        scheduler.release("qwen")
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_queued(scheduler, count, timeout=2):
+    deadline = time.time() + timeout
+    while len(scheduler._waiting) < count and time.time() < deadline:
+        time.sleep(0.005)
+
+
+class TestPriority:
+    """测试优先级调度"""
+
+    def test_interactive_jumps_queued_background(self):
+        scheduler = _scheduler()
+        order = []
+        scheduler.acquire("qwen", Priority.BACKGROUND)  # 占住唯一名额
+
+        threads = []
+        for i in range(3):
+            threads.append(_start_waiter(scheduler, Priority.BACKGROUND, order, f"bg{i}"))
+            _wait_queued(scheduler, i + 1)
+        threads.append(_start_waiter(scheduler, Priority.INTERACTIVE, order, "user"))
+        _wait_queued(scheduler, 4)
+
+        scheduler.release("qwen")
+        for t in threads:
+            t.join(5)
+
+        assert order == ["user", "bg0", "bg1", "bg2"]
+        stats = scheduler.stats()["priorities"]
+        assert stats["BACKGROUND"]["granted"] == 4
+        assert stats["INTERACTIVE"]["granted"] == 1
+
+    def test_reserved_capacity_for_interactive(self):
+        scheduler = _scheduler(max_in_flight=3, interactive_reserved=1)
+        scheduler.acquire("deepseek", Priority.BACKGROUND)
+        scheduler.acquire("deepseek", Priority.BACKGROUND)
+
+        blocked = threading.Thread(target=scheduler.acquire, args=("deepseek", Priority.BACKGROUND))
+        blocked.start()
+        _wait_queued(scheduler, 1)
+        assert scheduler.in_flight == 2  # 第三个后台请求被预留名额挡住
+
+        wait = scheduler.acquire("qwen", Priority.INTERACTIVE)
+        assert wait < 0.05
+        assert scheduler.in_flight == 3
+
+        scheduler.release("deepseek")
+        time.sleep(0.05)
+        assert blocked.is_alive()  # 在途 2 个 (含交互请求)，仍不超过非交互上限 2
+
+        scheduler.release("qwen")
+        blocked.join(5)
+        assert not blocked.is_alive()
+        assert scheduler.in_flight == 2
+
+
+class TestRateLimit:
+    """测试令牌桶限速"""
+
+    def test_token_bucket_spaces_requests(self):
+        scheduler = _scheduler(max_in_flight=8, rate_limits={"qwen": (20.0, 1)})
+        start = time.perf_counter()
+        for _ in range(4):
+            scheduler.acquire("qwen")
+            scheduler.release("qwen")
+        elapsed = time.perf_counter() - start
+        # 突发 1 个，其余 3 个每个约 50 ms
+        assert 0.13 <= elapsed < 1.0
+
+
+class TestAsyncCancel:
+    """测试异步排队的取消"""
+
+    async def test_cancelled_ticket_removed(self):
+        scheduler = _scheduler()
+        await scheduler.acquire_async("qwen", Priority.BACKGROUND)
+        task = asyncio.create_task(scheduler.acquire_async("qwen", Priority.INTERACTIVE))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert scheduler._waiting == []
+        scheduler.release("qwen")
+        assert scheduler.in_flight == 0
+
+
+class TestFakeProviderLoad:
+    """对本地假提供商的端到端调度"""
+
+    def test_interactive_latency_under_background_burst(self, monkeypatch):
+        registry = LLMRegistry(max_concurrency=3, provider_limits={"fake": 3}, rate_limits={},
+                               interactive_reserved=1)
+        monkeypatch.setattr(llm_registry_module, "_llm_registry_instance", registry)
+        with FakeLLMServer(latency=0.1) as server:
+            monkeypatch.setenv("FAKE_LLM_BASE_URL", server.base_url)
+            background = LLMClient(provider="fake", priority=Priority.BACKGROUND)
+            interactive = LLMClient(provider="fake", priority=Priority.INTERACTIVE)
+            messages = [{"role": "user", "content": "hi"}]
+            background.chat(messages)  # 预热连接与 SDK 导入
+
+            threads = [threading.Thread(target=background.chat, args=(messages,)) for _ in range(10)]
+            for t in threads:
+                t.start()
+            _wait_queued(registry.scheduler, 5)
+
+            start = time.perf_counter()
+            reply = interactive.chat(messages)
+            interactive_ms = (time.perf_counter() - start) * 1000
+            for t in threads:
+                t.join(10)
+
+        assert "echo: hi" in reply.content
+        stats = registry.stats()
+        assert stats["providers"]["fake"]["max_in_flight"] <= 3
+        assert stats["priorities"]["INTERACTIVE"]["wait_max_ms"] < 20
+        assert stats["priorities"]["BACKGROUND"]["wait_max_ms"] > 200
+        assert interactive_ms < 500
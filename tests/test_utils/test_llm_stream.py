@@ -0,0 +1,159 @@
+"""
+测试 LLM 流式输出: chunk 组装、reply 字段增量提取、LLMClient.chat_stream 与 Driver 的增量发布
+"""
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.llm_stream import ReplyStreamer, StreamAssembler
+
+
+def _chunk(content=None, tool_calls=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+def _tool_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, type="function" if id else None,
+                           function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestReplyStreamer:
+    """测试从流式 JSON 中增量提取 reply"""
+
+    @pytest.mark.parametrize("size", [1, 3, 7, 1000])
+    def test_extracts_reply_across_chunk_boundaries(self, size):
+        reply = '你好\n"星辰" \\ 路径/ \U0001F600 tab\t'
+        raw = "```json\n" + json.dumps(
+            {"reply": reply, "inner_voice": "他在试探", "emotion": "happy"}, ensure_ascii=True
+        ) + "\n```"
+        streamer = ReplyStreamer()
+        deltas = [d for d in (streamer.feed(part) for part in _split(raw, size)) if d]
+
+        assert "".join(deltas) == reply
+        assert streamer.text == reply
+        assert streamer.done
+
+    def test_waits_for_reply_key(self):
+        streamer = ReplyStreamer()
+        assert streamer.feed('{"inner_voice": "嗯", "re') == ""
+        assert streamer.feed('ply": "好') == "好"
+        assert streamer.feed('的"}') == "的"
+        assert streamer.feed(' 多余') == ""
+
+    def test_plain_text_passthrough(self):
+        streamer = ReplyStreamer()
+        assert streamer.feed("  直接") == "  直接"
+        assert streamer.feed("回复") == "回复"
+        assert streamer.text == "  直接回复"
+
+
+class TestStreamAssembler:
+    """测试流式 chunk 组装"""
+
+    def test_tool_call_deltas_merged_by_index(self):
+        assembler = StreamAssembler()
+        chunks = [
+            _chunk(tool_calls=[_tool_delta(0, id="call_a", name="web_search", arguments='{"q')]),
+            _chunk(tool_calls=[_tool_delta(1, id="call_b", name="read_file", arguments="")]),
+            _chunk(tool_calls=[_tool_delta(0, arguments='": "天气"}')]),
+            _chunk(tool_calls=[_tool_delta(1, arguments='{"path": "a.txt"}')]),
+            _chunk(finish_reason="tool_calls"),
+        ]
+        for c in chunks:
+            assert assembler.add(c) == ""
+
+        message = assembler.message()
+        assert assembler.finish_reason == "tool_calls"
+        assert message.content is None
+        assert [tc.id for tc in message.tool_calls] == ["call_a", "call_b"]
+        assert json.loads(message.tool_calls[0].function.arguments) == {"q": "天气"}
+        assert message.tool_calls[1].function.name == "read_file"
+        assert message.model_dump()["tool_calls"][1]["function"]["arguments"] == '{"path": "a.txt"}'
+
+
+class TestChatStream:
+    """测试 LLMClient.chat_stream (Mock SDK)"""
+
+    def _client(self, *responses):
+        client = LLMClient(provider="qwen")
+        client.client = MagicMock()
+        client.client.chat.completions.create.side_effect = list(responses)
+        return client
+
+    def test_streams_text_and_returns_message(self):
+        client = self._client(iter([_chunk("你"), _chunk("好"), _chunk(finish_reason="stop")]))
+        received = []
+
+        message = client.chat_stream([{"role": "user", "content": "hi"}], on_delta=received.append)
+
+        assert received == ["你", "好"]
+        assert message.content == "你好"
+        assert client.client.chat.completions.create.call_args.kwargs["stream"] is True
+
+    def test_no_retry_after_partial_output(self):
+        def broken():
+            yield _chunk("半")
+            raise ConnectionError("reset")
+
+        client = self._client(broken(), iter([_chunk("不应到达")]))
+        received = []
+        with pytest.raises(ConnectionError):
+            client.chat_stream([{"role": "user", "content": "hi"}], on_delta=received.append,
+                               retry_backoff_base=0)
+        assert received == ["半"]
+        assert client.client.chat.completions.create.call_count == 1
+
+
+class TestDriverDeltaPublishing:
+    """测试 Driver 把 reply 增量发布为 driver_response_delta"""
+
+    def test_publishes_cumulative_deltas(self):
+        from xingchen.core.driver import Driver
+
+        driver = Driver.__new__(Driver)
+        with patch("xingchen.core.driver.event_bus") as bus:
+            on_delta = driver._reply_publisher("stream-1")
+            for part in ['{"reply": "早', '上好', '", "emotion": "happy"}']:
+                on_delta(part)
+
+        events = [c.args[0] for c in bus.publish.call_args_list]
+        assert all(c.kwargs == {"persist": False} for c in bus.publish.call_args_list)
+        assert [e.type for e in events] == ["driver_response_delta"] * 2
+        assert [e.payload.content for e in events] == ["早", "早上好"]
+        assert [e.payload.seq for e in events] == [1, 2]
+        assert events[0].trace_id == "stream-1" and events[0].meta["stream_id"] == "stream-1"
+
+    def test_seq_continues_across_tool_rounds(self):
+        from xingchen.core.driver import Driver
+
+        tool_round = MagicMock(content='{"reply": "我查一下"}', tool_calls=[MagicMock()])
+        final = MagicMock(content='{"reply": "查到了"}', tool_calls=None)
+
+        def chat_stream(messages, tools=None, on_delta=None):
+            response = tool_round if chat_stream.calls == 0 else final
+            chat_stream.calls += 1
+            for part in (response.content[:12], response.content[12:]):
+                on_delta(part)
+            return response
+        chat_stream.calls = 0
+
+        driver = Driver.__new__(Driver)
+        driver.name = "Driver"
+        driver.llm = MagicMock(chat_stream=chat_stream)
+        driver._append_tool_request = MagicMock()
+        driver._execute_tool = MagicMock(return_value="ok")
+        driver._tool_result_message = MagicMock(return_value={"role": "tool", "content": "ok"})
+        with patch("xingchen.core.driver.event_bus") as bus:
+            driver._call_llm_with_tools([], tools=[{}], stream_id="stream-2")
+
+        events = [c.args[0] for c in bus.publish.call_args_list]
+        seqs = [e.payload.seq for e in events]
+        assert seqs == sorted(seqs) and len(set(seqs)) == len(seqs)
+        assert max(events, key=lambda e: e.payload.seq).payload.content == "查到了"
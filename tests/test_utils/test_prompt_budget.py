@@ -0,0 +1,80 @@
+"""
+测试 xingchen/utils/prompt_budget.py
+验证按提供商的 token 近似计数、分段上限、按优先级裁剪与单条截断
+"""
+import pytest
+
+from xingchen.config.settings import settings
+from xingchen.utils.prompt_budget import PromptBudget, Section, count_message_tokens, count_tokens
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_SECTION_BUDGETS", {
+        "history": (1, 1000), "long_term": (2, 1000), "skills": (4, 1000),
+    })
+
+
+class TestCounting:
+    """测试 token 近似计数"""
+
+    def test_cjk_and_ascii_ratios(self):
+        assert count_tokens("") == 0
+        assert count_tokens("你好世界" * 25, "deepseek") == 60
+        assert count_tokens("你好世界" * 25, "qwen") == 70
+        assert count_tokens("a" * 100, "qwen") == 28
+
+    def test_message_overhead(self):
+        messages = [{"role": "user", "content": "你好"}, {"role": "assistant", "content": None}]
+        assert count_message_tokens(messages, "deepseek") == 2 + 2 * settings.PROMPT_MESSAGE_OVERHEAD
+
+
+class TestBudget:
+    """测试分段裁剪"""
+
+    def test_within_target_untouched(self, budgets):
+        history = [{"role": "user", "content": "你好"}]
+        fitted = PromptBudget("driver", provider="qwen", target_tokens=1000).fit([
+            Section("history", history, keep="last", note=False),
+            Section.from_text("long_term", "- 喜欢猫\n- 住在杭州"),
+        ])
+        assert fitted["history"].kept == history
+        assert fitted["long_term"].text() == "- 喜欢猫\n- 住在杭州"
+
+    def test_section_budget_keeps_most_relevant(self, budgets):
+        items = [f"- 记忆{i}" + "内容" * 20 for i in range(20)]
+        section = Section("long_term", items, budget=150)
+        fitted = PromptBudget("driver", provider="qwen", target_tokens=10000).fit([section])
+
+        kept = fitted["long_term"].kept
+        assert kept == items[:len(kept)] and 0 < len(kept) < 20
+        assert fitted["long_term"].tokens <= 150
+        assert fitted["long_term"].text().endswith(f"(另有 {20 - len(kept)} 条因篇幅省略)")
+
+    def test_low_priority_sections_trimmed_first(self, budgets):
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"第{i}句" + "话" * 50}
+                   for i in range(10)]
+        skills = [f"- 技能{i}: " + "描述" * 30 for i in range(5)]
+        memories = [f"- 记忆{i}: " + "内容" * 30 for i in range(5)]
+        budget = PromptBudget("driver", provider="qwen", target_tokens=600)
+        fitted = budget.fit([
+            Section("history", history, keep="last", note=False),
+            Section("long_term", memories),
+            Section("skills", skills),
+        ], fixed=["系统提示" * 20])
+
+        assert budget.last_report["total"] <= 600
+        assert fitted["skills"].kept == []                       # 优先级最低，最先清空
+        assert fitted["history"].kept == history                 # 最重要的历史完整保留
+        assert 0 < len(fitted["long_term"].kept) < len(memories)
+
+    def test_history_keeps_latest_and_truncates_single_long_message(self, budgets):
+        history = [{"role": "user", "content": "旧消息"}, {"role": "assistant", "content": "长" * 2000}]
+        fitted = PromptBudget("driver", provider="qwen", target_tokens=200).fit([
+            Section("history", history, keep="last", note=False),
+        ])
+        kept = fitted["history"].kept
+        assert len(kept) == 1 and kept[0]["role"] == "assistant"
+        assert kept[0]["content"].endswith("…(截断)")
+        assert fitted["history"].tokens <= 200
+        assert history[1]["content"] == "长" * 2000  # 不修改原消息
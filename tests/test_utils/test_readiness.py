@@ -0,0 +1,40 @@
+"""
+测试组件就绪状态 (Readiness)
+"""
+import threading
+from xingchen.utils.readiness import Readiness, ReadyState
+
+
+class TestReadiness:
+    """测试状态流转与等待"""
+
+    def test_run_success(self):
+        readiness = Readiness("demo")
+        assert readiness.state == ReadyState.PENDING
+        assert readiness.run(lambda: 42) == 42
+        assert readiness.is_ready
+        assert readiness.wait(0)
+        assert readiness.to_dict()["state"] == "ready"
+
+    def test_run_failure_is_recorded(self):
+        readiness = Readiness("demo")
+
+        def boom():
+            raise RuntimeError("连接失败")
+
+        assert readiness.run(boom) is None
+        assert readiness.state == ReadyState.FAILED
+        assert readiness.error == "连接失败"
+        # 失败也会结束等待
+        assert readiness.wait(0) is False
+
+    def test_wait_for_background_warmup(self):
+        readiness = Readiness("demo")
+        gate = threading.Event()
+        thread = threading.Thread(target=lambda: readiness.run(gate.wait))
+        thread.start()
+        assert readiness.wait(0.05) is False
+        assert readiness.state == ReadyState.WARMING
+        gate.set()
+        assert readiness.wait(5)
+        thread.join()
@@ -0,0 +1,111 @@
+"""
+测试启动快照 (StartupSnapshot)
+"""
+import pytest
+import os
+import numpy as np
+from unittest.mock import patch
+from xingchen.utils.snapshot import StartupSnapshot
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return os.path.join(tmp_path, "startup_snapshot.bin")
+
+
+class TestSnapshotFile:
+    """测试文件读写与校验"""
+
+    def test_round_trip(self, snapshot_path):
+        writer = StartupSnapshot(snapshot_path)
+        weights = np.arange(10, dtype=np.float32)
+        writer.register("demo", lambda: {"v": 1}, lambda: ({"v": 1}, {"names": ["甲", "乙"]}, {"weights": weights}))
+        assert writer.save()
+
+        reader = StartupSnapshot(snapshot_path)
+        obj, arrays = reader.load("demo", {"v": 1})
+        assert obj == {"names": ["甲", "乙"]}
+        np.testing.assert_array_equal(arrays["weights"], weights)
+        # 取出的数组可写，不受映射区影响
+        arrays["weights"][0] = 42.0
+
+    def test_stale_stamp_is_miss(self, snapshot_path):
+        writer = StartupSnapshot(snapshot_path)
+        writer.register("demo", lambda: 1, lambda: (1, "old", None))
+        writer.save()
+
+        reader = StartupSnapshot(snapshot_path)
+        assert reader.load("demo", 2) is None
+        assert reader.load("missing", 1) is None
+        assert reader.stats["misses"] == 2
+
+    def test_unchanged_sections_carried_forward(self, snapshot_path):
+        builds = []
+        writer = StartupSnapshot(snapshot_path)
+        writer.register("a", lambda: 1, lambda: builds.append("a") or (1, "A", None))
+        writer.save()
+
+        # 新进程只登记了 b: a 原样沿用；a 的版本戳未变时不重新构建
+        second = StartupSnapshot(snapshot_path)
+        second.register("b", lambda: 1, lambda: builds.append("b") or (1, "B", None))
+        second.register("a", lambda: 1, lambda: builds.append("a") or (1, "A2", None))
+        assert second.save()
+        assert builds == ["a", "b"]
+        assert second.save() is False
+
+        reader = StartupSnapshot(snapshot_path)
+        assert reader.load("a", 1)[0] == "A"
+        assert reader.load("b", 1)[0] == "B"
+
+    def test_corrupt_or_foreign_file_ignored(self, snapshot_path):
+        with open(snapshot_path, "wb") as f:
+            f.write(b"not a snapshot at all")
+        assert StartupSnapshot(snapshot_path).load("demo", 1) is None
+
+    def test_disabled(self, snapshot_path):
+        writer = StartupSnapshot(snapshot_path)
+        writer.register("demo", lambda: 1, lambda: (1, "x", None))
+        with patch("xingchen.utils.snapshot.settings.STARTUP_SNAPSHOT_ENABLED", False):
+            assert writer.save() is False
+        assert not os.path.exists(snapshot_path)
+
+
+class TestKnowledgeSections:
+    """测试知识库的变更计数与图谱段"""
+
+    def test_change_versions_track_relevant_writes(self, tmp_knowledge_db):
+        db = tmp_knowledge_db
+        before = db.get_change_versions()
+        knowledge_id = db.add_knowledge("用户喜欢猫")
+        db.record_access([knowledge_id])
+        db.flush_access_stats()
+        db.update_knowledge_confidence(knowledge_id, 0.5)
+
+        after = db.get_change_versions()
+        # 访问统计与置信度更新不影响派生缓存
+        assert after["knowledge"] == before["knowledge"] + 1
+        assert after["graph"] == before["graph"]
+        assert after["epoch"] == before["epoch"]
+
+    def test_graph_restored_until_edges_change(self, tmp_knowledge_db, snapshot_path):
+        db = tmp_knowledge_db
+        db.add_edge("A", "B", "knows", weight=0.8)
+        db.add_edge("B", "C", "likes", weight=0.5)
+        writer = StartupSnapshot(snapshot_path)
+        writer.register("graph", lambda: db.snapshot_stamp("graph"), db.build_graph_snapshot)
+        writer.save()
+
+        reader = StartupSnapshot(snapshot_path)
+        with patch("xingchen.memory.storage.knowledge.graph_store.startup_snapshot", reader):
+            db._graph_index = None
+            index = db.get_graph_index()
+            assert reader.stats["hits"] == 1
+            assert index.shortest_path("A", "C") == ["A", "B", "C"]
+            # 恢复出的索引仍可增量更新
+            db.add_edge("C", "D", "knows")
+            assert index.shortest_path("A", "D") == ["A", "B", "C", "D"]
+
+            # 图谱已变化: 快照过期，回退到从 SQLite 重建
+            db._graph_index = None
+            assert db.get_graph_index().stats()["edges"] == 3
+            assert reader.stats["misses"] == 1
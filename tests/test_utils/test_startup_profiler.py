@@ -0,0 +1,85 @@
+"""
+测试启动耗时: 入口模块的导入预算与 StartupProfiler
+"""
+import os
+import subprocess
+import sys
+from xingchen.utils.startup_profiler import StartupProfiler
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# `import xingchen.main` 的耗时预算 (毫秒)。当前约 100 ms，预算留足余量以容忍慢机器
+IMPORT_BUDGET_MS = 800
+
+# 只应在首次使用时导入的重型/可选依赖
+DEFERRED_MODULES = [
+    "chromadb", "docker", "crawl4ai", "duckduckgo_search", "bs4",
+    "openai", "fastapi", "uvicorn", "yaml",
+]
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=120,
+    )
+
+
+class TestEntryImport:
+    """测试入口模块保持轻量"""
+
+    def test_heavy_dependencies_deferred(self):
+        code = (
+            "import sys, xingchen.main\n"
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+        )
+        result = _run(code)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1:] in ([], [""])
+
+    def test_import_time_budget(self):
+        result = _run("import xingchen.main", "-X", "importtime")
+        assert result.returncode == 0, result.stderr
+        # -X importtime 输出: "import time: self [us] | cumulative | imported package"
+        cumulative = [
+            int(line.split("|")[1])
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:") and line.split("|")[-1].strip() == "xingchen.main"
+        ]
+        assert cumulative, result.stderr[-2000:]
+        assert cumulative[0] / 1000 < IMPORT_BUDGET_MS
+
+
+class TestStartupProfiler:
+    """测试耗时树的记录与渲染"""
+
+    def test_phases_and_imports_nested(self, tmp_path):
+        (tmp_path / "xc_profile_outer.py").write_text("import xc_profile_inner\n", encoding="utf-8")
+        (tmp_path / "xc_profile_inner.py").write_text("VALUE = 1\n", encoding="utf-8")
+        sys.path.insert(0, str(tmp_path))
+        profiler = StartupProfiler()
+        try:
+            profiler.enable()
+            with profiler.phase("memory"):
+                import xc_profile_outer  # noqa: F401
+            with profiler.phase("driver"):
+                pass
+            report = profiler.report(min_ms=0)
+        finally:
+            profiler.disable()
+            sys.path.remove(str(tmp_path))
+            sys.modules.pop("xc_profile_outer", None)
+            sys.modules.pop("xc_profile_inner", None)
+
+        lines = report.splitlines()
+        assert lines[0].startswith("[Startup]")
+        labels = [line.split("─ ", 1)[1].rsplit("  ", 1)[0] for line in lines[1:]]
+        assert labels == ["memory", "import xc_profile_outer", "import xc_profile_inner", "driver"]
+        # 报告后导入钩子已卸载
+        assert not any(type(f).__name__ == "_TimingFinder" for f in sys.meta_path)
+
+    def test_disabled_is_noop(self):
+        profiler = StartupProfiler()
+        with profiler.phase("memory"):
+            pass
+        assert profiler.report() == ""
@@ -0,0 +1,27 @@
+"""
+测试 xingchen/utils/text_utils.py
+"""
+from xingchen.utils.text_utils import extract_terms
+
+
+class TestExtractTerms:
+    """测试检索词抽取"""
+
+    def test_cjk_bigrams(self):
+        assert extract_terms("喜欢苹果") == ["喜欢", "欢苹", "苹果"]
+
+    def test_words_lowercased(self):
+        assert extract_terms("Learn Python 3.11 now") == ["learn", "python", "3.11", "now"]
+
+    def test_mixed_and_dedup(self):
+        terms = extract_terms("苹果 Apple 苹果")
+        assert terms == ["apple", "苹果"]
+
+    def test_stop_bigrams_and_single_char(self):
+        assert extract_terms("我们 猫") == ["猫"]
+
+    def test_max_terms(self):
+        assert len(extract_terms("一二三四五六七八九十" * 3, max_terms=5)) == 5
+
+    def test_empty(self):
+        assert extract_terms("") == []
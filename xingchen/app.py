@@ -1,11 +1,11 @@
 import asyncio
-from xingchen.core.driver import Driver
-from xingchen.core.navigator import Navigator
-from xingchen.psyche import psyche_engine
-from xingchen.memory.facade import Memory
-from xingchen.core.cycle import CycleManager
-from xingchen.tools.loader import load_all_tools
+import threading
+import time
+from typing import Dict
+from xingchen.config.settings import settings
 from xingchen.utils.logger import logger
+from xingchen.utils.readiness import Readiness
+from xingchen.utils.startup_profiler import startup_profiler
 
 
 class XingChenApp:
@@ -20,32 +20,106 @@ class XingChenApp:
         self.driver = None
         self.cycle_manager = None
         self._initialized = False
+        # 由 App 直接管理的后台组件 (记忆系统内部组件的状态见 Memory.readiness)
+        self.readiness = {"navigator": Readiness("navigator"), "skills": Readiness("skills")}
+        self._warmup_threads = []
 
     def initialize(self):
-        """初始化所有核心组件"""
+        """
+        分阶段初始化核心组件
+        - 阶段一 (同步): 首轮回复必需的部分 —— 工具、短期/长期记忆缓存、心智、驱动脑 (F脑)
+        - 阶段二 (后台并行): 向量库与技能索引、别名缓存、话题索引、WAL 重放、导航脑 (S脑) 与周期管理器
+        STARTUP_BACKGROUND_WARMUP=False 时阶段二也同步完成 (与旧版一致)
+        """
         if self._initialized:
             return
             
         logger.info("[App] 🚀 正在初始化星辰-V 核心系统...")
+        background = settings.STARTUP_BACKGROUND_WARMUP
         
+        # 核心组件在各自的阶段内导入 (入口模块保持轻量；--profile-startup 可看到每个阶段的导入与构造耗时)
         # 1. 加载内置工具 (注册到 ToolRegistry)
-        load_all_tools()
+        with startup_profiler.phase("tools"):
+            from xingchen.tools.loader import load_all_tools
+            load_all_tools()
         
-        # 2. 初始化记忆系统 (含 WAL 恢复)
-        self.memory = Memory()
+        # 2. 初始化记忆系统 (后台预热时只加载短期记忆与长期记忆缓存)
+        with startup_profiler.phase("memory"):
+            from xingchen.memory.facade import Memory
+            self.memory = Memory(warm_up=not background)
         
         # 3. 初始化心智系统
-        self.psyche = psyche_engine
+        with startup_profiler.phase("psyche"):
+            from xingchen.psyche import psyche_engine
+            self.psyche = psyche_engine
         
-        # 4. 初始化导航脑 (S脑) 与 驱动脑 (F脑)
-        self.navigator = Navigator(memory=self.memory)
-        self.driver = Driver(memory=self.memory)
+        # 4. 初始化驱动脑 (F脑)，此后即可响应输入
+        with startup_profiler.phase("driver"):
+            from xingchen.core.driver import Driver
+            self.driver = Driver(memory=self.memory)
         
-        # 5. 启动周期管理器 (心跳、触发器、自动演化)
-        self.cycle_manager = CycleManager(self.navigator, self.psyche)
+        # 5. 其余组件: 导航脑 (S脑)、周期管理器 (心跳、触发器、自动演化)、技能索引
+        if background:
+            with startup_profiler.phase("warmup_dispatch"):
+                self._start_warmup()
+        else:
+            with startup_profiler.phase("navigator"):
+                self.readiness["navigator"].run(self._start_navigator)
+            with startup_profiler.phase("skills"):
+                self.readiness["skills"].run(self._index_skills)
         
         self._initialized = True
-        logger.info("[App] ✅ 核心系统初始化完成。")
+        logger.info("[App] ✅ 核心系统初始化完成。" + (" 其余组件正在后台预热。" if background else ""))
+
+    def _start_warmup(self):
+        """阶段二: 互不依赖的预热任务各自在后台线程中并行执行 (守护线程，不阻塞退出)"""
+        tasks = self.memory.warm_up_tasks()
+        warm_vector = tasks.pop("vector")
+
+        def vector_then_skills():
+            # 技能索引写入向量库的 skill_library 集合，需等向量库就绪
+            warm_vector()
+            self.readiness["skills"].run(self._index_skills)
+
+        def navigator():
+            # 导航脑的依赖链会导入 chromadb；chromadb 包内有循环导入，多线程同时首次导入会失败，
+            # 因此等向量库 (唯一负责导入 chromadb 的预热任务) 结束后再开始
+            self.memory.vector_storage.readiness.wait()
+            self.readiness["navigator"].run(self._start_navigator)
+
+        tasks["vector"] = vector_then_skills
+        tasks["navigator"] = navigator
+        for name, task in tasks.items():
+            thread = threading.Thread(target=task, name=f"warmup-{name}", daemon=True)
+            thread.start()
+            self._warmup_threads.append(thread)
+
+    def _start_navigator(self):
+        from xingchen.core.navigator import Navigator
+        from xingchen.core.cycle import CycleManager
+        self.navigator = Navigator(memory=self.memory)
+        self.cycle_manager = CycleManager(self.navigator, self.psyche)
+
+    def _index_skills(self):
+        from xingchen.managers.library import library_manager
+        if not self.memory.vector_storage.is_available():
+            logger.warning("[App] 向量库不可用，跳过技能索引。")
+            return
+        library_manager.set_memory(self.memory)
+        library_manager.scan_and_index()
+
+    def get_readiness(self) -> Dict[str, Dict]:
+        """各组件的就绪状态 (state / elapsed_ms / error)"""
+        components = dict(self.memory.readiness) if self.memory else {}
+        components.update(self.readiness)
+        return {name: r.to_dict() for name, r in components.items()}
+
+    def wait_until_warm(self, timeout: float = None) -> bool:
+        """等待后台预热结束，返回是否全部在超时前结束"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._warmup_threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        return not any(t.is_alive() for t in self._warmup_threads)
 
     def get_driver_handler(self):
         """获取同步 Driver 处理器 (用于 CLI)"""
@@ -62,6 +136,9 @@ class XingChenApp:
             self.initialize()
             
         async def handler(content):
+            if settings.WEB_ASYNC_DRIVER:
+                # LLM 请求直接在事件循环中并发 (AsyncLLMClient)，只有阻塞的检索/工具步骤进入线程池
+                return await self.driver.athink(content, psyche_state=self.psyche.get_raw_state())
             # 在线程池中执行耗时的 LLM 思考过程，不阻塞 FastAPI 异步循环
             return await asyncio.to_thread(
                 self.driver.think, 
@@ -72,9 +149,13 @@ class XingChenApp:
 
     def shutdown(self):
         """优雅关闭"""
+        # 预热中的组件 (如正在重放的 WAL) 先完成，避免与关闭流程交错
+        if not self.wait_until_warm(settings.STARTUP_WARMUP_SHUTDOWN_TIMEOUT):
+            logger.warning("[App] 部分组件预热未在超时内结束，直接关闭。")
         if self.cycle_manager:
             self.cycle_manager.stop()
         if self.memory:
+            self.memory.close()
             self.memory.commit_long_term()
             self.memory.save_cache()
         logger.info("[App] 系统已优雅关闭。")
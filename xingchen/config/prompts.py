@@ -371,6 +371,17 @@ MEMORY_SUMMARY_PROMPT = """对以下分散的记忆片段进行"深度整合"。
 
 整合后的核心记忆:"""
 
+MEMORY_CLUSTER_SUMMARY_PROMPT = """以下 {count} 条记忆属于同一话题，请合并为更少的核心事实。
+要求：
+1. 合并重复与琐碎的描述，保留关键信息（用户喜好、重要关系、时间、数字）。
+2. 新旧信息冲突时以较新的为准。
+3. 输出不超过 {max_lines} 条，每条一行，不要编号，不要额外说明。
+
+原始记忆 (按时间先后):
+{context}
+
+整合后的核心记忆:"""
+
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 #  8. 进化系统 Prompt (代码生成能力已暂停)
@@ -16,6 +16,7 @@ class Settings:
     # 记忆存储路径
     MEMORY_STORAGE_PATH = os.path.join(DATA_DIR, "storage.json")
     VECTOR_DB_PATH = os.path.join(DATA_DIR, "chroma_db")
+    EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, "embedding_cache.db")
     DIARY_PATH = os.path.join(DATA_DIR, "diary.md")
     KNOWLEDGE_DB_PATH = os.path.join(DATA_DIR, "knowledge.db")
     GRAPH_DB_PATH = os.path.join(DATA_DIR, "knowledge.db") # v3.0 统一使用 KnowledgeDB
@@ -26,6 +27,10 @@ class Settings:
     PSYCHE_DEFAULT_STATE_FILE = os.path.join(DATA_DIR, "psyche_state.json")
     MIND_LINK_STORAGE_PATH = os.path.join(DATA_DIR, "mind_link_buffer.json")
     SHORT_TERM_CACHE_PATH = os.path.join(DATA_DIR, "short_term_cache.json")
+    CLASSIFY_CENTROIDS_PATH = os.path.join(DATA_DIR, "topic_db", "centroids.npz")
+    CLASSIFY_CALIBRATION_PATH = os.path.join(DATA_DIR, "topic_db", "classifier_calibration.json")
+    STARTUP_SNAPSHOT_PATH = os.path.join(DATA_DIR, "startup_snapshot.bin")
+    LLM_CACHE_PATH = os.path.join(DATA_DIR, "llm_cache.db")
     
     # 记忆参数
     SHORT_TERM_MAX_COUNT = 30
@@ -35,6 +40,100 @@ class Settings:
     DEFAULT_ALIAS_LIMIT = 5
     EMOTIONAL_RESONANCE_FACTOR = 0.1 # 触景生情系数
     
+    # 图谱扩散激活 (Spreading Activation)
+    SPREADING_ACTIVATION_STEPS = 3       # 传播步数 (跳数)
+    SPREADING_ACTIVATION_DECAY = 0.6     # 每步衰减
+    SPREADING_ACTIVATION_THRESHOLD = 0.01 # 低于此值不再扩散
+    SPREADING_ACTIVATION_MIN_WEIGHT = 0.3 # 参与传播的最小边权
+    SPREADING_ACTIVATION_TOP_N = 8
+    SPREADING_ACTIVATION_BUDGET_MS = 5.0  # 单次激活的时间预算
+    
+    # 混合检索 (词法 + 向量, RRF 融合)
+    HYBRID_RRF_K = 60                    # RRF 平滑常数
+    HYBRID_CANDIDATES = 20               # 每路召回的候选数
+    HYBRID_RECENCY_BOOST = 0.2           # 新近度最大加成
+    HYBRID_RECENCY_HALF_LIFE_DAYS = 30   # 新近度半衰期 (天)
+    HYBRID_CONFIDENCE_WEIGHT = 0.5       # 置信度为 0 时的最大惩罚
+    HYBRID_VECTOR_TIMEOUT = 1.5          # 等待向量召回的最长时间 (秒)
+    
+    # 层级检索 (Topic → Task → Fragment)
+    HIERARCHICAL_LIMIT = 5               # 返回的片段数
+    HIERARCHICAL_TOP_TOPICS = 3          # 候选话题数
+    HIERARCHICAL_TOP_TASKS = 5           # 候选任务数
+    HIERARCHICAL_MAX_TOPIC_DISTANCE = 0.95 # 话题余弦距离上限，超过则视为无关
+    HIERARCHICAL_TASK_BONUS = 0.05       # 片段属于命中任务时的加分
+    HIERARCHICAL_CACHE_ROWS = 50000      # 按话题缓存的片段向量总行数上限 (384 维约 75MB)；应覆盖常用话题
+    HIERARCHICAL_LOAD_CHUNK = 100        # 交互路径未命中后，后台加载话题片段的每块行数
+    HIERARCHICAL_LOAD_PAUSE = 0.02       # 后台加载块与块之间的停顿 (秒)，给前台检索让出 Chroma
+    
+    # 嵌入缓存
+    EMBEDDING_CACHE_HOT_SIZE = 4096      # 内存 LRU 热层条数
+    
+    # 嵌入后端 ("default": Chroma 默认 ONNX 模型; "hashing": 离线哈希 n-gram，无需下载)
+    EMBEDDING_BACKEND = os.getenv("XINGCHEN_EMBEDDING_BACKEND", "default")
+    EMBEDDING_BACKEND_OVERRIDES = {}     # 按集合覆盖，如 {"fragments": "hashing"}
+    HASHING_EMBEDDING_DIM = 512          # 哈希嵌入维度
+    
+    # 话题分类快速通道 (质心相似度足够明确时跳过 LLM)
+    # 只有存在校准文件时才生效，未校准前全部走 LLM (质心照常学习)
+    CLASSIFY_FAST_PATH_ENABLED = True
+    CLASSIFY_FAST_MIN_SIM = 0.8          # 校准文件缺少该项时的 top1 质心相似度下限
+    CLASSIFY_FAST_MARGIN = 0.1           # 校准文件缺少该项时的 top1 领先 top2 最小差距
+    CLASSIFY_FAST_MIN_SAMPLES = 3        # 话题至少积累的样本数
+    CLASSIFY_TASK_MIN_SIM = 0.8          # 快速通道沿用已有任务的相似度下限
+    CLASSIFY_TOPIC_MATCH_DISTANCE = 0.25 # 新建话题前语义匹配已有话题的余弦距离上限
+    CLASSIFY_CENTROID_SAVE_EVERY = 50    # 质心累计多少次更新后落盘
+    CLASSIFY_CENTROID_SAVE_INTERVAL = 300  # 有未落盘更新时最长间隔 (秒)
+    
+    # 向量索引管线 (异步批量嵌入)
+    VECTOR_INDEX_QUEUE_SIZE = 1000       # 有界队列容量，溢出后回表补齐
+    VECTOR_INDEX_BATCH_SIZE = 32         # 每批嵌入条数
+    VECTOR_INDEX_BATCH_WINDOW = 2.0      # 攒批窗口 (秒)
+    VECTOR_INDEX_MAX_BACKOFF = 60        # 嵌入失败重试的最大退避 (秒)
+    VECTOR_INDEX_CATCH_UP_INTERVAL = 300 # 空闲时回表检查的间隔 (秒)
+    
+    # 图谱维护 (衰减 / 剪枝 / 归档)
+    GRAPH_DECAY_HALF_LIFE_DAYS = 30      # 边权重半衰期 (天)
+    GRAPH_PRUNE_WEIGHT = 0.05            # 低于此权重的边移入冷存储
+    GRAPH_ORPHAN_GRACE_HOURS = 24        # 孤立节点宽限期
+    GRAPH_MAINTENANCE_CHUNK = 500        # 每个短事务处理的行数
+    GRAPH_VACUUM_FREE_RATIO = 0.3        # 空闲页占比超过此值才 VACUUM
+
+    # 记忆冷热分层 (knowledge 热层 / archive.db 冷层)
+    MEMORY_HOT_CAPACITY = 5000           # 热层知识条数上限
+    MEMORY_HOT_TARGET_RATIO = 0.9        # 超限后回落到容量的比例，避免每轮都迁移
+    MEMORY_TIER_BATCH = 500              # 每个短事务迁移的条数
+    MEMORY_TIER_HALF_LIFE_DAYS = 30      # 留存得分中新近度的半衰期 (天)
+    MEMORY_TIER_FREQUENCY_WEIGHT = 0.4   # 留存得分: 访问频次权重
+    MEMORY_TIER_RECENCY_WEIGHT = 0.4     # 留存得分: 新近度权重
+    MEMORY_TIER_CONFIDENCE_WEIGHT = 0.2  # 留存得分: 置信度权重
+    MEMORY_ACCESS_FLUSH_SIZE = 64        # 访问统计累积多少条后落库
+    MEMORY_ARCHIVE_RECALL = True         # 检索时是否同时召回冷层 (命中即回迁热层)
+
+    # 知识近重复检测 (MinHash LSH，修改签名参数后需清空 knowledge_lsh 重建)
+    KNOWLEDGE_NEAR_DUP_ENABLED = True
+    KNOWLEDGE_NEAR_DUP_THRESHOLD = 0.75  # 归一化后字符 shingle 的 Jaccard 下限
+    KNOWLEDGE_SHINGLE_SIZE = 2           # 字符 n-gram 长度 (中文以二字为宜)
+    KNOWLEDGE_MINHASH_PERM = 64          # MinHash 签名长度
+    KNOWLEDGE_LSH_BANDS = 16             # LSH 分段数 (每段 4 行，候选阈值约 0.5)
+
+    # 记忆整合 (DeepClean: 先按字符 shingle 预聚类，再逐簇调用 LLM 摘要)
+    CONSOLIDATION_MIN_CANDIDATES = 50    # 候选少于此数不整合
+    CONSOLIDATION_CANDIDATES = 500       # 每轮参与聚类的最近知识条数
+    CONSOLIDATION_SIMILARITY = 0.35      # 入簇的二字 Jaccard 阈值 (低于近重复阈值，按话题聚拢)
+    CONSOLIDATION_MIN_CLUSTER = 3        # 少于此数的簇不值得一次 LLM 调用
+    CONSOLIDATION_MAX_CLUSTER = 20       # 单簇上限，控制 Prompt 长度
+    CONSOLIDATION_CONCURRENCY = 4        # 并发 LLM 调用数
+    CONSOLIDATION_HASH_DIM = 4096        # shingle 哈希向量维度
+
+    # 启动快照 (派生内存索引落盘，启动时按数据库变更计数校验后懒加载)
+    STARTUP_SNAPSHOT_ENABLED = True
+    STARTUP_SNAPSHOT_INTERVAL = 600      # 周期保存间隔 (秒)
+
+    # 分阶段启动 (首轮回复必需的组件先同步就绪，其余在后台并行预热)
+    STARTUP_BACKGROUND_WARMUP = True
+    STARTUP_WARMUP_SHUTDOWN_TIMEOUT = 30 # 关闭时等待未完成预热的上限 (秒)
+    
     # 心智引擎参数
     PSYCHE_DECAY_RATE = 0.05
     BASELINE_DRIFT_PERSISTENCE = 0.02 # 漂移因子
@@ -54,6 +153,7 @@ class Settings:
     PROACTIVE_COOLDOWN = 60
     CONTEXT_HISTORY_WINDOW = 15 # 上下文历史窗口
     MAX_TOOL_CALL_ROUNDS = 3    # LLM 工具循环最大次数
+    DRIVER_STREAMING = True     # F脑流式生成: 边生成边推送 driver_response_delta (首 token 即可见)
     PROACTIVE_HISTORY_WINDOW = 10
     
     # LLM 配置
@@ -67,6 +167,52 @@ class Settings:
     # LLM 默认模型 (从 llm_client.py 抽离)
     ZHIPU_DEFAULT_MODEL = "glm-4"
     QWEN_DEFAULT_MODEL = "qwen-turbo"
+
+    # LLM 响应缓存 (确定性的后台调用由调用点显式开启，见 LLMClient.chat(cache=...))
+    LLM_CACHE_ENABLED = True
+    LLM_CACHE_TTL = 7 * 24 * 3600         # 条目有效期 (秒)
+    LLM_CACHE_MAX_ENTRIES = 5000          # 超出后按最近使用时间淘汰
+
+    # LLM 并发与连接 (LLMRegistry: 进程内按提供商共享客户端与连接池；LLMScheduler: 优先级调度与限速)
+    LLM_MAX_CONCURRENCY = 16              # 全局在途请求上限
+    LLM_PROVIDER_CONCURRENCY = {"deepseek": 8, "qwen": 8, "zhipu": 4}  # 各提供商在途请求上限
+    LLM_PROVIDER_DEFAULT_CONCURRENCY = 8
+    LLM_RATE_LIMITS = {"deepseek": (10.0, 20), "qwen": (10.0, 20), "zhipu": (5.0, 10)}  # 令牌桶: (每秒请求数, 突发容量)
+    LLM_INTERACTIVE_RESERVED = 2          # 全局上限中只留给交互请求 (F脑回复) 的名额
+    LLM_HTTP_MAX_CONNECTIONS = 32         # httpx 连接池上限
+    LLM_HTTP_MAX_KEEPALIVE = 16           # 保持 keep-alive 的空闲连接数
+    LLM_HTTP_KEEPALIVE_EXPIRY = 60        # 空闲连接保留秒数
+    WEB_ASYNC_DRIVER = True               # Web 模式下 Driver 在事件循环中异步调用 LLM (不再每轮占用一个线程)
+    COMPRESSOR_ASYNC = True               # 记忆压缩的多路 LLM 请求在后台事件循环中并发 (替代 6 线程池)
+
+    # LLM 提供商健康与故障转移 (llm_health.py: 延迟直方图 + 熔断器；只会转到配置了 API Key 的备选提供商)
+    LLM_FALLBACK_PROVIDERS = {"qwen": ["deepseek", "zhipu"], "deepseek": ["qwen", "zhipu"], "zhipu": ["qwen", "deepseek"]}
+    LLM_BREAKER_FAILURES = 3              # 连续失败次数达到后熔断 (请求直接转到备选提供商)
+    LLM_BREAKER_COOLDOWN = 30             # 熔断后经过多少秒放行一个探测请求
+    LLM_HEALTH_WINDOW = 500               # 延迟直方图样本数达到后整体减半 (旧样本逐渐失效)
+    LLM_HEDGE_INTERACTIVE = True          # F脑回复: 主提供商超过延迟分位数仍未响应时，向备选提供商发出对冲请求并取先到的结果
+    LLM_HEDGE_QUANTILE = 0.95             # 对冲延迟取主提供商延迟 (流式为首 token 延迟) 的该分位数
+    LLM_HEDGE_MIN_SAMPLES = 20            # 样本不足时使用默认对冲延迟
+    LLM_HEDGE_DEFAULT_DELAY = 5.0         # 秒
+    LLM_HEDGE_MIN_DELAY = 0.5             # 对冲延迟下限 (秒)，避免常态下也重复请求
+    LLM_HEDGE_MAX_DELAY = 15.0            # 对冲延迟上限 (秒)
+
+    # 提示词 token 预算 (prompt_budget.py: 按提供商近似计数，超出目标时从低优先级分段开始裁剪)
+    PROMPT_BUDGET_ENABLED = True
+    PROMPT_TARGET_TOKENS = {"driver": 6000, "navigator": 10000}  # 各调用点整个请求 (含工具定义) 的目标大小
+    PROMPT_SECTION_BUDGETS = {            # 分段: (优先级，数字越小越重要；单独上限 tokens)
+        "profile": (0, 400),
+        "history": (1, 3000),
+        "script": (1, 5000),              # S脑的近期交互日志
+        "long_term": (2, 1500),
+        "tools": (3, 600),
+        "skills": (4, 400),
+    }
+    PROMPT_TOKEN_RATIOS = {               # 分词器近似: (每个中日韩字符的 token 数, 每个其他字符的 token 数)
+        "qwen": (0.70, 0.28), "deepseek": (0.60, 0.28), "zhipu": (0.70, 0.30),
+    }
+    PROMPT_DEFAULT_TOKEN_RATIO = (1.0, 0.30)
+    PROMPT_MESSAGE_OVERHEAD = 4           # 每条消息的格式开销 (role 等)
     
     # 工具与 Shell 配置 (从 system_tools.py 抽离)
     SHELL_DANGEROUS_COMMANDS = [
@@ -1,15 +1,24 @@
+import asyncio
+import itertools
 import json
 import threading
 import time
+import uuid
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List
 
 from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.async_llm_client import AsyncLLMClient
+from xingchen.utils.llm_scheduler import Priority
 from xingchen.utils.logger import logger
 from xingchen.utils.json_parser import extract_json
+from xingchen.utils.llm_stream import ReplyStreamer
+from xingchen.utils.prompt_budget import PromptBudget, Section
 from xingchen.memory.facade import Memory
 from xingchen.core.event_bus import event_bus
-from xingchen.schemas.events import BaseEvent as Event, DriverResponsePayload, UserInputPayload
+from xingchen.schemas.events import (
+    BaseEvent as Event, DriverResponsePayload, DriverResponseDeltaPayload, UserInputPayload
+)
 from xingchen.managers.library import library_manager
 from xingchen.psyche import psyche_engine, mind_link, value_system, emotion_detector
 from xingchen.config.prompts import DRIVER_SYSTEM_PROMPT, PROACTIVE_DRIVER_PROMPT
@@ -26,9 +35,12 @@ class Driver:
     """
     def __init__(self, name="Driver", memory=None):
         self.name = name
-        # F脑使用 Qwen
-        self.llm = LLMClient(provider="qwen")
-        self.llm.model = settings.F_BRAIN_MODEL
+        # F脑使用 Qwen (用户在等待回复，调度优先级最高；Qwen 过慢或熔断时对冲 / 转移到备选提供商)
+        self.llm = LLMClient(provider="qwen", model=settings.F_BRAIN_MODEL, priority=Priority.INTERACTIVE,
+                             hedge=settings.LLM_HEDGE_INTERACTIVE)
+        # Web 模式下在事件循环中使用的异步客户端 (同一提供商共享连接池)
+        self.async_llm = AsyncLLMClient(provider="qwen", model=settings.F_BRAIN_MODEL, priority=Priority.INTERACTIVE,
+                                        hedge=settings.LLM_HEDGE_INTERACTIVE)
         self.memory = memory if memory else Memory()
         
         # 订阅事件总线
@@ -179,42 +191,86 @@ class Driver:
             
             return response
 
+    async def athink(self, user_input: str, psyche_state: Optional[Dict[str, Any]] = None) -> str:
+        """
+        异步思考入口 (Web 模式)
+        LLM 请求在当前事件循环中进行；上下文检索、工具执行等阻塞步骤交给默认线程池。
+        """
+        if not user_input:
+            return ""
+
+        # 轮询获取锁，避免在事件循环中阻塞；被取消时不会遗留未释放的锁
+        while not self._thinking_lock.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+        try:
+            response = await self._athink_internal(user_input, psyche_state)
+            self.last_interaction_time = time.time()
+            return response
+        finally:
+            self._thinking_lock.release()
+
     def _think_internal(self, user_input, psyche_state=None, suggestion=""):
         """内部思考流程"""
-        # Phase 1.4: 重置工具执行状态
-        self._last_tool_success = False
-        self._last_tool_failed = False
-
         # 1. 深度维护检查
         if "深度维护" in user_input or "/deep_clean" in user_input:
             return self._handle_deep_clean(user_input)
 
-        # 2. 准备上下文
+        # 2-4. 准备上下文、组装消息、发布 UserInput 事件
+        messages = self._begin_turn(user_input)
+
+        # 5. 调用 LLM (含工具循环；流式模式下边生成边推送 reply 增量)
+        tools = tool_registry.get_openai_tools()
+        stream_id = str(uuid.uuid4()) if settings.DRIVER_STREAMING else None
+        raw_response = self._call_llm_with_tools(messages, tools, stream_id=stream_id)
+
+        # 6-7. 解析响应、存储记忆并发布响应事件
+        return self._end_turn(user_input, raw_response, psyche_state, suggestion, stream_id)
+
+    async def _athink_internal(self, user_input, psyche_state=None, suggestion=""):
+        """内部思考流程 (异步版，步骤与 _think_internal 一致)"""
+        if "深度维护" in user_input or "/deep_clean" in user_input:
+            return await asyncio.to_thread(self._handle_deep_clean, user_input)
+
+        messages = await asyncio.to_thread(self._begin_turn, user_input)
+
+        tools = tool_registry.get_openai_tools()
+        stream_id = str(uuid.uuid4()) if settings.DRIVER_STREAMING else None
+        raw_response = await self._acall_llm_with_tools(messages, tools, stream_id=stream_id)
+
+        return await asyncio.to_thread(self._end_turn, user_input, raw_response, psyche_state, suggestion, stream_id)
+
+    def _begin_turn(self, user_input: str) -> List[Dict[str, str]]:
+        """一轮对话的前置步骤: 重置工具状态、准备上下文、组装消息、发布 UserInput 事件"""
+        # Phase 1.4: 重置工具执行状态
+        self._last_tool_success = False
+        self._last_tool_failed = False
+
         context = self._prepare_context(user_input)
-        
-        # 3. 组装消息
         messages = self._build_messages(user_input, context)
-        
-        # 4. 发布 UserInput 事件
+
         event_bus.publish(Event(
             type="user_input",
             source="user",
             payload=UserInputPayload(content=user_input),
             meta={}
         ))
+        return messages
 
-        # 5. 调用 LLM (含工具循环)
-        tools = tool_registry.get_openai_tools()
-        raw_response = self._call_llm_with_tools(messages, tools)
-
-        # 6. 解析响应
+    def _end_turn(self, user_input, raw_response, psyche_state, suggestion, stream_id=None) -> str:
+        """一轮对话的收尾: 解析响应、存储记忆并发布响应事件"""
         reply, inner_voice, emotion = self._parse_driver_response(raw_response)
-
-        # 7. 收尾：存储记忆并发布响应事件
-        self._finalize_interaction(user_input, reply, inner_voice, emotion, psyche_state, suggestion)
-        
+        self._finalize_interaction(user_input, reply, inner_voice, emotion, psyche_state, suggestion,
+                                   stream_id=stream_id)
         return reply
 
+    def _memory_ready(self, component: str) -> bool:
+        """记忆子组件是否已就绪 (分阶段启动时未预热完成的部分降级跳过)"""
+        is_ready = getattr(self.memory, "is_ready", None)
+        if is_ready is None or is_ready(component):
+            return True
+        logger.debug(f"[{self.name}] 记忆组件 {component} 预热中，本轮跳过。")
+        return False
+
     def _prepare_context(self, user_input: str) -> Dict[str, Any]:
         """准备思考所需的全部上下文信息"""
         # A. 更新/读取心智
@@ -225,8 +281,9 @@ class Driver:
         if intuition:
             logger.info(f"[{self.name}] 🧠 感知到潜意识直觉: {intuition[:30]}...")
             
-        # C. 记忆检索 (含别名解析与画像)
-        long_term_context = self.memory.get_relevant_long_term(query=user_input)
+        # C. 记忆检索 (含别名解析、图谱联想与画像)
+        long_term_items = self.memory.get_relevant_long_term(query=user_input)
+        long_term_context = "\n".join(f"- {item}" for item in long_term_items)
         
         # 别名解析
         try:
@@ -241,11 +298,29 @@ class Driver:
         except Exception as e:
             logger.warning(f"[{self.name}] 别名检索异常: {e}")
 
-        # 画像检索
+        # 图谱联想 (扩散激活)
+        try:
+            activated_context = self.memory.get_activated_context(user_input)
+            if activated_context:
+                long_term_context = long_term_context + "\n" + activated_context
+        except Exception as e:
+            logger.warning(f"[{self.name}] 图谱联想失败: {e}")
+
+        # 话题记忆 (层级检索；话题索引仍在后台预热时跳过，避免首轮回复等待向量库加载；
+        # 未缓存的话题片段不在回复路径上加载，本轮退化为全量检索)
+        try:
+            topic_context = ""
+            if self._memory_ready("topics"):
+                topic_context = self.memory.get_hierarchical_context(user_input, cold_load=False)
+            if topic_context:
+                long_term_context = long_term_context + "\n" + topic_context
+        except Exception as e:
+            logger.warning(f"[{self.name}] 话题记忆检索失败: {e}")
+
+        # 画像检索 (单独成段，组装时优先于长期记忆保留)
+        user_profile = ""
         try:
             user_profile = self._get_user_profile_string()
-            if user_profile:
-                long_term_context = user_profile + "\n" + long_term_context
         except Exception as e:
             logger.warning(f"[{self.name}] 图谱画像检索失败: {e}")
 
@@ -272,6 +347,7 @@ class Driver:
             "value_constraints": value_constraints_str,
             "suggestion": intuition,
             "long_term_context": long_term_context,
+            "user_profile": user_profile,
             "skill_info": skill_info,
             "tool_list": tool_list_str
         }
@@ -303,18 +379,47 @@ class Driver:
         return profile_str
 
     def _build_messages(self, user_input: str, context: Dict[str, Any]) -> List[Dict[str, str]]:
-        """组装 LLM 请求消息列表"""
+        """组装 LLM 请求消息列表 (对话历史、画像、长期记忆、技能、工具列表按 token 预算裁剪)"""
+        context = dict(context)
+        history = self.memory.get_recent_history(limit=settings.CONTEXT_HISTORY_WINDOW)
+        user_profile = context.pop("user_profile", "")
+
+        if settings.PROMPT_BUDGET_ENABLED:
+            template = DRIVER_SYSTEM_PROMPT.format(**dict(context, long_term_context="", skill_info="", tool_list=""))
+            tool_schemas = json.dumps(tool_registry.get_openai_tools(), ensure_ascii=False)
+            fitted = PromptBudget("driver", provider=self.llm.provider).fit([
+                Section("history", history, keep="last", note=False),
+                Section.from_text("profile", user_profile),
+                Section.from_text("long_term", context["long_term_context"]),
+                Section.from_text("skills", context["skill_info"]),
+                Section.from_text("tools", context["tool_list"]),
+            ], fixed=[template, user_input, tool_schemas])
+            history = fitted["history"].kept
+            user_profile = fitted["profile"].text()
+            context.update(
+                long_term_context=fitted["long_term"].text(),
+                skill_info=fitted["skills"].text(),
+                tool_list=fitted["tools"].text(),
+            )
+
+        if user_profile:
+            context["long_term_context"] = user_profile + "\n" + context["long_term_context"]
         system_prompt = DRIVER_SYSTEM_PROMPT.format(**context)
         messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(self.memory.get_recent_history(limit=settings.CONTEXT_HISTORY_WINDOW))
+        messages.extend(history)
         messages.append({"role": "user", "content": user_input})
         return messages
 
-    def _call_llm_with_tools(self, messages: List[Dict[str, str]], tools: List[Dict[str, Any]]) -> Optional[str]:
-        """执行 LLM 调用循环，处理工具调用"""
+    def _call_llm_with_tools(self, messages: List[Dict[str, str]], tools: List[Dict[str, Any]],
+                             stream_id: Optional[str] = None) -> Optional[str]:
+        """执行 LLM 调用循环，处理工具调用 (提供 stream_id 时流式生成并发布 reply 增量)"""
         raw_response = None
+        seq = itertools.count(1)  # 同一 stream_id 的各轮共用序号，页面按最大 seq 显示
         for _ in range(settings.MAX_TOOL_CALL_ROUNDS): 
-            response = self.llm.chat(messages, tools=tools)
+            if stream_id:
+                response = self.llm.chat_stream(messages, tools=tools, on_delta=self._reply_publisher(stream_id, seq))
+            else:
+                response = self.llm.chat(messages, tools=tools)
             if not response: break
             
             if isinstance(response, str):
@@ -322,40 +427,99 @@ class Driver:
                 break
                 
             if response and hasattr(response, 'tool_calls') and response.tool_calls:
-                # 记录 Assistant 的工具调用回复
-                # 对于 OpenAI SDK 返回的 Message 对象，使用 model_dump 或手动构造
-                if hasattr(response, 'model_dump'):
-                    messages.append(response.model_dump())
-                else:
-                    messages.append({
-                        "role": "assistant",
-                        "content": response.content,
-                        "tool_calls": [
-                            {
-                                "id": tc.id,
-                                "type": tc.type,
-                                "function": {
-                                    "name": tc.function.name,
-                                    "arguments": tc.function.arguments
-                                }
-                            } for tc in response.tool_calls
-                        ]
-                    })
-                
+                self._append_tool_request(messages, response)
                 for tool_call in response.tool_calls:
                     res = self._execute_tool(tool_call)
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "name": tool_call.function.name,
-                        "content": str(res)
-                    })
+                    messages.append(self._tool_result_message(tool_call, res))
                 continue # 继续下一轮让 LLM 总结结果
             else:
                 raw_response = getattr(response, 'content', None)
                 break
         return raw_response
 
+    async def _acall_llm_with_tools(self, messages: List[Dict[str, str]], tools: List[Dict[str, Any]],
+                                    stream_id: Optional[str] = None) -> Optional[str]:
+        """_call_llm_with_tools 的异步版: LLM 请求走 AsyncLLMClient，工具在线程池中执行"""
+        raw_response = None
+        seq = itertools.count(1)
+        for _ in range(settings.MAX_TOOL_CALL_ROUNDS):
+            if stream_id:
+                response = await self.async_llm.chat_stream(messages, tools=tools,
+                                                            on_delta=self._reply_publisher(stream_id, seq))
+            else:
+                response = await self.async_llm.chat(messages, tools=tools)
+            if not response: break
+
+            if isinstance(response, str):
+                raw_response = response
+                break
+
+            if hasattr(response, 'tool_calls') and response.tool_calls:
+                self._append_tool_request(messages, response)
+                for tool_call in response.tool_calls:
+                    res = await asyncio.to_thread(self._execute_tool, tool_call)
+                    messages.append(self._tool_result_message(tool_call, res))
+                continue
+            else:
+                raw_response = getattr(response, 'content', None)
+                break
+        return raw_response
+
+    @staticmethod
+    def _append_tool_request(messages: List[Dict[str, Any]], response):
+        """记录 Assistant 的工具调用回复"""
+        # 对于 OpenAI SDK 返回的 Message 对象，使用 model_dump 或手动构造
+        if hasattr(response, 'model_dump'):
+            messages.append(response.model_dump())
+        else:
+            messages.append({
+                "role": "assistant",
+                "content": response.content,
+                "tool_calls": [
+                    {
+                        "id": tc.id,
+                        "type": tc.type,
+                        "function": {
+                            "name": tc.function.name,
+                            "arguments": tc.function.arguments
+                        }
+                    } for tc in response.tool_calls
+                ]
+            })
+
+    @staticmethod
+    def _tool_result_message(tool_call, result) -> Dict[str, Any]:
+        return {
+            "role": "tool",
+            "tool_call_id": tool_call.id,
+            "name": tool_call.function.name,
+            "content": str(result)
+        }
+
+    def _reply_publisher(self, stream_id: str, seq: Iterator[int] = None):
+        """
+        单轮流式生成的 on_delta 回调: 从 JSON 中增量提取 reply 并发布 driver_response_delta。
+        事件不落盘，且由线程池分发 (不保证顺序)，因此每条都带 seq 与截至当前的全文。
+        工具调用轮通常没有文本输出，不会产生增量；有输出时，各轮须传入同一个 seq 计数器，
+        否则后一轮从 1 重新计数，页面会一直显示前一轮的文本。
+        """
+        streamer = ReplyStreamer("reply")
+        seq = seq or itertools.count(1)
+
+        def on_delta(text: str):
+            delta = streamer.feed(text)
+            if not delta:
+                return
+            event_bus.publish(Event(
+                type="driver_response_delta",
+                source="driver",
+                trace_id=stream_id,
+                payload=DriverResponseDeltaPayload(delta=delta, content=streamer.text, seq=next(seq)),
+                meta={"stream_id": stream_id}
+            ), persist=False)
+
+        return on_delta
+
     def _execute_tool(self, tool_call) -> str:
         """执行单个工具调用并记录状态"""
         name = tool_call.function.name
@@ -397,7 +561,8 @@ class Driver:
             
         return raw_response, "直接输出", "neutral"
 
-    def _finalize_interaction(self, user_input, reply, inner_voice, emotion, psyche_state, suggestion):
+    def _finalize_interaction(self, user_input, reply, inner_voice, emotion, psyche_state, suggestion,
+                              stream_id: Optional[str] = None):
         """保存记忆并发布最终事件，同时触发即时情绪"""
         self.memory.add_short_term("user", user_input)
         self.memory.add_short_term("assistant", reply)
@@ -434,16 +599,20 @@ class Driver:
             logger.info(f"[{self.name}] ⚠️ 检测到价值观冲突，产生心理内耗: {conflict_delta}")
             psyche_engine.apply_emotion(conflict_delta)
         
+        meta = {
+            "inner_voice": inner_voice,
+            "user_emotion_detect": emotion,
+            "psyche_state": str(psyche_state) if psyche_state else "unknown",
+            "suggestion_ref": suggestion
+        }
+        if stream_id:
+            # 前端据此把流式渲染中的消息替换为最终回复
+            meta["stream_id"] = stream_id
         event_bus.publish(Event(
             type="driver_response",
             source="driver",
             payload=DriverResponsePayload(content=reply),
-            meta={
-                "inner_voice": inner_voice,
-                "user_emotion_detect": emotion,
-                "psyche_state": str(psyche_state) if psyche_state else "unknown",
-                "suggestion_ref": suggestion
-            }
+            meta=meta
         ))
 
     def _handle_deep_clean(self, user_input: str) -> str:
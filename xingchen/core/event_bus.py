@@ -56,8 +56,15 @@ class SQLiteEventBus:
             conn.commit()
         logger.info(f"[EventBus] 总线已连接: {self.db_path}")
 
-    def publish(self, event: Event) -> int:
-        """发布事件"""
+    def publish(self, event: Event, persist: bool = True) -> Optional[int]:
+        """
+        发布事件
+        :param persist: False 时只通知订阅者、不写入 SQLite (用于流式增量等高频瞬时事件)
+        """
+        if not persist:
+            self._notify_subscribers(event)
+            return None
+
         with self._lock:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
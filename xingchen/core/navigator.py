@@ -2,6 +2,7 @@ from typing import Optional, Dict, Any, List
 import threading
 import time
 from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.llm_scheduler import Priority
 from xingchen.memory.facade import Memory
 from xingchen.core.event_bus import event_bus
 from xingchen.config.settings import settings
@@ -25,9 +26,8 @@ class Navigator:
     def __init__(self, name="Navigator", memory=None):
         self.name = name
         # S脑使用 DeepSeek
-        self.llm = LLMClient(provider="deepseek")
-        # 强制切换为 deepseek-reasoner
-        self.llm.model = settings.S_BRAIN_MODEL
+        # 使用 deepseek-reasoner；后台任务，调度时让位于 F脑回复
+        self.llm = LLMClient(provider="deepseek", model=settings.S_BRAIN_MODEL, priority=Priority.BACKGROUND)
         self.memory = memory if memory else Memory()
         self.suggestion_board = []
         self._lock = threading.Lock() 
@@ -1,3 +1,5 @@
+import asyncio
+import os
 import time
 import concurrent.futures
 import json
@@ -20,13 +22,48 @@ class Compressor:
     """
     记忆压缩师 (Compressor)
     职责：执行具体的记忆压缩原子任务
+
+    每个 LLM 任务拆为 "请求参数" 与 "结果处理" 两部分:
+    - 同步入口 (generate_creative_diary 等) 与线程池路径直接调用 llm.chat
+    - 异步路径 (settings.COMPRESSOR_ASYNC) 在后台事件循环中并发请求，结果处理在线程池中执行
     """
     def __init__(self, llm, memory):
         self.llm = llm
         self.memory = memory
+        self._async_llm = None
+
+    @property
+    def async_llm(self):
+        """与 self.llm 同提供商、同模型、同优先级的异步客户端 (首次使用时创建)"""
+        if self._async_llm is None:
+            from xingchen.utils.async_llm_client import AsyncLLMClient
+            from xingchen.utils.llm_scheduler import Priority
+            self._async_llm = AsyncLLMClient(provider=getattr(self.llm, "provider", None),
+                                             model=getattr(self.llm, "model", None),
+                                             priority=getattr(self.llm, "priority", Priority.NORMAL))
+        return self._async_llm
+
+    def _llm_tasks(self, current_psyche, time_context, script):
+        """压缩任务表: 名称 -> (chat 参数, 结果处理函数)"""
+        return {
+            "Creative Diary": (self._diary_request(current_psyche, time_context, script), self._save_diary),
+            "Fact Extraction": (self._facts_request(script), self._save_facts),
+            "Cognitive Graph": (self._graph_request(current_psyche, script),
+                                lambda response: self._save_graph(response, current_psyche)),
+            "Alias Extraction": (self._alias_request(script), self._save_aliases),
+            "Autonomous Learning Trigger": (self._learning_request(script), self._run_learning_tasks),
+        }
 
     def run_compression_tasks_parallel(self, current_psyche, time_context, script):
         """并行执行所有压缩任务"""
+        if settings.COMPRESSOR_ASYNC:
+            from xingchen.utils.async_runner import async_runner
+            logger.info(f"[Compressor] 🚀 启动并行记忆压缩 (事件循环并发)...")
+            start_time = time.time()
+            results = async_runner.run(self._run_tasks_async(current_psyche, time_context, script))
+            logger.info(f"[Compressor] 并行压缩完成，耗时: {time.time() - start_time:.2f}s")
+            return results.get("Creative Diary")
+
         logger.info(f"[Compressor] 🚀 启动并行记忆压缩 (6路并发)...")
         start_time = time.time()
         
@@ -34,27 +71,17 @@ class Compressor:
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
             # 提交任务
-            future_diary = executor.submit(self.generate_creative_diary, current_psyche, time_context, script)
-            future_facts = executor.submit(self.extract_facts, script)
-            future_graph = executor.submit(self.build_cognitive_graph, current_psyche, script)
-            future_alias = executor.submit(self.extract_aliases, script)
-            future_learning = executor.submit(self.trigger_autonomous_learning, script)
-            future_classify = executor.submit(self._classify_to_hierarchy, script)  
-            
             futures = {
-                future_diary: "Creative Diary",
-                future_facts: "Fact Extraction",
-                future_graph: "Cognitive Graph",
-                future_alias: "Alias Extraction",
-                future_learning: "Autonomous Learning Trigger",
-                future_classify: "Hierarchical Classification"
+                executor.submit(self._run_task_sync, request, handler): name
+                for name, (request, handler) in self._llm_tasks(current_psyche, time_context, script).items()
             }
+            futures[executor.submit(self._classify_to_hierarchy, script)] = "Hierarchical Classification"
             
             for future in concurrent.futures.as_completed(futures):
                 name = futures[future]
                 try:
                     result = future.result()
-                    if future == future_diary:
+                    if name == "Creative Diary":
                         diary_response = result
                     logger.info(f"[Compressor] ✅ {name} 完成")
                 except Exception as e:
@@ -62,6 +89,31 @@ class Compressor:
                     
         logger.info(f"[Compressor] 并行压缩完成，耗时: {time.time() - start_time:.2f}s")
         return diary_response
+
+    def _run_task_sync(self, request, handler):
+        return handler(self.llm.chat(**request))
+
+    async def _run_tasks_async(self, current_psyche, time_context, script):
+        """异步路径: 5 路 LLM 请求共享一个事件循环与连接池；层级分类 (内部为同步调用) 放入线程池"""
+        async def run(request, handler):
+            response = await self.async_llm.chat(**request)
+            return await asyncio.to_thread(handler, response)
+
+        jobs = {
+            name: run(request, handler)
+            for name, (request, handler) in self._llm_tasks(current_psyche, time_context, script).items()
+        }
+        jobs["Hierarchical Classification"] = asyncio.to_thread(self._classify_to_hierarchy, script)
+
+        outcomes = await asyncio.gather(*jobs.values(), return_exceptions=True)
+        results = {}
+        for name, outcome in zip(jobs, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"[Compressor] ❌ {name} 失败: {outcome}", exc_info=outcome)
+            else:
+                results[name] = outcome
+                logger.info(f"[Compressor] ✅ {name} 完成")
+        return results
     
     def _classify_to_hierarchy(self, script: str):
         """
@@ -78,12 +130,18 @@ class Compressor:
 
     def generate_creative_diary(self, current_psyche, time_context, script):
         """任务 1: 生成 AI 日记"""
+        return self._run_task_sync(self._diary_request(current_psyche, time_context, script), self._save_diary)
+
+    @staticmethod
+    def _diary_request(current_psyche, time_context, script):
         prompt = DIARY_GENERATION_PROMPT.format(
             current_psyche=current_psyche,
             time_context=time_context,
             script=script
         )
-        response_obj = self.llm.chat([{"role": "user", "content": prompt}])
+        return {"messages": [{"role": "user", "content": prompt}]}
+
+    def _save_diary(self, response_obj):
         if response_obj:
             content = response_obj.content
             self.memory.write_diary_entry(content)
@@ -92,10 +150,16 @@ class Compressor:
 
     def extract_facts(self, script):
         """任务 2: 事实提取"""
+        return self._run_task_sync(self._facts_request(script), self._save_facts)
+
+    @staticmethod
+    def _facts_request(script):
         prompt = FACT_EXTRACTION_PROMPT.format(script=script)
-        response_obj = self.llm.chat([{"role": "user", "content": prompt}])
+        return {"messages": [{"role": "user", "content": prompt}], "cache": "extract_facts"}
+
+    def _save_facts(self, response_obj):
         if response_obj:
-            content = response_obj.choices[0].message.content
+            content = response_obj.content
             if content and content.strip() != "None":
                 facts = content.strip().split("\n")
                 for fact in facts:
@@ -106,8 +170,15 @@ class Compressor:
 
     def build_cognitive_graph(self, current_psyche, script):
         """任务 3: 构建认知图谱 (增强版)"""
+        return self._run_task_sync(self._graph_request(current_psyche, script),
+                                   lambda response: self._save_graph(response, current_psyche))
+
+    @staticmethod
+    def _graph_request(current_psyche, script):
         prompt = COGNITIVE_GRAPH_PROMPT.format(current_psyche=current_psyche, script=script)
-        response_obj = self.llm.chat([{"role": "user", "content": prompt}])
+        return {"messages": [{"role": "user", "content": prompt}]}
+
+    def _save_graph(self, response_obj, current_psyche):
         if response_obj:
             content = response_obj.content
             triplets = extract_json(content)
@@ -133,8 +204,16 @@ class Compressor:
 
     def extract_aliases(self, script):
         """任务 4: 别名提取"""
+        return self._run_task_sync(self._alias_request(script), self._save_aliases)
+
+    @staticmethod
+    def _alias_request(script):
         prompt = ALIAS_EXTRACTION_PROMPT.format(script=script)
-        response_obj = self.llm.chat([{"role": "user", "content": prompt}])
+        # 解析不出 JSON 列表的回复不缓存 (空列表是合法结果)
+        return {"messages": [{"role": "user", "content": prompt}], "cache": "extract_aliases",
+                "validate": lambda m: isinstance(extract_json(m.content), list)}
+
+    def _save_aliases(self, response_obj):
         if response_obj:
             content = response_obj.content
             aliases = extract_json(content)
@@ -152,8 +231,14 @@ class Compressor:
         任务 5: 自主学习触发器 (Autonomous Learning)
         分析对话记录，识别未知概念，直接调用 web_search/web_crawl 获取知识。
         """
+        return self._run_task_sync(self._learning_request(script), self._run_learning_tasks)
+
+    @staticmethod
+    def _learning_request(script):
         prompt = AUTONOMOUS_LEARNING_TRIGGER_PROMPT.format(script=script)
-        response_obj = self.llm.chat([{"role": "user", "content": prompt}])
+        return {"messages": [{"role": "user", "content": prompt}]}
+
+    def _run_learning_tasks(self, response_obj):
         if not response_obj:
             return
             
@@ -55,7 +55,9 @@ class KnowledgeIntegrator:
                 
                 # 2. 调用 LLM 进行提炼
                 prompt = KNOWLEDGE_INTERNALIZATION_PROMPT.format(document_content=content)
-                response_obj = self.llm.chat([{"role": "user", "content": prompt}])
+                # 同一文档处理失败后会被再次处理，缓存提炼结果避免重复请求
+                response_obj = self.llm.chat([{"role": "user", "content": prompt}], cache="knowledge_integrator",
+                                             validate=lambda m: bool(extract_json(m.content)))
                 
                 if not response_obj:
                     logger.warning(f"[Integrator] LLM 未返回结果，跳过: {filename}")
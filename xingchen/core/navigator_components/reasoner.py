@@ -10,6 +10,7 @@ from xingchen.tools.registry import tool_registry
 from xingchen.tools.definitions import ToolTier
 from xingchen.core.event_bus import event_bus
 from xingchen.psyche import value_system
+from xingchen.utils.prompt_budget import PromptBudget, Section
 
 
 class Reasoner:
@@ -28,31 +29,33 @@ class Reasoner:
         """
         logger.info(f"[Reasoner] 启动周期性深度推理 (R1 Mode)...")
         
-        events = event_bus.get_latest_cycle(limit=50)
+        events = event_bus.get_latest_cycle(limit=settings.NAVIGATOR_EVENT_LIMIT)
         if not events:
             return None, None, None
 
-        script = ""
+        script_lines = []
         for e in events:
             timestamp_str = f"{e.timestamp:.2f}"
             content = e.get_content()
 
             if e.type == "user_input":
-                script += f"[{timestamp_str}] User: {content}\n"
+                script_lines.append(f"[{timestamp_str}] User: {content}")
             elif e.type == "driver_response":
                 meta = e.meta
                 inner_voice = meta.get('inner_voice', 'N/A')
                 emotion = meta.get('user_emotion_detect', 'N/A')
-                script += f"[{timestamp_str}] Driver (Inner: {inner_voice}) [Detect: {emotion}]: {content}\n"
+                script_lines.append(f"[{timestamp_str}] Driver (Inner: {inner_voice}) [Detect: {emotion}]: {content}")
             elif e.type == "system_heartbeat":
-                 script += f"[{timestamp_str}] System: {content}\n"
+                script_lines.append(f"[{timestamp_str}] System: {content}")
+        script = "\n".join(script_lines)
 
         # 动态部分：长期记忆 + 最近日志
-        long_term_context = self.memory.get_relevant_long_term(
+        long_term_items = self.memory.get_relevant_long_term(
             query=script,
-            limit=10, 
+            limit=10,
             search_mode="hybrid"
         )
+        long_term_context = "\n".join(f"- {item}" for item in long_term_items)
 
         # 检索相关技能
         last_user_msg = ""
@@ -60,7 +63,15 @@ class Reasoner:
             if e.type == "user_input":
                 last_user_msg = e.get_content()
                 break
-        
+
+        # 话题记忆 (层级检索)
+        try:
+            topic_context = self.memory.get_hierarchical_context(last_user_msg or script)
+            if topic_context:
+                long_term_context = long_term_context + "\n" + topic_context
+        except Exception as e:
+            logger.warning(f"[Reasoner] 话题记忆检索失败: {e}")
+
         skill_info = ""
         if last_user_msg:
              skills = library_manager.search_skills(last_user_msg, top_k=3)
@@ -71,10 +82,23 @@ class Reasoner:
         
         # 强制注入 SLOW 级别的工具
         slow_tools_context = self.context_manager.get_slow_tools_context()
-        if slow_tools_context:
-            skill_info += slow_tools_context
-        
+
         static_system_prompt = self.context_manager.build_static_context()
+
+        # 按 token 预算裁剪: 交互日志保留最近的事件，长期记忆 / 技能 / 工具保留最相关的条目
+        if settings.PROMPT_BUDGET_ENABLED:
+            fitted = PromptBudget("navigator", provider=getattr(self.llm, "provider", None)).fit([
+                Section("script", script_lines, keep="last"),
+                Section.from_text("long_term", long_term_context),
+                Section.from_text("skills", skill_info),
+                Section.from_text("tools", slow_tools_context),
+            ], fixed=[static_system_prompt, NAVIGATOR_USER_PROMPT])
+            script = fitted["script"].text()
+            long_term_context = fitted["long_term"].text()
+            skill_info = fitted["skills"].text()
+            slow_tools_context = fitted["tools"].text()
+        if slow_tools_context:
+            skill_info += "\n" + slow_tools_context
         
         # 检测是否由 IdleTrigger 触发的特定意图
         idle_intent = None
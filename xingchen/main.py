@@ -1,17 +1,29 @@
 import sys
 import os
 import argparse
-import uvicorn
 from xingchen.app import app_context
 from xingchen.utils.logger import logger
+from xingchen.utils.startup_profiler import startup_profiler
 
 
-def start_cli():
+def initialize_app(profile: bool = False):
+    """初始化核心组件；profile=True 时打印各组件/模块的启动耗时树"""
+    if not profile:
+        app_context.initialize()
+        return
+    startup_profiler.enable()
+    try:
+        app_context.initialize()
+    finally:
+        print(startup_profiler.report(), flush=True)
+
+
+def start_cli(profile: bool = False):
     """启动调试 CLI 模式"""
     from xingchen.ui.cli import DebugCLI
     
     # 初始化核心组件
-    app_context.initialize()
+    initialize_app(profile)
     
     # 初始化 CLI 界面
     cli = DebugCLI()
@@ -25,15 +37,16 @@ def start_cli():
         app_context.shutdown()
 
 
-def start_web():
+def start_web(profile: bool = False):
     """启动 Web Server 模式"""
+    import uvicorn
     from xingchen.ui.web.app import create_web_app
     from xingchen.core.event_bus import event_bus
     from xingchen.schemas.events import EventType
     import asyncio
 
     # 初始化核心组件
-    app_context.initialize()
+    initialize_app(profile)
     
     # 创建 FastAPI 应用
     web_app = create_web_app()
@@ -79,6 +92,7 @@ def main():
     """启动器主入口"""
     parser = argparse.ArgumentParser(description="星辰-V (XingChen-V) 启动器")
     parser.add_argument("mode", nargs="?", choices=["cli", "web"], default="cli", help="启动模式 (cli 或 web)")
+    parser.add_argument("--profile-startup", action="store_true", help="打印核心组件初始化的耗时树 (组件 / 模块)")
     
     args = parser.parse_args()
     
@@ -86,9 +100,9 @@ def main():
     sys.path.append(os.getcwd())
     
     if args.mode == "web":
-        start_web()
+        start_web(profile=args.profile_startup)
     else:
-        start_cli()
+        start_cli(profile=args.profile_startup)
 
 
 if __name__ == "__main__":
@@ -6,7 +6,8 @@ import time
 from datetime import datetime, timedelta
 from xingchen.config.settings import settings
 from xingchen.utils.llm_client import LLMClient
-from xingchen.config.prompts import MEMORY_SUMMARY_PROMPT
+from xingchen.utils.llm_scheduler import Priority
+from xingchen.memory.services.consolidator import MemoryConsolidator
 from xingchen.utils.logger import logger
 
 
@@ -17,7 +18,8 @@ class DeepCleanManager:
     """
     def __init__(self, memory_service):
         self.memory_service = memory_service
-        self.llm = LLMClient(provider="deepseek") 
+        self.llm = LLMClient(provider="deepseek", priority=Priority.BACKGROUND) 
+        self.consolidator = MemoryConsolidator(memory_service, self.llm)
         self.running = False
         self.last_clean_time = None
         
@@ -77,12 +79,13 @@ class DeepCleanManager:
             except:
                 pass
 
-    def _save_state(self):
-        """保存维护时间"""
+    def _save_state(self, clean_time: datetime):
+        """保存维护时间 (同时刷新内存中的值，计时器据此判断今晚是否已执行)"""
+        self.last_clean_time = clean_time
         try:
             with open(self.state_path, 'w') as f:
                 json.dump({
-                    "last_clean_time": datetime.now().isoformat()
+                    "last_clean_time": clean_time.isoformat()
                 }, f)
         except:
             pass
@@ -118,19 +121,26 @@ class DeepCleanManager:
         if self.running: return
         
         self.running = True
+        started_at = datetime.now()
         logger.info(f"[DeepClean] 🧹 Starting deep maintenance ({trigger_type})...")
         
         try:
-            # 1. 记忆压缩 (对最近 24 小时的长期记忆进行整合)
+            # 1. 记忆整合 (最近的长期记忆按话题聚类，逐簇摘要替换)
             self._consolidate_memories()
             
-            # 2. 冷热分离 (将旧的、低频的原始记忆移入 SQLite 冷存储)
+            # 2. 近重复合并 (补建索引并合并 LLM 反复写入的改写版本)
+            self._dedupe_knowledge()
+
+            # 3. 冷热分离 (将旧的、低频的原始记忆移入 SQLite 冷存储)
             self._archive_old_memories()
             
-            # 3. 性格基准线修正 (根据日积月累的情绪波动永久性修正 Baseline)
+            # 4. 图谱维护 (边权重衰减、低权重边归档、孤立节点清理)
+            self._maintain_graph()
+            
+            # 5. 性格基准线修正 (根据日积月累的情绪波动永久性修正 Baseline)
             # 这部分通常在 Navigator.analyze_cycle 中触发增量，此处做大周期的整体归档
 
-            self._save_state()
+            self._save_state(started_at)
             logger.info("[DeepClean] ✨ Deep maintenance complete.")
             
         except Exception as e:
@@ -139,27 +149,26 @@ class DeepCleanManager:
             self.running = False
 
     def _consolidate_memories(self):
-        """整合长期记忆 (整合冗余 Facts)"""
-        long_term = self.memory_service.long_term
-        if len(long_term) < 50: return # 数量太少不整合
-        
-        # 1. 获取最近 24 小时或最近 50 条记忆
-        recent_mems = long_term[-50:]
-        context_str = "\n".join([f"- {m.content}" for m in recent_mems])
-        
-        # 2. 调用 LLM 整合
-        prompt = MEMORY_SUMMARY_PROMPT.format(context=context_str)
-        response_obj = self.llm.chat([{"role": "user", "content": prompt}])
-        
-        if response_obj:
-            summary = response_obj.content
-            if summary and len(summary) > 10:
-                logger.info("[DeepClean] ✅ Memories consolidated.")
-                # 将整合后的摘要存回长期记忆 (标记为 summary 类型)
-                self.memory_service.add_long_term(f"[Summary] {summary}", category="summary")
+        """整合长期记忆: 先按相似度预聚类，再逐簇并发摘要，摘要替换原条目，原条目移入冷存储"""
+        stats = self.consolidator.consolidate(archive_db_path=self.archive_db_path)
+        if stats.get("replaced"):
+            logger.info(f"[DeepClean] ✅ Memories consolidated: {stats['replaced']} -> {stats['added']}")
+
+    def _dedupe_knowledge(self):
+        """知识近重复合并 (存量数据首次执行时完成回填，之后只处理新增的未索引条目)"""
+        stats = self.memory_service.dedupe_knowledge()
+        if stats.get("merged"):
+            logger.info(f"[DeepClean] 🔗 合并了 {stats['merged']} 条近重复知识")
+
+    def _maintain_graph(self):
+        """知识图谱维护: 只衰减上次维护之后流逝的时间"""
+        self.memory_service.knowledge_db.run_graph_maintenance(
+            archive_db_path=self.archive_db_path,
+            since=self.last_clean_time
+        )
 
     def _archive_old_memories(self):
-        """将旧记忆移入冷存储 (SQLite)"""
-        # 示例：保留最近 1000 条在 ChromaDB/JSON，其他的移入 SQLite
-        # 此处简化实现，实际生产需更复杂的 LRU 策略
-        pass
+        """冷热分层: 按访问频次、新近度与置信度打分，热层超限时把最低分的知识移入 archive.db"""
+        stats = self.memory_service.run_memory_tiering(archive_db_path=self.archive_db_path)
+        if stats.get("archived"):
+            logger.info(f"[DeepClean] 🧊 {stats['archived']} 条低频记忆已移入冷存储 (热层 {stats['hot_after']} 条)")
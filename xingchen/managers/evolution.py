@@ -4,6 +4,7 @@ import time
 import json
 from typing import Optional
 from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.llm_scheduler import Priority
 from xingchen.config.prompts import EVOLUTION_SYSTEM_PROMPT
 from .library import library_manager
 from xingchen.tools.registry import tool_registry
@@ -29,7 +30,7 @@ class EvolutionManager:
         
     def _get_llm(self):
         if not self.llm_client:
-            self.llm_client = LLMClient()
+            self.llm_client = LLMClient(priority=Priority.BACKGROUND)
         return self.llm_client
 
     def process_request(self, request: str, memory=None):
@@ -1,4 +1,3 @@
-import docker
 import os
 import time
 from typing import Dict, Any, Optional
@@ -18,6 +17,8 @@ class Sandbox:
         self.containers = {} # container_id -> info
         
         try:
+            # docker SDK 为可选依赖，沙箱实例化时才导入
+            import docker
             self.client = docker.from_env()
             logger.info("[Sandbox] Docker client initialized.")
         except Exception as e:
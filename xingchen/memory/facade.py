@@ -1,4 +1,4 @@
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List
 from xingchen.memory.storage.vector import ChromaStorage
 from xingchen.memory.storage.local import JsonStorage
 from xingchen.memory.storage.diary import DiaryStorage
@@ -8,6 +8,8 @@ from xingchen.memory.wal import WriteAheadLog
 from xingchen.memory.service import MemoryService
 from xingchen.config.settings import settings
 from xingchen.utils.logger import logger
+from xingchen.utils.readiness import Readiness
+from xingchen.utils.snapshot import startup_snapshot
 from xingchen.core.event_bus import event_bus
 from xingchen.schemas.events import BaseEvent as Event
 
@@ -20,10 +22,16 @@ class Memory:
                  storage_path=None, 
                  vector_db_path=None, 
                  diary_path=None,
-                 graph_path=None):
+                 graph_path=None,
+                 warm_up=True):
+        """
+        :param warm_up: False 时只完成首轮回复必需的部分 (短期记忆、长期记忆缓存)，
+                        向量库、别名缓存、话题索引与 WAL 重放通过 warm_up_tasks() 交给后台并行预热
+        """
+        self.background_warmup = not warm_up
         
         # 使用 settings 中的默认值，如果未提供参数
-        self.vector_storage = ChromaStorage(vector_db_path or settings.VECTOR_DB_PATH)
+        self.vector_storage = ChromaStorage(vector_db_path or settings.VECTOR_DB_PATH, connect=warm_up)
         self.json_storage = JsonStorage(storage_path or settings.MEMORY_STORAGE_PATH)
         self.diary_storage = DiaryStorage(diary_path or settings.DIARY_PATH)
         self.graph_storage = GraphMemory(graph_path)
@@ -32,7 +40,7 @@ class Memory:
         self.wal = WriteAheadLog()
         
         # MemoryService 会自动初始化 KnowledgeDB 单例
-        self.service = MemoryService(self.vector_storage, self.json_storage, self.diary_storage)
+        self.service = MemoryService(self.vector_storage, self.json_storage, self.diary_storage, warm_up=warm_up)
         
         self.navigator = None
         
@@ -40,7 +48,43 @@ class Memory:
         event_bus.subscribe(self._on_event)
         
         # 启动时重放 WAL，恢复未提交的数据
-        self._replay_wal()
+        self.wal_readiness = Readiness("wal")
+        if warm_up:
+            self.wal_readiness.run(self._replay_wal)
+
+        # 派生内存索引的启动快照: 周期写盘，关闭时再写一次
+        startup_snapshot.start_autosave()
+
+    @property
+    def readiness(self) -> Dict[str, Readiness]:
+        return {
+            "vector": self.vector_storage.readiness,
+            "alias_cache": self.service.alias_readiness,
+            "topics": self.service.topic_readiness,
+            "wal": self.wal_readiness,
+        }
+
+    def is_ready(self, name: str) -> bool:
+        """组件是否可用；同步初始化时一律视为可用 (未预热的部分在首次使用时按需加载)"""
+        return not self.background_warmup or self.readiness[name].is_ready
+
+    def warm_up_tasks(self) -> Dict[str, Callable[[], None]]:
+        """后台预热任务 (彼此独立，可并行执行)"""
+        return {
+            "vector": self._warm_vector,
+            "alias_cache": self.service.warm_alias_cache,
+            "topics": self._warm_topics,
+            "wal": lambda: self.wal_readiness.run(self._replay_wal),
+        }
+
+    def _warm_topics(self):
+        # TopicManager 有独立的 Chroma 客户端；chromadb 不能在多个线程中同时首次导入，等向量库先完成导入
+        self.vector_storage.readiness.wait()
+        self.service.warm_topics()
+
+    def _warm_vector(self):
+        if self.vector_storage.connect():
+            self.service.start_vector_indexer()
 
     def _on_event(self, event):
         """处理事件总线消息"""
@@ -100,6 +144,12 @@ class Memory:
     def search_alias(self, query, limit=None):
         return self.service.search_alias(query, limit)
 
+    def get_activated_context(self, query, top_n=None):
+        return self.service.get_activated_context(query, top_n)
+
+    def get_hierarchical_context(self, query, limit=None, cold_load=True):
+        return self.service.get_hierarchical_context(query, limit, cold_load)
+
     def get_relevant_long_term(self, query=None, limit=None, search_mode="keyword"):
         return self.service.get_relevant_long_term(query, limit, search_mode)
 
@@ -120,6 +170,19 @@ class Memory:
     def save_cache(self):
         self.service.save_cache()
 
+    def get_index_stats(self):
+        return self.service.get_index_stats()
+
+    def get_embedding_stats(self):
+        return self.service.get_embedding_stats()
+
+    def get_tier_stats(self):
+        return self.service.get_tier_stats()
+
+    def close(self):
+        self.service.close()
+        startup_snapshot.shutdown()
+
     def commit_long_term(self):
         self.service.commit_long_term()
         # 成功保存后清理 WAL
@@ -3,20 +3,36 @@ import os
 from datetime import datetime
 from typing import List, Dict, Optional
 from xingchen.memory.models import ShortTermMemoryEntry, LongTermMemoryEntry
+from xingchen.memory.storage.knowledge.activation import SpreadingActivation
+from xingchen.memory.services.retriever import HybridRetriever
+from xingchen.memory.services.vector_indexer import VectorIndexer
 from xingchen.config.settings import settings
 from xingchen.utils.logger import logger
+from xingchen.utils.readiness import Readiness
+from xingchen.utils.snapshot import startup_snapshot
 
 class MemoryService:
     """
     记忆服务层
     整合 Vector, Json, Diary 存储，提供统一的记忆操作逻辑
     """
-    def __init__(self, vector_storage, json_storage, diary_storage, knowledge_db=None):
+    def __init__(self, vector_storage, json_storage, diary_storage, knowledge_db=None, warm_up=True):
+        """
+        :param warm_up: False 时跳过可以放到后台的预热 (向量索引线程、别名缓存)，
+                        由调用方稍后调用 start_vector_indexer() / warm_alias_cache()
+        """
         self.vector_storage = vector_storage
         self.json_storage = json_storage
         self.diary_storage = diary_storage
         from xingchen.memory.storage.knowledge_db import knowledge_db as kdb
         self.knowledge_db = knowledge_db or kdb
+        self.retriever = HybridRetriever(self.knowledge_db, self.vector_storage)
+        # 层级检索器在首次使用时创建 (依赖 TopicManager 单例)
+        self._hierarchical_retriever = None
+
+        self.vector_indexer = None
+        self.alias_readiness = Readiness("alias_cache")
+        self.topic_readiness = Readiness("topics")
 
         # 优先加载缓存的未归档记忆，然后是空的列表
         self.short_term: List[ShortTermMemoryEntry] = self._load_cache()
@@ -27,52 +43,119 @@ class MemoryService:
         self._long_term_dirty = False
         self._short_term_dirty = False
 
-        # 1. 优先从 KnowledgeDB 加载长期记忆 (作为新的真相源)
-        self.long_term = []
+        # 1. 优先从 KnowledgeDB 加载长期记忆 (作为新的真相源；启动快照未过期时直接恢复)
+        self.long_term = self._load_long_term()
+        
+        self.last_diary_time = datetime.now()
+
+        # Alias cache for fast substring matching
+        self._alias_cache: Dict[str, str] = {}
+        if warm_up:
+            self.start_vector_indexer()
+            self.warm_alias_cache()
+
+        # 派生缓存登记到启动快照 (周期保存与关闭时写盘)
+        startup_snapshot.register("long_term", lambda: self.knowledge_db.snapshot_stamp("knowledge"),
+                                  lambda: self._build_snapshot_section(["knowledge"], self._read_long_term_rows))
+        startup_snapshot.register("alias_cache", lambda: self.knowledge_db.snapshot_stamp("entities"),
+                                  lambda: self._build_snapshot_section(["entities"], self._read_alias_cache))
+        startup_snapshot.register("graph", lambda: self.knowledge_db.snapshot_stamp("graph"),
+                                  self.knowledge_db.build_graph_snapshot)
+
+    def start_vector_indexer(self):
+        """后台向量索引: 检查点与向量库放在一起，向量库被清空时会自动全量重建 (向量库就绪后调用)"""
+        if self.vector_indexer or not self.vector_storage.is_available():
+            return
+        self.vector_indexer = VectorIndexer(
+            self.knowledge_db,
+            self.vector_storage,
+            checkpoint_path=self.vector_storage.index_checkpoint_path
+        )
+        self.vector_indexer.start()
+
+    def warm_alias_cache(self):
+        self.alias_readiness.run(self._load_alias_cache)
+
+    def warm_topics(self):
+        """创建层级检索器并预加载最近活跃话题的片段向量"""
+        def warm():
+            retriever = self._get_hierarchical_retriever()
+            logger.info(f"[Memory] 话题片段预加载 {retriever.warm()} 条。")
+        self.topic_readiness.run(warm)
+
+    def _get_hierarchical_retriever(self):
+        # 层级检索器依赖 TopicManager 单例 (独立的 Chroma 客户端)，首次使用时创建
+        if self._hierarchical_retriever is None:
+            from xingchen.memory.storage.topic_manager import topic_manager
+            from xingchen.memory.services.hierarchical_retriever import HierarchicalRetriever
+            self._hierarchical_retriever = HierarchicalRetriever(topic_manager)
+        return self._hierarchical_retriever
+
+    def _build_snapshot_section(self, names, read_fn):
+        result = self.knowledge_db.build_versioned(names, read_fn)
+        return None if result is None else (result[0], result[1], None)
+
+    def _read_long_term_rows(self) -> List[Dict]:
+        """从 KnowledgeDB 读取最近的长期记忆 (字段与 LongTermMemoryEntry 一致)"""
+        rows = []
+        for item in self.knowledge_db.get_knowledge(limit=1000):
+            meta = item.get("meta") or {}
+            if isinstance(meta, str):
+                try:
+                    meta = json.loads(meta)
+                except:
+                    meta = {}
+            rows.append({
+                "content": item.get("content", ""),
+                "category": item.get("category", "fact"),
+                "created_at": item.get("created_at") or datetime.now().isoformat(),
+                "metadata": meta,
+                "emotional_tag": meta.get("emotional_tag", {}),
+            })
+        return rows
+
+    def _load_long_term(self) -> List[LongTermMemoryEntry]:
         try:
-            db_knowledge = self.knowledge_db.get_knowledge(limit=1000)
-            for item in db_knowledge:
-                meta = item.get("meta") or {}
-                if isinstance(meta, str):
-                    try:
-                        meta = json.loads(meta)
-                    except:
-                        meta = {}
-                self.long_term.append(LongTermMemoryEntry(
-                    content=item.get("content", ""),
-                    category=item.get("category", "fact"),
-                    created_at=item.get("created_at", datetime.now().isoformat()),
-                    metadata=meta,
-                    emotional_tag=meta.get("emotional_tag", {})
-                ))
-            logger.info(f"[Memory] 从 KnowledgeDB 加载了 {len(self.long_term)} 条长期记忆。")
+            cached = startup_snapshot.load("long_term", self.knowledge_db.snapshot_stamp("knowledge"))
+            if cached is not None:
+                # 快照中的数据写入前已校验过，跳过 pydantic 校验
+                long_term = [LongTermMemoryEntry.model_construct(**row) for row in cached[0]]
+                logger.info(f"[Memory] 从启动快照恢复了 {len(long_term)} 条长期记忆。")
+                return long_term
+            long_term = [LongTermMemoryEntry(**row) for row in self._read_long_term_rows()]
+            logger.info(f"[Memory] 从 KnowledgeDB 加载了 {len(long_term)} 条长期记忆。")
+            return long_term
         except Exception as e:
             logger.error(f"[Memory] 从 KnowledgeDB 加载失败: {e}")
-            raw_long_term = self.json_storage.load()
-            for item in raw_long_term:
+            long_term = []
+            for item in self.json_storage.load():
                 if isinstance(item, dict):
-                    self.long_term.append(LongTermMemoryEntry(
+                    long_term.append(LongTermMemoryEntry(
                         content=item.get("content", ""),
                         category=item.get("category", "fact")
                     ))
-        
-        self.last_diary_time = datetime.now()
+            return long_term
 
-        # Alias cache for fast substring matching
-        self._alias_cache: Dict[str, str] = {}
-        self._load_alias_cache()
+    def _read_alias_cache(self) -> Dict[str, str]:
+        alias_cache = {}
+        for entity in self.knowledge_db.get_all_entities():
+            name = entity['name']
+            alias_cache[name] = name
+            aliases = entity.get('aliases', []) or []
+            for alias in aliases:
+                if alias:
+                    alias_cache[alias.strip()] = name
+        return alias_cache
 
     def _load_alias_cache(self):
-        """一次性加载所有别名到内存缓存中。"""
+        """一次性加载所有别名到内存缓存中 (启动快照未过期时直接恢复)。"""
         try:
-            all_entities = self.knowledge_db.get_all_entities()
-            for entity in all_entities:
-                name = entity['name']
-                self._alias_cache[name] = name
-                aliases = entity.get('aliases', []) or []
-                for alias in aliases:
-                    if alias:
-                        self._alias_cache[alias.strip()] = name
+            cached = startup_snapshot.load("alias_cache", self.knowledge_db.snapshot_stamp("entities"))
+            if cached is not None:
+                self._alias_cache.update(cached[0])
+                logger.info(f"[Memory] 别名缓存从启动快照恢复，共 {len(self._alias_cache)} 条记录。")
+                return
+            self._alias_cache.update(self._read_alias_cache())
             logger.info(f"[Memory] 别名缓存加载完成，共 {len(self._alias_cache)} 条记录。")
         except Exception as e:
             logger.warning(f"[Memory] 别名缓存加载失败: {e}")
@@ -101,18 +184,22 @@ class MemoryService:
         except Exception as e:
             logger.error(f"[Memory] 别名存储失败: {e}", exc_info=True)
 
+    def _match_aliases(self, query):
+        """在查询中查找所有命中的别名，按别名长度降序"""
+        matches = []
+        for alias, target in self._alias_cache.items():
+            if alias and alias in query:
+                matches.append((alias, target, len(alias)))
+        matches.sort(key=lambda x: x[2], reverse=True)
+        return matches
+
     def search_alias(self, query, limit=None):
         if not query:
             return None
 
         try:
-            matches = []
-            for alias, target in self._alias_cache.items():
-                if alias and alias in query:
-                    matches.append((alias, target, len(alias)))
-
+            matches = self._match_aliases(query)
             if matches:
-                matches.sort(key=lambda x: x[2], reverse=True)
                 best = matches[0]
                 return (best[0], best[1], 1.0)
         except Exception as e:
@@ -120,32 +207,173 @@ class MemoryService:
 
         return None
 
+    def get_activated_context(self, query: str, top_n: int = None) -> str:
+        """
+        图谱联想: 以查询中出现的实体 (含别名解析) 为种子做扩散激活，
+        返回激活度最高的节点与关系的文本描述
+        """
+        if not query:
+            return ""
+        if top_n is None: top_n = settings.SPREADING_ACTIVATION_TOP_N
+
+        index = self.knowledge_db.get_graph_index()
+        seeds = index.find_nodes_in_text(query)
+        for _alias, target, _ in self._match_aliases(query):
+            if target not in seeds:
+                seeds.append(target)
+        if not seeds:
+            return ""
+
+        engine = SpreadingActivation(
+            index,
+            steps=settings.SPREADING_ACTIVATION_STEPS,
+            decay=settings.SPREADING_ACTIVATION_DECAY,
+            threshold=settings.SPREADING_ACTIVATION_THRESHOLD,
+            min_weight=settings.SPREADING_ACTIVATION_MIN_WEIGHT,
+            budget_ms=settings.SPREADING_ACTIVATION_BUDGET_MS,
+        )
+        result = engine.activate(seeds, top_n=top_n)
+        if not result["nodes"] and not result["edges"]:
+            return ""
+
+        logger.debug(f"[Memory] 扩散激活: 种子 {result['seeds']}，耗时 {result['elapsed_ms']:.2f}ms")
+        lines = ["【联想激活 (Spreading Activation)】:"]
+        if result["nodes"]:
+            lines.append("- 联想到: " + ", ".join(f"{n['name']}({n['activation']:.2f})" for n in result["nodes"]))
+        for edge in result["edges"]:
+            lines.append(f"- {edge['source']} --[{edge['relation']}]--> {edge['target']}")
+        return "\n".join(lines)
+
+    def get_hierarchical_context(self, query: str, limit: int = None, cold_load: bool = True) -> str:
+        """
+        话题记忆: 沿 Topic → Task → Fragment 由粗到细检索片段，返回带话题/任务标注的文本
+        :param cold_load: False 时 (交互路径) 不同步加载未缓存的话题片段，本轮退化为全量检索
+        """
+        if not query:
+            return ""
+        try:
+            results = self._get_hierarchical_retriever().retrieve(query, limit=limit, cold_load=cold_load)
+        except Exception as e:
+            logger.warning(f"[Memory] 层级检索失败: {e}")
+            return ""
+        if not results:
+            return ""
+
+        lines = ["【话题记忆 (Topic Memory)】:"]
+        for item in results:
+            label = "/".join(x for x in (item["topic"], item["task"]) if x)
+            lines.append(f"- [{label}] {item['document']}" if label else f"- {item['document']}")
+        return "\n".join(lines)
+
     def search_long_term(self, query: str, limit: int = 5) -> List[LongTermMemoryEntry]:
         """
-        搜索长期记忆 (结合知识库搜索与向量搜索)
+        搜索长期记忆 (词法召回与向量召回并发执行，RRF 融合；向量库不可用时仅词法)
         """
-        # 1. 知识库搜索
-        results = self.knowledge_db.search_knowledge(query, limit=limit)
-        
-        entries = []
+        results = self.retriever.retrieve(query, limit=limit)
+        self._adopt_promoted(results)
+        return [self._to_long_term_entry(item) for item in results]
+
+    def _adopt_promoted(self, results: List[Dict]):
+        """从冷层回迁的条目重新进入长期记忆缓存；回迁后换了新 id，重新交给后台索引"""
+        cached = None
         for item in results:
-            meta = item.get("meta") or {}
-            if isinstance(meta, str):
-                try:
-                    meta = json.loads(meta)
-                except:
-                    meta = {}
-            entries.append(LongTermMemoryEntry(
-                content=item.get("content", ""),
-                category=item.get("category", "fact"),
-                created_at=item.get("created_at", datetime.now().isoformat()),
-                metadata=meta,
-                emotional_tag=meta.get("emotional_tag", {})
-            ))
-            
-        # 2. 如果结果不足，补充向量搜索 (TODO)
-        
-        return entries
+            if not item.get("promoted"):
+                continue
+            if cached is None:
+                cached = {e.content for e in self.long_term}
+            if item.get("content") not in cached:
+                self.long_term.append(self._to_long_term_entry(item))
+                cached.add(item.get("content"))
+                self._long_term_dirty = True
+            if self.vector_indexer:
+                self.vector_indexer.enqueue(item["id"], item.get("content", ""), item.get("category", "fact"))
+
+    def run_memory_tiering(self, archive_db_path: str = None) -> Dict:
+        """冷热分层: 热层超出容量时把留存得分最低的知识移入冷存储，并删除其向量"""
+        stats = self.knowledge_db.run_memory_tiering(archive_db_path=archive_db_path)
+        archived_ids = stats.pop("archived_ids", [])
+        self._drop_long_term(stats.pop("archived_contents", []))
+        if archived_ids and self.vector_storage.is_available():
+            try:
+                self.vector_storage.delete_memories([f"ltm_{i}" for i in archived_ids])
+            except Exception as e:
+                logger.warning(f"[Memory] 删除已归档条目的向量失败: {e}")
+        return stats
+
+    def dedupe_knowledge(self) -> Dict:
+        """为存量知识补建近重复索引并合并近重复条目，删除被合并条目的向量"""
+        stats = self.knowledge_db.backfill_near_duplicates()
+        merged_ids = stats.pop("merged_ids", [])
+        self._drop_long_term(stats.pop("merged_contents", []))
+        if merged_ids and self.vector_storage.is_available():
+            try:
+                self.vector_storage.delete_memories([f"ltm_{i}" for i in merged_ids])
+            except Exception as e:
+                logger.warning(f"[Memory] 删除已合并条目的向量失败: {e}")
+        return stats
+
+    def replace_long_term(self, knowledge_ids: List[int], contents: List[str], category: str = "fact",
+                          archive_db_path: str = None) -> Dict:
+        """
+        用摘要替换一组长期记忆: 写入摘要，把原始条目移入冷存储并删除其向量
+        摘要与某条原文近重复时会并入该条目，该条目保留在热层
+        :return: {"added_ids", "archived"}
+        """
+        meta = {"consolidated_from": list(knowledge_ids)}
+        added_ids = []
+        for content in contents:
+            knowledge_id, created = self.knowledge_db.upsert_knowledge(content=content, category=category,
+                                                                       source="consolidation", meta=meta)
+            if knowledge_id in added_ids:
+                continue
+            added_ids.append(knowledge_id)
+            if not created:
+                continue
+            self.long_term.append(LongTermMemoryEntry(content=content, category=category, metadata=meta))
+            if self.vector_indexer:
+                self.vector_indexer.enqueue(knowledge_id, content, category)
+
+        originals = self.knowledge_db.get_knowledge_by_ids([i for i in knowledge_ids if i not in added_ids])
+        stats = self.knowledge_db.archive_knowledge([item["id"] for item in originals], archive_db_path=archive_db_path)
+        archived_ids = stats.get("archived_ids", [])
+        if archived_ids and self.vector_storage.is_available():
+            try:
+                self.vector_storage.delete_memories([f"ltm_{i}" for i in archived_ids])
+            except Exception as e:
+                logger.warning(f"[Memory] 删除已整合条目的向量失败: {e}")
+
+        self._drop_long_term([item["content"] for item in originals if item["id"] in set(archived_ids)])
+        return {"added_ids": added_ids, "archived": stats.get("archived", 0)}
+
+    def _drop_long_term(self, contents: List[str]):
+        """从长期记忆缓存中移除已离开热层 (归档/合并) 的条目"""
+        removed = set(contents)
+        if removed:
+            self.long_term = [e for e in self.long_term if e.content not in removed]
+            self._long_term_dirty = True
+
+    def get_tier_stats(self) -> Dict:
+        """各层条数、文件大小与检索延迟"""
+        stats = self.knowledge_db.get_tier_stats()
+        for tier, latency in self.retriever.tier_latency().items():
+            stats.setdefault(tier, {})["latency"] = latency
+        return stats
+
+    @staticmethod
+    def _to_long_term_entry(item: Dict) -> LongTermMemoryEntry:
+        meta = item.get("meta") or {}
+        if isinstance(meta, str):
+            try:
+                meta = json.loads(meta)
+            except:
+                meta = {}
+        return LongTermMemoryEntry(
+            content=item.get("content", ""),
+            category=item.get("category", "fact"),
+            created_at=item.get("created_at", datetime.now().isoformat()),
+            metadata=meta,
+            emotional_tag=meta.get("emotional_tag", {})
+        )
 
     def write_diary_entry(self, content):
         self.diary_storage.append(content)
@@ -158,6 +386,10 @@ class MemoryService:
         
         if len(self.short_term) > settings.SHORT_TERM_MAX_COUNT:
             self.short_term.pop(0)
+        # 总字符数上限: 从最早的条目开始移出 (至少保留刚写入的一条)
+        total_chars = sum(len(e.content or "") for e in self.short_term)
+        while total_chars > settings.SHORT_TERM_MAX_CHARS and len(self.short_term) > 1:
+            total_chars -= len(self.short_term.pop(0).content or "")
     
     def clear_short_term(self):
         self.short_term = []
@@ -173,11 +405,18 @@ class MemoryService:
         
         matched_entries: List[LongTermMemoryEntry] = []
         
-        if query:
+        if query and search_mode == "hybrid":
+            matched_entries = self.search_long_term(query, limit=limit)
+        elif query:
             query_lower = query.lower()
             for entry in self.long_term:
                 if query_lower in entry.content.lower():
                     matched_entries.append(entry)
+            if not matched_entries:
+                # 热层未命中时查冷存储，命中的条目回迁热层
+                results = self.retriever.retrieve_archive(query, limit=limit)
+                self._adopt_promoted(results)
+                matched_entries = [self._to_long_term_entry(item) for item in results]
         
         # 触景生情
         from xingchen.psyche import psyche_engine
@@ -197,14 +436,18 @@ class MemoryService:
         if not content: return
         
         # 写入 KnowledgeDB (持久化源)
+        knowledge_id, created = None, True
         try:
-            self.knowledge_db.add_knowledge(
+            knowledge_id, created = self.knowledge_db.upsert_knowledge(
                 content=content,
                 category=category,
                 meta=meta
             )
         except Exception as e:
             logger.error(f"[Memory] 写入 KnowledgeDB 失败: {e}")
+        if not created:
+            # 重复或并入了已有条目: 缓存与向量保持已有条目的原文，不用新改写覆盖
+            return None
 
         # 更新内存缓存
         entry = LongTermMemoryEntry(
@@ -216,9 +459,31 @@ class MemoryService:
         self.long_term.append(entry)
         self._long_term_dirty = True
         
-        # 异步推送到向量数据库 (TODO)
+        # 交给后台索引线程批量嵌入，写入路径不等待模型
+        if self.vector_indexer and knowledge_id:
+            self.vector_indexer.enqueue(knowledge_id, content, category)
         return entry
 
+    def get_index_stats(self) -> Dict:
+        """向量索引滞后等指标 (向量库不可用时为空)"""
+        return self.vector_indexer.stats() if self.vector_indexer else {}
+
+    def get_embedding_stats(self) -> Dict:
+        """嵌入缓存命中率与嵌入耗时"""
+        embedding_function = getattr(self.vector_storage, "embedding_function", None)
+        return embedding_function.stats() if hasattr(embedding_function, "stats") else {}
+
+    def flush_vector_index(self, timeout: float = 10.0) -> bool:
+        """等待已写入的长期记忆全部进入向量库"""
+        if not self.vector_indexer:
+            return True
+        return self.vector_indexer.flush(timeout=timeout)
+
+    def close(self):
+        """停止后台任务 (尽量先把索引队列处理完)"""
+        if self.vector_indexer:
+            self.vector_indexer.stop(flush=True)
+
     def save_cache(self):
         if self._short_term_dirty:
             self._save_cache(self.short_term)
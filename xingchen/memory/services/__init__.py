@@ -1,4 +1,20 @@
-from .auto_classifier import auto_classifier, AutoClassifier
-from .orchestrator import orchestrator, MemoryOrchestrator
+from .retriever import HybridRetriever
+from .hierarchical_retriever import HierarchicalRetriever
+from .consolidator import MemoryConsolidator
 
-__all__ = ["auto_classifier", "AutoClassifier", "orchestrator", "MemoryOrchestrator"]
+__all__ = ["auto_classifier", "AutoClassifier", "orchestrator", "MemoryOrchestrator", "HybridRetriever", "HierarchicalRetriever", "MemoryConsolidator"]
+
+# 自动分类与编排依赖 TopicManager (chromadb 导入约 1s)，按需导入
+_LAZY = {
+    "auto_classifier": ".auto_classifier",
+    "AutoClassifier": ".auto_classifier",
+    "orchestrator": ".orchestrator",
+    "MemoryOrchestrator": ".orchestrator",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
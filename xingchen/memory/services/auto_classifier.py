@@ -2,11 +2,17 @@
 自动分类器 (Auto Classifier)
 使用 LLM (S-Brain DeepSeek) 自动将对话/记忆归类到话题
 """
+import atexit
 from typing import List, Dict, Optional, Tuple
+import numpy as np
+from xingchen.config.settings import settings
 from xingchen.utils.llm_client import LLMClient
+from xingchen.utils.llm_scheduler import Priority
 from xingchen.utils.logger import logger
 from xingchen.utils.json_parser import extract_json
 from xingchen.memory.storage.topic_manager import topic_manager
+from xingchen.memory.storage.embedding_cache import resolve_collection
+from xingchen.memory.services.topic_centroids import TopicCentroids, load_calibration
 from xingchen.config.prompts import MEMORY_CLASSIFY_PROMPT
 from xingchen.utils.proxy import lazy_proxy
 
@@ -14,7 +20,8 @@ from xingchen.utils.proxy import lazy_proxy
 class AutoClassifier:
     """
     自动分类器
-    使用 LLM 自动将对话归类到话题
+    两级分类: 先与话题质心比对，相似度足够明确时直接归类 (快速通道)；
+    否则调用 LLM，并用其结果更新质心
     """
     
     def __init__(self, llm_provider: str = "deepseek"):
@@ -22,8 +29,12 @@ class AutoClassifier:
         初始化分类器
         :param llm_provider: LLM 提供商 (默认使用 S脑 DeepSeek)
         """
-        self.llm = LLMClient(provider=llm_provider)
+        self.llm = LLMClient(provider=llm_provider, priority=Priority.BACKGROUND)
         self.topic_manager = topic_manager
+        self.fast_hits = 0
+        self.llm_calls = 0
+        self._centroids: Optional[TopicCentroids] = None
+        self._thresholds: Optional[Dict] = None
         logger.info(f"[AutoClassifier] Initialized with {llm_provider} LLM")
     
     def classify(self, content: str, auto_create: bool = True) -> Dict:
@@ -32,8 +43,16 @@ class AutoClassifier:
         
         :param content: 待分类的内容
         :param auto_create: 是否自动创建新话题
-        :return: 分类结果 {topic_id, task_id, is_new, confidence}
+        :return: 分类结果 {topic_id, task_id, is_new, confidence, source}
         """
+        vector = self._embed(content)
+        if vector is not None:
+            fast = self._fast_classify(vector)
+            if fast:
+                self.fast_hits += 1
+                return fast
+
+        self.llm_calls += 1
         # 获取现有话题列表
         existing_topics = self._get_existing_topics_str()
         
@@ -46,7 +65,8 @@ class AutoClassifier:
         # 调用 LLM
         logger.debug(f"[AutoClassifier] Calling LLM to classify: {content[:50]}...")
         try:
-            response_obj = self.llm.chat([{"role": "user", "content": prompt}], temperature=0.3)
+            response_obj = self.llm.chat([{"role": "user", "content": prompt}], temperature=0.3, cache="auto_classifier",
+                                         validate=lambda m: bool(extract_json(m.content)))
             response = response_obj.content if response_obj else None
             
             if not response:
@@ -61,31 +81,100 @@ class AutoClassifier:
             
             # 处理分类结果
             classification = self._process_classification(result, auto_create)
+            if vector is not None and classification.get("topic_id"):
+                self._learn(vector, classification)
             return classification
             
         except Exception as e:
             logger.error(f"[AutoClassifier] 分类出错: {e}", exc_info=True)
             return self._default_result()
 
-    def _get_existing_topics_str(self) -> str:
-        """获取现有话题列表的字符串表示"""
+    def _embed(self, content: str) -> Optional[np.ndarray]:
+        """与片段集合同一向量空间的内容向量 (失败时返回 None，直接走 LLM)"""
+        if not settings.CLASSIFY_FAST_PATH_ENABLED:
+            return None
         try:
-            stats = self.topic_manager.get_stats()
-            if stats["topics"] == 0:
-                return ""
-            
-            # 获取所有话题
-            topics = self.topic_manager.search_topics("", limit=50)
-            
-            if not topics:
-                return ""
-            
-            lines = []
-            for t in topics:
-                name = t['metadata'].get("name", "未知")
-                lines.append(f"- {name}")
-            
-            return "\n".join(lines)
+            embedding_function = resolve_collection("fragments")[1]
+            return np.asarray(embedding_function([content[:2000]])[0], dtype=np.float32)
+        except Exception as e:
+            logger.debug(f"[AutoClassifier] 内容向量计算失败，跳过快速通道: {e}")
+            return None
+
+    def _get_centroids(self) -> Optional[TopicCentroids]:
+        """加载话题质心；没有质心文件时从已存储的片段向量重建"""
+        if self._centroids is None:
+            try:
+                centroids = TopicCentroids(settings.CLASSIFY_CENTROIDS_PATH, space=resolve_collection("fragments")[0])
+                if not centroids.load():
+                    names = {t["id"]: t["name"] for t in self.topic_manager.list_topics()}
+                    added = centroids.build_from_fragments(self.topic_manager.fragments, names)
+                    centroids.save()
+                    logger.info(f"[AutoClassifier] 已从 {added} 条片段重建 {len(centroids)} 个话题质心")
+                self._centroids = centroids
+                atexit.register(centroids.flush)
+            except Exception as e:
+                logger.warning(f"[AutoClassifier] 话题质心不可用，快速通道关闭: {e}")
+                return None
+        return self._centroids
+
+    def _fast_classify(self, vector: np.ndarray) -> Optional[Dict]:
+        """质心快速通道: top1 相似度达标且明显领先第二名时直接归类 (需先离线校准阈值)"""
+        centroids = self._get_centroids()
+        if centroids is None:
+            return None
+        if self._thresholds is None:
+            # 校准 CLI 可能在运行期间写入校准文件，未校准时每次重新检查
+            self._thresholds = load_calibration(settings.CLASSIFY_CALIBRATION_PATH)
+            if self._thresholds is None:
+                return None
+        matches = centroids.match_topics(vector, min_samples=settings.CLASSIFY_FAST_MIN_SAMPLES)
+        if not matches:
+            return None
+        topic_id, top1 = matches[0]
+        top2 = max(matches[1][1], 0.0) if len(matches) > 1 else 0.0
+        if top1 < self._thresholds["min_sim"] or top1 - top2 < self._thresholds["margin"]:
+            return None
+
+        task_id, task_sim = centroids.match_task(vector, topic_id)
+        if task_sim < settings.CLASSIFY_TASK_MIN_SIM:
+            task_id = None
+        logger.debug(f"[AutoClassifier] 快速通道命中: {centroids.topics[topic_id]['name']} (sim={top1:.2f}, margin={top1 - top2:.2f})")
+        return {
+            "topic_id": topic_id,
+            "topic_name": centroids.topics[topic_id]["name"],
+            "task_id": task_id,
+            "task_name": centroids.tasks[task_id]["name"] if task_id else None,
+            "is_new": False,
+            "confidence": round(top1, 3),
+            "reason": f"与话题质心相似度 {top1:.2f}，领先第二名 {top1 - top2:.2f}",
+            "source": "centroid",
+        }
+
+    def _learn(self, vector: np.ndarray, classification: Dict):
+        """把 LLM 的分类结果并入质心 (快速通道的结果不回灌，避免自我强化)"""
+        centroids = self._get_centroids()
+        if centroids is None:
+            return
+        centroids.add(vector, classification["topic_id"], classification.get("topic_name"),
+                      classification.get("task_id"), classification.get("task_name"))
+        centroids.save_if_due()
+
+    def stats(self) -> Dict:
+        """快速通道命中率等指标"""
+        total = self.fast_hits + self.llm_calls
+        return {
+            "fast_hits": self.fast_hits,
+            "llm_calls": self.llm_calls,
+            "hit_rate": self.fast_hits / total if total else 0.0,
+            "topics": len(self._centroids) if self._centroids is not None else 0,
+            "thresholds": dict(self._thresholds or {}),
+        }
+
+    def _get_existing_topics_str(self, limit: int = 50) -> str:
+        """获取现有话题列表的字符串表示 (来自内存中的话题目录，不做向量查询)"""
+        try:
+            topics = self.topic_manager.list_topics()[:limit]
+            return "\n".join(f"- {t['name']}" for t in topics)
         except Exception:
             return ""
     
@@ -106,12 +195,11 @@ class AutoClassifier:
             topic_id = self.topic_manager.create_topic(topic_name, topic_description)
             logger.info(f"[AutoClassifier] 创建新话题: {topic_name}")
         else:
-            # 查找现有话题
-            existing = self.topic_manager.search_topics(topic_name, limit=1)
-            if existing:
-                topic_id = existing[0]["id"]
-            elif auto_create:
-                # 未找到但允许创建
+            # 查找现有话题: 名称规范化匹配 → 语义检索最接近的话题 → 仍未找到且允许时才新建
+            topic_id = self.topic_manager.find_topic_by_name(topic_name)
+            if not topic_id:
+                topic_id = self._nearest_topic(topic_name, strict=auto_create)
+            if not topic_id and auto_create:
                 topic_id = self.topic_manager.create_topic(topic_name, topic_description)
         
         # 处理子任务
@@ -125,9 +213,27 @@ class AutoClassifier:
             "task_name": task_name,
             "is_new": is_new_topic,
             "confidence": confidence,
-            "reason": result.get("reason", "")
+            "reason": result.get("reason", ""),
+            "source": "llm"
         }
     
+    def _nearest_topic(self, topic_name: str, strict: bool) -> Optional[str]:
+        """
+        语义检索最接近的已有话题 (LLM 改写了已有话题的名称时避免重复建话题)
+        strict=True 时要求距离不超过 CLASSIFY_TOPIC_MATCH_DISTANCE，否则交给调用方新建
+        """
+        try:
+            existing = self.topic_manager.search_topics(topic_name, limit=1)
+        except Exception as e:
+            logger.warning(f"[AutoClassifier] 话题语义匹配失败: {e}")
+            return None
+        if not existing:
+            return None
+        distance = existing[0].get("distance")
+        if strict and (distance is None or distance > settings.CLASSIFY_TOPIC_MATCH_DISTANCE):
+            return None
+        return existing[0]["id"]
+
     def _default_result(self) -> Dict:
         """默认分类结果（分类失败时使用）"""
         return {
@@ -0,0 +1,162 @@
+import re
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from xingchen.config.prompts import MEMORY_CLUSTER_SUMMARY_PROMPT
+from xingchen.config.settings import settings
+from xingchen.memory.storage.knowledge.near_dup import shingles
+from xingchen.utils.logger import logger
+
+# 摘要行首的列表符号与编号 ("- ", "1. ", "2、" 等)
+_LINE_PREFIX = re.compile(r"^\s*(?:[-*•]+|\d+\s*[.、)）])\s*")
+
+
+def shingle_matrix(texts: List[str], dim: int = None) -> np.ndarray:
+    """把每条文本的二字 shingle 哈希进 dim 维 0/1 向量 (crc32 取模，跨进程稳定)"""
+    dim = dim or settings.CONSOLIDATION_HASH_DIM
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        cols = [zlib.crc32(g.encode("utf-8")) % dim for g in shingles(text, size=2)]
+        matrix[row, cols] = 1.0
+    return matrix
+
+
+def cluster_texts(texts: List[str], threshold: float = None, max_size: int = None) -> List[List[int]]:
+    """
+    按二字 Jaccard 预聚类 (一次矩阵乘法得到两两相似度)
+    贪心选簇心: 每次取未分配且邻居最多的条目，把与它相似度 >= threshold 的未分配条目按相似度收入簇，单簇不超过 max_size
+    :return: 簇列表 (元素为 texts 的下标，按下标升序)，不成簇的条目各自成一簇
+    """
+    threshold = settings.CONSOLIDATION_SIMILARITY if threshold is None else threshold
+    max_size = max_size or settings.CONSOLIDATION_MAX_CLUSTER
+    if not texts:
+        return []
+    matrix = shingle_matrix(texts)
+    sizes = matrix.sum(axis=1)
+    inter = matrix @ matrix.T
+    union = sizes[:, None] + sizes[None, :] - inter
+    sim = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+    adjacency = sim >= threshold
+
+    unassigned = np.ones(len(texts), dtype=bool)
+    clusters = []
+    while unassigned.any():
+        degree = (adjacency & unassigned[None, :]).sum(axis=1)
+        degree[~unassigned] = -1
+        seed = int(np.argmax(degree))
+        candidates = np.flatnonzero(adjacency[seed] & unassigned)
+        candidates = candidates[np.argsort(-sim[seed, candidates], kind="stable")][:max_size]
+        if seed not in candidates:
+            candidates = np.append(candidates[:max_size - 1], seed)
+        unassigned[candidates] = False
+        clusters.append(sorted(int(i) for i in candidates))
+    return clusters
+
+
+def parse_summary_lines(text: str) -> List[str]:
+    """把 LLM 输出拆成事实行 (去掉编号与列表符号)"""
+    lines = []
+    for line in (text or "").splitlines():
+        line = _LINE_PREFIX.sub("", line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+class MemoryConsolidator:
+    """
+    记忆整合器 (DeepClean 使用)
+    1. 取最近的 CONSOLIDATION_CANDIDATES 条知识，按类别分组后用字符 shingle 相似度预聚类
+    2. 每个足够大的簇单独调用一次 LLM 摘要，簇之间并发 (最多 CONSOLIDATION_CONCURRENCY 路)
+    3. 摘要写回热层，被替换的原始条目移入冷存储 (冷层召回仍可找回)
+    """
+
+    def __init__(self, memory_service, llm, max_workers: int = None):
+        self.memory_service = memory_service
+        self.llm = llm
+        self.max_workers = max_workers or settings.CONSOLIDATION_CONCURRENCY
+
+    def plan(self, items: List[Dict]) -> List[List[Dict]]:
+        """把候选知识按类别分组聚类，只返回达到 CONSOLIDATION_MIN_CLUSTER 的簇 (簇内按写入时间升序)"""
+        by_category: Dict[str, List[Dict]] = {}
+        for item in items:
+            by_category.setdefault(item.get("category") or "fact", []).append(item)
+
+        clusters = []
+        for group in by_category.values():
+            for members in cluster_texts([item["content"] for item in group]):
+                if len(members) >= settings.CONSOLIDATION_MIN_CLUSTER:
+                    cluster = [group[i] for i in members]
+                    cluster.sort(key=lambda item: (item.get("created_at") or "", item["id"]))
+                    clusters.append(cluster)
+        return clusters
+
+    def consolidate(self, archive_db_path: str = None) -> Dict:
+        """
+        执行一轮整合
+        :return: {"candidates", "clusters", "summarized", "replaced", "added", "elapsed_ms"}
+        """
+        stats = {"candidates": 0, "clusters": 0, "summarized": 0, "replaced": 0, "added": 0, "elapsed_ms": 0.0}
+        t0 = time.perf_counter()
+        items = self.memory_service.knowledge_db.get_knowledge(limit=settings.CONSOLIDATION_CANDIDATES)
+        stats["candidates"] = len(items)
+        if len(items) < settings.CONSOLIDATION_MIN_CANDIDATES:
+            return stats
+
+        clusters = self.plan(items)
+        stats["clusters"] = len(clusters)
+        if not clusters:
+            return stats
+
+        summaries = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="consolidator") as executor:
+            futures = {executor.submit(self._summarize, cluster): cluster for cluster in clusters}
+            for future in as_completed(futures):
+                cluster = futures[future]
+                try:
+                    lines = future.result()
+                except Exception as e:
+                    logger.warning(f"[Consolidator] 簇摘要失败 ({len(cluster)} 条): {e}")
+                    continue
+                if lines:
+                    summaries.append((cluster, lines))
+
+        # 写库在主线程串行进行，LLM 调用才需要并发
+        for cluster, lines in summaries:
+            try:
+                result = self.memory_service.replace_long_term(
+                    [item["id"] for item in cluster], lines,
+                    category=cluster[0].get("category") or "fact",
+                    archive_db_path=archive_db_path
+                )
+            except Exception as e:
+                logger.error(f"[Consolidator] 摘要写回失败: {e}", exc_info=True)
+                continue
+            stats["summarized"] += 1
+            stats["replaced"] += result["archived"]
+            stats["added"] += len(result["added_ids"])
+
+        stats["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+        logger.info(
+            f"[Consolidator] 整合完成: {stats['candidates']} 条候选, {stats['clusters']} 个簇, "
+            f"{stats['replaced']} 条原始记忆 -> {stats['added']} 条摘要, 耗时 {stats['elapsed_ms']:.0f} ms"
+        )
+        return stats
+
+    def _summarize(self, cluster: List[Dict]) -> Optional[List[str]]:
+        """对一个簇调用 LLM，摘要不比原文更短时放弃 (返回 None)"""
+        max_lines = max(1, len(cluster) // 2)
+        prompt = MEMORY_CLUSTER_SUMMARY_PROMPT.format(
+            count=len(cluster),
+            max_lines=max_lines,
+            context="\n".join(f"- {item['content']}" for item in cluster)
+        )
+        response = self.llm.chat([{"role": "user", "content": prompt}], cache="consolidator")
+        lines = parse_summary_lines(getattr(response, "content", None))
+        if not lines or len(lines) >= len(cluster):
+            return None
+        return lines
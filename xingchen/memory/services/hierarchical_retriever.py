@@ -0,0 +1,314 @@
+"""
+层级检索器 (Hierarchical Retriever)
+沿 Topic → Task → Fragment 层级由粗到细检索:
+先选最相关的几个话题，再在这些话题内选任务，最后只在命中话题 (以及未分类) 的片段中打分，
+命中任务的片段额外加分。
+
+Chroma 的元数据过滤查询 (where) 比全量 HNSW 检索还慢，因此细排不走 Chroma:
+话题层、任务层与按话题分组的片段向量 (连同正文) 都缓存为 NumPy 矩阵，一次矩阵乘法完成打分，
+入选片段的元数据从 SQLite 侧索引读取，不再回 Chroma。话题/任务层以 TopicManager.revision 为版本，
+片段缓存以侧索引中该话题的片段数为版本，新增后自动重载。
+
+交互路径 (cold_load=False) 不在请求中加载片段缓存: 命中话题尚未缓存或已过期时本轮退化为全量检索，
+缺失的话题交给后台线程加载，之后的请求走层级检索。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+
+
+_UNCLASSIFIED = "none"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+class _Layer:
+    """一层 (话题或任务) 的向量快照"""
+
+    def __init__(self, version: int, ids: List[str], metas: List[Dict], matrix: np.ndarray):
+        self.version = version
+        self.ids = ids
+        self.metas = metas
+        self.matrix = matrix
+        self.topic_ids = np.array([(m or {}).get("topic_id", "") for m in metas], dtype=object)
+
+
+class _TopicFragments:
+    """某话题片段的缓存: 向量矩阵、正文，以及编码为整数的任务归属"""
+
+    def __init__(self, version: int, checked: int, ids: List[str], task_of: Dict[str, str],
+                 documents: List[str], matrix: np.ndarray):
+        self.version = version
+        # 上次校验时侧索引的写入计数，未变化时跳过 count 查询
+        self.checked = checked
+        self.ids = ids
+        self.documents = documents
+        self.matrix = matrix
+        keys, codes = np.unique(np.array([task_of[i] for i in ids], dtype=str), return_inverse=True) \
+            if ids else (np.array([], dtype=str), np.zeros(0, dtype=np.int64))
+        self.task_keys = keys.tolist()
+        self.task_codes = codes
+
+    def task_mask(self, hit_tasks: set) -> np.ndarray:
+        hit_codes = [code for code, key in enumerate(self.task_keys) if key in hit_tasks]
+        return np.isin(self.task_codes, hit_codes)
+
+
+class HierarchicalRetriever:
+    """
+    层级检索器
+    片段得分 = 余弦相似度 + (task_bonus, 若片段属于命中的任务)
+    """
+
+    def __init__(self, topic_manager, cache_rows: int = None):
+        self.topic_manager = topic_manager
+        self.cache_rows = cache_rows or settings.HIERARCHICAL_CACHE_ROWS
+        self.last_timings: Dict[str, float] = {}
+        self._topics: Optional[_Layer] = None
+        self._tasks: Optional[_Layer] = None
+        self._fragments: "OrderedDict[str, _TopicFragments]" = OrderedDict()
+        self._cached_rows = 0
+        # warm() 在后台线程运行时 Reasoner / Driver 也会检索，LRU 的查找、插入与淘汰须互斥
+        self._lock = threading.Lock()
+        # 交互路径上未命中缓存、等待后台加载的话题
+        self._pending: set = set()
+        self._loader: Optional[threading.Thread] = None
+
+    def retrieve(self, query: str, limit: int = None, top_topics: int = None, top_tasks: int = None,
+                 cold_load: bool = True) -> List[Dict]:
+        """
+        层级检索
+        :param cold_load: False 时不在本次调用中加载片段缓存 (交互路径)，未缓存的话题退化为全量检索并转入后台加载
+        :return: [{"id", "document", "metadata", "distance", "score", "topic", "task"}]，按得分降序
+        """
+        if not query:
+            return []
+        limit = limit or settings.HIERARCHICAL_LIMIT
+        top_topics = top_topics or settings.HIERARCHICAL_TOP_TOPICS
+        top_tasks = top_tasks or settings.HIERARCHICAL_TOP_TASKS
+        tm = self.topic_manager
+        timings: Dict[str, float] = {}
+
+        t0 = time.perf_counter()
+        query_vectors = self._embed_query(query)
+        timings["embed_ms"] = (time.perf_counter() - t0) * 1000
+
+        # 1. 话题
+        t1 = time.perf_counter()
+        self._topics = self._refresh_layer(tm.topics, self._topics)
+        topic_scores = self._score(self._topics, query_vectors[id(tm.topics)])
+        order = np.argsort(-topic_scores)[:top_topics]
+        chosen = [i for i in order if 1.0 - topic_scores[i] <= settings.HIERARCHICAL_MAX_TOPIC_DISTANCE]
+        topic_names = {self._topics.ids[i]: self._topics.metas[i].get("name", self._topics.ids[i]) for i in chosen}
+        timings["topic_ms"] = (time.perf_counter() - t1) * 1000
+
+        # 2. 任务 (只在命中话题内)
+        t2 = time.perf_counter()
+        task_names: Dict[str, str] = {}
+        if topic_names:
+            self._tasks = self._refresh_layer(tm.tasks, self._tasks)
+            task_scores = self._score(self._tasks, query_vectors[id(tm.tasks)])
+            in_topic = np.flatnonzero(np.isin(self._tasks.topic_ids, list(topic_names)))
+            best = in_topic[np.argsort(-task_scores[in_topic])[:top_tasks]]
+            task_names = {self._tasks.ids[i]: self._tasks.metas[i].get("name", self._tasks.ids[i]) for i in best}
+        timings["task_ms"] = (time.perf_counter() - t2) * 1000
+
+        # 3. 片段: 命中话题 + 未分类；没有命中话题或 (交互路径上) 缓存未就绪时退化为全量检索
+        t3 = time.perf_counter()
+        hits = None
+        if topic_names:
+            topic_ids = list(topic_names) + [_UNCLASSIFIED]
+            cached = [self._topic_fragments(topic_id, load=cold_load) for topic_id in topic_ids]
+            missing = [topic_id for topic_id, entry in zip(topic_ids, cached) if entry is None]
+            if missing:
+                self._schedule_loads(missing)
+            else:
+                hits = self._score_fragments(cached, query_vectors[id(tm.fragments)], set(task_names), limit)
+        if hits is None:
+            hits = self._flat_search(query_vectors[id(tm.fragments)], limit)
+        timings["fragment_ms"] = (time.perf_counter() - t3) * 1000
+
+        t4 = time.perf_counter()
+        results = self._hydrate(hits, topic_names, task_names)
+        timings["hydrate_ms"] = (time.perf_counter() - t4) * 1000
+        timings["total_ms"] = (time.perf_counter() - t0) * 1000
+        self.last_timings = timings
+
+        logger.debug(
+            f"[HierarchicalRetriever] '{query[:20]}': 话题 {len(topic_names)} / 任务 {len(task_names)} / 片段 {len(results)}, "
+            + ", ".join(f"{k}={v:.1f}" for k, v in timings.items())
+        )
+        return results
+
+    # ---------------- 向量 ----------------
+
+    def _embed_query(self, query: str) -> Dict[int, np.ndarray]:
+        """每个集合所用 embedding_function 只计算一次查询向量"""
+        tm = self.topic_manager
+        by_function: Dict[int, np.ndarray] = {}
+        vectors: Dict[int, np.ndarray] = {}
+        for name, collection in (("topics", tm.topics), ("tasks", tm.tasks), ("fragments", tm.fragments)):
+            embedding_function = tm.embedding_functions[name]
+            key = id(embedding_function)
+            if key not in by_function:
+                by_function[key] = _normalize_rows(embedding_function([query])[0])[0]
+            vectors[id(collection)] = by_function[key]
+        return vectors
+
+    @staticmethod
+    def _score(layer: _Layer, vector: np.ndarray) -> np.ndarray:
+        if not layer.ids:
+            return np.zeros(0, dtype=np.float32)
+        return layer.matrix @ vector
+
+    def _refresh_layer(self, collection, layer: Optional[_Layer]) -> _Layer:
+        version = self.topic_manager.revision
+        if layer is not None and layer.version == version:
+            return layer
+        data = collection.get(include=["embeddings", "metadatas"])
+        matrix = _normalize_rows(data["embeddings"]) if data["ids"] else np.zeros((0, 0), dtype=np.float32)
+        return _Layer(version, list(data["ids"]), list(data["metadatas"] or []), matrix)
+
+    def _topic_fragments(self, topic_id: str, load: bool = True, chunk_size: int = 5000,
+                         pause: float = 0.0) -> Optional[_TopicFragments]:
+        """
+        某话题全部片段的向量与正文 (LRU 缓存，按侧索引中的片段数判断是否过期)
+        load=False 时只查缓存，未缓存或已过期返回 None；
+        后台加载用小块 + 块间停顿，避免长时间占用 Chroma 拖慢前台检索
+        """
+        index = self.topic_manager.fragment_index
+        revision = index.revision
+        with self._lock:
+            cached = self._fragments.get(topic_id)
+            if cached is not None and cached.checked == revision:
+                self._fragments.move_to_end(topic_id)
+                return cached
+        version = index.count(topic_id=topic_id)
+        with self._lock:
+            cached = self._fragments.get(topic_id)
+            if cached is not None and cached.version == version:
+                cached.checked = revision
+                self._fragments.move_to_end(topic_id)
+                return cached
+        if not load:
+            return None
+
+        # 成员与任务归属来自侧索引，Chroma 只取向量与正文 (加载不持锁，避免预热阻塞检索)
+        task_of = dict(index.topic_members(topic_id))
+        ids: List[str] = []
+        documents: List[str] = []
+        vectors = []
+        members = list(task_of)
+        for start in range(0, len(members), chunk_size):
+            if start and pause:
+                time.sleep(pause)
+            data = self.topic_manager.fragments.get(ids=members[start:start + chunk_size],
+                                                    include=["embeddings", "documents"])
+            ids.extend(data["ids"])
+            documents.extend(data["documents"])
+            vectors.extend(data["embeddings"])
+        matrix = _normalize_rows(vectors) if ids else np.zeros((0, 0), dtype=np.float32)
+        entry = _TopicFragments(version, revision, ids, task_of, documents, matrix)
+
+        with self._lock:
+            previous = self._fragments.pop(topic_id, None)
+            if previous is not None:
+                self._cached_rows -= len(previous.ids)
+            self._fragments[topic_id] = entry
+            self._cached_rows += len(ids)
+            while self._cached_rows > self.cache_rows and len(self._fragments) > 1:
+                _, evicted = self._fragments.popitem(last=False)
+                self._cached_rows -= len(evicted.ids)
+        return entry
+
+    def _schedule_loads(self, topic_ids: List[str]):
+        """把缺失的话题交给后台线程加载 (同一话题只排队一次)"""
+        with self._lock:
+            self._pending.update(topic_ids)
+            if self._loader is not None and self._loader.is_alive():
+                return
+            self._loader = threading.Thread(target=self._drain_pending, daemon=True, name="HierarchicalLoader")
+            self._loader.start()
+
+    def _drain_pending(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                topic_id = self._pending.pop()
+            try:
+                self._topic_fragments(topic_id, chunk_size=settings.HIERARCHICAL_LOAD_CHUNK,
+                                      pause=settings.HIERARCHICAL_LOAD_PAUSE)
+            except Exception as e:
+                logger.warning(f"[HierarchicalRetriever] 话题 {topic_id} 片段加载失败: {e}")
+            time.sleep(settings.HIERARCHICAL_LOAD_PAUSE)
+
+    def wait_for_loads(self, timeout: float = None):
+        """等待后台加载完成 (测试与基准用)"""
+        loader = self._loader
+        if loader is not None:
+            loader.join(timeout)
+
+    def warm(self, max_rows: int = None) -> int:
+        """按最近活跃顺序预加载话题片段向量 (启动预热用)，返回加载的行数"""
+        budget = max_rows or self.cache_rows
+        loaded = 0
+        for topic_id, count in self.topic_manager.fragment_index.topic_activity():
+            if loaded + count > budget:
+                break
+            loaded += len(self._topic_fragments(topic_id).ids)
+        return loaded
+
+    def _score_fragments(self, entries: List[_TopicFragments], vector: np.ndarray, hit_tasks: set,
+                         limit: int) -> List[Tuple[str, float, float, str]]:
+        """返回 [(fragment_id, score, distance, document)]"""
+        candidates: List[Tuple[str, float, float, str]] = []
+        for entry in entries:
+            if not entry.ids:
+                continue
+            sims = entry.matrix @ vector
+            scores = sims + settings.HIERARCHICAL_TASK_BONUS * entry.task_mask(hit_tasks) if hit_tasks else sims
+            top = np.argpartition(-scores, min(limit, len(entry.ids) - 1))[:limit]
+            candidates.extend((entry.ids[i], float(scores[i]), float(1.0 - sims[i]), entry.documents[i]) for i in top)
+        candidates.sort(key=lambda c: c[1], reverse=True)
+        return candidates[:limit]
+
+    def _flat_search(self, vector: np.ndarray, limit: int) -> List[Tuple[str, float, float, str]]:
+        """全量 HNSW 检索 (复用已算好的查询向量，不再重复嵌入)"""
+        results = self.topic_manager.fragments.query(query_embeddings=[vector.tolist()], n_results=limit,
+                                                     include=["distances", "documents"])
+        return [(i, 1.0 - d, d, doc) for i, d, doc in
+                zip(results["ids"][0], results["distances"][0], results["documents"][0])]
+
+    def _hydrate(self, hits: List[Tuple[str, float, float, str]], topic_names: Dict[str, str],
+                 task_names: Dict[str, str]) -> List[Dict]:
+        """为入选片段补元数据 (来自 SQLite 侧索引)"""
+        if not hits:
+            return []
+        metas = self.topic_manager.fragment_index.get_many([h[0] for h in hits])
+        results = []
+        for fragment_id, score, distance, doc in hits:
+            meta = metas.get(fragment_id)
+            if meta is None:
+                continue
+            results.append({
+                "id": fragment_id,
+                "document": doc,
+                "metadata": meta,
+                "distance": distance,
+                "score": score,
+                "topic": topic_names.get(meta.get("topic_id")),
+                "task": task_names.get(meta.get("task_id")),
+            })
+        return results
@@ -0,0 +1,222 @@
+"""
+混合检索器 (Hybrid Retriever)
+并发执行词法召回 (KnowledgeDB) 与向量召回 (ChromaDB)，用倒数排名融合 (RRF) 合并，
+再叠加时间新近度与置信度加权。向量库不可用或超时时退化为纯词法检索。
+冷存储 (archive.db) 作为第三路词法召回并发执行，入选的冷层条目会被搬回热层。
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+from xingchen.utils.text_utils import extract_terms
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """检索线程池 (进程内共享，首次使用时创建)"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-retriever")
+    return _executor
+
+
+class HybridRetriever:
+    """
+    混合检索器
+
+    融合得分:
+        rrf(d)   = Σ 1 / (k + rank_i(d))              (i ∈ {lexical, vector})
+        score(d) = rrf(d) * (1 + recency_boost * 0.5 ^ (age_days / half_life))
+                          * (1 - confidence_weight * (1 - confidence))
+    """
+
+    def __init__(self, knowledge_db, vector_storage=None):
+        self.knowledge_db = knowledge_db
+        self.vector_storage = vector_storage
+        self.last_timings: Dict[str, float] = {}
+        # 各层累计检索延迟: tier -> {"queries", "total_ms", "max_ms"}
+        self._tier_latency: Dict[str, Dict[str, float]] = {}
+
+    def vector_enabled(self) -> bool:
+        return bool(self.vector_storage) and self.vector_storage.is_available()
+
+    def retrieve(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        混合检索
+        :return: 知识条目列表 (附加 score 与 sources 字段)，按融合得分降序
+        """
+        if not query:
+            return []
+
+        t0 = time.perf_counter()
+        candidates = max(limit * 4, settings.HYBRID_CANDIDATES)
+        timings: Dict[str, float] = {}
+
+        vector_future = None
+        if self.vector_enabled():
+            vector_future = _get_executor().submit(self._timed, self._vector_search, query, candidates)
+        archive_future = None
+        if settings.MEMORY_ARCHIVE_RECALL:
+            archive_future = _get_executor().submit(self._timed, self._archive_search, query, candidates)
+
+        lexical_hits, timings["lexical_ms"] = self._timed(self._lexical_search, query, candidates)
+
+        vector_hits: List[Dict] = []
+        if vector_future is not None:
+            try:
+                vector_hits, timings["vector_ms"] = vector_future.result(timeout=settings.HYBRID_VECTOR_TIMEOUT)
+            except FutureTimeoutError:
+                logger.warning(f"[Retriever] 向量检索超时 (>{settings.HYBRID_VECTOR_TIMEOUT}s)，本次仅使用词法结果")
+            except Exception as e:
+                logger.warning(f"[Retriever] 向量检索失败，本次仅使用词法结果: {e}")
+
+        archive_hits: List[Dict] = []
+        if archive_future is not None:
+            try:
+                archive_hits, timings["archive_ms"] = archive_future.result(timeout=settings.HYBRID_VECTOR_TIMEOUT)
+            except FutureTimeoutError:
+                logger.warning(f"[Retriever] 冷层检索超时 (>{settings.HYBRID_VECTOR_TIMEOUT}s)，本次跳过冷层")
+            except Exception as e:
+                logger.warning(f"[Retriever] 冷层检索失败，本次跳过冷层: {e}")
+
+        t_fuse = time.perf_counter()
+        results = self._fuse(lexical_hits, vector_hits, limit, archive_hits)
+        timings["fusion_ms"] = (time.perf_counter() - t_fuse) * 1000
+        results = self._promote_and_record(results)
+        timings["total_ms"] = (time.perf_counter() - t0) * 1000
+        self.last_timings = timings
+        self._record_latency("hot", max(timings["lexical_ms"], timings.get("vector_ms", 0.0)))
+        if "archive_ms" in timings:
+            self._record_latency("archive", timings["archive_ms"])
+
+        logger.debug(
+            f"[Retriever] 混合检索 '{query[:20]}': 词法 {len(lexical_hits)} 条 / 向量 {len(vector_hits)} 条 / "
+            f"冷层 {len(archive_hits)} 条 -> {len(results)} 条, "
+            + ", ".join(f"{k}={v:.1f}" for k, v in timings.items())
+        )
+        return results
+
+    def retrieve_archive(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        只查冷存储 (关键词检索在热层未命中时的兜底)，入选的冷层条目同样搬回热层
+        """
+        if not query or not settings.MEMORY_ARCHIVE_RECALL:
+            return []
+        hits, elapsed_ms = self._timed(self._archive_search, query, limit)
+        self._record_latency("archive", elapsed_ms)
+        return self._promote_and_record(hits[:limit])
+
+    @staticmethod
+    def _timed(fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        return result, (time.perf_counter() - start) * 1000
+
+    def _lexical_search(self, query: str, limit: int) -> List[Dict]:
+        terms = extract_terms(query)
+        if not terms:
+            return []
+        return self.knowledge_db.search_knowledge_terms(terms, limit=limit)
+
+    def _archive_search(self, query: str, limit: int) -> List[Dict]:
+        terms = extract_terms(query)
+        if not terms:
+            return []
+        return self.knowledge_db.search_archive_terms(terms, limit=limit)
+
+    def _vector_search(self, query: str, limit: int) -> List[Dict]:
+        """向量召回，返回 [{"id": knowledge_id, "distance"}] (按距离升序)"""
+        hits = []
+        for hit in self.vector_storage.query_memories(query, n_results=limit):
+            knowledge_id = hit["metadata"].get("knowledge_id")
+            if knowledge_id is None and hit["id"].startswith("ltm_"):
+                knowledge_id = hit["id"][4:]
+            try:
+                hits.append({"id": int(knowledge_id), "distance": hit["distance"]})
+            except (TypeError, ValueError):
+                continue
+        return hits
+
+    def _fuse(self, lexical_hits: List[Dict], vector_hits: List[Dict], limit: int,
+              archive_hits: List[Dict] = ()) -> List[Dict]:
+        k = settings.HYBRID_RRF_K
+        items: Dict[int, Dict] = {}
+        rrf: Dict[int, float] = {}
+        sources: Dict[int, List[str]] = {}
+
+        for source, hits in (("lexical", lexical_hits), ("archive", archive_hits)):
+            for rank, item in enumerate(hits):
+                items.setdefault(item["id"], item)
+                rrf[item["id"]] = rrf.get(item["id"], 0.0) + 1.0 / (k + rank + 1)
+                sources.setdefault(item["id"], []).append(source)
+
+        for rank, hit in enumerate(vector_hits):
+            rrf[hit["id"]] = rrf.get(hit["id"], 0.0) + 1.0 / (k + rank + 1)
+            sources.setdefault(hit["id"], []).append("vector")
+
+        # 只被向量召回的条目需要回表取正文；回表失败说明向量已过期 (知识被删除)
+        missing = [i for i in rrf if i not in items]
+        for item in self.knowledge_db.get_knowledge_by_ids(missing):
+            items[item["id"]] = item
+
+        now = datetime.now()
+        scored = []
+        for knowledge_id, base in rrf.items():
+            item = items.get(knowledge_id)
+            if item is None:
+                continue
+            score = base * self._recency_factor(item.get("created_at"), now) * self._confidence_factor(item.get("confidence"))
+            scored.append({**item, "score": score, "sources": sources[knowledge_id]})
+
+        scored.sort(key=lambda x: x["score"], reverse=True)
+        return scored[:limit]
+
+    def _promote_and_record(self, results: List[Dict]) -> List[Dict]:
+        """入选的冷层条目搬回热层 (换成热层 id)，其余条目登记访问次数"""
+        archived = {item["archive_id"]: item for item in results if item.get("tier") == "archive"}
+        if archived:
+            try:
+                promoted = self.knowledge_db.promote_archived(list(archived))
+            except Exception as e:
+                logger.warning(f"[Retriever] 冷层条目回迁失败: {e}")
+                promoted = {}
+            for archive_id, item in archived.items():
+                if archive_id in promoted:
+                    item["id"] = promoted[archive_id]
+                    item["promoted"] = True
+        self.knowledge_db.record_access([item["id"] for item in results if item.get("tier") != "archive"])
+        return results
+
+    def _record_latency(self, tier: str, elapsed_ms: float):
+        stats = self._tier_latency.setdefault(tier, {"queries": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["queries"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def tier_latency(self) -> Dict[str, Dict[str, float]]:
+        """各层检索延迟 {tier: {"queries", "avg_ms", "max_ms"}}"""
+        return {
+            tier: {"queries": s["queries"], "avg_ms": s["total_ms"] / s["queries"], "max_ms": s["max_ms"]}
+            for tier, s in self._tier_latency.items() if s["queries"]
+        }
+
+    @staticmethod
+    def _recency_factor(created_at, now: datetime) -> float:
+        try:
+            age_days = max((now - datetime.fromisoformat(str(created_at))).total_seconds() / 86400, 0.0)
+        except (TypeError, ValueError):
+            return 1.0
+        return 1.0 + settings.HYBRID_RECENCY_BOOST * 0.5 ** (age_days / settings.HYBRID_RECENCY_HALF_LIFE_DAYS)
+
+    @staticmethod
+    def _confidence_factor(confidence) -> float:
+        try:
+            confidence = min(max(float(confidence), 0.0), 1.0)
+        except (TypeError, ValueError):
+            return 1.0
+        return 1.0 - settings.HYBRID_CONFIDENCE_WEIGHT * (1.0 - confidence)
@@ -0,0 +1,304 @@
+"""
+话题质心 (Topic Centroids)
+为每个话题/任务维护片段向量的质心，作为 AutoClassifier 的快速通道:
+内容与某个话题质心足够相似、且明显领先第二名时直接归类，不再调用 LLM。
+
+离线校准: python -m xingchen.memory.services.topic_centroids [--precision 0.95] [--write]
+用已存储的分类结果 (带 topic_id 的片段) 做留一法评估，给出满足目标准确率且覆盖率最高的阈值。
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+
+
+class TopicCentroids:
+    """
+    话题/任务质心索引
+    质心以"向量和 + 计数"存储，增量更新为 O(dim)；检索时归一化后做一次矩阵乘法
+    """
+
+    def __init__(self, path: str, space: str = ""):
+        self.path = path
+        # 向量空间标识 (片段集合名)，切换嵌入后端后旧质心不可再用
+        self.space = space
+        self._lock = threading.Lock()
+        # id -> {"name", "sum", "count"}；任务额外带 "topic_id"
+        self.topics: Dict[str, Dict] = {}
+        self.tasks: Dict[str, Dict] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[str] = []
+        # 未落盘的更新次数与上次落盘时间 (增量更新攒批保存，不在每次分类后重写整个文件)
+        self._unsaved = 0
+        self._last_saved = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.topics)
+
+    # ---------------- 更新 ----------------
+
+    def add(self, vector: np.ndarray, topic_id: str, topic_name: str = None,
+            task_id: str = None, task_name: str = None):
+        """把一条已归类内容的向量并入对应话题 (与任务) 的质心"""
+        vector = self._normalize(vector)
+        with self._lock:
+            self._accumulate(self.topics, topic_id, topic_name, vector)
+            if task_id:
+                self._accumulate(self.tasks, task_id, task_name, vector)
+                self.tasks[task_id]["topic_id"] = topic_id
+            self._matrix = None
+            self._unsaved += 1
+
+    @staticmethod
+    def _accumulate(table: Dict[str, Dict], key: str, name: Optional[str], vector: np.ndarray):
+        entry = table.get(key)
+        if entry is None:
+            table[key] = {"name": name or key, "sum": vector.copy(), "count": 1}
+        else:
+            entry["sum"] += vector
+            entry["count"] += 1
+            if name:
+                entry["name"] = name
+
+    def build_from_fragments(self, fragments, topic_names: Dict[str, str] = None, page_size: int = 1000) -> int:
+        """从片段集合已存储的向量重建质心 (首次启用或质心文件丢失时)"""
+        topic_names = topic_names or {}
+        total = fragments.count()
+        added = 0
+        with self._lock:
+            self.topics, self.tasks, self._matrix = {}, {}, None
+        for offset in range(0, total, page_size):
+            page = fragments.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+            for vector, meta in zip(page["embeddings"], page["metadatas"]):
+                topic_id = (meta or {}).get("topic_id")
+                if not topic_id or topic_id == "none":
+                    continue
+                task_id = meta.get("task_id")
+                self.add(np.asarray(vector, dtype=np.float32), topic_id, topic_names.get(topic_id),
+                         task_id if task_id and task_id != "none" else None)
+                added += 1
+        return added
+
+    # ---------------- 检索 ----------------
+
+    def match_topics(self, vector: np.ndarray, min_samples: int = 1, top_k: int = 2) -> List[Tuple[str, float]]:
+        """按余弦相似度返回最接近的话题 [(topic_id, sim)]，只考虑样本数足够的话题"""
+        with self._lock:
+            if self._matrix is None:
+                self._rebuild_matrix()
+            if not self._matrix_ids:
+                return []
+            sims = self._matrix @ self._normalize(vector)
+            counts = np.array([self.topics[i]["count"] for i in self._matrix_ids])
+            sims = np.where(counts >= min_samples, sims, -1.0)
+            order = np.argsort(-sims)[:top_k]
+            return [(self._matrix_ids[i], float(sims[i])) for i in order if sims[i] > -1.0]
+
+    def match_task(self, vector: np.ndarray, topic_id: str) -> Tuple[Optional[str], float]:
+        """在话题内选最接近的任务"""
+        vector = self._normalize(vector)
+        best, best_sim = None, -1.0
+        with self._lock:
+            for task_id, entry in self.tasks.items():
+                if entry.get("topic_id") != topic_id:
+                    continue
+                sim = float(self._normalize(entry["sum"]) @ vector)
+                if sim > best_sim:
+                    best, best_sim = task_id, sim
+        return best, best_sim
+
+    def _rebuild_matrix(self):
+        self._matrix_ids = list(self.topics)
+        if self._matrix_ids:
+            sums = np.stack([self.topics[i]["sum"] for i in self._matrix_ids])
+            self._matrix = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        else:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    # ---------------- 持久化 ----------------
+
+    def save_if_due(self, every: int = None, interval: float = None) -> bool:
+        """累计更新达到 every 次，或距上次落盘超过 interval 秒且有未落盘更新时保存"""
+        every = every or settings.CLASSIFY_CENTROID_SAVE_EVERY
+        interval = settings.CLASSIFY_CENTROID_SAVE_INTERVAL if interval is None else interval
+        with self._lock:
+            pending = self._unsaved
+            due = pending >= every or (pending and time.monotonic() - self._last_saved >= interval)
+        if due:
+            self.save()
+        return bool(due)
+
+    def flush(self):
+        """有未落盘的更新时保存 (退出时调用)"""
+        if self._unsaved:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            self._unsaved = 0
+            self._last_saved = time.monotonic()
+            payload = {}
+            for prefix, table in (("topic", self.topics), ("task", self.tasks)):
+                ids = list(table)
+                payload[f"{prefix}_ids"] = np.array(ids, dtype=str)
+                payload[f"{prefix}_names"] = np.array([table[i]["name"] for i in ids], dtype=str)
+                payload[f"{prefix}_counts"] = np.array([table[i]["count"] for i in ids], dtype=np.int64)
+                payload[f"{prefix}_sums"] = np.stack([table[i]["sum"] for i in ids]) if ids else np.zeros((0, 0), dtype=np.float32)
+            payload["task_topics"] = np.array([self.tasks[i].get("topic_id", "") for i in self.tasks], dtype=str)
+            payload["space"] = np.array(self.space)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp.npz"
+            np.savez(tmp_path, **payload)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"[TopicCentroids] 质心保存失败: {e}")
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                if str(data["space"]) != self.space:
+                    logger.info(f"[TopicCentroids] 向量空间已变更 ({data['space']} -> {self.space})，将从片段重建")
+                    return False
+                topics, tasks = {}, {}
+                for prefix, table in (("topic", topics), ("task", tasks)):
+                    for key, name, count, total in zip(data[f"{prefix}_ids"], data[f"{prefix}_names"],
+                                                        data[f"{prefix}_counts"], data[f"{prefix}_sums"]):
+                        table[str(key)] = {"name": str(name), "sum": total.astype(np.float32), "count": int(count)}
+                for key, topic_id in zip(data["task_ids"], data["task_topics"]):
+                    tasks[str(key)]["topic_id"] = str(topic_id)
+        except Exception as e:
+            logger.warning(f"[TopicCentroids] 质心文件损坏，将从片段重建: {e}")
+            return False
+        with self._lock:
+            self.topics, self.tasks, self._matrix = topics, tasks, None
+        return True
+
+
+# ---------------- 离线校准 ----------------
+
+def load_calibration(path: str) -> Optional[Dict]:
+    """
+    读取校准结果 {min_sim, margin}，缺少的项使用 settings 中的默认值
+    校准文件不存在或不可读时返回 None (未校准的阈值不可信，快速通道保持关闭)
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.warning(f"[TopicCentroids] 校准文件读取失败，快速通道保持关闭: {e}")
+        return None
+    thresholds = {"min_sim": settings.CLASSIFY_FAST_MIN_SIM, "margin": settings.CLASSIFY_FAST_MARGIN}
+    thresholds.update({k: float(data[k]) for k in ("min_sim", "margin") if k in data})
+    return thresholds
+
+
+def calibrate(vectors: np.ndarray, labels: List[str], target_precision: float = 0.95,
+              min_samples: int = None, min_accepted: int = 20) -> Dict:
+    """
+    留一法校准快速通道阈值
+    对每条已分类片段，用去掉它自己之后的质心预测话题，记录 (top1 相似度, 与第二名的差距, 是否正确)，
+    在阈值网格上选择准确率 >= target_precision 时覆盖率最高的 (min_sim, margin)。
+    """
+    min_samples = settings.CLASSIFY_FAST_MIN_SAMPLES if min_samples is None else min_samples
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    topic_ids = sorted(set(labels))
+    if len(topic_ids) < 2:
+        return {"samples": len(labels), "topics": len(topic_ids), "error": "至少需要两个话题才能校准"}
+
+    label_index = np.array([topic_ids.index(label) for label in labels])
+    sums = np.zeros((len(topic_ids), vectors.shape[1]), dtype=np.float32)
+    np.add.at(sums, label_index, vectors)
+    counts = np.bincount(label_index, minlength=len(topic_ids))
+
+    rows = np.arange(len(labels))
+    # 留一: 自身所在话题的质心减去自己
+    own = sums[label_index] - vectors
+    raw = vectors @ sums.T
+    raw[rows, label_index] = np.einsum("ij,ij->i", vectors, own)
+    norms = np.broadcast_to(np.linalg.norm(sums, axis=1), raw.shape).copy()
+    norms[rows, label_index] = np.linalg.norm(own, axis=1)
+    sims = raw / np.maximum(norms, 1e-12)
+
+    eligible = np.broadcast_to(counts >= min_samples, sims.shape).copy()
+    eligible[rows, label_index] = counts[label_index] - 1 >= min_samples
+    sims = np.where(eligible, sims, -1.0)
+
+    order = np.argsort(-sims, axis=1)
+    top1 = sims[rows, order[:, 0]]
+    top2 = sims[rows, order[:, 1]]
+    correct = order[:, 0] == label_index
+    margin = top1 - np.maximum(top2, 0.0)
+
+    best = None
+    for min_sim in np.arange(0.30, 0.96, 0.025):
+        for gap in np.arange(0.0, 0.31, 0.01):
+            accepted = (top1 >= min_sim) & (margin >= gap)
+            n = int(accepted.sum())
+            if n < min_accepted:
+                continue
+            precision = float(correct[accepted].mean())
+            coverage = n / len(labels)
+            if precision >= target_precision and (best is None or coverage > best["coverage"]):
+                best = {"min_sim": round(float(min_sim), 3), "margin": round(float(gap), 3),
+                        "precision": precision, "coverage": coverage}
+
+    result = {"samples": len(labels), "topics": len(topic_ids), "target_precision": target_precision}
+    if best is None:
+        result["error"] = "没有阈值组合能达到目标准确率，快速通道应保持关闭或降低目标"
+    else:
+        result.update(best)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="话题快速分类阈值校准")
+    parser.add_argument("--precision", type=float, default=0.95, help="目标准确率")
+    parser.add_argument("--max-samples", type=int, default=20000, help="最多使用的片段数")
+    parser.add_argument("--write", action="store_true", help="把结果写入校准文件，供 AutoClassifier 使用")
+    args = parser.parse_args()
+
+    from xingchen.memory.storage.topic_manager import topic_manager
+
+    fragments = topic_manager.fragments
+    vectors, labels = [], []
+    for offset in range(0, min(fragments.count(), args.max_samples), 1000):
+        page = fragments.get(limit=1000, offset=offset, include=["embeddings", "metadatas"])
+        for vector, meta in zip(page["embeddings"], page["metadatas"]):
+            topic_id = (meta or {}).get("topic_id")
+            if topic_id and topic_id != "none":
+                vectors.append(vector)
+                labels.append(topic_id)
+
+    if not labels:
+        print("没有已分类的片段，无法校准")
+        return
+    result = calibrate(np.asarray(vectors), labels, target_precision=args.precision)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.write and "error" not in result:
+        with open(settings.CLASSIFY_CALIBRATION_PATH, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"已写入 {settings.CLASSIFY_CALIBRATION_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+向量索引管线 (Vector Indexer)
+后台线程把新写入的长期记忆批量嵌入到 ChromaDB 的 long_term_memory 集合，写入路径不再承担模型延迟。
+
+可靠性:
+- 检查点 (checkpoint) 是"低水位": 所有 id <= checkpoint 的知识都已入库，原子写入磁盘
+- 检查点只推进到回表扫描确认过的位置，绕过 enqueue 直接写库的条目不会被越过
+- 启动时从 KnowledgeDB 补齐 id > checkpoint 的条目；队列溢出时同样回表补齐，不会丢
+- 向量 id 固定为 ltm_<knowledge_id> 且使用 upsert，重放只会覆盖，不会产生重复
+"""
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+
+
+class VectorIndexer:
+    """
+    后台批量向量索引器
+
+    批次在以下任一条件满足时提交:
+    - 攒满 batch_size 条
+    - 距批次第一条入队已过 batch_window 秒
+    - 调用 flush()
+    """
+
+    def __init__(self, knowledge_db, vector_storage, checkpoint_path: str,
+                 queue_size: int = None, batch_size: int = None, batch_window: float = None):
+        self.knowledge_db = knowledge_db
+        self.vector_storage = vector_storage
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size or settings.VECTOR_INDEX_BATCH_SIZE
+        self.batch_window = settings.VECTOR_INDEX_BATCH_WINDOW if batch_window is None else batch_window
+
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=queue_size or settings.VECTOR_INDEX_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # 已入队但尚未入库的 id -> 入队时间 (用于计算低水位与滞后)
+        self._pending: Dict[int, float] = {}
+        # 检查点之上已入库的 id，回表时跳过，避免重复嵌入
+        self._indexed_ahead: Set[int] = set()
+        self._retry: List[Dict] = []
+        self._needs_catch_up = False
+        self._backoff = 0.0
+
+        self.checkpoint = self._load_checkpoint()
+        self._latest_id = self.checkpoint
+        self._caught_up_to = self.checkpoint
+        # 回表扫描确认过的位置: id <= _verified_to 的行都已入队或入库
+        self._verified_to = self.checkpoint
+        self._last_catch_up = time.time()
+        self.indexed_total = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_batch_ms = 0.0
+
+    # ---------------- 生命周期 ----------------
+
+    def start(self):
+        """启动后台线程 (先补齐上次退出时未入库的条目)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._request_catch_up()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="vector-indexer")
+        self._thread.start()
+        logger.info(f"[VectorIndexer] 后台索引已启动，检查点 #{self.checkpoint}")
+
+    def stop(self, flush: bool = True, timeout: float = 10.0):
+        """停止后台线程；flush=True 时先尽量把队列处理完"""
+        if flush:
+            self.flush(timeout=timeout)
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    # ---------------- 写入 ----------------
+
+    def enqueue(self, knowledge_id: int, content: str, category: str = "fact"):
+        """登记一条待索引的长期记忆 (非阻塞)"""
+        if not knowledge_id or knowledge_id <= 0 or not content:
+            return
+        now = time.time()
+        with self._lock:
+            self._pending.setdefault(knowledge_id, now)
+            self._latest_id = max(self._latest_id, knowledge_id)
+        try:
+            self._queue.put_nowait({"id": knowledge_id, "content": content, "category": category})
+        except queue.Full:
+            # 丢弃入队但保留 pending，低水位停在这里，等队列排空后回表补齐
+            with self._lock:
+                self.dropped += 1
+            self._request_catch_up()
+            logger.warning(f"[VectorIndexer] 索引队列已满，#{knowledge_id} 将在稍后从 KnowledgeDB 补齐")
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def _request_catch_up(self):
+        """标记需要回表: 从当前检查点开始扫描"""
+        with self._lock:
+            if not self._needs_catch_up:
+                self._caught_up_to = self.checkpoint
+            self._needs_catch_up = True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """催促立即提交并等待所有已登记条目入库 (测试与关闭时使用)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                done = not self._pending and not self._needs_catch_up and self.checkpoint >= self._latest_id
+            if done and self._queue.empty():
+                return True
+            if not (self._thread and self._thread.is_alive()):
+                # 未启动后台线程时在当前线程同步处理
+                self._process_once(force=True)
+                continue
+            self._wake.set()
+            time.sleep(0.01)
+        return False
+
+    # ---------------- 指标 ----------------
+
+    def stats(self) -> Dict:
+        """索引滞后等运行指标"""
+        with self._lock:
+            oldest = min(self._pending.values()) if self._pending else None
+            return {
+                "checkpoint": self.checkpoint,
+                "latest_id": self._latest_id,
+                "lag": max(self._latest_id - self.checkpoint, 0),
+                "lag_seconds": (time.time() - oldest) if oldest else 0.0,
+                "pending": len(self._pending),
+                "queued": self._queue.qsize(),
+                "indexed_total": self.indexed_total,
+                "batches": self.batches,
+                "failures": self.failures,
+                "dropped": self.dropped,
+                "last_batch_ms": self.last_batch_ms,
+            }
+
+    # ---------------- 后台循环 ----------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._backoff:
+                    self._stop.wait(self._backoff)
+                self._process_once(force=False)
+            except Exception as e:
+                logger.error(f"[VectorIndexer] 后台循环异常: {e}", exc_info=True)
+                self._stop.wait(1.0)
+
+    def _process_once(self, force: bool):
+        """处理一批: 失败重试 > 队列 > 回表补齐"""
+        batch = self._retry
+        self._retry = []
+        if not batch:
+            batch = self._collect_batch(force)
+        if not batch and not self._needs_catch_up and self._queue.empty() and (
+                self._unverified() or time.time() - self._last_catch_up > settings.VECTOR_INDEX_CATCH_UP_INTERVAL):
+            # 队列排空后检查点仍落后，或空闲超过间隔时回表，覆盖绕过 add_long_term 直接写 KnowledgeDB 的条目
+            self._request_catch_up()
+        if not batch and self._needs_catch_up and self._queue.empty():
+            batch = self._catch_up_batch()
+        if batch:
+            self._index_batch(batch)
+
+    def _unverified(self) -> bool:
+        """已登记条目全部入库，但检查点尚未经回表确认"""
+        with self._lock:
+            return not self._pending and self.checkpoint < self._latest_id
+
+    def _collect_batch(self, force: bool) -> List[Dict]:
+        """攒批: 满 batch_size、窗口到期或被 flush 唤醒即返回"""
+        batch: List[Dict] = []
+        try:
+            batch.append(self._queue.get(timeout=0 if force else 0.5))
+        except queue.Empty:
+            return batch
+        deadline = time.time() + (0 if force else self.batch_window)
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0 or self._wake.is_set() or self._stop.is_set():
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                continue
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+            except queue.Empty:
+                pass
+        self._wake.clear()
+        return batch
+
+    def _catch_up_batch(self) -> List[Dict]:
+        """从 KnowledgeDB 取 id > 已补齐位置 的条目；取尽时清除补齐标记"""
+        with self._lock:
+            latest = self._latest_id
+        rows = self.knowledge_db.get_knowledge_after(self._caught_up_to, limit=self.batch_size)
+        now = time.time()
+        batch = []
+        with self._lock:
+            for row in rows:
+                self._latest_id = max(self._latest_id, row["id"])
+                if row["id"] in self._indexed_ahead:
+                    continue
+                self._pending.setdefault(row["id"], now)
+                batch.append({"id": row["id"], "content": row["content"], "category": row.get("category", "fact")})
+            if rows:
+                self._caught_up_to = rows[-1]["id"]
+                self._verified_to = max(self._verified_to, self._caught_up_to)
+            else:
+                # 已扫到表尾: 扫描前登记过的 id 要么在库中已确认，要么已被删除
+                self._verified_to = max(self._verified_to, latest)
+            if len(rows) < self.batch_size:
+                self._needs_catch_up = False
+                self._last_catch_up = now
+        if not batch:
+            self._advance_checkpoint()
+        return batch
+
+    def _index_batch(self, batch: List[Dict]):
+        # 同一 id 只保留最后一次内容
+        items = list({item["id"]: item for item in batch}.values())
+        start = time.perf_counter()
+        try:
+            self.vector_storage.upsert_memories(
+                ids=[f"ltm_{item['id']}" for item in items],
+                documents=[item["content"] for item in items],
+                metadatas=[{"knowledge_id": item["id"], "category": item["category"]} for item in items],
+            )
+        except Exception as e:
+            self.failures += 1
+            self._retry = items
+            self._backoff = min(max(self._backoff * 2, 1.0), settings.VECTOR_INDEX_MAX_BACKOFF)
+            logger.warning(f"[VectorIndexer] 批量嵌入失败 ({len(items)} 条)，{self._backoff:.0f}s 后重试: {e}")
+            return
+
+        self._backoff = 0.0
+        self.last_batch_ms = (time.perf_counter() - start) * 1000
+        self.batches += 1
+        self.indexed_total += len(items)
+        with self._lock:
+            for item in items:
+                self._pending.pop(item["id"], None)
+                if item["id"] > self.checkpoint:
+                    self._indexed_ahead.add(item["id"])
+        self._advance_checkpoint()
+        logger.debug(f"[VectorIndexer] 已索引 {len(items)} 条，耗时 {self.last_batch_ms:.1f}ms，检查点 #{self.checkpoint}")
+
+    # ---------------- 检查点 ----------------
+
+    def _advance_checkpoint(self):
+        """
+        低水位 = 最小未完成 id - 1；没有未完成条目时等于已见过的最大 id
+        且不超过回表确认过的位置 (未经 enqueue 直接写库的行只有回表才能发现)
+        """
+        with self._lock:
+            mark = (min(self._pending) - 1) if self._pending else self._latest_id
+            mark = min(mark, self._verified_to)
+            if mark <= self.checkpoint:
+                return
+            self.checkpoint = mark
+            self._indexed_ahead = {i for i in self._indexed_ahead if i > mark}
+        self._save_checkpoint(mark)
+
+    def _load_checkpoint(self) -> int:
+        if not os.path.exists(self.checkpoint_path):
+            return 0
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                return int(json.load(f).get("checkpoint", 0))
+        except Exception as e:
+            logger.warning(f"[VectorIndexer] 检查点读取失败，将从头补齐: {e}")
+            return 0
+
+    def _save_checkpoint(self, mark: int):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"checkpoint": mark, "updated_at": time.time()}, f)
+            os.replace(tmp_path, self.checkpoint_path)
+        except Exception as e:
+            logger.error(f"[VectorIndexer] 检查点写入失败: {e}")
@@ -2,6 +2,13 @@ from .vector import ChromaStorage
 from .local import JsonStorage
 from .diary import DiaryStorage
 from .knowledge_db import KnowledgeDB, knowledge_db
-from .topic_manager import TopicManager
 
 __all__ = ["ChromaStorage", "JsonStorage", "DiaryStorage", "KnowledgeDB", "knowledge_db", "TopicManager"]
+
+
+def __getattr__(name):
+    # TopicManager 依赖 chromadb (导入约 1s)，按需导入，分阶段启动时由后台预热线程加载
+    if name == "TopicManager":
+        from .topic_manager import TopicManager
+        return TopicManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
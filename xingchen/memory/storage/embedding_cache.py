@@ -0,0 +1,276 @@
+"""
+嵌入缓存 (Embedding Cache)
+按 (模型标识, 内容哈希) 缓存向量: 内存 LRU 热层 + SQLite 持久层 (float32 BLOB)。
+以 Chroma embedding_function 的形式挂到各集合上，技能重扫、片段写入、话题检索与
+每轮对话的查询都不再重复计算同一段文本的向量，重启后依然命中。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
+from chromadb.utils import embedding_functions
+
+from xingchen.config.settings import settings
+from xingchen.memory.storage.hashing_embedding import HashingEmbeddingFunction, available_backends
+from xingchen.utils.logger import logger
+
+
+class EmbeddingCache:
+    """
+    两级嵌入缓存
+    - 热层: OrderedDict 实现的 LRU，命中时零拷贝返回
+    - 冷层: SQLite (model, content_hash) 主键表，向量以 float32 字节串存储
+    """
+
+    def __init__(self, db_path: str, hot_size: int = 4096):
+        self.db_path = db_path
+        self.hot_size = hot_size
+        self._hot: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hot_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (model, content_hash)
+            ) WITHOUT ROWID
+        ''')
+        self._conn.commit()
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """批量查找，返回命中的 {hash: vector}"""
+        found: Dict[str, np.ndarray] = {}
+        cold: List[str] = []
+        with self._lock:
+            for h in hashes:
+                vec = self._hot.get((model, h))
+                if vec is not None:
+                    self._hot.move_to_end((model, h))
+                    found[h] = vec
+                    self.hot_hits += 1
+                else:
+                    cold.append(h)
+
+            unique_cold = list(dict.fromkeys(cold))
+            for start in range(0, len(unique_cold), 500):
+                chunk = unique_cold[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, dim, vector FROM embeddings WHERE model = ? "
+                    f"AND content_hash IN ({','.join('?' * len(chunk))})",
+                    (model, *chunk)
+                ).fetchall()
+                for h, dim, blob in rows:
+                    vec = np.frombuffer(blob, dtype=np.float32, count=dim)
+                    found[h] = vec
+                    self._remember((model, h), vec)
+            for h in cold:
+                if h in found:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]):
+        """写入新计算的向量 (两级同时写)"""
+        if not items:
+            return
+        rows = []
+        with self._lock:
+            for h, vec in items.items():
+                vec = np.ascontiguousarray(vec, dtype=np.float32)
+                self._remember((model, h), vec)
+                rows.append((model, h, int(vec.shape[0]), vec.tobytes()))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def _remember(self, key: tuple, vec: np.ndarray):
+        self._hot[key] = vec
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hot_hits + self.disk_hits + self.misses
+            stored = self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+            return {
+                "lookups": lookups,
+                "hot_hits": self.hot_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hot_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "hot_size": len(self._hot),
+                "stored": stored,
+            }
+
+
+class _DelegatedName:
+    """
+    name() 既要能在实例上调用 (集合配置)，也要能在类上调用 (Chroma 按类注册 embedding function)
+    两种情况都透传底层模型的名称
+    """
+
+    def __get__(self, obj, owner):
+        if obj is not None:
+            return obj.base.name
+        base_class = getattr(owner, "_base_class", None)
+        return base_class.name if base_class is not None else (lambda: "cached")
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    带缓存的 embedding_function 包装器
+    name()/get_config() 透传底层模型，已持久化的集合不会因为换了包装而报 embedding 冲突
+    """
+
+    _base_class = None
+    name = _DelegatedName()
+
+    def __init__(self, base: EmbeddingFunction, cache: EmbeddingCache, model_id: str = None):
+        self.base = base
+        self.cache = cache
+        self.model_id = model_id or self._model_id(base)
+        self.embed_calls = 0
+        self.embed_ms = 0.0
+
+    @staticmethod
+    def _model_id(base) -> str:
+        name = base.name()
+        try:
+            config = base.get_config()
+        except Exception:
+            config = None
+        if config and config is not NotImplemented:
+            return f"{name}:{json.dumps(config, sort_keys=True, ensure_ascii=False)}"
+        return name
+
+    def __call__(self, input: Documents) -> Embeddings:
+        texts = list(input)
+        hashes = [EmbeddingCache.content_hash(t) for t in texts]
+        found = self.cache.get_many(self.model_id, hashes)
+
+        missing: Dict[str, str] = {}
+        for h, text in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = text
+        if missing:
+            start = time.perf_counter()
+            vectors = self.base(list(missing.values()))
+            self.embed_ms += (time.perf_counter() - start) * 1000
+            self.embed_calls += 1
+            fresh = {h: np.asarray(v, dtype=np.float32) for h, v in zip(missing.keys(), vectors)}
+            self.cache.put_many(self.model_id, fresh)
+            found.update(fresh)
+            logger.debug(f"[EmbeddingCache] 新计算 {len(missing)}/{len(texts)} 条向量，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return [found[h] for h in hashes]
+
+    @classmethod
+    def wrap(cls, base: EmbeddingFunction, cache: EmbeddingCache) -> "CachedEmbeddingFunction":
+        """为底层模型类派生专属子类，使 Chroma 按名称重建时仍能得到带缓存的同一模型"""
+        base_class = type(base)
+        subclass = _wrapped_classes.get(base_class)
+        if subclass is None:
+            subclass = type(f"Cached{base_class.__name__}", (cls,), {"_base_class": base_class})
+            _wrapped_classes[base_class] = subclass
+        return subclass(base, cache)
+
+    def get_config(self) -> Dict:
+        return self.base.get_config()
+
+    @classmethod
+    def build_from_config(cls, config: Dict) -> "EmbeddingFunction[Documents]":
+        if cls._base_class is None:
+            return get_embedding_function()
+        return cls(cls._base_class.build_from_config(config), get_embedding_cache())
+
+    def default_space(self):
+        return self.base.default_space()
+
+    def supported_spaces(self):
+        return self.base.supported_spaces()
+
+    def stats(self) -> Dict:
+        stats = self.cache.stats()
+        stats.update({"model": self.model_id, "embed_calls": self.embed_calls, "embed_ms": self.embed_ms})
+        return stats
+
+
+_wrapped_classes: Dict[type, type] = {}
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_functions: Dict[str, EmbeddingFunction] = {}
+_embedding_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """获取进程内共享的嵌入缓存"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, hot_size=settings.EMBEDDING_CACHE_HOT_SIZE)
+                logger.info(f"[EmbeddingCache] 嵌入缓存已启用: {settings.EMBEDDING_CACHE_PATH}")
+    return _embedding_cache
+
+
+def backend_for(collection: str) -> str:
+    """集合使用的嵌入后端 (按集合覆盖 > 全局设置)"""
+    backend = settings.EMBEDDING_BACKEND_OVERRIDES.get(collection, settings.EMBEDDING_BACKEND)
+    if backend not in available_backends():
+        logger.warning(f"[EmbeddingCache] 未知嵌入后端 '{backend}'，集合 {collection} 回退为 default")
+        return "default"
+    return backend
+
+
+def get_embedding_function(backend: str = "default") -> EmbeddingFunction:
+    """
+    获取进程内共享的 embedding_function (ChromaStorage 与 TopicManager 共用)
+    - default: Chroma 默认模型 + 内容寻址缓存
+    - hashing: 离线哈希嵌入，计算比查缓存还快，不再包一层缓存
+    """
+    ef = _embedding_functions.get(backend)
+    if ef is None:
+        cache = get_embedding_cache() if backend == "default" else None
+        with _embedding_lock:
+            ef = _embedding_functions.get(backend)
+            if ef is None:
+                if backend == "hashing":
+                    ef = HashingEmbeddingFunction(dim=settings.HASHING_EMBEDDING_DIM)
+                else:
+                    ef = CachedEmbeddingFunction.wrap(embedding_functions.DefaultEmbeddingFunction(), cache)
+                _embedding_functions[backend] = ef
+    return ef
+
+
+def resolve_collection(collection: str):
+    """
+    解析集合的实际名称与 embedding_function
+    非默认后端使用带后缀的独立集合 (如 fragments__hashing): 向量空间不同不能混存，
+    Chroma 也不允许同一集合换 embedding_function；切回 default 时原集合原封不动
+    """
+    backend = backend_for(collection)
+    name = collection if backend == "default" else f"{collection}__{backend}"
+    return name, get_embedding_function(backend)
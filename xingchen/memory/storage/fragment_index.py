@@ -0,0 +1,164 @@
+"""
+片段元数据侧索引 (Fragment Index)
+ChromaDB 不能按元数据排序，最近活跃 / 权重最高 / 按话题列出这类查询改由 SQLite 侧索引回答，
+Chroma 只负责向量。TopicManager 每次写入片段时同步更新本索引。
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+_COLUMNS = ("id", "topic_id", "task_id", "category", "created_at", "last_activated", "weight", "mention_count", "fingerprint")
+
+
+class FragmentIndex:
+    """
+    片段元数据索引 (id 主键，另有 last_activated / weight / topic / fingerprint 索引)
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # 写入计数 (进程内)：未变化时派生缓存无需再查库校验
+        self.revision = 0
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS fragment_meta (
+                id TEXT PRIMARY KEY,
+                topic_id TEXT NOT NULL DEFAULT 'none',
+                task_id TEXT NOT NULL DEFAULT 'none',
+                category TEXT,
+                created_at TEXT,
+                last_activated TEXT,
+                weight REAL NOT NULL DEFAULT 1.0,
+                mention_count INTEGER NOT NULL DEFAULT 1,
+                fingerprint TEXT
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_fragment_recent ON fragment_meta(last_activated);
+            CREATE INDEX IF NOT EXISTS idx_fragment_weight ON fragment_meta(weight);
+            CREATE INDEX IF NOT EXISTS idx_fragment_topic ON fragment_meta(topic_id, last_activated);
+            CREATE INDEX IF NOT EXISTS idx_fragment_fingerprint ON fragment_meta(fingerprint);
+        ''')
+        self._conn.commit()
+
+    @staticmethod
+    def _row_from_meta(fragment_id: str, meta: Dict) -> tuple:
+        return (
+            fragment_id,
+            meta.get("topic_id") or "none",
+            meta.get("task_id") or "none",
+            meta.get("category"),
+            meta.get("created_at"),
+            meta.get("last_activated") or meta.get("created_at"),
+            float(meta.get("weight", 1.0)),
+            int(meta.get("mention_count", 1)),
+            meta.get("fingerprint"),
+        )
+
+    def upsert(self, fragment_id: str, meta: Dict):
+        self.upsert_many([fragment_id], [meta])
+
+    def upsert_many(self, ids: List[str], metadatas: List[Dict]):
+        """按 Chroma 中的片段元数据写入/覆盖"""
+        if not ids:
+            return
+        rows = [self._row_from_meta(i, m or {}) for i, m in zip(ids, metadatas)]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO fragment_meta ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                rows
+            )
+            self._conn.commit()
+            self.revision += 1
+
+    def delete_many(self, ids: Iterable[str]):
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM fragment_meta WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+            self.revision += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM fragment_meta")
+            self._conn.commit()
+            self.revision += 1
+
+    def count(self, topic_id: Optional[str] = None) -> int:
+        with self._lock:
+            if topic_id is not None:
+                return self._conn.execute("SELECT count(*) FROM fragment_meta WHERE topic_id = ?", (topic_id,)).fetchone()[0]
+            return self._conn.execute("SELECT count(*) FROM fragment_meta").fetchone()[0]
+
+    def _select(self, where: str, params: tuple, order: str, limit: int) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM fragment_meta {where} ORDER BY {order} LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, limit: int = 5, topic_id: Optional[str] = None) -> List[Dict]:
+        """最近活跃的片段"""
+        if topic_id:
+            return self._select("WHERE topic_id = ?", (topic_id,), "last_activated DESC", limit)
+        return self._select("", (), "last_activated DESC", limit)
+
+    def top_weighted(self, limit: int = 5, topic_id: Optional[str] = None) -> List[Dict]:
+        """权重最高的片段 (同权重按最近活跃)"""
+        if topic_id:
+            return self._select("WHERE topic_id = ?", (topic_id,), "weight DESC, last_activated DESC", limit)
+        return self._select("", (), "weight DESC, last_activated DESC", limit)
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict]:
+        """按 id 批量取元数据"""
+        found: Dict[str, Dict] = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM fragment_meta WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            found.update({row["id"]: dict(row) for row in rows})
+        return found
+
+    def topic_members(self, topic_id: str) -> List[tuple]:
+        """某话题下全部片段的 (id, task_id)"""
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(
+                "SELECT id, task_id FROM fragment_meta WHERE topic_id = ?", (topic_id,)
+            ).fetchall()]
+
+    def topic_activity(self) -> List[tuple]:
+        """各话题的 (topic_id, 片段数)，按最近活跃排序"""
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(
+                "SELECT topic_id, count(*) FROM fragment_meta GROUP BY topic_id ORDER BY max(last_activated) DESC"
+            ).fetchall()]
+
+    def get_by_fingerprints(self, fingerprints: List[str]) -> Dict[str, Dict]:
+        """
+        按指纹批量查找已有片段
+        旧版本同一内容在不同日期会生成多条，此时取提及次数最多 (其次最近活跃) 的那条
+        """
+        found: Dict[str, Dict] = {}
+        fingerprints = list(dict.fromkeys(fingerprints))
+        for start in range(0, len(fingerprints), 500):
+            chunk = fingerprints[start:start + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM fragment_meta WHERE fingerprint IN ({','.join('?' * len(chunk))}) "
+                    f"ORDER BY mention_count DESC, last_activated DESC",
+                    chunk
+                ).fetchall()
+            for row in rows:
+                found.setdefault(row["fingerprint"], dict(row))
+        return found
@@ -64,25 +64,16 @@ class GraphMemory:
         in_edges = self.db.get_edges(target=entity)
         return out_edges + in_edges
 
-    def get_path(self, source: str, target: str) -> List[str]:
+    def get_path(self, source: str, target: str, max_depth: int = 3) -> List[str]:
         """
-        寻找两个实体之间的最短路径
+        寻找两个实体之间的最短路径 (内存 CSR 快照上的双向 BFS)
         """
-        queue = [(source, [source])]
-        visited = set()
-        
-        while queue:
-            (vertex, path) = queue.pop(0)
-            if len(path) > 3: # 限制深度为 3
-                continue
-                
-            if vertex not in visited:
-                visited.add(vertex)
-                neighbors = self.db.get_related_nodes(vertex, limit=20)
-                for neighbor_info in neighbors:
-                    neighbor = neighbor_info['neighbor']
-                    if neighbor == target:
-                        return path + [target]
-                    else:
-                        queue.append((neighbor, path + [neighbor]))
-        return []
+        index = self.db.get_graph_index()
+        return index.shortest_path(source, target, max_depth=max_depth, min_weight=0.5)
+
+    def get_neighborhood(self, entity: str, k: int = 2, min_weight: float = 0.5) -> List[str]:
+        """
+        获取实体的 k 跳邻域 (按跳数升序)
+        """
+        index = self.db.get_graph_index()
+        return index.k_hop(entity, k=k, min_weight=min_weight)
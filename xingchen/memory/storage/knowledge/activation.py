@@ -0,0 +1,125 @@
+"""
+扩散激活引擎 (Spreading Activation)
+从用户输入中的实体出发，沿边权重做 k 步带衰减的激活传播，返回激活度最高的节点与边。
+每一步只展开当前活跃的节点 (稀疏矩阵-向量乘)，代价与被激活的子图相关而与全图规模无关。
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from xingchen.memory.storage.knowledge.graph_index import GraphIndex
+
+
+class SpreadingActivation:
+    """
+    扩散激活
+
+    每一步: a' = decay * (W_norm · a)
+    - W_norm 为按源节点出权重和归一化的边权 (抑制枢纽节点的激活爆炸)
+    - 低于 threshold 的激活值被截断，不再向外扩散
+    - 每步只保留激活度最高的 max_frontier 个节点继续扩散
+    - 度数超过 max_fan_out 的枢纽节点只接收激活、不再向外扩散
+      (归一化后它分给每个邻居的激活本就低于阈值，展开它只会白白遍历数万条边)
+    - 超过时间预算时提前结束，保证交互路径的延迟上限
+    """
+
+    def __init__(self, index: GraphIndex, steps: int = 3, decay: float = 0.6,
+                 threshold: float = 0.01, min_weight: float = 0.0, budget_ms: float = 5.0,
+                 max_frontier: int = 256, max_fan_out: int = 2000):
+        self.index = index
+        self.steps = steps
+        self.decay = decay
+        self.threshold = threshold
+        self.min_weight = min_weight
+        self.budget_ms = budget_ms
+        self.max_frontier = max_frontier
+        self.max_fan_out = max_fan_out
+
+    def run(self, seeds: List[str], seed_energy: float = 1.0) -> Optional[np.ndarray]:
+        """
+        执行激活传播
+        :return: 每个节点的累计激活值 (float32 向量)；没有可用种子时返回 None
+        """
+        index = self.index
+        # 整个传播过程持有索引锁: Navigator 线程的 add_edge / compact 会改写或替换 CSR 数组与增量缓冲
+        with index._lock:
+            seed_ids = index.ids_of(seeds)
+            if not seed_ids:
+                return None
+
+            deadline = time.perf_counter() + self.budget_ms / 1000.0
+            total = np.zeros(index.num_nodes, dtype=np.float32)
+            frontier = np.unique(np.asarray(seed_ids, dtype=np.int32))
+            energy = np.full(len(frontier), seed_energy, dtype=np.float32)
+            total[frontier] += energy
+
+            # 全程只在被触达的节点上做稀疏运算，避免每步都扫描长度为 N 的稠密向量
+            for _ in range(self.steps):
+                keep = self._fan_out_mask(frontier)
+                frontier, energy = frontier[keep], energy[keep]
+                parents, neighbors, weights = index.expand(frontier, self.min_weight)
+                if not len(neighbors):
+                    break
+                # 按源节点的出权重和归一化 (frontier 已排序，可直接二分定位 parents)
+                slot = np.searchsorted(frontier, parents)
+                out_sum = np.bincount(slot, weights=weights, minlength=len(frontier))
+                contrib = energy[slot] * weights / out_sum[slot]
+                touched, inverse = np.unique(neighbors, return_inverse=True)
+                nxt = (np.bincount(inverse, weights=contrib) * self.decay).astype(np.float32)
+                alive = nxt >= self.threshold
+                touched, nxt = touched[alive], nxt[alive]
+                if not len(touched):
+                    break
+                total[touched] += nxt
+                if len(touched) > self.max_frontier:
+                    top = np.sort(np.argpartition(nxt, -self.max_frontier)[-self.max_frontier:])
+                    touched, nxt = touched[top], nxt[top]
+                frontier, energy = touched, nxt
+                if time.perf_counter() > deadline:
+                    break
+            return total
+
+    def _fan_out_mask(self, frontier: np.ndarray) -> np.ndarray:
+        """CSR 中度数不超过 max_fan_out 的节点 (增量缓冲中的新节点度数很小，直接保留)"""
+        indptr = self.index.indptr
+        in_csr = frontier < len(indptr) - 1
+        degree = np.zeros(len(frontier), dtype=np.int64)
+        degree[in_csr] = indptr[frontier[in_csr] + 1] - indptr[frontier[in_csr]]
+        return degree <= self.max_fan_out
+
+    def top_nodes(self, activation: np.ndarray, seeds: List[str], top_n: int = 8) -> List[Dict]:
+        """激活度最高的非种子节点"""
+        scores = activation.copy()
+        scores[self.index.ids_of(seeds)] = 0.0
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return []
+        if len(candidates) > top_n:
+            part = np.argpartition(scores[candidates], -top_n)[-top_n:]
+            candidates = candidates[part]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+        return [
+            {"name": self.index.node_names[i], "activation": float(scores[i])}
+            for i in candidates
+        ]
+
+    def activate(self, seeds: List[str], top_n: int = 8, edge_limit: int = 12) -> Dict:
+        """
+        一次完整的联想: 传播 + 取 Top-N 节点 + 收集它们与种子之间的边
+        :return: {"seeds": [...], "nodes": [...], "edges": [...], "elapsed_ms": float}
+        """
+        t0 = time.perf_counter()
+        activation = self.run(seeds)
+        if activation is None:
+            return {"seeds": [], "nodes": [], "edges": [], "elapsed_ms": 0.0}
+        nodes = self.top_nodes(activation, seeds, top_n=top_n)
+        member_ids = self.index.ids_of(list(seeds) + [n["name"] for n in nodes])
+        edges = self.index.edges_among(member_ids, limit=edge_limit)
+        return {
+            "seeds": [s for s in seeds if s in self.index.node_ids],
+            "nodes": nodes,
+            "edges": edges,
+            "elapsed_ms": (time.perf_counter() - t0) * 1000,
+        }
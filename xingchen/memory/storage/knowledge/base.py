@@ -1,9 +1,26 @@
 import sqlite3
 import os
+import threading
 import json
+from typing import Any, Callable, Dict, Optional, Tuple
 from xingchen.config.settings import settings
 from xingchen.utils.logger import logger
 
+# 变更计数触发器: (计数名, 表, 触发事件)。只跟踪会影响派生内存结构的列 (访问统计、置信度等更新不计)
+_CHANGE_TRIGGERS = [
+    ("knowledge", "knowledge", "INSERT"),
+    ("knowledge", "knowledge", "DELETE"),
+    ("knowledge", "knowledge", "UPDATE OF content, category, meta, created_at"),
+    ("entities", "entities", "INSERT"),
+    ("entities", "entities", "DELETE"),
+    ("entities", "entities", "UPDATE"),
+    ("graph", "nodes", "INSERT"),
+    ("graph", "nodes", "DELETE"),
+    ("graph", "edges", "INSERT"),
+    ("graph", "edges", "DELETE"),
+    ("graph", "edges", "UPDATE OF source, target, relation, weight"),
+]
+
 class KnowledgeBase:
     """
     知识库基础 Mixin: 负责数据库连接管理与表结构初始化
@@ -12,6 +29,11 @@ class KnowledgeBase:
         if not getattr(self, "db_path", None):
             self.db_path = settings.KNOWLEDGE_DB_PATH
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # 派生的内存索引与未落库的访问统计随数据库重新初始化而失效
+        self._graph_index = None
+        # 每个库实例各自一把构建锁，一个库的慢构建不阻塞其他库
+        self._graph_index_lock = threading.Lock()
+        self._access_buffer = {}
         self._init_db_schema()
 
     def _init_db(self):
@@ -91,15 +113,88 @@ class KnowledgeBase:
                     weight FLOAT DEFAULT 1.0,
                     meta TEXT,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    last_activated DATETIME,
                     FOREIGN KEY(source) REFERENCES nodes(name),
                     FOREIGN KEY(target) REFERENCES nodes(name),
                     UNIQUE(source, target, relation)
                 )
             ''')
-            
+
+            # 旧库迁移: edges 补充 last_activated (ALTER TABLE 不支持非常量默认值，NULL 视为 created_at)
+            self._ensure_column(cursor, "edges", "last_activated", "DATETIME")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target)")
+
+            # 知识近重复索引 (MinHash LSH 分段 -> 知识 id)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS knowledge_lsh (
+                    band INTEGER NOT NULL,
+                    knowledge_id INTEGER NOT NULL,
+                    PRIMARY KEY (band, knowledge_id)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_lsh_id ON knowledge_lsh(knowledge_id)")
+
+            # 旧库迁移: knowledge 补充访问统计 (冷热分层的留存得分依据)
+            self._ensure_column(cursor, "knowledge", "access_count", "INTEGER DEFAULT 0")
+            self._ensure_column(cursor, "knowledge", "last_accessed", "DATETIME")
+
+            # 变更计数 (启动快照的高水位): 触发器在写入时递增，epoch 随数据库文件新建而变化
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS change_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute("INSERT OR IGNORE INTO change_versions (name, version) VALUES ('epoch', abs(random()))")
+            for name, table, event in _CHANGE_TRIGGERS:
+                cursor.execute("INSERT OR IGNORE INTO change_versions (name, version) VALUES (?, 0)", (name,))
+                trigger = f"trg_version_{table}_{event.split()[0].lower()}"
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE change_versions SET version = version + 1 WHERE name = '{name}';
+                    END
+                ''')
+
+            # 周期维护的水位 (如图谱衰减的截止时间)，保证重复触发的维护不会重复生效
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS maintenance_state (
+                    name TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+
             conn.commit()
         logger.info(f"[KnowledgeBase] 数据库表结构初始化成功: {self.db_path}")
 
+    def get_change_versions(self) -> Dict[str, int]:
+        """各类数据的变更计数 ({"epoch", "knowledge", "entities", "graph"})，用于校验派生缓存是否过期"""
+        with self._get_conn() as conn:
+            return dict(conn.execute("SELECT name, version FROM change_versions").fetchall())
+
+    def snapshot_stamp(self, *names: str) -> Dict[str, int]:
+        """启动快照段的版本戳: 数据库 epoch + 指定数据的变更计数"""
+        versions = self.get_change_versions()
+        return {"epoch": versions.get("epoch"), **{name: versions.get(name) for name in names}}
+
+    def build_versioned(self, names, build_fn: Callable[[], Any]) -> Optional[Tuple[Dict[str, int], Any]]:
+        """
+        构建一份带版本戳的派生数据: 构建前后变更计数不一致 (期间有写入) 时返回 None，
+        保证写入快照的数据与版本戳对应
+        """
+        before = self.snapshot_stamp(*names)
+        value = build_fn()
+        if self.snapshot_stamp(*names) != before:
+            return None
+        return before, value
+
+    @staticmethod
+    def _ensure_column(cursor, table: str, column: str, decl: str):
+        """列不存在时追加 (幂等)"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
     def get_stats(self):
         """获取数据库统计信息 (Production Monitoring)"""
         stats = {}
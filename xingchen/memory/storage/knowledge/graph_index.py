@@ -0,0 +1,467 @@
+"""
+图谱邻接快照 (CSR Adjacency Snapshot)
+将 nodes/edges 表一次性加载为压缩稀疏行 (CSR) 结构，节点映射为连续整数 ID。
+BFS、双向最短路径与 k 跳邻域查询全部在内存中完成，不再逐节点访问 SQLite。
+"""
+
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from xingchen.utils.logger import logger
+
+# 方向标记: 边在当前行节点上是出边还是入边
+DIRECTION_OUT = 1
+DIRECTION_IN = 0
+
+
+class GraphIndex:
+    """
+    内存图谱索引 (CSR)
+
+    - 每条边以无向方式存两份 (source 行的出边 + target 行的入边)，与 get_related_nodes 的语义一致
+    - add_edge 的新边先进入增量缓冲，超过阈值后合并进 CSR (compact)
+    - 已存在边的权重更新直接原地修改 CSR
+    """
+
+    # 增量缓冲占 CSR 边数的比例超过该值时触发合并
+    COMPACT_RATIO = 0.1
+    COMPACT_MIN_PENDING = 4096
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.node_ids: Dict[str, int] = {}
+        self.node_names: List[str] = []
+        self.relation_ids: Dict[str, int] = {}
+        self.relation_names: List[str] = []
+
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.edge_relations = np.zeros(0, dtype=np.int32)
+        self.edge_directions = np.zeros(0, dtype=np.int8)
+
+        # 增量缓冲: node_id -> {(neighbor_id, relation_id, direction): weight}
+        self._pending: Dict[int, Dict[Tuple[int, int, int], float]] = {}
+        self._pending_count = 0
+
+    # ------------------------------------------------------------------ #
+    # 构建
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def from_db(cls, conn) -> "GraphIndex":
+        """从 KnowledgeDB 连接构建快照"""
+        index = cls()
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM nodes")
+        for (name,) in cursor.fetchall():
+            index._get_or_create_node(name)
+
+        cursor.execute("SELECT source, target, relation, weight FROM edges")
+        rows = cursor.fetchall()
+        src = np.empty(len(rows), dtype=np.int32)
+        dst = np.empty(len(rows), dtype=np.int32)
+        rel = np.empty(len(rows), dtype=np.int32)
+        wgt = np.empty(len(rows), dtype=np.float32)
+        for i, (source, target, relation, weight) in enumerate(rows):
+            src[i] = index._get_or_create_node(source)
+            dst[i] = index._get_or_create_node(target)
+            rel[i] = index._get_or_create_relation(relation or "RELATED_TO")
+            wgt[i] = weight if weight is not None else 1.0
+
+        index._build(src, dst, wgt, rel)
+        logger.info(f"[GraphIndex] 快照构建完成: {len(index.node_names)} 节点, {len(rows)} 边")
+        return index
+
+    @classmethod
+    def from_arrays(cls, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray = None,
+                    relations: np.ndarray = None, node_names: List[str] = None) -> "GraphIndex":
+        """从整数边数组直接构建 (用于批量导入与基准测试)"""
+        index = cls()
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+        num_nodes = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+        if node_names is None:
+            node_names = [str(i) for i in range(num_nodes)]
+        for name in node_names:
+            index._get_or_create_node(name)
+        if weights is None:
+            weights = np.ones(len(sources), dtype=np.float32)
+        if relations is None:
+            relations = np.full(len(sources), index._get_or_create_relation("RELATED_TO"), dtype=np.int32)
+        index._build(sources, targets, np.asarray(weights, dtype=np.float32), np.asarray(relations, dtype=np.int32))
+        return index
+
+    def _build(self, src: np.ndarray, dst: np.ndarray, wgt: np.ndarray, rel: np.ndarray):
+        """由边列表生成无向 CSR"""
+        num_nodes = len(self.node_names)
+        rows = np.concatenate([src, dst])
+        cols = np.concatenate([dst, src])
+        directions = np.concatenate([
+            np.full(len(src), DIRECTION_OUT, dtype=np.int8),
+            np.full(len(dst), DIRECTION_IN, dtype=np.int8),
+        ])
+        order = np.argsort(rows, kind="stable")
+
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_nodes), out=self.indptr[1:])
+        self.indices = cols[order].astype(np.int32, copy=False)
+        self.weights = np.concatenate([wgt, wgt])[order]
+        self.edge_relations = np.concatenate([rel, rel])[order]
+        self.edge_directions = directions[order]
+        self._pending = {}
+        self._pending_count = 0
+
+    def _get_or_create_node(self, name: str) -> int:
+        node_id = self.node_ids.get(name)
+        if node_id is None:
+            node_id = len(self.node_names)
+            self.node_ids[name] = node_id
+            self.node_names.append(name)
+        return node_id
+
+    def _get_or_create_relation(self, relation: str) -> int:
+        relation_id = self.relation_ids.get(relation)
+        if relation_id is None:
+            relation_id = len(self.relation_names)
+            self.relation_ids[relation] = relation_id
+            self.relation_names.append(relation)
+        return relation_id
+
+    # ------------------------------------------------------------------ #
+    # 增量更新
+    # ------------------------------------------------------------------ #
+    def add_node(self, name: str) -> int:
+        """注册节点 (已存在则直接返回 ID)"""
+        with self._lock:
+            return self._get_or_create_node(name)
+
+    def add_edge(self, source: str, target: str, relation: str = "RELATED_TO", weight: float = 1.0):
+        """增量写入一条边 (与 SQLite 的 UPSERT 语义一致)"""
+        with self._lock:
+            src = self._get_or_create_node(source)
+            dst = self._get_or_create_node(target)
+            rel = self._get_or_create_relation(relation or "RELATED_TO")
+            self._upsert_half(src, dst, rel, DIRECTION_OUT, weight)
+            self._upsert_half(dst, src, rel, DIRECTION_IN, weight)
+            if self._pending_count > max(self.COMPACT_MIN_PENDING, self.COMPACT_RATIO * len(self.indices)):
+                self.compact()
+
+    def _upsert_half(self, row: int, col: int, rel: int, direction: int, weight: float):
+        # 1. CSR 中已有该边: 原地更新权重
+        if row + 1 < len(self.indptr):
+            start, end = self.indptr[row], self.indptr[row + 1]
+            if end > start:
+                hits = np.flatnonzero(
+                    (self.indices[start:end] == col)
+                    & (self.edge_relations[start:end] == rel)
+                    & (self.edge_directions[start:end] == direction)
+                )
+                if len(hits):
+                    self.weights[start + hits[0]] = weight
+                    return
+        # 2. 写入增量缓冲
+        bucket = self._pending.setdefault(row, {})
+        key = (col, rel, direction)
+        if key not in bucket:
+            self._pending_count += 1
+        bucket[key] = weight
+
+    def compact(self):
+        """将增量缓冲合并进 CSR"""
+        with self._lock:
+            if not self._pending_count and len(self.indptr) == len(self.node_names) + 1:
+                return
+            num_nodes = len(self.node_names)
+            old_rows = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int32), np.diff(self.indptr))
+
+            new_rows, new_cols, new_wgt, new_rel, new_dir = [], [], [], [], []
+            for row, bucket in self._pending.items():
+                for (col, rel, direction), weight in bucket.items():
+                    new_rows.append(row)
+                    new_cols.append(col)
+                    new_wgt.append(weight)
+                    new_rel.append(rel)
+                    new_dir.append(direction)
+
+            rows = np.concatenate([old_rows, np.asarray(new_rows, dtype=np.int32)])
+            cols = np.concatenate([self.indices, np.asarray(new_cols, dtype=np.int32)])
+            wgt = np.concatenate([self.weights, np.asarray(new_wgt, dtype=np.float32)])
+            rel = np.concatenate([self.edge_relations, np.asarray(new_rel, dtype=np.int32)])
+            directions = np.concatenate([self.edge_directions, np.asarray(new_dir, dtype=np.int8)])
+
+            order = np.argsort(rows, kind="stable")
+            self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=num_nodes), out=self.indptr[1:])
+            self.indices = cols[order]
+            self.weights = wgt[order]
+            self.edge_relations = rel[order]
+            self.edge_directions = directions[order]
+            self._pending = {}
+            self._pending_count = 0
+
+    # ------------------------------------------------------------------ #
+    # 快照序列化 (启动快照)
+    # ------------------------------------------------------------------ #
+    def to_snapshot(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """导出为 (名称表, CSR 数组)，增量缓冲先合并"""
+        with self._lock:
+            self.compact()
+            names = {"node_names": list(self.node_names), "relation_names": list(self.relation_names)}
+            arrays = {
+                "indptr": self.indptr,
+                "indices": self.indices,
+                "weights": self.weights,
+                "edge_relations": self.edge_relations,
+                "edge_directions": self.edge_directions,
+            }
+            return names, arrays
+
+    @classmethod
+    def from_snapshot(cls, names: Dict, arrays: Dict[str, np.ndarray]) -> "GraphIndex":
+        """由 to_snapshot 的输出恢复 (只重建名称到 ID 的字典，CSR 直接沿用)"""
+        index = cls()
+        index.node_names = list(names["node_names"])
+        index.node_ids = {name: i for i, name in enumerate(index.node_names)}
+        index.relation_names = list(names["relation_names"])
+        index.relation_ids = {name: i for i, name in enumerate(index.relation_names)}
+        index.indptr = arrays["indptr"]
+        index.indices = arrays["indices"]
+        index.weights = arrays["weights"]
+        index.edge_relations = arrays["edge_relations"]
+        index.edge_directions = arrays["edge_directions"]
+        return index
+
+    # ------------------------------------------------------------------ #
+    # 查询
+    # ------------------------------------------------------------------ #
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_names)
+
+    @property
+    def num_edges(self) -> int:
+        """有向边数量 (无向存储的一半)"""
+        return (len(self.indices) + self._pending_count) // 2
+
+    def expand(self, frontier: np.ndarray, min_weight: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        向量化扩展一层邻居
+        :return: (parents, neighbors, weights) 三者一一对应
+        """
+        with self._lock:
+            csr_frontier = frontier[frontier < len(self.indptr) - 1]
+            starts = self.indptr[csr_frontier]
+            counts = self.indptr[csr_frontier + 1] - starts
+            total = int(counts.sum())
+            if total:
+                offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+                parents = np.repeat(csr_frontier, counts)
+                neighbors = self.indices[offsets]
+                weights = self.weights[offsets]
+                if min_weight > 0:
+                    keep = weights >= min_weight
+                    parents, neighbors, weights = parents[keep], neighbors[keep], weights[keep]
+            else:
+                parents = np.zeros(0, dtype=np.int32)
+                neighbors = np.zeros(0, dtype=np.int32)
+                weights = np.zeros(0, dtype=np.float32)
+
+            if self._pending:
+                extra_parents, extra_neighbors, extra_weights = [], [], []
+                for node in frontier.tolist():
+                    bucket = self._pending.get(node)
+                    if not bucket:
+                        continue
+                    for (col, _rel, _direction), weight in bucket.items():
+                        if weight >= min_weight:
+                            extra_parents.append(node)
+                            extra_neighbors.append(col)
+                            extra_weights.append(weight)
+                if extra_parents:
+                    parents = np.concatenate([parents, np.asarray(extra_parents, dtype=np.int32)])
+                    neighbors = np.concatenate([neighbors, np.asarray(extra_neighbors, dtype=np.int32)])
+                    weights = np.concatenate([weights, np.asarray(extra_weights, dtype=np.float32)])
+            return parents, neighbors, weights
+
+    def neighbors(self, name: str, min_weight: float = 0.0) -> List[Dict]:
+        """单节点的一跳邻居 (含关系、方向与权重)，按权重降序"""
+        with self._lock:
+            node = self.node_ids.get(name)
+            if node is None:
+                return []
+            results = []
+            if node < len(self.indptr) - 1:
+                start, end = self.indptr[node], self.indptr[node + 1]
+                for pos in range(start, end):
+                    weight = float(self.weights[pos])
+                    if weight >= min_weight:
+                        results.append({
+                            "direction": "out" if self.edge_directions[pos] == DIRECTION_OUT else "in",
+                            "neighbor": self.node_names[self.indices[pos]],
+                            "relation": self.relation_names[self.edge_relations[pos]],
+                            "weight": weight,
+                        })
+            for (col, rel, direction), weight in self._pending.get(node, {}).items():
+                if weight >= min_weight:
+                    results.append({
+                        "direction": "out" if direction == DIRECTION_OUT else "in",
+                        "neighbor": self.node_names[col],
+                        "relation": self.relation_names[rel],
+                        "weight": float(weight),
+                    })
+            results.sort(key=lambda x: x["weight"], reverse=True)
+            return results
+
+    def bfs(self, source: str, max_depth: int = 3, min_weight: float = 0.0) -> Dict[str, int]:
+        """
+        广度优先遍历
+        :return: {节点名: 跳数}，包含起点 (跳数 0)
+        """
+        with self._lock:
+            start = self.node_ids.get(source)
+            if start is None:
+                return {}
+            depth = np.full(self.num_nodes, -1, dtype=np.int32)
+            depth[start] = 0
+            frontier = np.asarray([start], dtype=np.int32)
+            for level in range(1, max_depth + 1):
+                _, neighbors, _ = self.expand(frontier, min_weight)
+                if not len(neighbors):
+                    break
+                neighbors = neighbors[depth[neighbors] < 0]
+                if not len(neighbors):
+                    break
+                # 重复下标的赋值结果一致，用掩码代替 np.unique 排序去重
+                depth[neighbors] = level
+                frontier = np.flatnonzero(depth == level).astype(np.int32)
+            reached = np.flatnonzero(depth >= 0)
+            return {self.node_names[i]: int(depth[i]) for i in reached}
+
+    def k_hop(self, name: str, k: int = 2, min_weight: float = 0.0) -> List[str]:
+        """k 跳邻域 (不含起点)，按跳数升序"""
+        reached = self.bfs(name, max_depth=k, min_weight=min_weight)
+        reached.pop(name, None)
+        return sorted(reached, key=reached.get)
+
+    def shortest_path(self, source: str, target: str, max_depth: int = 3, min_weight: float = 0.0) -> List[str]:
+        """
+        双向 BFS 最短路径
+        :param max_depth: 允许的最大跳数
+        :return: 节点名列表 (含两端)，不可达时返回 []
+        """
+        with self._lock:
+            src = self.node_ids.get(source)
+            dst = self.node_ids.get(target)
+            if src is None or dst is None:
+                return []
+            if src == dst:
+                return [source]
+
+            n = self.num_nodes
+            # parent 数组: -1 未访问; 起点指向自身
+            parent_fwd = np.full(n, -1, dtype=np.int64)
+            parent_bwd = np.full(n, -1, dtype=np.int64)
+            parent_fwd[src] = src
+            parent_bwd[dst] = dst
+            frontier_fwd = np.asarray([src], dtype=np.int32)
+            frontier_bwd = np.asarray([dst], dtype=np.int32)
+            hops = 0
+
+            while len(frontier_fwd) and len(frontier_bwd) and hops < max_depth:
+                # 总是扩展较小的一侧
+                forward = len(frontier_fwd) <= len(frontier_bwd)
+                frontier = frontier_fwd if forward else frontier_bwd
+                parent_this = parent_fwd if forward else parent_bwd
+                parent_other = parent_bwd if forward else parent_fwd
+
+                parents, neighbors, _ = self.expand(frontier, min_weight)
+                fresh = parent_this[neighbors] < 0
+                parents, neighbors = parents[fresh], neighbors[fresh]
+                neighbors, first = np.unique(neighbors, return_index=True)
+                parent_this[neighbors] = parents[first]
+                hops += 1
+
+                meet = neighbors[parent_other[neighbors] >= 0]
+                if len(meet):
+                    return self._join_path(int(meet[0]), parent_fwd, parent_bwd)
+
+                if forward:
+                    frontier_fwd = neighbors.astype(np.int32)
+                else:
+                    frontier_bwd = neighbors.astype(np.int32)
+            return []
+
+    def _join_path(self, meet: int, parent_fwd: np.ndarray, parent_bwd: np.ndarray) -> List[str]:
+        left = [meet]
+        while parent_fwd[left[-1]] != left[-1]:
+            left.append(int(parent_fwd[left[-1]]))
+        left.reverse()
+        node = meet
+        while parent_bwd[node] != node:
+            node = int(parent_bwd[node])
+            left.append(node)
+        return [self.node_names[i] for i in left]
+
+    def edges_among(self, node_ids: Iterable[int], limit: int = 20) -> List[Dict]:
+        """返回节点集合内部的边 (按权重降序，每条边只出现一次)"""
+        with self._lock:
+            members = np.zeros(self.num_nodes, dtype=bool)
+            ids = np.asarray(list(node_ids), dtype=np.int32)
+            if not len(ids):
+                return []
+            members[ids] = True
+            results = []
+            for row in ids.tolist():
+                if row + 1 < len(self.indptr):
+                    start, end = self.indptr[row], self.indptr[row + 1]
+                    for pos in np.flatnonzero(members[self.indices[start:end]]
+                                              & (self.edge_directions[start:end] == DIRECTION_OUT)):
+                        pos = start + pos
+                        results.append((row, int(self.indices[pos]), int(self.edge_relations[pos]), float(self.weights[pos])))
+                for (col, rel, direction), weight in self._pending.get(row, {}).items():
+                    if direction == DIRECTION_OUT and members[col]:
+                        results.append((row, col, rel, float(weight)))
+            results.sort(key=lambda x: x[3], reverse=True)
+            return [
+                {
+                    "source": self.node_names[src],
+                    "target": self.node_names[dst],
+                    "relation": self.relation_names[rel],
+                    "weight": weight,
+                }
+                for src, dst, rel, weight in results[:limit]
+            ]
+
+    def find_nodes_in_text(self, text: str, max_len: int = 16) -> List[str]:
+        """
+        找出文本中出现的节点名 (子串枚举 + 哈希查找，代价与文本长度相关而与图规模无关)
+        长的匹配优先，被更长匹配覆盖的短名称会被忽略
+        """
+        if not text:
+            return []
+        found = {}
+        length = len(text)
+        for i in range(length):
+            for j in range(min(length, i + max_len), i, -1):
+                if text[i:j] in self.node_ids:
+                    found.setdefault(text[i:j], i)
+                    break
+        names = sorted(found, key=len, reverse=True)
+        kept = []
+        for name in names:
+            if not any(name in longer for longer in kept):
+                kept.append(name)
+        return kept
+
+    def ids_of(self, names: Iterable[str]) -> List[int]:
+        """名称转整数 ID (忽略不存在的节点)"""
+        return [self.node_ids[n] for n in names if n in self.node_ids]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "nodes": self.num_nodes,
+            "edges": self.num_edges,
+            "pending_edges": self._pending_count // 2,
+        }
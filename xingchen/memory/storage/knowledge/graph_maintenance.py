@@ -0,0 +1,208 @@
+import json
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+
+_SQL_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_EPOCH = "1970-01-01 00:00:00"
+_DECAY_WATERMARK = "graph_decay_at"
+_DECAY_PROGRESS = "graph_decay_progress"
+
+
+class GraphMaintenanceMixin:
+    """
+    知识库图谱维护 Mixin
+    周期性地对 edges 做时间衰减、低权重边归档与孤立节点清理，让热图谱保持精简。
+
+    所有步骤都是按块执行的集合式 SQL: 每块一个短事务 (BEGIN IMMEDIATE ... COMMIT)，
+    块与块之间让出写锁，交互路径上的 add_edge 最多只需等待一个块的时间。
+    """
+
+    def run_graph_maintenance(self, archive_db_path: str = None, since: Optional[datetime] = None,
+                              half_life_days: float = None, prune_threshold: float = None,
+                              orphan_grace_hours: float = None, chunk_size: int = None) -> Dict:
+        """
+        执行一轮图谱维护
+        :param archive_db_path: 冷存储路径 (pruned_relations 表所在库)
+        :param since: 上次维护时间；只对该时间之后流逝的部分做衰减，避免重复衰减
+                      (库内另存衰减水位，取两者较晚者，重复执行不会重复衰减)
+        :return: 各步骤的处理数量与耗时统计
+        """
+        archive_db_path = archive_db_path or settings.ARCHIVE_DB_PATH
+        half_life_days = half_life_days or settings.GRAPH_DECAY_HALF_LIFE_DAYS
+        prune_threshold = settings.GRAPH_PRUNE_WEIGHT if prune_threshold is None else prune_threshold
+        orphan_grace_hours = settings.GRAPH_ORPHAN_GRACE_HOURS if orphan_grace_hours is None else orphan_grace_hours
+        chunk_size = chunk_size or settings.GRAPH_MAINTENANCE_CHUNK
+
+        now = datetime.now(timezone.utc)
+        stats = {"decayed": 0, "archived": 0, "orphans_removed": 0, "vacuumed": False, "max_lock_ms": 0.0}
+        t0 = time.perf_counter()
+
+        conn = self._get_conn()
+        # 手动管理事务，保证每个块独立提交
+        conn.isolation_level = None
+        conn.create_function("power", 2, math.pow, deterministic=True)
+        try:
+            stats["decayed"] = self._decay_edges(conn, now, since, half_life_days, chunk_size, stats)
+            stats["archived"] = self._archive_weak_edges(conn, archive_db_path, prune_threshold, chunk_size, stats)
+            stats["orphans_removed"] = self._remove_orphan_nodes(conn, now, orphan_grace_hours, chunk_size, stats)
+            stats["vacuumed"] = self._optimize_storage(conn)
+        finally:
+            conn.close()
+
+        # 权重与边集都已变化，内存快照下次访问时重建
+        self.invalidate_graph_index()
+        stats["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+        logger.info(
+            f"[KnowledgeDB] 图谱维护完成: 衰减 {stats['decayed']} 条边, 归档 {stats['archived']} 条边, "
+            f"清理 {stats['orphans_removed']} 个孤立节点, 最长持锁 {stats['max_lock_ms']:.1f} ms, "
+            f"总耗时 {stats['elapsed_ms']:.0f} ms"
+        )
+        return stats
+
+    def _run_chunk(self, conn, stats: Dict, *statements) -> int:
+        """在一个短写事务中执行若干语句，返回最后一条语句影响的行数"""
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rowcount = 0
+            for sql, params in statements:
+                rowcount = conn.execute(sql, params).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        stats["max_lock_ms"] = max(stats["max_lock_ms"], (time.perf_counter() - start) * 1000)
+        # 让出写锁，给交互写入插队的机会
+        time.sleep(0)
+        return rowcount
+
+    def _decay_edges(self, conn, now: datetime, since: Optional[datetime],
+                     half_life_days: float, chunk_size: int, stats: Dict) -> int:
+        """
+        时间衰减: weight *= 0.5 ^ (流逝天数 / 半衰期)
+        流逝时间从 max(最近激活时间, 上次维护时间, 衰减水位) 算起；
+        上一轮中途失败时先用同一时间窗补完剩余区间，已衰减的块不会重复衰减
+        """
+        since_str = since.astimezone(timezone.utc).strftime(_SQL_TIME_FORMAT) if since else _EPOCH
+        watermark = self._get_maintenance_state(conn, _DECAY_WATERMARK)
+        if watermark and watermark > since_str:
+            since_str = watermark
+
+        decayed = 0
+        progress = self._get_maintenance_state(conn, _DECAY_PROGRESS)
+        if progress:
+            window = json.loads(progress)
+            logger.info(f"[KnowledgeDB] 续做未完成的图谱衰减: 自 #{window['next_id']} 起 (截至 {window['until']})")
+            decayed += self._decay_window(conn, window["since"], window["until"], window["next_id"],
+                                          half_life_days, chunk_size, stats)
+            since_str = max(since_str, window["until"])
+        decayed += self._decay_window(conn, since_str, now.strftime(_SQL_TIME_FORMAT), 0,
+                                      half_life_days, chunk_size, stats)
+        return decayed
+
+    def _decay_window(self, conn, since_str: str, until_str: str, start_id: int,
+                      half_life_days: float, chunk_size: int, stats: Dict) -> int:
+        """
+        把 id >= start_id 的边从 since 衰减到 until，按 id 区间分块更新
+        每块在同一事务中记录进度 (时间窗与下一块起点)；最后一块把衰减水位推进到 until 并清除进度
+        """
+        # 起点超过当前最大 id 时 (边已被删除) 仍执行一块，以便推进水位、清除进度
+        max_id = max(conn.execute("SELECT MAX(id) FROM edges").fetchone()[0] or 0, start_id)
+        sql = '''
+            UPDATE edges
+            SET weight = weight * power(0.5, (julianday(?) - julianday(
+                MAX(COALESCE(last_activated, created_at), ?))) / ?)
+            WHERE id >= ? AND id < ?
+              AND MAX(COALESCE(last_activated, created_at), ?) < ?
+        '''
+        upsert_state = "INSERT OR REPLACE INTO maintenance_state (name, value) VALUES (?, ?)"
+        decayed = 0
+        for lo in range(start_id, max_id + 1, chunk_size):
+            hi = lo + chunk_size
+            if hi > max_id:
+                state = [(upsert_state, (_DECAY_WATERMARK, until_str)),
+                         ("DELETE FROM maintenance_state WHERE name = ?", (_DECAY_PROGRESS,))]
+            else:
+                window = json.dumps({"since": since_str, "until": until_str, "next_id": hi})
+                state = [(upsert_state, (_DECAY_PROGRESS, window))]
+            # 衰减语句放在最后，_run_chunk 返回的是它影响的行数
+            decayed += self._run_chunk(conn, stats, *state, (
+                sql, (until_str, since_str, half_life_days, lo, hi, since_str, until_str)
+            ))
+        return decayed
+
+    @staticmethod
+    def _get_maintenance_state(conn, name: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM maintenance_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _archive_weak_edges(self, conn, archive_db_path: str, threshold: float,
+                            chunk_size: int, stats: Dict) -> int:
+        """把权重低于阈值的边按 id 区间分块移入 archive.db 的 pruned_relations 表"""
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_db_path,))
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS archive.pruned_relations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source TEXT,
+                    relation TEXT,
+                    target TEXT,
+                    meta TEXT,
+                    archived_at TEXT
+                )
+            ''')
+            max_id = conn.execute("SELECT MAX(id) FROM edges").fetchone()[0] or 0
+            archived = 0
+            for lo in range(0, max_id + 1, chunk_size):
+                params = (lo, lo + chunk_size, threshold)
+                archived += self._run_chunk(conn, stats, ('''
+                    INSERT INTO archive.pruned_relations (source, relation, target, meta, archived_at)
+                    SELECT source, relation, target,
+                           json_object('weight', weight, 'relation_type', relation_type, 'meta', meta,
+                                       'created_at', created_at, 'last_activated', last_activated),
+                           CURRENT_TIMESTAMP
+                    FROM edges WHERE id >= ? AND id < ? AND weight < ?
+                ''', params), (
+                    "DELETE FROM edges WHERE id >= ? AND id < ? AND weight < ?", params
+                ))
+            return archived
+        finally:
+            conn.execute("DETACH DATABASE archive")
+
+    def _remove_orphan_nodes(self, conn, now: datetime, grace_hours: float,
+                             chunk_size: int, stats: Dict) -> int:
+        """
+        按 rowid 区间分块删除没有任何边的节点
+        只清理超过宽限期未激活的节点，避免误删 add_edge 刚写入、边尚未落库的节点
+        """
+        cutoff = datetime.fromtimestamp(now.timestamp() - grace_hours * 3600, timezone.utc)
+        cutoff_str = cutoff.strftime(_SQL_TIME_FORMAT)
+        max_rowid = conn.execute("SELECT MAX(rowid) FROM nodes").fetchone()[0] or 0
+        sql = '''
+            DELETE FROM nodes
+            WHERE rowid >= ? AND rowid < ? AND last_activated < ?
+              AND NOT EXISTS (SELECT 1 FROM edges WHERE source = nodes.name)
+              AND NOT EXISTS (SELECT 1 FROM edges WHERE target = nodes.name)
+        '''
+        removed = 0
+        for lo in range(0, max_rowid + 1, chunk_size):
+            removed += self._run_chunk(conn, stats, (sql, (lo, lo + chunk_size, cutoff_str)))
+        return removed
+
+    def _optimize_storage(self, conn) -> bool:
+        """
+        更新统计信息；空闲页占比过高时才 VACUUM
+        (VACUUM 会在整个重写期间持有排他锁，只适合凌晨维护窗口且确有收益时执行)
+        """
+        conn.execute("PRAGMA analysis_limit=400")
+        conn.execute("ANALYZE")
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if page_count and freelist / page_count > settings.GRAPH_VACUUM_FREE_RATIO:
+            conn.execute("VACUUM")
+            return True
+        return False
@@ -3,6 +3,11 @@ import sqlite3
 from datetime import datetime
 from typing import List, Dict
 from xingchen.utils.logger import logger
+from xingchen.memory.storage.knowledge.graph_index import GraphIndex
+from xingchen.utils.snapshot import startup_snapshot
+
+# 构建期间持续有写入时的最大重建次数
+_GRAPH_BUILD_ATTEMPTS = 3
 
 class GraphStoreMixin:
     """
@@ -22,6 +27,9 @@ class GraphStoreMixin:
                         last_activated = CURRENT_TIMESTAMP
                 ''', (name, type, weight, meta_json))
                 conn.commit()
+                index = getattr(self, "_graph_index", None)
+                if index is not None:
+                    index.add_node(name)
                 return True
             except Exception as e:
                 logger.error(f"[KnowledgeDB] Failed to add node {name}: {e}")
@@ -37,14 +45,18 @@ class GraphStoreMixin:
             cursor = conn.cursor()
             try:
                 cursor.execute('''
-                    INSERT INTO edges (source, target, relation, relation_type, weight, meta, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    INSERT INTO edges (source, target, relation, relation_type, weight, meta, created_at, last_activated)
+                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
                     ON CONFLICT(source, target, relation) DO UPDATE SET
                         weight = excluded.weight,
                         relation_type = excluded.relation_type,
-                        meta = excluded.meta
+                        meta = excluded.meta,
+                        last_activated = CURRENT_TIMESTAMP
                 ''', (source, target, relation, relation_type, weight, meta_json))
                 conn.commit()
+                index = getattr(self, "_graph_index", None)
+                if index is not None:
+                    index.add_edge(source, target, relation, weight)
                 return True
             except Exception as e:
                 logger.error(f"[KnowledgeDB] Failed to add edge {source}->{target}: {e}")
@@ -84,7 +96,7 @@ class GraphStoreMixin:
             return results
 
     def get_related_nodes(self, node_name: str, min_weight: float = 0.5, limit: int = 10) -> List[Dict]:
-        """获取相关联的节点 (扩散激活)"""
+        """获取一跳相关节点 (多跳扩散激活见 SpreadingActivation)"""
         with self._get_conn() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
@@ -100,3 +112,50 @@ class GraphStoreMixin:
             cursor.execute(query, (node_name, min_weight, node_name, min_weight, limit))
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
+
+    def get_graph_index(self) -> GraphIndex:
+        """
+        获取内存图谱快照 (首次调用时优先从启动快照恢复，过期则从 SQLite 构建，之后随 add_edge 增量更新)
+        构建期间提交的写入看到的索引仍为 None，会跳过增量更新；赋值后图谱版本有变化则丢弃重建
+        """
+        index = getattr(self, "_graph_index", None)
+        if index is not None:
+            return index
+        with self._graph_index_lock:
+            index = getattr(self, "_graph_index", None)
+            if index is not None:
+                return index
+            for attempt in range(_GRAPH_BUILD_ATTEMPTS):
+                stamp = self.snapshot_stamp("graph")
+                cached = startup_snapshot.load("graph", stamp) if attempt == 0 else None
+                if cached is not None:
+                    index = GraphIndex.from_snapshot(*cached)
+                    logger.info(f"[KnowledgeDB] 图谱索引从启动快照恢复: {index.stats()}")
+                else:
+                    with self._get_conn() as conn:
+                        index = GraphIndex.from_db(conn)
+                self._graph_index = index
+                # 此后提交的写入都会增量更新到 index (UPSERT 语义，重复应用无副作用)
+                if self.snapshot_stamp("graph") == stamp:
+                    return index
+                self._graph_index = None
+            # 写入持续不断: 保留最后一次构建，之后的写入照常增量更新
+            logger.warning("[KnowledgeDB] 图谱索引构建期间持续有写入，可能缺少构建窗口内的少量边")
+            self._graph_index = index
+        return index
+
+    def build_graph_snapshot(self):
+        """启动快照的图谱段: 从 SQLite 重新构建 CSR (构建期间图谱有写入时返回 None)"""
+        def build():
+            with self._get_conn() as conn:
+                return GraphIndex.from_db(conn)
+        result = self.build_versioned(["graph"], build)
+        if result is None:
+            return None
+        stamp, index = result
+        names, arrays = index.to_snapshot()
+        return stamp, names, arrays
+
+    def invalidate_graph_index(self):
+        """丢弃内存快照 (批量修改 edges 后调用，下次访问时重建)"""
+        self._graph_index = None
@@ -2,7 +2,9 @@ import json
 import sqlite3
 import hashlib
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from xingchen.config.settings import settings
+from xingchen.memory.storage.knowledge.near_dup import content_bands
 from xingchen.utils.logger import logger
 
 class KnowledgeStoreMixin:
@@ -13,23 +15,43 @@ class KnowledgeStoreMixin:
                       source: str = None, confidence: float = 1.0,
                       meta: Dict = None) -> int:
         """
-        添加一条知识 (支持内容哈希去重幂等)
+        添加一条知识 (支持内容哈希去重幂等；同类别的近重复改写并入已有条目)
+        """
+        return self.upsert_knowledge(content, category, source, confidence, meta)[0]
+
+    def upsert_knowledge(self, content: str, category: str = "fact",
+                         source: str = None, confidence: float = 1.0,
+                         meta: Dict = None) -> Tuple[int, bool]:
+        """
+        同 add_knowledge，额外返回是否插入了新条目
+        :return: (knowledge_id, created)；精确重复或并入近重复条目时 created 为 False
         """
         content_hash = hashlib.md5(f"{category}::{content}".encode()).hexdigest()
         now = datetime.now().isoformat()
+        bands = content_bands(content) if settings.KNOWLEDGE_NEAR_DUP_ENABLED else []
         
         with self._get_conn() as conn:
             cursor = conn.cursor()
+            duplicate = self._find_near_duplicate(cursor, content, category, bands)
+            if duplicate is not None:
+                # 与精确重复一样只刷新置信度与校验时间
+                cursor.execute('''
+                    UPDATE knowledge SET confidence = MAX(confidence, ?), verified_at = ? WHERE id = ?
+                ''', (confidence, now, duplicate))
+                conn.commit()
+                return duplicate, False
             try:
                 cursor.execute('''
                     INSERT INTO knowledge (content_hash, content, category, source, confidence, verified_at, created_at, meta)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (content_hash, content, category, source, confidence, now, now, 
                       json.dumps(meta, ensure_ascii=False) if meta else None))
-                conn.commit()
                 knowledge_id = cursor.lastrowid
+                if settings.KNOWLEDGE_NEAR_DUP_ENABLED:
+                    self._index_bands(cursor, knowledge_id, bands)
+                conn.commit()
                 logger.info(f"[KnowledgeDB] Added knowledge #{knowledge_id}: {content[:50]}...")
-                return knowledge_id
+                return knowledge_id, True
             except sqlite3.IntegrityError:
                 # 幂等处理
                 cursor.execute('''
@@ -41,7 +63,7 @@ class KnowledgeStoreMixin:
                 conn.commit()
                 cursor.execute('SELECT id FROM knowledge WHERE content_hash = ?', (content_hash,))
                 row = cursor.fetchone()
-                return row[0] if row else -1
+                return (row[0] if row else -1), False
 
     def get_knowledge(self, category: str = None, limit: int = 100) -> List[Dict]:
         """
@@ -95,6 +117,7 @@ class KnowledgeStoreMixin:
             cursor.execute('''
                 DELETE FROM knowledge WHERE id = ?
             ''', (knowledge_id,))
+            cursor.execute("DELETE FROM knowledge_lsh WHERE knowledge_id = ?", (knowledge_id,))
             conn.commit()
 
     def search_knowledge(self, query: str, limit: int = 10) -> List[Dict]:
@@ -124,3 +147,62 @@ class KnowledgeStoreMixin:
                     item["meta"] = {}
                 results.append(item)
             return results
+
+    def search_knowledge_terms(self, terms: List[str], limit: int = 20) -> List[Dict]:
+        """
+        按检索词打分搜索知识 (词法召回)
+        得分 = 命中的检索词个数，同分按置信度、时间排序；结果附带 lexical_hits 字段
+        """
+        if not terms:
+            return []
+        hit_expr = " + ".join(["(instr(lower(content), ?) > 0)"] * len(terms))
+        with self._get_conn() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT * FROM (
+                    SELECT *, ({hit_expr}) AS lexical_hits FROM knowledge
+                ) WHERE lexical_hits > 0
+                ORDER BY lexical_hits DESC, confidence DESC, created_at DESC
+                LIMIT ?
+            ''', (*[t.lower() for t in terms], limit))
+            return [self._row_to_knowledge(row) for row in cursor.fetchall()]
+
+    def get_knowledge_by_ids(self, knowledge_ids: List[int]) -> List[Dict]:
+        """
+        按 ID 批量获取知识 (顺序与输入一致，缺失的 ID 被跳过)
+        """
+        if not knowledge_ids:
+            return []
+        placeholders = ",".join("?" * len(knowledge_ids))
+        with self._get_conn() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM knowledge WHERE id IN ({placeholders})", list(knowledge_ids))
+            by_id = {row["id"]: self._row_to_knowledge(row) for row in cursor.fetchall()}
+        return [by_id[i] for i in knowledge_ids if i in by_id]
+
+    def get_knowledge_after(self, after_id: int, limit: int = 100) -> List[Dict]:
+        """
+        按 id 升序获取 id > after_id 的知识 (增量同步用)
+        """
+        with self._get_conn() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM knowledge WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit)
+            )
+            return [self._row_to_knowledge(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _row_to_knowledge(row) -> Dict:
+        item = dict(row)
+        if item.get("meta"):
+            try:
+                item["meta"] = json.loads(item["meta"])
+            except:
+                item["meta"] = {}
+        else:
+            item["meta"] = {}
+        return item
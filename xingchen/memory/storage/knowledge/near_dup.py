@@ -0,0 +1,179 @@
+import hashlib
+import re
+import time
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+
+# MinHash 置换参数 (固定种子，保证跨进程一致；修改 KNOWLEDGE_MINHASH_PERM 后需清空 knowledge_lsh 重建)
+_RNG = np.random.default_rng(20240601)
+_PERM_A = _RNG.integers(1, 2 ** 63, size=256, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _RNG.integers(0, 2 ** 63, size=256, dtype=np.uint64)
+
+
+# 否定词或数字不同的两条知识即使字面高度相似，含义也不同 ("不喜欢"/"喜欢"、"3 岁"/"33 岁")，不能合并
+_NEGATION_CHARS = set("不没无非未别莫勿")
+_NEGATION_WORDS = re.compile(r"\b(?:not|no|never|none|cannot)\b|n't")
+_NUMBERS = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC + 小写，去掉空白、标点与控制字符 (LLM 改写最常见的差异)"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "PZC")
+
+
+def shingles(text: str, size: int = None) -> Set[str]:
+    """归一化后的字符 n-gram 集合 (短于 n 的文本整体作为一个 shingle)"""
+    size = size or settings.KNOWLEDGE_SHINGLE_SIZE
+    text = normalize_text(text)
+    if not text:
+        return set()
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def meaning_signature(text: str) -> tuple:
+    """否定词与数字 (两条知识必须一致才可能是近重复)"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return (sorted(ch for ch in text if ch in _NEGATION_CHARS),
+            sorted(_NEGATION_WORDS.findall(text)),
+            sorted(_NUMBERS.findall(text)))
+
+
+def near_duplicate_score(a: str, b: str, a_grams: Set[str] = None) -> float:
+    """近重复得分: 否定词或数字不一致时为 0，否则为 shingle 的 Jaccard"""
+    if meaning_signature(a) != meaning_signature(b):
+        return 0.0
+    return jaccard(a_grams if a_grams is not None else shingles(a), shingles(b))
+
+
+def minhash(grams: Set[str], num_perm: int = None) -> np.ndarray:
+    """MinHash 签名: h_i(x) = (a_i * x + b_i) mod 2^64 的高 32 位，取最小值"""
+    num_perm = num_perm or settings.KNOWLEDGE_MINHASH_PERM
+    base = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams),
+        dtype=np.uint64, count=len(grams)
+    )
+    with np.errstate(over="ignore"):
+        hashed = (base[:, None] * _PERM_A[None, :num_perm] + _PERM_B[None, :num_perm]) >> np.uint64(32)
+    return hashed.min(axis=0)
+
+
+def lsh_bands(signature: np.ndarray, bands: int = None) -> List[int]:
+    """把签名切成若干段，每段哈希成一个有符号 64 位整数 (SQLite INTEGER)"""
+    bands = bands or settings.KNOWLEDGE_LSH_BANDS
+    rows = len(signature) // bands
+    keys = []
+    for b in range(bands):
+        chunk = signature[b * rows:(b + 1) * rows].astype("<u8").tobytes()
+        digest = hashlib.blake2b(bytes([b]) + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+# 归一化后为空的内容 (纯标点 / 空白) 没有签名，写入该占位分段标记"已建索引"，避免回填反复选中
+_EMPTY_BAND = 0
+
+
+def content_bands(content: str) -> List[int]:
+    grams = shingles(content)
+    return lsh_bands(minhash(grams)) if grams else []
+
+
+class NearDuplicateMixin:
+    """
+    知识近重复检测 Mixin (MinHash LSH)
+    - 写入时: 用 LSH 分段在 knowledge_lsh 中取候选，再以字符 shingle 的精确 Jaccard 校验 (否定词或数字不同的不算重复)
+    - 命中 (同类别且 Jaccard >= KNOWLEDGE_NEAR_DUP_THRESHOLD) 时合并到已有条目，不新增行
+    - backfill_near_duplicates 为存量数据补建索引，并把后写入的近重复条目并入先写入的条目
+    """
+
+    def _find_near_duplicate(self, cursor, content: str, category: str, bands: List[int]) -> Optional[int]:
+        """返回同类别中与 content 最相似且超过阈值的知识 id"""
+        if not bands:
+            return None
+        placeholders = ",".join("?" * len(bands))
+        cursor.execute(f'''
+            SELECT k.id, k.content FROM knowledge k
+            WHERE k.category = ? AND k.id IN (
+                SELECT DISTINCT knowledge_id FROM knowledge_lsh WHERE band IN ({placeholders})
+            )
+        ''', (category, *bands))
+        target = shingles(content)
+        best_id, best_sim = None, settings.KNOWLEDGE_NEAR_DUP_THRESHOLD
+        for knowledge_id, existing in cursor.fetchall():
+            sim = near_duplicate_score(content, existing, target)
+            if sim >= best_sim:
+                best_id, best_sim = knowledge_id, sim
+        if best_id is not None:
+            logger.debug(f"[KnowledgeDB] 近重复命中 #{best_id} (Jaccard {best_sim:.2f}): {content[:30]}...")
+        return best_id
+
+    @staticmethod
+    def _index_bands(cursor, knowledge_id: int, bands: List[int]):
+        cursor.executemany(
+            "INSERT OR IGNORE INTO knowledge_lsh (band, knowledge_id) VALUES (?, ?)",
+            [(band, knowledge_id) for band in bands or [_EMPTY_BAND]]
+        )
+
+    def backfill_near_duplicates(self, batch_size: int = 500, merge: bool = True) -> Dict:
+        """
+        为尚未建索引的存量知识补建 LSH 索引 (按 id 升序，先写入的条目优先保留)
+        merge=True 时把近重复条目并入更早的条目: 置信度取大、verified_at 取新、访问次数相加，然后删除
+        :return: {"indexed", "merged", "merged_ids", "merged_contents", "elapsed_ms"}
+        """
+        stats = {"indexed": 0, "merged": 0, "merged_ids": [], "merged_contents": [], "elapsed_ms": 0.0}
+        t0 = time.perf_counter()
+        after_id = 0
+        while True:
+            with self._get_conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, content, category, confidence, verified_at, access_count FROM knowledge k
+                    WHERE id > ? AND NOT EXISTS (SELECT 1 FROM knowledge_lsh l WHERE l.knowledge_id = k.id)
+                    ORDER BY id LIMIT ?
+                ''', (after_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                for knowledge_id, content, category, confidence, verified_at, access_count in rows:
+                    bands = content_bands(content)
+                    duplicate = self._find_near_duplicate(cursor, content, category, bands) if merge else None
+                    if duplicate is not None and duplicate < knowledge_id:
+                        cursor.execute('''
+                            UPDATE knowledge SET
+                                confidence = MAX(confidence, ?),
+                                verified_at = MAX(COALESCE(verified_at, ''), COALESCE(?, '')),
+                                access_count = COALESCE(access_count, 0) + COALESCE(?, 0)
+                            WHERE id = ?
+                        ''', (confidence, verified_at, access_count, duplicate))
+                        cursor.execute("DELETE FROM knowledge WHERE id = ?", (knowledge_id,))
+                        stats["merged"] += 1
+                        stats["merged_ids"].append(knowledge_id)
+                        stats["merged_contents"].append(content)
+                    else:
+                        self._index_bands(cursor, knowledge_id, bands)
+                        stats["indexed"] += 1
+                conn.commit()
+            after_id = rows[-1][0]
+
+        stats["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+        if stats["indexed"] or stats["merged"]:
+            logger.info(
+                f"[KnowledgeDB] 近重复回填: 索引 {stats['indexed']} 条, 合并 {stats['merged']} 条, "
+                f"耗时 {stats['elapsed_ms']:.0f} ms"
+            )
+        return stats
@@ -0,0 +1,365 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+from xingchen.config.settings import settings
+from xingchen.memory.storage.knowledge.near_dup import content_bands
+from xingchen.utils.logger import logger
+
+# archive.raw_memories 的完整列定义 (旧库只有 content/category/created_at/archived_at，按需补列)
+_ARCHIVE_COLUMNS = {
+    "knowledge_id": "INTEGER",
+    "content_hash": "TEXT",
+    "source": "TEXT",
+    "confidence": "FLOAT",
+    "verified_at": "TEXT",
+    "meta": "TEXT",
+    "access_count": "INTEGER DEFAULT 0",
+    "last_accessed": "TEXT",
+    "tier_score": "FLOAT",
+}
+
+
+def _gram_tokens(text: str, with_unigrams: bool = True) -> List[str]:
+    """
+    冷层全文索引的词元: 按空白切词后取单字与相邻二字 (十六进制编码，避开分词器对标点/CJK 的处理)
+    查询只取二字 (单字词取单字)，是内容词元的子集，索引命中后再用 instr 精确校验
+    """
+    grams = set()
+    for word in (text or "").lower().split():
+        if with_unigrams or len(word) == 1:
+            grams.update(word)
+        grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return [g.encode("utf-8").hex() for g in grams]
+
+
+def _index_text(content: str) -> str:
+    return " ".join(_gram_tokens(content))
+
+
+def tier_score(access_count, last_seen_days, confidence) -> float:
+    """
+    留存得分 (越高越应留在热层)
+    score = w_f * min(log(1+访问次数) / log(1+10), 1)
+          + w_r * 0.5 ^ (距最近访问/写入的天数 / 半衰期)
+          + w_c * 置信度
+    """
+    frequency = min(math.log1p(access_count or 0) / math.log1p(10), 1.0)
+    recency = 0.5 ** (max(last_seen_days or 0.0, 0.0) / settings.MEMORY_TIER_HALF_LIFE_DAYS)
+    try:
+        confidence = min(max(float(confidence), 0.0), 1.0)
+    except (TypeError, ValueError):
+        confidence = 1.0
+    return (settings.MEMORY_TIER_FREQUENCY_WEIGHT * frequency
+            + settings.MEMORY_TIER_RECENCY_WEIGHT * recency
+            + settings.MEMORY_TIER_CONFIDENCE_WEIGHT * confidence)
+
+
+class MemoryTieringMixin:
+    """
+    知识库冷热分层 Mixin
+    热层是 knowledge 表 (词法 + 向量检索)，冷层是 archive.db 的 raw_memories 表 (附 FTS5 二字索引)。
+    - 访问统计先在内存中累积，攒够一批再落库，检索路径不做逐条写入
+    - run_memory_tiering 按留存得分把最低分的条目分块移入冷层，热层条数回落到容量的 MEMORY_HOT_TARGET_RATIO
+    - 检索命中冷层条目时由 promote_archived 搬回热层 (保留访问次数与原始写入时间)
+    """
+
+    _access_lock = threading.Lock()
+
+    @property
+    def archive_db_path(self) -> str:
+        """冷存储路径: 与 knowledge.db 同目录 (默认即 settings.ARCHIVE_DB_PATH，临时库自带独立冷存储)"""
+        return os.path.join(os.path.dirname(self.db_path), os.path.basename(settings.ARCHIVE_DB_PATH))
+
+    # ---------------- 访问统计 ----------------
+
+    def record_access(self, knowledge_ids: List[int]):
+        """登记一次检索命中 (内存累积，达到 MEMORY_ACCESS_FLUSH_SIZE 时落库)"""
+        if not knowledge_ids:
+            return
+        now = datetime.now().isoformat()
+        with self._access_lock:
+            buffer = getattr(self, "_access_buffer", None)
+            if buffer is None:
+                buffer = self._access_buffer = {}
+            for knowledge_id in knowledge_ids:
+                count, _ = buffer.get(knowledge_id, (0, now))
+                buffer[knowledge_id] = (count + 1, now)
+            should_flush = len(buffer) >= settings.MEMORY_ACCESS_FLUSH_SIZE
+        if should_flush:
+            self.flush_access_stats()
+
+    def flush_access_stats(self) -> int:
+        """把累积的访问统计写入 knowledge 表，返回更新的条目数"""
+        with self._access_lock:
+            buffer = getattr(self, "_access_buffer", None) or {}
+            self._access_buffer = {}
+        if not buffer:
+            return 0
+        try:
+            with self._get_conn() as conn:
+                conn.executemany(
+                    "UPDATE knowledge SET access_count = COALESCE(access_count, 0) + ?, last_accessed = ? WHERE id = ?",
+                    [(count, last, knowledge_id) for knowledge_id, (count, last) in buffer.items()]
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"[KnowledgeDB] 访问统计落库失败: {e}")
+            return 0
+        return len(buffer)
+
+    # ---------------- 分层迁移 ----------------
+
+    def run_memory_tiering(self, archive_db_path: str = None, hot_capacity: int = None,
+                           batch_size: int = None) -> Dict:
+        """
+        执行一轮冷热分层: 热层超过容量时，把留存得分最低的条目分块移入冷层
+        :return: {"hot_before", "hot_after", "archived", "archived_ids", "archived_contents", "max_lock_ms", "elapsed_ms"}
+        """
+        archive_db_path = archive_db_path or self.archive_db_path
+        hot_capacity = hot_capacity or settings.MEMORY_HOT_CAPACITY
+        batch_size = batch_size or settings.MEMORY_TIER_BATCH
+        self.flush_access_stats()
+
+        stats = {"hot_before": 0, "hot_after": 0, "archived": 0, "archived_ids": [], "archived_contents": [],
+                 "max_lock_ms": 0.0}
+        t0 = time.perf_counter()
+        conn = self._get_conn()
+        conn.isolation_level = None
+        conn.create_function("tier_score", 3, tier_score, deterministic=True)
+        try:
+            hot = conn.execute("SELECT COUNT(*) FROM knowledge").fetchone()[0]
+            stats["hot_before"] = stats["hot_after"] = hot
+            if hot <= hot_capacity:
+                return stats
+
+            excess = hot - int(hot_capacity * settings.MEMORY_HOT_TARGET_RATIO)
+            now = datetime.now().isoformat()
+            rows = conn.execute('''
+                SELECT id, content FROM knowledge
+                ORDER BY tier_score(access_count,
+                                    julianday(?) - julianday(COALESCE(last_accessed, created_at)),
+                                    confidence) ASC, id ASC
+                LIMIT ?
+            ''', (now, excess)).fetchall()
+            victims = [row[0] for row in rows]
+            stats["archived_contents"] = [row[1] for row in rows]
+
+            self._attach_archive(conn, archive_db_path)
+            try:
+                self._archive_chunks(conn, victims, batch_size, now, stats)
+            finally:
+                conn.execute("DETACH DATABASE archive")
+            stats["hot_after"] = conn.execute("SELECT COUNT(*) FROM knowledge").fetchone()[0]
+        finally:
+            conn.close()
+            stats["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+
+        logger.info(
+            f"[KnowledgeDB] 冷热分层完成: 热层 {stats['hot_before']} -> {stats['hot_after']} 条, "
+            f"归档 {stats['archived']} 条, 最长持锁 {stats['max_lock_ms']:.1f} ms, 总耗时 {stats['elapsed_ms']:.0f} ms"
+        )
+        return stats
+
+    def archive_knowledge(self, knowledge_ids: List[int], archive_db_path: str = None,
+                          batch_size: int = None) -> Dict:
+        """
+        把指定知识移入冷层 (如记忆整合后被摘要替换的原始条目)，冷层召回仍可找回
+        :return: {"archived", "archived_ids", "max_lock_ms"}
+        """
+        stats = {"archived": 0, "archived_ids": [], "max_lock_ms": 0.0}
+        if not knowledge_ids:
+            return stats
+        archive_db_path = archive_db_path or self.archive_db_path
+        batch_size = batch_size or settings.MEMORY_TIER_BATCH
+        self.flush_access_stats()
+
+        conn = self._get_conn()
+        conn.isolation_level = None
+        conn.create_function("tier_score", 3, tier_score, deterministic=True)
+        try:
+            self._attach_archive(conn, archive_db_path)
+            try:
+                self._archive_chunks(conn, list(knowledge_ids), batch_size, datetime.now().isoformat(), stats)
+            finally:
+                conn.execute("DETACH DATABASE archive")
+        finally:
+            conn.close()
+        return stats
+
+    def _archive_chunks(self, conn, knowledge_ids: List[int], batch_size: int, now: str, stats: Dict):
+        """分块把知识行连同全文索引搬进已挂载的冷层，再删除热层行与 LSH 索引 (每块一个短事务)"""
+        for start in range(0, len(knowledge_ids), batch_size):
+            chunk = knowledge_ids[start:start + batch_size]
+            placeholders = ",".join("?" * len(chunk))
+            stats["archived"] += self._run_chunk(conn, stats, (f'''
+                INSERT INTO archive.raw_memories
+                    (knowledge_id, content_hash, content, category, source, confidence, verified_at,
+                     created_at, meta, access_count, last_accessed, tier_score, archived_at)
+                SELECT id, content_hash, content, category, source, confidence, verified_at,
+                       created_at, meta, access_count, last_accessed,
+                       tier_score(access_count, julianday(?) - julianday(COALESCE(last_accessed, created_at)), confidence),
+                       ?
+                FROM knowledge WHERE id IN ({placeholders})
+            ''', (now, now, *chunk)), (f'''
+                INSERT INTO archive.raw_memories_fts (rowid, grams)
+                SELECT id, memory_grams(content) FROM archive.raw_memories WHERE knowledge_id IN ({placeholders})
+            ''', tuple(chunk)), (
+                f"DELETE FROM knowledge_lsh WHERE knowledge_id IN ({placeholders})", tuple(chunk)
+            ), (
+                f"DELETE FROM knowledge WHERE id IN ({placeholders})", tuple(chunk)
+            ))
+            stats["archived_ids"].extend(chunk)
+
+    def _attach_archive(self, conn, archive_db_path: str):
+        """挂载冷存储并补齐 raw_memories 的列 (兼容 DeepCleanManager 建出的旧表)"""
+        os.makedirs(os.path.dirname(archive_db_path) or ".", exist_ok=True)
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_db_path,))
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS archive.raw_memories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                content TEXT,
+                category TEXT,
+                created_at TEXT,
+                archived_at TEXT
+            )
+        ''')
+        existing = {row[1] for row in conn.execute("PRAGMA archive.table_info(raw_memories)").fetchall()}
+        for column, decl in _ARCHIVE_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE archive.raw_memories ADD COLUMN {column} {decl}")
+        conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_raw_memories_hash ON raw_memories(content_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_raw_memories_knowledge ON raw_memories(knowledge_id)")
+
+        conn.create_function("memory_grams", 1, _index_text, deterministic=True)
+        has_fts = conn.execute(
+            "SELECT 1 FROM archive.sqlite_master WHERE name = 'raw_memories_fts'"
+        ).fetchone()
+        if not has_fts:
+            conn.execute("CREATE VIRTUAL TABLE archive.raw_memories_fts USING fts5(grams)")
+            conn.execute("INSERT INTO archive.raw_memories_fts (rowid, grams) SELECT id, memory_grams(content) FROM archive.raw_memories")
+
+    # ---------------- 冷层召回 ----------------
+
+    def search_archive_terms(self, terms: List[str], limit: int = 20, archive_db_path: str = None) -> List[Dict]:
+        """
+        冷层词法召回 (与 search_knowledge_terms 同样的打分)
+        返回的条目带 archive_id 与 tier="archive"，id 为归档前的知识 id
+        """
+        archive_db_path = archive_db_path or self.archive_db_path
+        if not terms or not os.path.exists(archive_db_path):
+            return []
+        # 先用二字索引按 BM25 取少量候选 (常见词权重低，不会把候选撑满整张表)，再按命中词数打分
+        groups = [_gram_tokens(term, with_unigrams=False) for term in terms]
+        match = " OR ".join("(" + " AND ".join(f'"{g}"' for g in grams) + ")" for grams in groups if grams)
+        if not match:
+            return []
+        hit_expr = " + ".join(["(instr(lower(content), ?) > 0)"] * len(terms))
+        try:
+            conn = sqlite3.connect(archive_db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            try:
+                rows = conn.execute(f'''
+                    SELECT * FROM (
+                        SELECT *, ({hit_expr}) AS lexical_hits FROM raw_memories
+                        WHERE id IN (
+                            SELECT rowid FROM raw_memories_fts WHERE raw_memories_fts MATCH ? ORDER BY rank LIMIT ?
+                        )
+                    ) WHERE lexical_hits > 0
+                    ORDER BY lexical_hits DESC, confidence DESC, created_at DESC
+                    LIMIT ?
+                ''', (*[t.lower() for t in terms], match, limit * 10, limit)).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.OperationalError as e:
+            # 从未执行过分层 (没有索引或旧表未补列) 时没有可召回的条目
+            logger.debug(f"[KnowledgeDB] 冷层检索跳过: {e}")
+            return []
+
+        results = []
+        for row in rows:
+            item = self._row_to_knowledge(row)
+            item["archive_id"] = item["id"]
+            item["id"] = item.get("knowledge_id") or -item["archive_id"]
+            item["tier"] = "archive"
+            results.append(item)
+        return results
+
+    def promote_archived(self, archive_ids: List[int], archive_db_path: str = None) -> Dict[int, int]:
+        """
+        把冷层条目搬回热层 (保留写入时间、置信度与访问次数，访问次数 +1)
+        内容已在热层时只合并访问次数
+        :return: {archive_id: 热层中的新 knowledge_id}
+        """
+        archive_db_path = archive_db_path or self.archive_db_path
+        if not archive_ids or not os.path.exists(archive_db_path):
+            return {}
+        now = datetime.now().isoformat()
+        promoted: Dict[int, int] = {}
+        conn = self._get_conn()
+        conn.isolation_level = None
+        try:
+            self._attach_archive(conn, archive_db_path)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for archive_id in archive_ids:
+                        row = conn.execute(
+                            "SELECT content_hash, content FROM archive.raw_memories WHERE id = ?", (archive_id,)
+                        ).fetchone()
+                        if row is None:
+                            continue
+                        conn.execute('''
+                            INSERT INTO knowledge (content_hash, content, category, source, confidence, verified_at,
+                                                   created_at, meta, access_count, last_accessed)
+                            SELECT content_hash, content, category, source, confidence, verified_at,
+                                   created_at, meta, COALESCE(access_count, 0) + 1, ?
+                            FROM archive.raw_memories WHERE id = ?
+                            ON CONFLICT(content_hash) DO UPDATE SET
+                                access_count = COALESCE(knowledge.access_count, 0) + excluded.access_count,
+                                last_accessed = excluded.last_accessed
+                        ''', (now, archive_id))
+                        knowledge_id = conn.execute(
+                            "SELECT id FROM knowledge WHERE content_hash = ?", (row[0],)
+                        ).fetchone()
+                        conn.execute("DELETE FROM archive.raw_memories WHERE id = ?", (archive_id,))
+                        conn.execute("DELETE FROM archive.raw_memories_fts WHERE rowid = ?", (archive_id,))
+                        if knowledge_id:
+                            promoted[archive_id] = knowledge_id[0]
+                            self._index_bands(conn, knowledge_id[0], content_bands(row[1]))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE archive")
+        finally:
+            conn.close()
+        if promoted:
+            logger.info(f"[KnowledgeDB] 冷层命中，{len(promoted)} 条记忆已回迁热层")
+        return promoted
+
+    # ---------------- 指标 ----------------
+
+    def get_tier_stats(self, archive_db_path: str = None) -> Dict:
+        """各层条数与文件大小"""
+        archive_db_path = archive_db_path or self.archive_db_path
+        stats = {"hot": {"count": 0, "bytes": 0}, "archive": {"count": 0, "bytes": 0}}
+        try:
+            with self._get_conn() as conn:
+                stats["hot"]["count"] = conn.execute("SELECT COUNT(*) FROM knowledge").fetchone()[0]
+            stats["hot"]["bytes"] = os.path.getsize(self.db_path)
+            if os.path.exists(archive_db_path):
+                conn = sqlite3.connect(archive_db_path, timeout=30)
+                try:
+                    stats["archive"]["count"] = conn.execute("SELECT COUNT(*) FROM raw_memories").fetchone()[0]
+                finally:
+                    conn.close()
+                stats["archive"]["bytes"] = os.path.getsize(archive_db_path)
+        except Exception as e:
+            logger.warning(f"[KnowledgeDB] 获取分层统计失败: {e}")
+        stats["hot"]["capacity"] = settings.MEMORY_HOT_CAPACITY
+        return stats
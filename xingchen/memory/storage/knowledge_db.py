@@ -1,6 +1,6 @@
 """
 知识库存储模块 (Knowledge Database)
-通过 Mixin 模式聚合基础连接、事实存储、实体管理与图谱操作
+通过 Mixin 模式聚合基础连接、事实存储、实体管理、图谱操作、图谱维护、冷热分层与近重复检测
 """
 
 from typing import Optional
@@ -9,9 +9,13 @@ from xingchen.memory.storage.knowledge.base import KnowledgeBase
 from xingchen.memory.storage.knowledge.knowledge_store import KnowledgeStoreMixin
 from xingchen.memory.storage.knowledge.entity_store import EntityStoreMixin
 from xingchen.memory.storage.knowledge.graph_store import GraphStoreMixin
+from xingchen.memory.storage.knowledge.graph_maintenance import GraphMaintenanceMixin
+from xingchen.memory.storage.knowledge.tiering import MemoryTieringMixin
+from xingchen.memory.storage.knowledge.near_dup import NearDuplicateMixin
 
 
-class KnowledgeDB(KnowledgeBase, KnowledgeStoreMixin, EntityStoreMixin, GraphStoreMixin):
+class KnowledgeDB(KnowledgeBase, KnowledgeStoreMixin, EntityStoreMixin, GraphStoreMixin, GraphMaintenanceMixin,
+                  MemoryTieringMixin, NearDuplicateMixin):
     """
     知识库 (Knowledge Database)
     聚合所有存储功能，保持对外接口 100% 兼容
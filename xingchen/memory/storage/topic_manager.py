@@ -7,9 +7,13 @@ from datetime import datetime
 from typing import List, Dict, Optional, Any
 import os
 import hashlib
+import threading
+import unicodedata
 from xingchen.utils.logger import logger
 from xingchen.config.settings import settings
 from xingchen.utils.proxy import lazy_proxy
+from xingchen.memory.storage.embedding_cache import resolve_collection
+from xingchen.memory.storage.fragment_index import FragmentIndex
 import chromadb
 
 
@@ -21,6 +25,13 @@ class TopicManager:
 
     _instance = None
 
+    # 话题目录 (名称 -> {id, name, description})，首次使用时从 Chroma 元数据加载
+    _topic_catalog: Optional[Dict[str, Dict]] = None
+    _catalog_lock = threading.Lock()
+
+    # 话题/任务层的修订号: 新建话题或任务时递增，供检索侧缓存判断是否过期
+    revision = 0
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(TopicManager, cls).__new__(cls)
@@ -34,24 +45,39 @@ class TopicManager:
         os.makedirs(db_path, exist_ok=True)
 
         self.client = chromadb.PersistentClient(path=db_path)
+        # 逻辑集合名 -> embedding_function (检索侧据此计算查询向量)
+        self.embedding_functions = {}
+        self.topics = self._open_collection("topics", "话题层")
+        self.tasks = self._open_collection("tasks", "任务层")
+        self.fragments = self._open_collection("fragments", "片段层")
 
-        self.topics = self.client.get_or_create_collection(
-            name="topics",
-            metadata={"hnsw:space": "cosine", "description": "话题层"},
-        )
+        # 片段元数据侧索引 (排序/列表查询走 SQLite，Chroma 只负责向量)
+        self.fragment_index = FragmentIndex(os.path.join(db_path, "fragment_index.db"))
+        self._sync_fragment_index()
 
-        self.tasks = self.client.get_or_create_collection(
-            name="tasks",
-            metadata={"hnsw:space": "cosine", "description": "任务层"},
-        )
+        self._initialized = True
+        logger.info(f"[TopicManager] Initialized with {self.get_stats()}")
 
-        self.fragments = self.client.get_or_create_collection(
-            name="fragments",
-            metadata={"hnsw:space": "cosine", "description": "片段层"},
+    def _open_collection(self, name: str, description: str):
+        """按配置的嵌入后端打开集合"""
+        physical_name, embedding_function = resolve_collection(name)
+        self.embedding_functions[name] = embedding_function
+        return self.client.get_or_create_collection(
+            name=physical_name,
+            metadata={"hnsw:space": "cosine", "description": description},
+            embedding_function=embedding_function,
         )
 
-        self._initialized = True
-        logger.info(f"[TopicManager] Initialized with {self.get_stats()}")
+    def _sync_fragment_index(self, page_size: int = 1000):
+        """侧索引与 Chroma 条数不一致时 (首次升级 / 索引文件丢失) 从 Chroma 元数据重建"""
+        total = self.fragments.count()
+        if self.fragment_index.count() == total:
+            return
+        self.fragment_index.clear()
+        for offset in range(0, total, page_size):
+            page = self.fragments.get(limit=page_size, offset=offset, include=["metadatas"])
+            self.fragment_index.upsert_many(page["ids"], page["metadatas"])
+        logger.info(f"[TopicManager] 片段侧索引已重建: {total} 条")
 
     def _generate_id(self, text: str) -> str:
         """生成唯一 ID"""
@@ -80,9 +106,38 @@ class TopicManager:
             ],
         )
 
+        self._catalog()[self._catalog_key(name)] = {"id": topic_id, "name": name, "description": description or name}
+        self.revision += 1
         logger.info(f"[TopicManager] Created topic: {name} ({topic_id})")
         return topic_id
 
+    @staticmethod
+    def _catalog_key(name: str) -> str:
+        """名称规范化: 全半角统一、忽略大小写与所有空白 ("Python 编程" 与 "Python编程" 视为同名)"""
+        return "".join(unicodedata.normalize("NFKC", name or "").casefold().split())
+
+    def _catalog(self) -> Dict[str, Dict]:
+        """话题目录 (只读元数据，不做向量查询)"""
+        if self._topic_catalog is None:
+            with self._catalog_lock:
+                if self._topic_catalog is None:
+                    result = self.topics.get(include=["metadatas", "documents"])
+                    catalog = {}
+                    for topic_id, meta, doc in zip(result["ids"], result["metadatas"] or [], result["documents"] or []):
+                        name = (meta or {}).get("name") or doc
+                        catalog[self._catalog_key(name)] = {"id": topic_id, "name": name, "description": doc}
+                    self._topic_catalog = catalog
+        return self._topic_catalog
+
+    def list_topics(self) -> List[Dict]:
+        """列出全部话题 [{id, name, description}] (按名称排序)"""
+        return sorted(self._catalog().values(), key=lambda t: t["name"])
+
+    def find_topic_by_name(self, name: str) -> Optional[str]:
+        """按规范化后的名称查找话题 id (忽略大小写、全半角与空白)"""
+        entry = self._catalog().get(self._catalog_key(name))
+        return entry["id"] if entry else None
+
     def get_topic(self, topic_id: str) -> Optional[Dict]:
         """获取话题详情"""
         result = self.topics.get(ids=[topic_id])
@@ -120,6 +175,7 @@ class TopicManager:
             ],
         )
 
+        self.revision += 1
         logger.info(f"[TopicManager] Created task: {name} under {topic_id}")
         return task_id
 
@@ -133,47 +189,98 @@ class TopicManager:
         meta: Dict = None,
     ) -> str:
         """添加记忆片段"""
-        seed = f"{category}:{topic_id or 'none'}:{task_id or 'none'}:{content}"
-        fingerprint = hashlib.md5(seed.encode()).hexdigest()[:12]
-        fragment_id = f"frag_{datetime.now().strftime('%Y%m%d')}_{fingerprint}"
-
-        existing = self.fragments.get(ids=[fragment_id])
-
-        if existing and existing["ids"] and len(existing["ids"]) > 0:
-            old_meta = existing["metadatas"][0]
-            count = old_meta.get("mention_count", 1) + 1
-            weight = min(2.0, old_meta.get("weight", 1.0) + 0.1)
-
-            updated_meta = {
-                **old_meta,
-                "last_activated": datetime.now().isoformat(),
-                "mention_count": count,
-                "weight": weight,
-            }
-            if meta:
-                updated_meta.update(meta)
-
-            self.fragments.update(ids=[fragment_id], metadatas=[updated_meta])
-            return fragment_id
-
-        metadata = {
-            "created_at": datetime.now().isoformat(),
-            "last_activated": datetime.now().isoformat(),
-            "mention_count": 1,
-            "weight": 1.0,
+        return self.add_fragments([{
+            "content": content,
+            "topic_id": topic_id,
+            "task_id": task_id,
             "emotion_tag": emotion_tag,
             "category": category,
-            "type": "fragment",
-            "fingerprint": fingerprint,
-            "topic_id": topic_id or "none",
-            "task_id": task_id or "none",
-        }
-
-        if meta:
-            metadata.update(meta)
+            "meta": meta,
+        }])[0]
 
-        self.fragments.add(ids=[fragment_id], documents=[content], metadatas=[metadata])
-        return fragment_id
+    @staticmethod
+    def _fingerprint(content: str, topic_id: str = None, task_id: str = None, category: str = "memory") -> str:
+        seed = f"{category}:{topic_id or 'none'}:{task_id or 'none'}:{content}"
+        return hashlib.md5(seed.encode()).hexdigest()[:12]
+
+    def add_fragments(self, batch: List[Dict]) -> List[str]:
+        """
+        批量添加记忆片段
+        :param batch: [{"content", "topic_id", "task_id", "emotion_tag", "category", "meta"}]
+        :return: 与 batch 一一对应的片段 id
+
+        按指纹 (而非带日期的 id) 去重: 已存在的片段只累加 mention_count / weight，
+        同一批次内的重复也会合并；新增与更新各一次批量写入。
+        """
+        if not batch:
+            return []
+
+        now = datetime.now().isoformat()
+        fingerprints = [
+            self._fingerprint(item["content"], item.get("topic_id"), item.get("task_id"), item.get("category", "memory"))
+            for item in batch
+        ]
+        existing = self.fragment_index.get_by_fingerprints(fingerprints)
+
+        # 按指纹合并: 每个指纹只写一次
+        merged: Dict[str, Dict] = {}
+        for fingerprint, item in zip(fingerprints, batch):
+            entry = merged.get(fingerprint)
+            if entry is None:
+                merged[fingerprint] = {"item": item, "mentions": 1, "meta": dict(item.get("meta") or {})}
+            else:
+                entry["mentions"] += 1
+                entry["meta"].update(item.get("meta") or {})
+
+        add_ids, add_docs, add_metas = [], [], []
+        update_ids, update_metas = [], []
+        index_ids, index_metas = [], []
+        id_by_fingerprint: Dict[str, str] = {}
+
+        for fingerprint, entry in merged.items():
+            item, mentions = entry["item"], entry["mentions"]
+            row = existing.get(fingerprint)
+            if row is not None:
+                fragment_id = row["id"]
+                updated_meta = {
+                    "last_activated": now,
+                    "mention_count": row["mention_count"] + mentions,
+                    "weight": min(2.0, row["weight"] + 0.1 * mentions),
+                    **entry["meta"],
+                }
+                update_ids.append(fragment_id)
+                update_metas.append(updated_meta)
+                index_metas.append({**row, **updated_meta})
+            else:
+                fragment_id = f"frag_{datetime.now().strftime('%Y%m%d')}_{fingerprint}"
+                metadata = {
+                    "created_at": now,
+                    "last_activated": now,
+                    "mention_count": mentions,
+                    "weight": min(2.0, 1.0 + 0.1 * (mentions - 1)),
+                    "emotion_tag": item.get("emotion_tag", "neutral"),
+                    "category": item.get("category", "memory"),
+                    "type": "fragment",
+                    "fingerprint": fingerprint,
+                    "topic_id": item.get("topic_id") or "none",
+                    "task_id": item.get("task_id") or "none",
+                    **entry["meta"],
+                }
+                add_ids.append(fragment_id)
+                add_docs.append(item["content"])
+                add_metas.append(metadata)
+                index_metas.append(metadata)
+            index_ids.append(fragment_id)
+            id_by_fingerprint[fingerprint] = fragment_id
+
+        if add_ids:
+            self.fragments.add(ids=add_ids, documents=add_docs, metadatas=add_metas)
+        if update_ids:
+            # Chroma 的 update 按键合并元数据，未提供的字段保持不变
+            self.fragments.update(ids=update_ids, metadatas=update_metas)
+        self.fragment_index.upsert_many(index_ids, index_metas)
+
+        return [id_by_fingerprint[fingerprint] for fingerprint in fingerprints]
 
     def _format_query_results(self, results: Dict) -> List[Dict]:
         items = []
@@ -209,16 +316,29 @@ class TopicManager:
             "fragments": self.fragments.count()
         }
 
-    def get_recent_fragments(self, limit: int = 5) -> List[Dict]:
-        """获取最近活跃的记忆片段"""
-        # 注意：ChromaDB 默认不支持按元数据排序，这里获取最近的一些片段并在内存中排序
-        # 这是一个简化实现，生产环境下可能需要更复杂的索引
-        results = self.fragments.get(limit=limit * 10) # 多取一点
-        items = self._format_get_results(results)
-        
-        # 按 last_activated 降序排序
-        items.sort(key=lambda x: x["metadata"].get("last_activated", ""), reverse=True)
-        return items[:limit]
+    def get_recent_fragments(self, limit: int = 5, topic_id: str = None) -> List[Dict]:
+        """获取最近活跃的记忆片段 (可限定话题)"""
+        return self._load_fragments(self.fragment_index.recent(limit, topic_id=topic_id))
+
+    def get_top_fragments(self, limit: int = 5, topic_id: str = None) -> List[Dict]:
+        """获取权重最高的记忆片段 (可限定话题)"""
+        return self._load_fragments(self.fragment_index.top_weighted(limit, topic_id=topic_id))
+
+    def list_topic_fragments(self, topic_id: str, limit: int = 50) -> List[Dict]:
+        """列出某个话题下的片段 (按最近活跃)"""
+        return self.get_recent_fragments(limit, topic_id=topic_id)
+
+    def _load_fragments(self, rows: List[Dict]) -> List[Dict]:
+        """按侧索引给出的顺序从 Chroma 取正文与完整元数据"""
+        if not rows:
+            return []
+        ids = [row["id"] for row in rows]
+        by_id = {item["id"]: item for item in self._format_get_results(self.fragments.get(ids=ids))}
+        stale = [i for i in ids if i not in by_id]
+        if stale:
+            # Chroma 中已不存在 (被外部删除)，顺手清理侧索引
+            self.fragment_index.delete_many(stale)
+        return [by_id[i] for i in ids if i in by_id]
 
 
 _topic_manager_instance: Optional[TopicManager] = None
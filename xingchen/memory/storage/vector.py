@@ -1,13 +1,17 @@
 import os
-import chromadb
-from chromadb.utils import embedding_functions
 from xingchen.utils.logger import logger
+from xingchen.utils.readiness import Readiness
 
 class ChromaStorage:
     """
     ChromaDB 向量存储服务
     """
-    def __init__(self, db_path):
+    def __init__(self, db_path, connect=True):
+        """
+        :param connect: False 时只创建对象，由调用方稍后 (通常在后台预热线程中) 调用 connect()；
+                        连接完成前所有读写接口按"不可用"处理
+        """
+        self.db_path = db_path
         self.client = None
         self.collection = None
         self.skill_collection = None
@@ -15,39 +19,48 @@ class ChromaStorage:
         self.command_cases_collection = None
         self.alias_collection = None
         self._available = False
+        self.readiness = Readiness("vector")
         
-        try:
-            self.client = chromadb.PersistentClient(path=db_path)
-            # 使用默认的 embedding 模型
-            self.collection = self.client.get_or_create_collection(
-                name="long_term_memory",
-                metadata={"hnsw:space": "cosine"}
-            )
-            
-            self.skill_collection = self.client.get_or_create_collection(
-                name="skill_library",
-                metadata={"hnsw:space": "cosine"}
-            )
-            
-            self.command_docs_collection = self.client.get_or_create_collection(
-                name="command_docs",
-                metadata={"hnsw:space": "cosine"}
-            )
-            
-            self.command_cases_collection = self.client.get_or_create_collection(
-                name="command_cases",
-                metadata={"hnsw:space": "cosine"}
-            )
-            
-            self.alias_collection = self.client.get_or_create_collection(
-                name="entity_aliases",
-                metadata={"hnsw:space": "cosine"}
-            )
-            self._available = True
+        if connect:
+            self.connect()
+
+    def connect(self):
+        """打开 ChromaDB 客户端与各集合；失败时以降级模式运行"""
+        self.readiness.run(self._open_all)
+        if self._available:
             logger.info("[Memory] ChromaDB 向量数据库 (Memory & Skills & Docs & Cases & Aliases) 初始化成功。")
-        except Exception as e:
-            logger.error(f"[Memory] ChromaDB 初始化失败: {e}", exc_info=True)
+        else:
             logger.warning("[Memory] 向量检索功能将不可用，系统将以降级模式运行。")
+        return self._available
+
+    def _open_all(self):
+        # chromadb 及嵌入后端导入耗时约 1s，放到 connect() 里 (分阶段启动时在后台线程完成)
+        import chromadb
+        from xingchen.memory.storage.embedding_cache import resolve_collection
+        self.client = chromadb.PersistentClient(path=self.db_path)
+        # 各集合按配置选择嵌入后端 (默认模型带内容寻址缓存，离线哈希嵌入无需下载)
+        self.embedding_function = resolve_collection("long_term_memory")[1]
+        self.collection = self._open_collection("long_term_memory")
+        self.skill_collection = self._open_collection("skill_library")
+        self.command_docs_collection = self._open_collection("command_docs")
+        self.command_cases_collection = self._open_collection("command_cases")
+        self.alias_collection = self._open_collection("entity_aliases")
+        self._available = True
+
+    def _open_collection(self, name):
+        from xingchen.memory.storage.embedding_cache import resolve_collection
+        physical_name, embedding_function = resolve_collection(name)
+        return self.client.get_or_create_collection(
+            name=physical_name,
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=embedding_function
+        )
+
+    @property
+    def index_checkpoint_path(self):
+        """长期记忆向量索引的检查点 (跟随实际集合，切换嵌入后端后会自动全量重建)"""
+        suffix = self.collection.name[len("long_term_memory"):] if self.collection else ""
+        return os.path.join(self.db_path, f"index_checkpoint{suffix}.json")
 
     def is_available(self):
         """检查向量库是否可用"""
@@ -56,6 +69,45 @@ class ChromaStorage:
     def get_memory_collection(self):
         return self.collection if self._available else None
 
+    def upsert_memories(self, ids, documents, metadatas=None):
+        """写入/覆盖长期记忆向量 (id 约定为 ltm_<knowledge_id>)"""
+        if not self._available or not ids:
+            return False
+        self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
+        return True
+
+    def delete_memories(self, ids):
+        """删除长期记忆向量 (条目移入冷存储时调用)"""
+        if not self._available or not ids:
+            return False
+        self.collection.delete(ids=ids)
+        return True
+
+    def query_memories(self, query, n_results=10):
+        """
+        检索长期记忆向量
+        :return: [{"id", "document", "metadata", "distance"}]，按距离升序
+        """
+        if not self._available or not query:
+            return []
+        count = self.collection.count()
+        if count == 0:
+            return []
+        result = self.collection.query(
+            query_texts=[query],
+            n_results=min(n_results, count),
+            include=["documents", "metadatas", "distances"]
+        )
+        hits = []
+        for i, doc_id in enumerate(result["ids"][0]):
+            hits.append({
+                "id": doc_id,
+                "document": result["documents"][0][i],
+                "metadata": (result["metadatas"][0][i] or {}),
+                "distance": result["distances"][0][i],
+            })
+        return hits
+
     def get_skill_collection(self):
         return self.skill_collection if self._available else None
         
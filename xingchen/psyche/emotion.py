@@ -1,7 +1,7 @@
-import yaml
 import os
 from typing import Dict, List
 from xingchen.config.settings import settings
+from xingchen.utils.snapshot import startup_snapshot
 
 class EmotionDetector:
     """
@@ -9,12 +9,12 @@ class EmotionDetector:
     从文本中提取情感倾向，并根据规则返回情绪增量。
     """
     def __init__(self, rules_path: str = None):
+        default_path = os.path.join(settings.PROJECT_ROOT, "xingchen", "config", "emotion_rules.yaml")
         if rules_path is None:
-            rules_path = os.path.join(settings.PROJECT_ROOT, "xingchen", "config", "emotion_rules.yaml")
+            rules_path = default_path
         
         try:
-            with open(rules_path, "r", encoding="utf-8") as f:
-                self.rules = yaml.safe_load(f)
+            self.rules = self._load_rules(rules_path, use_snapshot=rules_path == default_path)
         except Exception:
             # 兜底默认规则
             self.rules = {
@@ -28,6 +28,34 @@ class EmotionDetector:
                     "user_negative": {"grievance": 0.3, "frustration": 0.1}
                 }
             }
+
+    @staticmethod
+    def _file_stamp(path: str) -> Dict:
+        stat = os.stat(path)
+        return {"path": os.path.abspath(path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    @staticmethod
+    def _parse_rules(path: str) -> Dict:
+        # 命中启动快照时不需要解析 YAML，yaml 推迟到这里导入
+        import yaml
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f)
+
+    @classmethod
+    def _load_rules(cls, rules_path: str, use_snapshot: bool = False) -> Dict:
+        """解析规则文件；默认规则文件未改动时直接从启动快照恢复"""
+        if not use_snapshot:
+            return cls._parse_rules(rules_path)
+
+        def build():
+            stamp = cls._file_stamp(rules_path)
+            return stamp, cls._parse_rules(rules_path), None
+
+        startup_snapshot.register("emotion_rules", lambda: cls._file_stamp(rules_path), build)
+        cached = startup_snapshot.load("emotion_rules", cls._file_stamp(rules_path))
+        if cached is not None:
+            return cached[0]
+        return build()[1]
             
     def detect_user_sentiment(self, text: str) -> Dict[str, float]:
         """检测用户情感并返回情绪增量"""
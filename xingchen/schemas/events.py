@@ -7,6 +7,7 @@ import time
 class EventType(str, Enum):
     USER_INPUT = "user_input"
     DRIVER_RESPONSE = "driver_response"
+    DRIVER_RESPONSE_DELTA = "driver_response_delta"
     NAVIGATOR_SUGGESTION = "navigator_suggestion"
     PROACTIVE_INSTRUCTION = "proactive_instruction"
     SYSTEM_HEARTBEAT = "system_heartbeat"
@@ -25,6 +26,12 @@ class UserInputPayload(BaseModel):
 class DriverResponsePayload(BaseModel):
     content: str
 
+class DriverResponseDeltaPayload(BaseModel):
+    """流式回复的增量: delta 为新增文本，content 为截至本条的全文 (按 seq 取最新即可，无需拼接)"""
+    delta: str
+    content: str
+    seq: int
+
 class ProactiveInstructionPayload(BaseModel):
     content: Union[str, Dict[str, Any]] # 支持字符串或字典结构
 
@@ -59,6 +66,7 @@ class BaseEvent(BaseModel):
     payload: Union[
         UserInputPayload, 
         DriverResponsePayload, 
+        DriverResponseDeltaPayload,
         ProactiveInstructionPayload, 
         SystemHeartbeatPayload,
         MemoryFullPayload,
@@ -1,30 +1,20 @@
 import asyncio
+from importlib.util import find_spec
 import requests
 from xingchen.tools.registry import ToolRegistry, ToolTier
 from xingchen.utils.logger import logger
 
-# Check for crawl4ai
-try:
-    from crawl4ai import AsyncWebCrawler
-    CRAWL4AI_AVAILABLE = True
-except ImportError:
-    CRAWL4AI_AVAILABLE = False
+# 可选依赖只探测是否安装，真正导入推迟到工具首次调用 (crawl4ai 依赖链很重，会拖慢启动)
+CRAWL4AI_AVAILABLE = find_spec("crawl4ai") is not None
+if not CRAWL4AI_AVAILABLE:
     logger.warning("[WebTools] crawl4ai not installed. 'web_crawl' tool will be disabled.")
 
-# Check for duckduckgo_search
-try:
-    from duckduckgo_search import DDGS
-    DDGS_AVAILABLE = True
-except ImportError:
-    DDGS_AVAILABLE = False
+DDGS_AVAILABLE = find_spec("duckduckgo_search") is not None
+if not DDGS_AVAILABLE:
     logger.info("[WebTools] duckduckgo-search not available, using domestic search engines.")
 
-# Check for BeautifulSoup
-try:
-    from bs4 import BeautifulSoup
-    BS4_AVAILABLE = True
-except ImportError:
-    BS4_AVAILABLE = False
+BS4_AVAILABLE = find_spec("bs4") is not None
+if not BS4_AVAILABLE:
     logger.warning("[WebTools] beautifulsoup4 not installed. Domestic search will be limited.")
 
 _HEADERS = {
@@ -43,6 +33,7 @@ def _sogou_search(query: str, max_results: int = 5) -> str:
         resp = requests.get(url, headers=_HEADERS, timeout=10)
         resp.raise_for_status()
 
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(resp.text, "html.parser")
         results = []
 
@@ -81,6 +72,7 @@ def _baidu_search(query: str, max_results: int = 5) -> str:
         resp = requests.get(url, headers=_HEADERS, timeout=10)
         resp.raise_for_status()
 
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(resp.text, "html.parser")
         results = []
 
@@ -127,6 +119,7 @@ def web_search(query: str, max_results: int = 5):
     # 1. 尝试 DuckDuckGo (国际化最优)
     if DDGS_AVAILABLE:
         try:
+            from duckduckgo_search import DDGS
             with DDGS() as ddgs:
                 results = list(ddgs.text(query, max_results=max_results))
                 if results:
@@ -164,6 +157,8 @@ def web_crawl(url: str):
     if not CRAWL4AI_AVAILABLE:
         return "Error: 系统未安装网页抓取组件 (crawl4ai)。"
 
+    from crawl4ai import AsyncWebCrawler
+
     async def _crawl():
         async with AsyncWebCrawler() as crawler:
             result = await crawler.arun(url=url)
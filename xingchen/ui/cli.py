@@ -142,6 +142,13 @@ class DebugCLI(UserInterface):
         elif base == "/status":
             print("\n[System Status]:")
             print(f"  Local Time: {datetime.now().isoformat()}")
+            from xingchen.utils.llm_registry import llm_registry
+            llm_stats = llm_registry.stats()
+            print(f"  LLM In-Flight: {llm_stats['in_flight']}/{llm_stats['max_concurrency']}")
+            for name, m in llm_stats["providers"].items():
+                print(f"    {name}: {m['requests']} req, {m['errors']} err, "
+                      f"peak {m['max_in_flight']}/{m['limit']}, avg {m['avg_latency_ms']:.0f} ms, "
+                      f"{m['health']['state']}, hedged {m['health']['hedged']}")
             # 发送探测事件，让其他组件汇报状态
             event_bus.publish(Event(type="debug_request", source="cli", payload={"action": "get_status"}))
 
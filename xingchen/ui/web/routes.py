@@ -70,9 +70,12 @@ async def status(key: str = None):
     if key != settings.WEB_API_KEY:
         raise HTTPException(status_code=403, detail="Invalid key")
         
+    from xingchen.utils.llm_registry import llm_registry
+
     # 这里可以返回更详细的运行统计
     return {
         "status": "running",
         "uptime": "TODO",
-        "memory_stats": "TODO"
+        "memory_stats": "TODO",
+        "llm": llm_registry.stats()
     }
@@ -10,24 +10,31 @@ class SSEManager:
     SSE 事件管理器
     负责监听 EventBus 并推送到 Web 端
     """
+    # 推送到前端的事件类型
+    FORWARDED_TYPES = (
+        "driver_response", "driver_response_delta", "psyche_update", "system_heartbeat", "system_notification"
+    )
+
     def __init__(self):
         self.queue = asyncio.Queue()
+        self._loop = None  # 事件循环在首个 SSE 连接建立时记录
         event_bus.subscribe(self._on_bus_event)
 
     def _on_bus_event(self, event):
         """将 EventBus 事件同步到异步队列"""
         try:
             # 过滤需要推送到前端的事件
-            if event.type in ["driver_response", "psyche_update", "system_heartbeat", "system_notification"]:
-                # 在异步循环中放入队列
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
+            if event.type in self.FORWARDED_TYPES:
+                # 回调运行在 EventBus 线程池中，没有自己的事件循环，需投递到 SSE 所在的循环
+                loop = self._loop
+                if loop is not None and loop.is_running():
                     loop.call_soon_threadsafe(self.queue.put_nowait, event)
         except Exception as e:
             pass
 
     async def event_generator(self) -> AsyncGenerator[dict, None]:
         """SSE 生成器"""
+        self._loop = asyncio.get_running_loop()
         while True:
             try:
                 event = await self.queue.get()
@@ -41,6 +48,16 @@ class SSEManager:
                             "meta": event.meta
                         }, ensure_ascii=False)
                     }
+                elif event.type == "driver_response_delta":
+                    # 流式回复增量: content 为截至当前的全文，前端按 stream_id + seq 覆盖渲染
+                    payload = event.payload_data
+                    yield {
+                        "data": json.dumps({
+                            "role": "assistant_delta",
+                            "content": payload.get("content", ""),
+                            "meta": {**event.meta, "seq": payload.get("seq", 0), "delta": payload.get("delta", "")}
+                        }, ensure_ascii=False)
+                    }
                 elif event.type == "psyche_update":
                     yield {
                         "data": json.dumps({
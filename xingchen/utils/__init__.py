@@ -1,7 +1,14 @@
 from .logger import logger
 from .json_parser import extract_json
 from .time_utils import parse_relative_time, format_time_ago
-from .llm_client import LLMClient
 from .proxy import lazy_proxy
 
 __all__ = ["logger", "extract_json", "parse_relative_time", "format_time_ago", "LLMClient", "lazy_proxy"]
+
+
+def __getattr__(name):
+    # LLMClient 按需导入，避免 `xingchen.utils.logger` 之类的轻量导入牵连 LLM 客户端
+    if name == "LLMClient":
+        from .llm_client import LLMClient
+        return LLMClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,320 @@
+"""
+异步 LLM 客户端 (AsyncLLMClient)
+基于 AsyncOpenAI (httpx)，在单个事件循环中承载大量并发请求，不再需要每个请求占用一个线程。
+
+- 连接复用: 同一事件循环内，同一提供商共用一个 AsyncOpenAI (由 LLMRegistry 管理)
+- 并发上限: 与同步 LLMClient 共用 LLMRegistry 的全局/提供商上限，等待名额时让出事件循环
+- 重试: 指数退避使用 asyncio.sleep，不阻塞线程；有可用的备选提供商时立即转移
+- 对冲: 与 LLMClient 相同的语义，落败的一路被直接取消 (释放连接与名额)
+- 取消: 任务被取消时 CancelledError 直接向上传播 (不会被重试吞掉)，流式响应会被关闭
+"""
+
+import asyncio
+import inspect
+import time
+import uuid
+from typing import Any, Dict
+
+from xingchen.config.settings import settings
+from xingchen.utils.llm_health import HedgeCancelled, HedgeRace, is_provider_failure
+from xingchen.utils.prompt_budget import count_message_tokens
+from xingchen.utils.llm_registry import llm_registry
+from xingchen.utils.llm_scheduler import Priority
+from xingchen.utils.logger import logger
+
+
+def __getattr__(name):
+    """延迟导入 openai SDK，保留 async_llm_client.AsyncOpenAI 这个模块属性便于测试 patch"""
+    if name == "AsyncOpenAI":
+        from openai import AsyncOpenAI
+        globals()["AsyncOpenAI"] = AsyncOpenAI
+        return AsyncOpenAI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def aclose_clients():
+    """关闭当前事件循环中各提供商的共享客户端 (释放 keep-alive 连接)"""
+    for provider in list(llm_registry.stats()["providers"]):
+        client = llm_registry.handle(provider).pop_async_client()
+        if client is None:
+            continue
+        try:
+            await client.close()
+        except Exception as e:
+            logger.debug(f"[AsyncLLM] 关闭客户端失败: {e}")
+
+
+class AsyncLLMClient:
+    """
+    异步 LLM 客户端 (接口与 LLMClient 对应)
+    - chat(): 返回完整 Message
+    - chat_stream(on_delta=...): 流式生成，返回组装后的 Message
+    """
+
+    def __init__(self, provider=None, model=None, priority: int = Priority.NORMAL, hedge: bool = False):
+        self._handle = llm_registry.handle(provider)
+        self.provider = self._handle.name
+        self.api_key = self._handle.api_key
+        self.base_url = self._handle.base_url
+        self.model = model or self._handle.default_model
+        self.priority = priority  # 调度优先级 (交互 / 普通 / 后台)
+        self.hedge = hedge        # 主提供商慢于延迟分位数时向备选提供商发出对冲请求
+        if not self.api_key:
+            logger.warning(f"警告: 未找到提供商 {self.provider} 的 API Key")
+        self._client = None  # 显式注入的客户端 (测试用)；默认使用事件循环内共享的客户端
+
+    @property
+    def client(self):
+        """当前事件循环内该提供商共享的 AsyncOpenAI 客户端 (必须在协程中访问)"""
+        if self._client is not None:
+            return self._client
+        return self._handle.async_client()
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def _client_for(self, handle):
+        return self.client if handle is self._handle else handle.async_client()
+
+    def _model_for(self, handle) -> str:
+        return self.model if handle is self._handle else handle.default_model
+
+    def _build_kwargs(self, messages, temperature, tools, tool_choice, stream=False) -> Dict[str, Any]:
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "timeout": settings.DEFAULT_LLM_TIMEOUT,
+        }
+        if stream:
+            kwargs["stream"] = True
+        if tools:
+            kwargs["tools"] = tools
+            if tool_choice:
+                kwargs["tool_choice"] = tool_choice
+        return kwargs
+
+    async def chat(
+        self,
+        messages,
+        temperature=0.7,
+        trace_id=None,
+        tools=None,
+        tool_choice=None,
+        max_retries: int = 2,
+        retry_backoff_base: float = 1.0,
+        cache: str = None,
+        priority: int = None,
+        hedge: bool = None,
+        validate=None,
+    ):
+        """
+        发送消息给 LLM 并获取回复 (协程)。
+        :param priority: 本次请求的调度优先级 (默认使用客户端的 priority)
+        :param hedge: 本次请求是否启用对冲 (默认使用客户端的 hedge)
+        :param cache: 调用点名称；提供时启用磁盘响应缓存 (与 LLMClient.chat 共用同一缓存)
+        :param validate: 缓存前校验回复的函数 (同 LLMClient.chat)
+        """
+        if not trace_id:
+            trace_id = str(uuid.uuid4())[:8]
+
+        if cache and settings.LLM_CACHE_ENABLED:
+            from xingchen.utils.llm_cache import is_cacheable, llm_cache
+            key = llm_cache.make_key(self.provider, self.model, messages, tools, temperature)
+            message = await asyncio.to_thread(llm_cache.get, key, cache)
+            if message is not None:
+                if is_cacheable(message, validate):
+                    logger.info(f"[{self.provider}] [TraceID: {trace_id}] 命中响应缓存 ({cache})")
+                    return message
+                await asyncio.to_thread(llm_cache.invalidate, key)
+            message = await self.chat(messages, temperature=temperature, trace_id=trace_id, tools=tools,
+                                      tool_choice=tool_choice, max_retries=max_retries,
+                                      retry_backoff_base=retry_backoff_base, priority=priority, hedge=hedge)
+            await asyncio.to_thread(llm_cache.put, key, message, self.provider, self.model, cache, validate)
+            return message
+
+        msg_len = sum(len(m.get("content", "") or "") for m in messages)
+        msg_tokens = count_message_tokens(messages, self.provider)
+        tool_info = f", Tools: {len(tools)}" if tools else ""
+        kwargs = self._build_kwargs(messages, temperature, tools, tool_choice)
+        priority = self.priority if priority is None else priority
+        hedge = self.hedge if hedge is None else hedge
+
+        last_error: Exception | None = None
+        failed = None
+        for attempt in range(max_retries + 1):
+            handle = llm_registry.route(self._handle, avoid=failed)
+            if attempt == 0:
+                logger.info(
+                    f"[{handle.name}] [TraceID: {trace_id}] Sending to {self._model_for(handle)} (async)... (Msg: {len(messages)}, Chars: {msg_len}, ~Tokens: {msg_tokens}{tool_info})"
+                )
+            else:
+                if handle is failed:
+                    await asyncio.sleep(retry_backoff_base * (2 ** (attempt - 1)))
+                logger.warning(
+                    f"[{handle.name}] [TraceID: {trace_id}] Retry attempt {attempt}/{max_retries}..."
+                )
+            try:
+                backup = llm_registry.hedge_target(self._handle, handle) if hedge else None
+                if backup is None:
+                    return await self._request_once(handle, kwargs, priority)
+                return await self._hedged(lambda h: self._request_once(h, kwargs, priority),
+                                          handle, backup, handle.health.hedge_delay(), trace_id)
+
+            except Exception as e:
+                last_error = e
+                failed = handle
+                logger.error(f"[{handle.name}] [TraceID: {trace_id}] Error: {e}")
+                if not is_provider_failure(e):
+                    raise  # 请求本身有误 (4xx)，重试或转移都无济于事
+
+        raise last_error
+
+    async def _request_once(self, handle, kwargs, priority):
+        """在指定提供商上发出一次非流式请求，并记录其延迟与成败"""
+        model = self._model_for(handle)
+        try:
+            async with llm_registry.aslot(handle.name, model, priority):
+                start = time.perf_counter()
+                response = await self._client_for(handle).chat.completions.create(**dict(kwargs, model=model))
+        except BaseException as e:
+            handle.health.record_error(e)
+            raise
+        handle.health.record_success((time.perf_counter() - start) * 1000)
+        return response.choices[0].message
+
+    async def _hedged(self, run, primary, backup, delay: float, trace_id: str, progress: asyncio.Event = None):
+        """
+        对冲请求: run(primary) 在 delay 秒内没有完成 (流式: 没有任何一路开始输出) 时，
+        再向 backup 发出同样的请求，返回先成功的一路；其余各路被取消。
+        """
+        first = asyncio.ensure_future(run(primary))
+        pending = {first}
+        try:
+            waiters = {first}
+            if progress is not None:
+                waiters.add(asyncio.ensure_future(progress.wait()))
+            done, _ = await asyncio.wait(waiters, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters - {first}:
+                waiter.cancel()
+            if done or not backup.health.allow():
+                return await first
+
+            primary.health.count("hedged")
+            logger.info(f"[{primary.name}] [TraceID: {trace_id}] {delay * 1000:.0f} ms 内未响应，向 {backup.name} 发出对冲请求")
+            second = asyncio.ensure_future(run(backup))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            primary.health.count("hedge_wins")
+                        return task.result()
+                    if error is None or isinstance(error, HedgeCancelled):
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def chat_stream(
+        self,
+        messages,
+        temperature=0.7,
+        trace_id=None,
+        tools=None,
+        tool_choice=None,
+        on_delta=None,
+        max_retries: int = 2,
+        retry_backoff_base: float = 1.0,
+        priority: int = None,
+        hedge: bool = None,
+    ):
+        """
+        流式发送消息给 LLM (协程，语义同 LLMClient.chat_stream)。
+        只在尚未输出任何文本时重试；被取消时关闭流并释放连接。
+        """
+        if not trace_id:
+            trace_id = str(uuid.uuid4())[:8]
+
+        msg_len = sum(len(m.get("content", "") or "") for m in messages)
+        msg_tokens = count_message_tokens(messages, self.provider)
+        tool_info = f", Tools: {len(tools)}" if tools else ""
+        kwargs = self._build_kwargs(messages, temperature, tools, tool_choice, stream=True)
+        priority = self.priority if priority is None else priority
+        hedge = self.hedge if hedge is None else hedge
+
+        last_error: Exception | None = None
+        failed = None
+        for attempt in range(max_retries + 1):
+            handle = llm_registry.route(self._handle, avoid=failed)
+            if attempt == 0:
+                logger.info(
+                    f"[{handle.name}] [TraceID: {trace_id}] Streaming from {self._model_for(handle)} (async)... (Msg: {len(messages)}, Chars: {msg_len}, ~Tokens: {msg_tokens}{tool_info})"
+                )
+            else:
+                if handle is failed:
+                    await asyncio.sleep(retry_backoff_base * (2 ** (attempt - 1)))
+                logger.warning(
+                    f"[{handle.name}] [TraceID: {trace_id}] Retry attempt {attempt}/{max_retries}..."
+                )
+            progress = asyncio.Event()
+            race = HedgeRace(on_claim=progress.set)
+            try:
+                backup = llm_registry.hedge_target(self._handle, handle) if hedge else None
+                run = lambda h: self._stream_once(h, kwargs, priority, on_delta, race, trace_id)
+                if backup is None:
+                    return await run(handle)
+                return await self._hedged(run, handle, backup, handle.health.hedge_delay(stream=True),
+                                          trace_id, progress)
+
+            except Exception as e:
+                last_error = e
+                failed = handle
+                logger.error(f"[{handle.name}] [TraceID: {trace_id}] Stream error: {e}")
+                if not is_provider_failure(e):
+                    raise
+                if race.emitted:
+                    break
+
+        raise last_error
+
+    async def _stream_once(self, handle, kwargs, priority, on_delta, race: HedgeRace, trace_id: str):
+        """在指定提供商上发出一次流式请求；先开始输出的一路 (race 的胜者) 才把文本交给 on_delta"""
+        from xingchen.utils.llm_stream import StreamAssembler
+
+        assembler = StreamAssembler()
+        model = self._model_for(handle)
+        try:
+            async with llm_registry.aslot(handle.name, model, priority):
+                start = time.perf_counter()
+                first_token_ms = None
+                stream = await self._client_for(handle).chat.completions.create(**dict(kwargs, model=model))
+                try:
+                    async for chunk in stream:
+                        text = assembler.add(chunk)
+                        if first_token_ms is None and (text or assembler.tool_calls):
+                            first_token_ms = (time.perf_counter() - start) * 1000
+                            handle.health.record_first_token(first_token_ms)
+                            logger.debug(f"[{handle.name}] [TraceID: {trace_id}] 首个 token: {first_token_ms:.0f} ms")
+                            if not race.claim(handle):
+                                raise HedgeCancelled(f"{handle.name} 落后于 {race.winner.name}")
+                        if text and on_delta:
+                            race.emitted = True
+                            on_delta(text)
+                    if not race.claim(handle):
+                        raise HedgeCancelled(f"{handle.name} 落后于 {race.winner.name}")
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close is not None and assembler.finish_reason is None:
+                        result = close()
+                        if inspect.isawaitable(result):
+                            await result
+        except BaseException as e:
+            handle.health.record_error(e)
+            raise
+        handle.health.record_success()
+        return assembler.message()
@@ -0,0 +1,86 @@
+"""
+后台事件循环 (AsyncRunner)
+同步代码 (Navigator / Compressor 等后台线程) 通过它把协程交给一个常驻的事件循环执行，
+多路 LLM 请求在同一个循环里并发，共享 AsyncLLMClient 的连接池，不再每个请求开一个线程。
+
+- run(coro, timeout): 阻塞等待结果；超时或调用方中断时取消协程
+- submit(coro): 返回 concurrent.futures.Future，不等待
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Coroutine, Optional
+
+from xingchen.utils.logger import logger
+from xingchen.utils.proxy import lazy_proxy
+
+
+class AsyncRunner:
+    """常驻后台线程中的事件循环 (首次使用时启动)"""
+
+    def __init__(self, name: str = "LLMLoop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=_run, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                logger.debug(f"[AsyncRunner] 后台事件循环已启动: {self.name}")
+            return self._loop
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro: Coroutine, timeout: float = None) -> Any:
+        """在后台循环中执行协程并等待结果 (不能在该循环自身的线程内调用)"""
+        if self._thread is not None and threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("AsyncRunner.run() 不能在后台事件循环线程内调用，请直接 await")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # 超时 / KeyboardInterrupt: 取消后台协程，释放其占用的连接与并发名额
+            future.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+
+
+_async_runner_instance: Optional[AsyncRunner] = None
+
+
+def get_async_runner() -> AsyncRunner:
+    """获取全局 AsyncRunner 实例（延迟初始化）。"""
+    global _async_runner_instance
+    if _async_runner_instance is None:
+        _async_runner_instance = AsyncRunner()
+    return _async_runner_instance
+
+
+async_runner = lazy_proxy(get_async_runner, AsyncRunner)
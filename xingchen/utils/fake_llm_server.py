@@ -0,0 +1,189 @@
+"""
+本地假 LLM 提供商 (Fake LLM Server)
+OpenAI 兼容的 /v1/chat/completions 端点 (支持 stream=True)，用于调度、限速、对冲等的负载测试与基准，
+不消耗真实 API 额度。延迟、抖动、长尾、错误率可在运行中修改。
+
+用法:
+    with FakeLLMServer(latency=0.2) as server:
+        os.environ["FAKE_LLM_BASE_URL"] = server.base_url
+        LLMClient(provider="fake").chat([...])
+
+多个假提供商: provider="fake_xxx" 读取 FAKE_XXX_LLM_BASE_URL (故障转移 / 对冲测试)
+
+也可单独运行: python -m xingchen.utils.fake_llm_server --port 18080 --latency 0.3
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 非流式响应保持 keep-alive
+    server: "_Server"
+
+    def log_message(self, format, *args):  # 静默
+        pass
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        fake._enter()
+        try:
+            delay = max(0.0, fake.latency + random.uniform(-fake.jitter, fake.jitter))
+            if fake.tail_rate and random.random() < fake.tail_rate:
+                delay += fake.tail_latency
+            if fake.error_rate and random.random() < fake.error_rate:
+                time.sleep(delay)
+                self._send_json(500, {"error": {"message": "fake provider error", "type": "server_error"}})
+                return
+            content = fake.reply_for(body.get("messages", []))
+            if body.get("stream"):
+                try:
+                    self._send_stream(body, content, delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # 客户端中途放弃 (取消 / 对冲落败)
+            else:
+                time.sleep(delay)
+                self._send_json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake-model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+        finally:
+            fake._exit()
+
+    def _send_json(self, status: int, data: dict):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, body: dict, content: str, delay: float):
+        fake = self.server.fake
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(delay)  # 首 token 延迟
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        pieces = [content[i:i + fake.chunk_chars] for i in range(0, len(content), fake.chunk_chars)] or [""]
+        for i, piece in enumerate(pieces + [None]):
+            choice = {"index": 0, "delta": {}, "finish_reason": None}
+            if piece is None:
+                choice["finish_reason"] = "stop"
+            else:
+                choice["delta"] = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+            chunk = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model", "fake-model"), "choices": [choice]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if piece is not None and fake.chunk_interval:
+                time.sleep(fake.chunk_interval)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeLLMServer"
+
+
+class FakeLLMServer:
+    """
+    本地 OpenAI 兼容假提供商
+    - latency / jitter: 每个请求的延迟 (秒)，流式请求为首 token 延迟
+    - error_rate: 返回 500 的比例
+    - tail_rate / tail_latency: 额外延迟 tail_latency 秒的请求比例 (模拟长尾)
+    - reply: 固定回复文本；默认回显最后一条用户消息 (Driver 的 JSON 回复格式)
+    - requests / max_concurrent: 收到的请求数与峰值并发
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2, jitter: float = 0.0,
+                 error_rate: float = 0.0, reply: Optional[str] = None, chunk_chars: int = 4,
+                 chunk_interval: float = 0.01, tail_rate: float = 0.0, tail_latency: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.reply = reply
+        self.chunk_chars = chunk_chars
+        self.chunk_interval = chunk_interval
+        self.requests = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reply_for(self, messages) -> str:
+        if self.reply is not None:
+            return self.reply
+        last = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "") or ""
+        return json.dumps({"reply": f"echo: {last}", "inner_voice": "", "emotion": "neutral"}, ensure_ascii=False)
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+
+    def _exit(self):
+        with self._lock:
+            self.concurrent -= 1
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="FakeLLMServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容假提供商")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tail-rate", type=float, default=0.0)
+    parser.add_argument("--tail-latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeLLMServer(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+    print(f"Fake LLM provider: {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
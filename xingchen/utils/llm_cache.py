@@ -0,0 +1,237 @@
+"""
+LLM 响应缓存 (LLM Response Cache)
+后台的确定性调用 (话题分类、事实/别名提取、知识内化、记忆整合等) 经常对同一输入重复请求，
+按 (provider, model, messages, tools, temperature) 缓存回复，相同的后台工作不再重复付出 API 延迟。
+
+- 存储: data/ 下的 SQLite，带 TTL；条目数超过上限时按最近使用时间 (LRU) 淘汰
+- 开关: 由调用点显式开启 (LLMClient.chat(..., cache="调用点名称"))，按调用点统计命中/未命中
+- 同一进程内相同 key 的并发请求只发出一次，其余等待首个请求的结果
+- 空回复不写入；调用点可传入 validate 在写入前校验回复 (如 JSON 能否解析)，校验失败的回复不缓存
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+from xingchen.utils.proxy import lazy_proxy
+
+
+def message_to_dict(message: Any) -> Dict:
+    """把 SDK 返回的 Message 对象转成可 JSON 序列化的 dict"""
+    if hasattr(message, "model_dump"):
+        return message.model_dump(exclude_none=True)
+    if isinstance(message, dict):
+        return message
+    return {"role": getattr(message, "role", "assistant"), "content": getattr(message, "content", None)}
+
+
+def is_cacheable(message: Any, validate: Optional[Callable[[Any], bool]] = None) -> bool:
+    """有文本或工具调用、且通过调用点校验的回复才值得缓存"""
+    if message is None:
+        return False
+    content = getattr(message, "content", None) if not isinstance(message, dict) else message.get("content")
+    tool_calls = getattr(message, "tool_calls", None) if not isinstance(message, dict) else message.get("tool_calls")
+    if not (content and content.strip()) and not tool_calls:
+        return False
+    if validate is not None:
+        try:
+            return bool(validate(message))
+        except Exception:
+            return False
+    return True
+
+
+def message_from_dict(data: Dict) -> Any:
+    """还原为与未缓存调用一致的 Message 对象 (保留 .content / .tool_calls / model_dump())"""
+    from openai.types.chat import ChatCompletionMessage
+    return ChatCompletionMessage.model_validate(data)
+
+
+class LLMResponseCache:
+    """
+    磁盘 LLM 响应缓存
+    - make_key(): 计算缓存 key
+    - get(key, site) / put(key, message, ...): 读写 (put 跳过空回复与校验失败的回复)
+    - invalidate(key): 作废一条缓存 (调用点解析命中的回复失败时)
+    - key_lock(key): 同 key 并发请求合并
+    - stats(): 命中率与各调用点指标
+    """
+
+    def __init__(self, db_path: str = None, ttl: float = None, max_entries: int = None):
+        self.db_path = db_path or settings.LLM_CACHE_PATH
+        self.ttl = ttl if ttl is not None else settings.LLM_CACHE_TTL
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, list] = {}  # key -> [lock, 引用数]
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "rejected": 0, "evictions": 0, "expired": 0}
+        self._sites: Dict[str, Dict[str, int]] = {}
+        self._init_db()
+
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        with self._get_conn() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT,
+                    model TEXT,
+                    site TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER DEFAULT 0
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+            conn.commit()
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages, tools=None, temperature=None) -> str:
+        payload = json.dumps(
+            {"provider": provider, "model": model, "messages": messages, "tools": tools, "temperature": temperature},
+            ensure_ascii=False, sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, site: str, field: str):
+        with self._lock:
+            self._counters[field] += 1
+            if site:
+                entry = self._sites.setdefault(site, {"hits": 0, "misses": 0})
+                if field in entry:
+                    entry[field] += 1
+
+    def get(self, key: str, site: str = None) -> Optional[Any]:
+        """命中时返回还原的 Message 对象；未命中或已过期返回 None"""
+        now = time.time()
+        try:
+            with self._get_conn() as conn:
+                row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] > self.ttl:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    self._count(site, "expired")
+                    row = None
+                if row:
+                    conn.execute("UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                    conn.commit()
+            if row:
+                message = message_from_dict(json.loads(row[0]))
+                self._count(site, "hits")
+                return message
+        except Exception as e:
+            logger.warning(f"[LLMCache] 读取缓存失败: {e}")
+        self._count(site, "misses")
+        return None
+
+    def put(self, key: str, message: Any, provider: str = None, model: str = None, site: str = None,
+            validate: Optional[Callable[[Any], bool]] = None) -> bool:
+        """
+        写入一条回复，超出条目上限时淘汰最久未使用的条目
+        空回复 (无文本且无工具调用) 或 validate 返回 False 的回复不写入，避免在 TTL 内反复重放失败结果
+        :return: 是否写入
+        """
+        if not is_cacheable(message, validate):
+            with self._lock:
+                self._counters["rejected"] += 1
+            logger.debug(f"[LLMCache] 回复为空或未通过校验，不写入缓存 ({site})")
+            return False
+        now = time.time()
+        try:
+            response = json.dumps(message_to_dict(message), ensure_ascii=False)
+            with self._get_conn() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, provider, model, site, response, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, provider, model, site, response, now, now)
+                )
+                overflow = conn.execute("SELECT count(*) FROM llm_cache").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)",
+                        (overflow,)
+                    )
+                conn.commit()
+            with self._lock:
+                self._counters["writes"] += 1
+                self._counters["evictions"] += max(overflow, 0)
+            return True
+        except Exception as e:
+            logger.warning(f"[LLMCache] 写入缓存失败: {e}")
+            return False
+
+    def invalidate(self, key: str):
+        """删除一条缓存"""
+        try:
+            with self._get_conn() as conn:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"[LLMCache] 删除缓存失败: {e}")
+
+    @contextmanager
+    def key_lock(self, key: str):
+        """同一 key 的请求串行化: 后到的请求等首个请求写入缓存后直接命中"""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._key_locks.pop(key, None)
+
+    def purge_expired(self) -> int:
+        with self._get_conn() as conn:
+            deleted = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+            conn.commit()
+        return deleted
+
+    def clear(self):
+        with self._get_conn() as conn:
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def stats(self) -> Dict:
+        """命中/未命中/写入/淘汰计数、命中率、当前条目数与各调用点指标"""
+        with self._lock:
+            counters = dict(self._counters)
+            sites = {site: dict(v) for site, v in self._sites.items()}
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        try:
+            with self._get_conn() as conn:
+                counters["entries"] = conn.execute("SELECT count(*) FROM llm_cache").fetchone()[0]
+        except Exception:
+            counters["entries"] = None
+        counters["sites"] = sites
+        return counters
+
+
+_llm_cache_instance: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """获取全局 LLMResponseCache 实例（延迟初始化）。"""
+    global _llm_cache_instance
+    if _llm_cache_instance is None:
+        _llm_cache_instance = LLMResponseCache()
+    return _llm_cache_instance
+
+
+llm_cache = lazy_proxy(get_llm_cache, LLMResponseCache)
@@ -1,49 +1,101 @@
 import os
+import threading
 import time
-from dotenv import load_dotenv
-from openai import OpenAI
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from xingchen.config.settings import settings
+from xingchen.utils.llm_health import HedgeCancelled, HedgeRace, is_provider_failure
+from xingchen.utils.prompt_budget import count_message_tokens
+from xingchen.utils.llm_scheduler import Priority
 from xingchen.utils.logger import logger
 
-# 立即加载环境变量
-load_dotenv(override=True)
+# 环境变量已由 settings 在导入时加载 (load_dotenv 只执行一次)
+
+
+def __getattr__(name):
+    """
+    延迟导入 openai SDK (导入耗时约 1s)：首次真正发起请求时才加载。
+    保留 llm_client.OpenAI 这个模块属性，便于测试 patch。
+    """
+    if name == "OpenAI":
+        from openai import OpenAI
+        globals()["OpenAI"] = OpenAI
+        return OpenAI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def resolve_provider(provider: str):
+    """提供商配置: 返回 (api_key, base_url, 默认模型)，同步/异步客户端共用"""
+    if provider == "deepseek":
+        return os.getenv("DEEPSEEK_API_KEY"), os.getenv("DEEPSEEK_BASE_URL"), settings.DEFAULT_LLM_MODEL
+    if provider == "zhipu":
+        return os.getenv("ZHIPU_API_KEY"), os.getenv("ZHIPU_BASE_URL"), settings.ZHIPU_DEFAULT_MODEL
+    if provider == "qwen":
+        return os.getenv("QWEN_API_KEY"), os.getenv("QWEN_BASE_URL"), settings.QWEN_DEFAULT_MODEL
+    if provider == "fake" or provider.startswith("fake_"):
+        # 本地假提供商 (xingchen.utils.fake_llm_server)，用于负载测试与基准；
+        # fake_xxx 读取 FAKE_XXX_LLM_BASE_URL，便于模拟多个提供商之间的故障转移
+        base_url = os.getenv(f"{provider.upper()}_LLM_BASE_URL", "http://127.0.0.1:18080/v1")
+        return "fake", base_url, "fake-model"
+    # 默认为 OPENAI_* 变量
+    return os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_BASE_URL"), os.getenv("LLM_MODEL", settings.DEFAULT_LLM_MODEL)
+
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _hedge_executor() -> ThreadPoolExecutor:
+    """对冲请求的线程池 (两路请求并行，调用线程等待先到的结果)"""
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _hedge_pool_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=settings.LLM_MAX_CONCURRENCY,
+                                                 thread_name_prefix="LLMHedge")
+    return _hedge_pool
 
 
 class LLMClient:
-    def __init__(self, provider=None):
-        self.provider = provider or settings.DEFAULT_LLM_PROVIDER
-        self.api_key = None
-        self.base_url = None
-        self.model = None
-        self._configure()
+    """
+    同步 LLM 客户端
+    同一提供商的 OpenAI 客户端、连接池与并发上限由 LLMRegistry 在进程内共享，
+    每个实例只携带自己的模型名 (调用点各自选择模型)。
+    提供商熔断时自动转到备选提供商 (使用其默认模型)；hedge=True 时启用对冲请求。
+    """
+
+    def __init__(self, provider=None, model=None, priority: int = Priority.NORMAL, hedge: bool = False):
+        from xingchen.utils.llm_registry import llm_registry
+        self._registry = llm_registry
+        self._handle = llm_registry.handle(provider)
+        self.provider = self._handle.name
+        self.api_key = self._handle.api_key
+        self.base_url = self._handle.base_url
+        self.model = model or self._handle.default_model
+        self.priority = priority  # 调度优先级 (交互 / 普通 / 后台)
+        self.hedge = hedge        # 主提供商慢于延迟分位数时向备选提供商发出对冲请求
 
         if not self.api_key:
             logger.warning(f"警告: 未找到提供商 {self.provider} 的 API Key")
 
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
-
-    def _configure(self):
-        if self.provider == "deepseek":
-            self.api_key = os.getenv("DEEPSEEK_API_KEY")
-            self.base_url = os.getenv("DEEPSEEK_BASE_URL")
-            self.model = settings.DEFAULT_LLM_MODEL
-        elif self.provider == "zhipu":
-            self.api_key = os.getenv("ZHIPU_API_KEY")
-            self.base_url = os.getenv("ZHIPU_BASE_URL")
-            self.model = settings.ZHIPU_DEFAULT_MODEL
-        elif self.provider == "qwen":
-            self.api_key = os.getenv("QWEN_API_KEY")
-            self.base_url = os.getenv("QWEN_BASE_URL")
-            self.model = settings.QWEN_DEFAULT_MODEL
-        else:
-            # 默认为 OPENAI_* 变量
-            self.api_key = os.getenv("OPENAI_API_KEY")
-            self.base_url = os.getenv("OPENAI_BASE_URL")
-            self.model = os.getenv("LLM_MODEL", settings.DEFAULT_LLM_MODEL)
+        self._client = None
+
+    @property
+    def client(self):
+        """OpenAI 兼容客户端 (默认为该提供商共享的客户端，首次访问时创建)"""
+        if self._client is None:
+            return self._handle.client
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def _client_for(self, handle):
+        return self.client if handle is self._handle else handle.client
+
+    def _model_for(self, handle) -> str:
+        return self.model if handle is self._handle else handle.default_model
 
     def complete(self, prompt: str, **kwargs):
         """
@@ -60,18 +112,46 @@ class LLMClient:
         tool_choice=None,
         max_retries: int = 2,
         retry_backoff_base: float = 1.0,
+        cache: str = None,
+        priority: int = None,
+        hedge: bool = None,
+        validate=None,
     ):
         """
         发送消息给 LLM 并获取回复。
         支持 trace_id 追踪。
         支持 Function Calling (Tools)。
-        支持失败重试（指数退避）。
+        支持失败重试（指数退避；有可用的备选提供商时立即转移，不再等待）。
+        :param priority: 本次请求的调度优先级 (默认使用客户端的 priority)
+        :param hedge: 本次请求是否启用对冲 (默认使用客户端的 hedge)
+        :param cache: 调用点名称；提供时启用磁盘响应缓存 (仅用于确定性的后台调用，按调用点统计命中率)
+        :param validate: 缓存前校验回复的函数 (message -> bool)；返回 False 的回复不写入，
+                         命中的旧条目校验失败时作废并重新请求
         """
         if not trace_id:
             trace_id = str(uuid.uuid4())[:8]
 
+        if cache and settings.LLM_CACHE_ENABLED:
+            from xingchen.utils.llm_cache import is_cacheable, llm_cache
+            key = llm_cache.make_key(self.provider, self.model, messages, tools, temperature)
+            with llm_cache.key_lock(key):
+                message = llm_cache.get(key, site=cache)
+                if message is not None:
+                    if is_cacheable(message, validate):
+                        logger.info(f"[{self.provider}] [TraceID: {trace_id}] 命中响应缓存 ({cache})")
+                        return message
+                    llm_cache.invalidate(key)
+                message = self.chat(messages, temperature=temperature, trace_id=trace_id, tools=tools,
+                                    tool_choice=tool_choice, max_retries=max_retries,
+                                    retry_backoff_base=retry_backoff_base, priority=priority, hedge=hedge)
+                llm_cache.put(key, message, provider=self.provider, model=self.model, site=cache, validate=validate)
+                return message
+
         msg_len = sum(len(m.get("content", "") or "") for m in messages)
+        msg_tokens = count_message_tokens(messages, self.provider)
         tool_info = f", Tools: {len(tools)}" if tools else ""
+        priority = self.priority if priority is None else priority
+        hedge = self.hedge if hedge is None else hedge
 
         kwargs = {
             "model": self.model,
@@ -86,27 +166,182 @@ class LLMClient:
                 kwargs["tool_choice"] = tool_choice
 
         last_error: Exception | None = None
+        failed = None
         for attempt in range(max_retries + 1):
+            handle = self._registry.route(self._handle, avoid=failed)
+            if attempt == 0:
+                logger.info(
+                    f"[{handle.name}] [TraceID: {trace_id}] Sending to {self._model_for(handle)}... (Msg: {len(messages)}, Chars: {msg_len}, ~Tokens: {msg_tokens}{tool_info})"
+                )
+            else:
+                if handle is failed:
+                    time.sleep(retry_backoff_base * (2 ** (attempt - 1)))
+                logger.warning(
+                    f"[{handle.name}] [TraceID: {trace_id}] Retry attempt {attempt}/{max_retries}..."
+                )
             try:
-                if attempt == 0:
-                    logger.info(
-                        f"[{self.provider}] [TraceID: {trace_id}] Sending to {self.model}... (Msg: {len(messages)}, Chars: {msg_len}{tool_info})"
-                    )
-                else:
-                    logger.warning(
-                        f"[{self.provider}] [TraceID: {trace_id}] Retry attempt {attempt}/{max_retries}..."
-                    )
-
-                response = self.client.chat.completions.create(**kwargs)
-                return response.choices[0].message
+                backup = self._registry.hedge_target(self._handle, handle) if hedge else None
+                if backup is None:
+                    return self._request_once(handle, kwargs, priority)
+                return self._hedged(lambda h: self._request_once(h, kwargs, priority),
+                                    handle, backup, handle.health.hedge_delay(), trace_id)
 
             except Exception as e:
                 last_error = e
-                logger.error(f"[{self.provider}] [TraceID: {trace_id}] Error: {e}")
-                if attempt < max_retries:
-                    sleep_time = retry_backoff_base * (2 ** attempt)
-                    time.sleep(sleep_time)
-                else:
+                failed = handle
+                logger.error(f"[{handle.name}] [TraceID: {trace_id}] Error: {e}")
+                if not is_provider_failure(e):
+                    raise  # 请求本身有误 (4xx)，重试或转移都无济于事
+
+        raise last_error
+
+    def _request_once(self, handle, kwargs, priority):
+        """在指定提供商上发出一次非流式请求，并记录其延迟与成败"""
+        model = self._model_for(handle)
+        try:
+            with self._registry.slot(handle.name, model, priority):
+                start = time.perf_counter()
+                response = self._client_for(handle).chat.completions.create(**dict(kwargs, model=model))
+        except BaseException as e:
+            handle.health.record_error(e)
+            raise
+        handle.health.record_success((time.perf_counter() - start) * 1000)
+        return response.choices[0].message
+
+    def _hedged(self, run, primary, backup, delay: float, trace_id: str, progress: threading.Event = None):
+        """
+        对冲请求: run(primary) 在 delay 秒内没有完成 (流式: 没有任何一路开始输出) 时，
+        再向 backup 发出同样的请求，返回先成功的一路；落败的一路在后台结束 (结果丢弃)。
+        """
+        progress = progress or threading.Event()
+        pool = _hedge_executor()
+        first = pool.submit(run, primary)
+        first.add_done_callback(lambda _: progress.set())
+        if progress.wait(delay) or not backup.health.allow():
+            return first.result()
+
+        primary.health.count("hedged")
+        logger.info(f"[{primary.name}] [TraceID: {trace_id}] {delay * 1000:.0f} ms 内未响应，向 {backup.name} 发出对冲请求")
+        second = pool.submit(run, backup)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        primary.health.count("hedge_wins")
+                    return future.result()
+                if error is None or isinstance(error, HedgeCancelled):
+                    error = future.exception()
+        raise error
+
+    def chat_stream(
+        self,
+        messages,
+        temperature=0.7,
+        trace_id=None,
+        tools=None,
+        tool_choice=None,
+        on_delta=None,
+        max_retries: int = 2,
+        retry_backoff_base: float = 1.0,
+        priority: int = None,
+        hedge: bool = None,
+    ):
+        """
+        流式发送消息给 LLM (stream=True)。
+        每收到一段文本即调用 on_delta(text)；工具调用的增量按 index 组装。
+        返回值与 chat() 一致 (完整的 Message 对象)。
+        只在尚未输出任何文本时重试，避免回调收到重复内容。
+        对冲时按首 token 延迟判断，先开始输出的一路获胜，另一路随即放弃。
+        """
+        if not trace_id:
+            trace_id = str(uuid.uuid4())[:8]
+
+        msg_len = sum(len(m.get("content", "") or "") for m in messages)
+        msg_tokens = count_message_tokens(messages, self.provider)
+        tool_info = f", Tools: {len(tools)}" if tools else ""
+        priority = self.priority if priority is None else priority
+        hedge = self.hedge if hedge is None else hedge
+
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "timeout": settings.DEFAULT_LLM_TIMEOUT,
+            "stream": True,
+        }
+
+        if tools:
+            kwargs["tools"] = tools
+            if tool_choice:
+                kwargs["tool_choice"] = tool_choice
+
+        last_error: Exception | None = None
+        failed = None
+        for attempt in range(max_retries + 1):
+            handle = self._registry.route(self._handle, avoid=failed)
+            if attempt == 0:
+                logger.info(
+                    f"[{handle.name}] [TraceID: {trace_id}] Streaming from {self._model_for(handle)}... (Msg: {len(messages)}, Chars: {msg_len}, ~Tokens: {msg_tokens}{tool_info})"
+                )
+            else:
+                if handle is failed:
+                    time.sleep(retry_backoff_base * (2 ** (attempt - 1)))
+                logger.warning(
+                    f"[{handle.name}] [TraceID: {trace_id}] Retry attempt {attempt}/{max_retries}..."
+                )
+            progress = threading.Event()
+            race = HedgeRace(on_claim=progress.set)
+            try:
+                backup = self._registry.hedge_target(self._handle, handle) if hedge else None
+                run = lambda h: self._stream_once(h, kwargs, priority, on_delta, race, trace_id)
+                if backup is None:
+                    return run(handle)
+                return self._hedged(run, handle, backup, handle.health.hedge_delay(stream=True), trace_id, progress)
+
+            except Exception as e:
+                last_error = e
+                failed = handle
+                logger.error(f"[{handle.name}] [TraceID: {trace_id}] Stream error: {e}")
+                if not is_provider_failure(e):
+                    raise
+                if race.emitted:
                     break
 
         raise last_error
+
+    def _stream_once(self, handle, kwargs, priority, on_delta, race: HedgeRace, trace_id: str):
+        """在指定提供商上发出一次流式请求；先开始输出的一路 (race 的胜者) 才把文本交给 on_delta"""
+        from xingchen.utils.llm_stream import StreamAssembler
+
+        assembler = StreamAssembler()
+        model = self._model_for(handle)
+        stream = None
+        try:
+            with self._registry.slot(handle.name, model, priority):
+                start = time.perf_counter()
+                first_token_ms = None
+                stream = self._client_for(handle).chat.completions.create(**dict(kwargs, model=model))
+                for chunk in stream:
+                    text = assembler.add(chunk)
+                    if first_token_ms is None and (text or assembler.tool_calls):
+                        first_token_ms = (time.perf_counter() - start) * 1000
+                        handle.health.record_first_token(first_token_ms)
+                        logger.debug(f"[{handle.name}] [TraceID: {trace_id}] 首个 token: {first_token_ms:.0f} ms")
+                        if not race.claim(handle):
+                            raise HedgeCancelled(f"{handle.name} 落后于 {race.winner.name}")
+                    if text and on_delta:
+                        race.emitted = True
+                        on_delta(text)
+                if not race.claim(handle):
+                    raise HedgeCancelled(f"{handle.name} 落后于 {race.winner.name}")
+        except BaseException as e:
+            handle.health.record_error(e)
+            close = getattr(stream, "close", None)
+            if close is not None and assembler.finish_reason is None:
+                close()
+            raise
+        handle.health.record_success()
+        return assembler.message()
@@ -0,0 +1,223 @@
+"""
+LLM 提供商健康 (LLM Health)
+同一提供商偶发的慢请求或连续失败不应让 F脑 的回复拖上数秒 (原先只会对同一提供商指数退避重试)。
+
+- LatencyHistogram: 对数分桶的延迟直方图 (总耗时 / 流式首 token)，样本达到窗口后整体减半，分位数随近况变化
+- CircuitBreaker: 连续失败 LLM_BREAKER_FAILURES 次后熔断 (OPEN)，冷却后放行一个探测请求 (HALF_OPEN)，
+  探测成功恢复 (CLOSED)、失败继续熔断
+- ProviderHealth: 每个提供商一份，由 LLMRegistry 的 ProviderHandle 持有；
+  路由 (LLMRegistry.route) 据此跳过熔断中的提供商，对冲延迟 (hedge_delay) 取延迟分位数
+- HedgeRace: 流式对冲请求的胜者裁决，先开始输出的一路获胜，另一路在下一个 chunk 时以 HedgeCancelled 放弃
+- is_provider_failure: 只有连接/超时、429 与 5xx 算提供商故障 (计入熔断、可重试/转移)；
+  其余 4xx (上下文超长、鉴权失败等) 是请求本身的问题，换提供商重发也无济于事，直接抛出
+"""
+
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from xingchen.config.settings import settings
+
+_BUCKET_BASE_MS = 10.0
+_BUCKET_GROWTH = 1.25
+_BUCKET_COUNT = 48      # 10 ms ~ 约 400 s
+
+
+class HedgeCancelled(Exception):
+    """对冲请求中落败的一路主动放弃 (不计为提供商失败)"""
+
+
+# 与 OpenAI SDK 自身的重试策略一致: 请求超时 / 冲突 / 限流
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """是否为提供商侧故障 (可重试、计入熔断): 连接错误、超时、429 与 5xx"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    import httpx
+    import openai
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in _RETRYABLE_STATUS or error.status_code >= 500
+    # APIConnectionError / APITimeoutError，以及流式中途的 APIError (无状态码)
+    return isinstance(error, (openai.APIError, httpx.TransportError))
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图 (毫秒)"""
+
+    def __init__(self, window: int = None):
+        self.window = window or settings.LLM_HEALTH_WINDOW
+        self.counts = [0.0] * _BUCKET_COUNT
+        self.total = 0.0
+
+    @staticmethod
+    def _bucket(ms: float) -> int:
+        if ms <= _BUCKET_BASE_MS:
+            return 0
+        index = int(math.log(ms / _BUCKET_BASE_MS, _BUCKET_GROWTH)) + 1
+        return min(index, _BUCKET_COUNT - 1)
+
+    @staticmethod
+    def _upper(index: int) -> float:
+        return _BUCKET_BASE_MS * _BUCKET_GROWTH ** index
+
+    def record(self, ms: float):
+        if self.total + 1 > self.window:
+            self.counts = [c / 2 for c in self.counts]
+            self.total /= 2
+        self.counts[self._bucket(ms)] += 1
+        self.total += 1
+
+    def percentile(self, q: float) -> float:
+        """返回分位数所在桶的上界 (ms)；无样本时为 0"""
+        if self.total <= 0:
+            return 0.0
+        target = q * self.total
+        cumulative = 0.0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count:
+                return self._upper(index)
+        return self._upper(_BUCKET_COUNT - 1)
+
+
+class CircuitBreaker:
+    """三态熔断器 (CLOSED / OPEN / HALF_OPEN)"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int = None, cooldown: float = None, clock: Callable[[], float] = time.monotonic):
+        self.threshold = failures or settings.LLM_BREAKER_FAILURES
+        self.cooldown = settings.LLM_BREAKER_COOLDOWN if cooldown is None else cooldown
+        self._clock = clock
+        self._state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self.opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self.probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """能否向该提供商发出请求；半开状态只放行一个探测请求 (会占用探测资格)"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.threshold:
+            self._state = self.OPEN
+            self.opened_at = self._clock()
+        self.probing = False
+
+    def record_cancel(self):
+        """请求被放弃 (对冲落败 / 调用方取消)：归还探测资格，不影响状态"""
+        self.probing = False
+
+
+class ProviderHealth:
+    """单个提供商的健康状态: 延迟直方图、熔断器与对冲/转移计数"""
+
+    def __init__(self, name: str, breaker: CircuitBreaker = None):
+        self.name = name
+        self.latency = LatencyHistogram()   # 非流式请求总耗时
+        self.ttft = LatencyHistogram()      # 流式请求首 token 延迟
+        self.breaker = breaker or CircuitBreaker()
+        self.counters = {"successes": 0, "failures": 0, "client_errors": 0, "hedged": 0, "hedge_wins": 0,
+                         "failovers": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self.breaker.state
+
+    def allow(self) -> bool:
+        with self._lock:
+            return self.breaker.allow()
+
+    def record_success(self, latency_ms: float = None):
+        with self._lock:
+            if latency_ms is not None:
+                self.latency.record(latency_ms)
+            self.counters["successes"] += 1
+            self.breaker.record_success()
+
+    def record_first_token(self, ms: float):
+        with self._lock:
+            self.ttft.record(ms)
+
+    def record_error(self, error: BaseException):
+        """记录一次失败；请求本身的错误 (4xx)、对冲落败与取消不计入熔断，只归还探测资格"""
+        provider_failure = isinstance(error, Exception) and is_provider_failure(error)
+        with self._lock:
+            if provider_failure:
+                self.counters["failures"] += 1
+                self.breaker.record_failure()
+            else:
+                if isinstance(error, Exception) and not isinstance(error, HedgeCancelled):
+                    self.counters["client_errors"] += 1
+                self.breaker.record_cancel()
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def hedge_delay(self, stream: bool = False) -> float:
+        """对冲延迟 (秒): 主提供商 (首 token) 延迟的 LLM_HEDGE_QUANTILE 分位数，限制在上下限之间"""
+        with self._lock:
+            histogram = self.ttft if stream else self.latency
+            if histogram.total < settings.LLM_HEDGE_MIN_SAMPLES:
+                return settings.LLM_HEDGE_DEFAULT_DELAY
+            delay = histogram.percentile(settings.LLM_HEDGE_QUANTILE) / 1000
+        return min(max(delay, settings.LLM_HEDGE_MIN_DELAY), settings.LLM_HEDGE_MAX_DELAY)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self.counters,
+                state=self.breaker.state,
+                consecutive_failures=self.breaker.consecutive_failures,
+                latency_p50_ms=self.latency.percentile(0.50),
+                latency_p95_ms=self.latency.percentile(0.95),
+                ttft_p95_ms=self.ttft.percentile(0.95),
+            )
+
+
+class HedgeRace:
+    """
+    流式对冲的胜者裁决
+    - claim(leg): 某一路开始输出时调用，返回该路是否获胜 (第一个调用者获胜)
+    - on_claim: 产生胜者时的回调 (同步版设置 threading.Event，异步版设置 asyncio.Event)
+    - emitted: 胜者是否已经把文本交给回调 (此后失败不能再重试，否则前端会收到重复内容)
+    """
+
+    def __init__(self, on_claim: Optional[Callable[[], None]] = None):
+        self._lock = threading.Lock()
+        self._on_claim = on_claim
+        self.winner = None
+        self.emitted = False
+
+    def claim(self, leg) -> bool:
+        with self._lock:
+            if self.winner is None:
+                self.winner = leg
+                if self._on_claim:
+                    self._on_claim()
+            return self.winner is leg
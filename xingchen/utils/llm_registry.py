@@ -0,0 +1,236 @@
+"""
+LLM 客户端注册表 (LLM Registry)
+进程内按提供商共享 LLM 资源；各调用点 (Driver / Navigator / DeepClean / AutoClassifier / Evolution)
+构造的 LLMClient / AsyncLLMClient 只是带各自模型名的轻量视图。
+
+- 连接复用: 每个提供商一个同步 OpenAI 客户端 (httpx 连接池 + keep-alive)；
+  异步客户端的连接绑定事件循环，按 (提供商, 事件循环) 共享
+- 调度: 同步 (slot) 与异步 (aslot) 请求都经过 LLMScheduler (优先级、并发上限、令牌桶限速)
+- 路由: 按 LLM_FALLBACK_PROVIDERS 组成备选链，熔断中的提供商被跳过 (route)，对冲请求的目标见 hedge_target
+- 指标: 各提供商的请求数、错误数、排队等待与请求耗时、各模型调用次数、健康状态，以及调度器的排队指标 (stats())
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional
+
+from xingchen.config.settings import settings
+from xingchen.utils.llm_health import HedgeCancelled, ProviderHealth
+from xingchen.utils.llm_scheduler import LLMScheduler, Priority
+from xingchen.utils.logger import logger
+from xingchen.utils.proxy import lazy_proxy
+
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+class ProviderHandle:
+    """单个提供商的共享资源: 配置、客户端、健康状态与指标"""
+
+    def __init__(self, name: str):
+        from xingchen.utils.llm_client import resolve_provider
+        self.name = name
+        self.api_key, self.base_url, self.default_model = resolve_provider(name)
+        self._client = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._client_lock = threading.Lock()
+        self.health = ProviderHealth(name)
+        self.metrics: Dict[str, Any] = {
+            "requests": 0, "errors": 0, "waited": 0,
+            "wait_ms": 0.0, "latency_ms": 0.0, "models": {},
+        }
+
+    @property
+    def client(self):
+        """
+        进程内共享的同步 OpenAI 客户端 (首次访问时创建)
+        关闭 SDK 自带的重试: 重试与故障转移统一由 LLMClient 按熔断状态处理
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import DefaultHttpxClient
+                    from xingchen.utils import llm_client
+                    self._client = llm_client.OpenAI(
+                        api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                        http_client=DefaultHttpxClient(limits=_http_limits()),
+                    )
+        return self._client
+
+    def async_client(self):
+        """当前事件循环内共享的 AsyncOpenAI 客户端 (必须在协程中调用)"""
+        loop = asyncio.get_running_loop()
+        with self._client_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                from openai import DefaultAsyncHttpxClient
+                from xingchen.utils import async_llm_client
+                client = self._async_clients[loop] = async_llm_client.AsyncOpenAI(
+                    api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+                )
+            return client
+
+    def pop_async_client(self):
+        with self._client_lock:
+            return self._async_clients.pop(asyncio.get_running_loop(), None)
+
+
+class LLMRegistry:
+    """
+    进程级 LLM 注册表
+    - handle(provider): 提供商共享资源
+    - route(primary, avoid) / hedge_target(primary, chosen): 按熔断状态选择提供商
+    - slot(provider, model, priority) / aslot(...): 经调度器占用一个名额并记录指标 (同步 / 异步)
+    - stats(): 各提供商指标与调度器指标
+    """
+
+    def __init__(self, max_concurrency: int = None, provider_limits: Dict[str, int] = None,
+                 rate_limits: Dict = None, interactive_reserved: int = None):
+        self.scheduler = LLMScheduler(max_concurrency, provider_limits, rate_limits, interactive_reserved)
+        self._handles: Dict[str, ProviderHandle] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self.scheduler.in_flight
+
+    @property
+    def max_concurrency(self) -> int:
+        return self.scheduler.max_in_flight
+
+    def handle(self, provider: str = None) -> ProviderHandle:
+        provider = provider or settings.DEFAULT_LLM_PROVIDER
+        with self._lock:
+            handle = self._handles.get(provider)
+            if handle is None:
+                handle = self._handles[provider] = ProviderHandle(provider)
+            return handle
+
+    # ---------- 路由 ----------
+
+    def fallback_chain(self, primary: ProviderHandle) -> List[ProviderHandle]:
+        """主提供商 + 已配置 API Key 的备选提供商 (按 LLM_FALLBACK_PROVIDERS 的顺序)"""
+        chain = [primary]
+        for name in settings.LLM_FALLBACK_PROVIDERS.get(primary.name, []):
+            handle = self.handle(name)
+            if handle not in chain and handle.api_key:
+                chain.append(handle)
+        return chain
+
+    def route(self, primary: ProviderHandle, avoid: ProviderHandle = None) -> ProviderHandle:
+        """
+        选择本次请求的提供商: 备选链中第一个未熔断的 (重试时优先避开刚失败的 avoid)；
+        全部熔断时仍使用主提供商，总比直接失败好
+        """
+        chain = self.fallback_chain(primary)
+        chosen = next((h for h in chain if h is not avoid and h.health.allow()), None)
+        if chosen is None:
+            chosen = avoid if avoid is not None and avoid.health.allow() else primary
+        if chosen is not primary:
+            primary.health.count("failovers")
+            logger.warning(f"[LLMRegistry] {primary.name} 不可用 ({primary.health.state})，转用 {chosen.name}")
+        return chosen
+
+    def hedge_target(self, primary: ProviderHandle, chosen: ProviderHandle) -> Optional[ProviderHandle]:
+        """对冲请求的目标: 备选链中除 chosen 外第一个处于 CLOSED 状态的提供商"""
+        for handle in self.fallback_chain(primary):
+            if handle is not chosen and handle.health.state == handle.health.breaker.CLOSED:
+                return handle
+        return None
+
+    # ---------- 名额 ----------
+
+    def _record(self, handle: ProviderHandle, model: Optional[str], wait: float, start: float, failed: bool):
+        with self._lock:
+            m = handle.metrics
+            m["requests"] += 1
+            m["errors"] += int(failed)
+            m["latency_ms"] += (time.perf_counter() - start) * 1000
+            if wait > 0.001:
+                m["waited"] += 1
+                m["wait_ms"] += wait * 1000
+            if model:
+                m["models"][model] = m["models"].get(model, 0) + 1
+
+    @contextmanager
+    def slot(self, provider: str, model: str = None, priority: int = Priority.NORMAL):
+        """同步请求: 阻塞等待调度器放行"""
+        handle = self.handle(provider)
+        wait = self.scheduler.acquire(handle.name, priority)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield handle
+        except BaseException as e:
+            failed = not isinstance(e, (HedgeCancelled, asyncio.CancelledError, GeneratorExit))
+            raise
+        finally:
+            self.scheduler.release(handle.name)
+            self._record(handle, model, wait, start, failed)
+
+    @asynccontextmanager
+    async def aslot(self, provider: str, model: str = None, priority: int = Priority.NORMAL):
+        """异步请求: 等待放行时让出事件循环 (可取消)"""
+        handle = self.handle(provider)
+        wait = await self.scheduler.acquire_async(handle.name, priority)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield handle
+        except BaseException as e:
+            failed = not isinstance(e, (HedgeCancelled, asyncio.CancelledError, GeneratorExit))
+            raise
+        finally:
+            self.scheduler.release(handle.name)
+            self._record(handle, model, wait, start, failed)
+
+    # ---------- 观测 ----------
+
+    def stats(self) -> Dict[str, Any]:
+        scheduler = self.scheduler.stats()
+        with self._lock:
+            providers = {}
+            for name, handle in self._handles.items():
+                m = dict(handle.metrics, models=dict(handle.metrics["models"]))
+                requests = m["requests"]
+                m.update(scheduler["providers"].get(name, {"in_flight": 0, "max_in_flight": 0, "limit": None}))
+                m["health"] = handle.health.snapshot()
+                m["avg_latency_ms"] = m["latency_ms"] / requests if requests else 0.0
+                m["avg_wait_ms"] = m["wait_ms"] / m["waited"] if m["waited"] else 0.0
+                providers[name] = m
+        return {"in_flight": scheduler["in_flight"], "max_concurrency": scheduler["max_in_flight"],
+                "priorities": scheduler["priorities"], "providers": providers}
+
+    def log_stats(self):
+        for name, m in self.stats()["providers"].items():
+            logger.info(
+                f"[LLMRegistry] {name}: 请求 {m['requests']} (错误 {m['errors']})，"
+                f"峰值并发 {m['max_in_flight']}/{m['limit']}，平均耗时 {m['avg_latency_ms']:.0f} ms，"
+                f"排队 {m['waited']} 次 (平均 {m['avg_wait_ms']:.0f} ms)，"
+                f"状态 {m['health']['state']}，对冲 {m['health']['hedged']} 次 (胜 {m['health']['hedge_wins']})，"
+                f"转移 {m['health']['failovers']} 次"
+            )
+
+
+_llm_registry_instance: Optional[LLMRegistry] = None
+
+
+def get_llm_registry() -> LLMRegistry:
+    """获取全局 LLMRegistry 实例（延迟初始化）。"""
+    global _llm_registry_instance
+    if _llm_registry_instance is None:
+        _llm_registry_instance = LLMRegistry()
+    return _llm_registry_instance
+
+
+llm_registry = lazy_proxy(get_llm_registry, LLMRegistry)
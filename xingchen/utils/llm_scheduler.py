@@ -0,0 +1,265 @@
+"""
+LLM 请求调度器 (LLM Scheduler)
+F脑的实时回复与 S脑的后台任务 (压缩、内化、推理、深度维护、分类) 共用同一批提供商，
+调度器统一决定哪个请求可以发出:
+
+- 优先级: INTERACTIVE > NORMAL > BACKGROUND；名额释放时总是先放行排队中优先级最高的请求
+- 预留名额: 全局在途上限中保留 LLM_INTERACTIVE_RESERVED 个只给交互请求，后台任务占满时用户回复也不用排队
+  (已发出的请求无法中途收回，"抢占" 通过插队 + 预留名额实现)
+- 并发上限: 全局在途上限 + 各提供商在途上限
+- 速率限制: 各提供商一个令牌桶 (每秒请求数 + 突发容量)，令牌不足时由定时器在补充后重新调度
+- 指标: 各优先级的排队等待 (次数 / p50 / p95 / 最大值) 与当前排队数
+
+同步请求 (threading.Event) 与异步请求 (asyncio.Future) 在同一个队列中排队。
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+from xingchen.config.settings import settings
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0   # 用户正在等待的回复 (F脑)
+    NORMAL = 1
+    BACKGROUND = 2    # S脑后台任务
+
+
+class TokenBucket:
+    """令牌桶: rate 为每秒补充的令牌数，burst 为桶容量"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class _ProviderState:
+    def __init__(self, limit: int, bucket: Optional[TokenBucket]):
+        self.limit = limit
+        self.bucket = bucket
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "provider", "enqueued_at", "granted", "event", "loop", "future")
+
+    def __init__(self, priority: int, seq: int, provider: str):
+        self.priority = priority
+        self.seq = seq
+        self.provider = provider
+        self.enqueued_at = time.perf_counter()
+        self.granted = False
+        self.event: Optional[threading.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(_resolve, self.future)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    优先级调度器
+    - acquire(provider, priority) / release(provider): 同步占用与归还一个名额，acquire 返回排队秒数
+    - acquire_async(provider, priority): 异步版 (可取消)
+    - stats(): 在途数、各优先级排队指标、各提供商在途/峰值
+    """
+
+    def __init__(self, max_in_flight: int = None, provider_limits: Dict[str, int] = None,
+                 rate_limits: Dict[str, Tuple[float, float]] = None, interactive_reserved: int = None):
+        self.max_in_flight = max_in_flight or settings.LLM_MAX_CONCURRENCY
+        self.provider_limits = dict(settings.LLM_PROVIDER_CONCURRENCY if provider_limits is None else provider_limits)
+        self.rate_limits = dict(settings.LLM_RATE_LIMITS if rate_limits is None else rate_limits)
+        reserved = settings.LLM_INTERACTIVE_RESERVED if interactive_reserved is None else interactive_reserved
+        self.interactive_reserved = min(reserved, self.max_in_flight - 1)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._providers: Dict[str, _ProviderState] = {}
+        self._waiting: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._timer: Optional[threading.Timer] = None
+        self._timer_due = 0.0
+        self._waits: Dict[str, deque] = {p.name: deque(maxlen=2000) for p in Priority}
+        self._wait_counts: Dict[str, int] = {p.name: 0 for p in Priority}
+
+    def _provider(self, name: str) -> _ProviderState:
+        state = self._providers.get(name)
+        if state is None:
+            rate = self.rate_limits.get(name)
+            bucket = TokenBucket(*rate) if rate else None
+            limit = self.provider_limits.get(name, settings.LLM_PROVIDER_DEFAULT_CONCURRENCY)
+            state = self._providers[name] = _ProviderState(limit, bucket)
+        return state
+
+    # ---------- 调度核心 (均在 self._lock 内调用) ----------
+
+    def _capacity_for(self, priority: int) -> int:
+        if priority == Priority.INTERACTIVE:
+            return self.max_in_flight
+        return self.max_in_flight - self.interactive_reserved
+
+    def _dispatch(self):
+        """按 (优先级, 到达顺序) 放行排队请求；受令牌限制的请求安排定时重试"""
+        if not self._waiting:
+            return
+        self._waiting.sort(key=lambda t: (t.priority, t.seq))
+        now = time.monotonic()
+        next_wake = None
+        blocked_providers = set()
+        remaining = []
+        for ticket in self._waiting:
+            state = self._provider(ticket.provider)
+            if (ticket.provider in blocked_providers
+                    or self.in_flight >= self._capacity_for(ticket.priority)
+                    or state.in_flight >= state.limit):
+                # 同一提供商内保持优先级顺序: 前面的请求被挡住时后面的也不放行
+                blocked_providers.add(ticket.provider)
+                remaining.append(ticket)
+                continue
+            if state.bucket is not None and not state.bucket.try_take(now):
+                wait = state.bucket.wait_time(now)
+                next_wake = wait if next_wake is None else min(next_wake, wait)
+                blocked_providers.add(ticket.provider)
+                remaining.append(ticket)
+                continue
+            self._grant(ticket, state)
+        self._waiting = remaining
+        if next_wake is not None:
+            self._schedule_timer(next_wake)
+
+    def _grant(self, ticket: _Ticket, state: _ProviderState):
+        self.in_flight += 1
+        state.in_flight += 1
+        state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        ticket.granted = True
+        wait = time.perf_counter() - ticket.enqueued_at
+        name = Priority(ticket.priority).name
+        self._waits[name].append(wait)
+        self._wait_counts[name] += 1
+        ticket.wake()
+
+    def _schedule_timer(self, delay: float):
+        due = time.monotonic() + delay
+        if self._timer is not None and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = threading.Timer(delay + 0.001, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _enqueue(self, provider: str, priority: int) -> _Ticket:
+        ticket = _Ticket(int(priority), next(self._seq), provider)
+        self._waiting.append(ticket)
+        return ticket
+
+    # ---------- 对外接口 ----------
+
+    def acquire(self, provider: str, priority: int = Priority.NORMAL) -> float:
+        """阻塞直到获得名额，返回排队秒数"""
+        with self._lock:
+            ticket = self._enqueue(provider, priority)
+            ticket.event = threading.Event()
+            self._dispatch()
+        ticket.event.wait()
+        return time.perf_counter() - ticket.enqueued_at
+
+    async def acquire_async(self, provider: str, priority: int = Priority.NORMAL) -> float:
+        """等待名额时让出事件循环；被取消时撤回排队 (或归还已分配的名额)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            ticket = self._enqueue(provider, priority)
+            ticket.loop = loop
+            ticket.future = loop.create_future()
+            self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if ticket.granted:
+                    granted = True
+                else:
+                    granted = False
+                    if ticket in self._waiting:
+                        self._waiting.remove(ticket)
+            if granted:
+                self.release(provider)
+            raise
+        return time.perf_counter() - ticket.enqueued_at
+
+    def release(self, provider: str):
+        with self._lock:
+            state = self._provider(provider)
+            self.in_flight -= 1
+            state.in_flight -= 1
+            self._dispatch()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queued = {p.name: 0 for p in Priority}
+            for ticket in self._waiting:
+                queued[Priority(ticket.priority).name] += 1
+            priorities = {}
+            for name, waits in self._waits.items():
+                ordered = sorted(waits)
+                priorities[name] = {
+                    "granted": self._wait_counts[name],
+                    "queued": queued[name],
+                    "wait_p50_ms": _percentile(ordered, 0.50) * 1000,
+                    "wait_p95_ms": _percentile(ordered, 0.95) * 1000,
+                    "wait_max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+                }
+            providers = {
+                name: {"in_flight": s.in_flight, "max_in_flight": s.max_in_flight, "limit": s.limit,
+                       "tokens": round(s.bucket.tokens, 2) if s.bucket else None}
+                for name, s in self._providers.items()
+            }
+            return {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight,
+                    "interactive_reserved": self.interactive_reserved,
+                    "priorities": priorities, "providers": providers}
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,161 @@
+"""
+LLM 流式输出工具 (LLM Streaming)
+- StreamAssembler: 把 stream=True 返回的 chunk 增量 (content / tool_calls) 组装成完整的 Message
+- ReplyStreamer: 从流式生成中的 JSON 文本里增量提取某个字符串字段 (默认 "reply")，
+  供 Driver 在完整 JSON 生成之前就把回复逐段推送给前端
+
+工具调用的增量按 index 归并: 首个分片携带 id / name，后续分片只追加 arguments。
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class StreamAssembler:
+    """
+    流式 chunk 组装器
+    - add(chunk): 吸收一个 chunk，返回其中新增的文本 (没有则为空串)
+    - message(): 组装为与非流式调用一致的 Message 对象 (保留 .content / .tool_calls / model_dump())
+    """
+
+    def __init__(self):
+        self.content_parts: List[str] = []
+        self.tool_calls: Dict[int, Dict[str, Any]] = {}
+        self.finish_reason: Optional[str] = None
+
+    def add(self, chunk: Any) -> str:
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            return ""
+        choice = choices[0]
+        if getattr(choice, "finish_reason", None):
+            self.finish_reason = choice.finish_reason
+        delta = getattr(choice, "delta", None)
+        if delta is None:
+            return ""
+
+        for tc in getattr(delta, "tool_calls", None) or []:
+            index = getattr(tc, "index", None)
+            if index is None:
+                index = len(self.tool_calls)
+            entry = self.tool_calls.setdefault(
+                index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
+            )
+            if getattr(tc, "id", None):
+                entry["id"] = tc.id
+            if getattr(tc, "type", None):
+                entry["type"] = tc.type
+            fn = getattr(tc, "function", None)
+            if fn is not None:
+                if getattr(fn, "name", None):
+                    entry["function"]["name"] += fn.name
+                if getattr(fn, "arguments", None):
+                    entry["function"]["arguments"] += fn.arguments
+
+        text = getattr(delta, "content", None) or ""
+        if text:
+            self.content_parts.append(text)
+        return text
+
+    @property
+    def content(self) -> str:
+        return "".join(self.content_parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"role": "assistant", "content": self.content or None}
+        if self.tool_calls:
+            data["tool_calls"] = [self.tool_calls[i] for i in sorted(self.tool_calls)]
+        return data
+
+    def message(self) -> Any:
+        from xingchen.utils.llm_cache import message_from_dict
+        return message_from_dict(self.to_dict())
+
+
+class ReplyStreamer:
+    """
+    JSON 字符串字段的增量提取器
+    - feed(text): 追加一段模型输出，返回该字段新解码出的文本
+    - text: 目前为止解码出的字段全文
+
+    输出不是 JSON (首个非空白字符不是 "{" 或 "`") 时按纯文本原样透传，
+    与 Driver 解析失败时把原始文本当作回复的降级行为一致。
+    """
+
+    def __init__(self, field: str = "reply"):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = 0          # 字段值中下一个待解码字符的位置
+        self._mode = "seek"    # seek -> value -> done | plain
+        self._pending_high: Optional[str] = None  # 等待配对的高位代理
+        self.text = ""
+
+    @property
+    def done(self) -> bool:
+        return self._mode == "done"
+
+    def feed(self, chunk: str) -> str:
+        if not chunk or self._mode == "done":
+            return ""
+        self._buffer += chunk
+
+        if self._mode == "plain":
+            self.text += chunk
+            return chunk
+
+        if self._mode == "seek":
+            head = self._buffer.lstrip()
+            if head and head[0] not in "{`":
+                self._mode = "plain"
+                self.text = self._buffer
+                return self._buffer
+            match = self._key.search(self._buffer)
+            if not match:
+                return ""
+            self._mode = "value"
+            self._pos = match.end()
+
+        return self._decode()
+
+    def _decode(self) -> str:
+        out = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self._mode = "done"
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # 转义序列: 不完整时停在反斜杠处，等待下一段
+            if i + 1 >= len(buf):
+                break
+            code = buf[i + 1]
+            if code == "u":
+                if i + 6 > len(buf):
+                    break
+                try:
+                    char = chr(int(buf[i + 2:i + 6], 16))
+                except ValueError:
+                    char = buf[i:i + 6]
+                i += 6
+                if "\ud800" <= char <= "\udbff":
+                    self._pending_high = char
+                    continue
+                if self._pending_high and "\udc00" <= char <= "\udfff":
+                    char = (self._pending_high + char).encode("utf-16", "surrogatepass").decode("utf-16")
+                self._pending_high = None
+                out.append(char)
+                continue
+            out.append(_ESCAPES.get(code, code))
+            i += 2
+        self._pos = i
+        delta = "".join(out)
+        self.text += delta
+        return delta
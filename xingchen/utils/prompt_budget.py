@@ -0,0 +1,185 @@
+"""
+提示词 token 预算 (Prompt Budget)
+Driver / Navigator 的提示词由多个分段拼接 (对话历史、长期记忆、画像、技能、工具列表、事件日志)，
+原先各段原样拼接、长度不受控制。PromptBudget 在发送前把它们约束到目标大小:
+
+- 计数: 按提供商的分词器近似 (中日韩字符与其他字符各一个系数，见 PROMPT_TOKEN_RATIOS)，不依赖分词器库
+- 分段: 每段有优先级与单独上限 (PROMPT_SECTION_BUDGETS)；先各自截到上限，
+  整体仍超出目标时从优先级最低的分段开始继续裁剪
+- 裁剪: 按条目整条丢弃 (列表类保留开头，即最相关的条目；历史 / 日志保留末尾，即最近的)，
+  被丢弃的条目用一行省略说明代替 (不额外调用 LLM 做摘要，以免增加延迟)
+- 日志: 每次组装记录各分段 token 数与裁剪情况 (last_report)
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+
+# 中日韩文字与全角标点 (分词器中通常每 1~2 个字符一个 token)
+_CJK = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def count_tokens(text: str, provider: str = None) -> int:
+    """按提供商近似计算 token 数"""
+    if not text:
+        return 0
+    cjk_ratio, other_ratio = settings.PROMPT_TOKEN_RATIOS.get(provider, settings.PROMPT_DEFAULT_TOKEN_RATIO)
+    cjk = len(_CJK.findall(text))
+    return math.ceil(cjk * cjk_ratio + (len(text) - cjk) * other_ratio - 1e-9)
+
+
+def count_message_tokens(messages: List[Dict[str, Any]], provider: str = None) -> int:
+    """消息列表的近似 token 数 (含每条消息的格式开销)"""
+    return sum(count_tokens(m.get("content") or "", provider) + settings.PROMPT_MESSAGE_OVERHEAD for m in messages)
+
+
+_TRUNCATED = "…(截断)"
+
+
+def truncate_to_tokens(text: str, max_tokens: int, provider: str = None) -> str:
+    """把单段文本截到 max_tokens 以内 (保留开头，末尾加截断标记)"""
+    tokens = count_tokens(text, provider)
+    if tokens <= max_tokens:
+        return text
+    room = max_tokens - count_tokens(_TRUNCATED, provider)
+    if room <= 0:
+        return ""
+    cut = int(len(text) * room / tokens)
+    while cut > 0 and count_tokens(text[:cut], provider) > room:
+        cut = int(cut * 0.9)
+    return text[:cut] + _TRUNCATED
+
+
+class Section:
+    """
+    提示词分段
+    - items: 文本行 (str) 或对话消息 (dict)，按重要性排好序
+    - keep: 超出预算时保留 "first" (开头，按相关度排序的列表) 或 "last" (末尾，对话历史 / 事件日志)
+    - priority / budget: 默认取 PROMPT_SECTION_BUDGETS[name]
+    - note: 丢弃条目后是否追加一行省略说明 (对话消息不追加)
+    """
+
+    def __init__(self, name: str, items: List[Any], keep: str = "first", priority: int = None,
+                 budget: int = None, note: bool = True):
+        default_priority, default_budget = settings.PROMPT_SECTION_BUDGETS.get(name, (5, None))
+        self.name = name
+        self.items = [item for item in items if item]
+        self.keep = keep
+        self.priority = default_priority if priority is None else priority
+        self.budget = default_budget if budget is None else budget
+        self.note = note
+        self.kept: List[Any] = list(self.items)
+        self.tokens = 0
+
+    @classmethod
+    def from_text(cls, name: str, text: str, **kwargs) -> "Section":
+        return cls(name, (text or "").splitlines(), **kwargs)
+
+    @property
+    def dropped(self) -> int:
+        return len(self.items) - len(self.kept)
+
+    def text(self) -> str:
+        lines = list(self.kept)
+        if self.note and self.dropped:
+            if self.keep == "last":
+                lines.insert(0, f"(更早的 {self.dropped} 条因篇幅省略)")
+            else:
+                lines.append(f"(另有 {self.dropped} 条因篇幅省略)")
+        return "\n".join(lines)
+
+
+class PromptBudget:
+    """
+    单次提示词组装的 token 预算
+    用法:
+        budget = PromptBudget("driver", provider="qwen")
+        fitted = budget.fit([Section(...), ...], fixed=[system_template, user_input, tools_json])
+        fitted["history"].kept / fitted["long_term"].text()
+    """
+
+    def __init__(self, site: str, provider: str = None, target_tokens: int = None):
+        self.site = site
+        self.provider = provider
+        self.target = target_tokens or settings.PROMPT_TARGET_TOKENS.get(site, 8000)
+        self.last_report: Dict[str, Any] = {}
+
+    # ---------- 计数 ----------
+
+    def _item_tokens(self, item: Any) -> int:
+        if isinstance(item, dict):
+            return count_tokens(item.get("content") or "", self.provider) + settings.PROMPT_MESSAGE_OVERHEAD
+        return count_tokens(item, self.provider) + 1  # 换行
+
+    def _truncate_item(self, item: Any, max_tokens: int) -> Any:
+        if isinstance(item, dict):
+            content = truncate_to_tokens(item.get("content") or "", max_tokens - settings.PROMPT_MESSAGE_OVERHEAD,
+                                         self.provider)
+            return dict(item, content=content)
+        return truncate_to_tokens(item, max_tokens - 1, self.provider)
+
+    def _fit_section(self, section: Section, limit: Optional[int]):
+        """按 keep 方向整条保留，直到用完 limit (含省略说明)；第一条就放不下时截断这一条"""
+        self._keep_within(section, limit)
+        if section.note and section.dropped and limit is not None:
+            note_tokens = self._item_tokens(f"(另有 {len(section.items)} 条因篇幅省略)")
+            self._keep_within(section, max(0, limit - note_tokens))
+            section.tokens += note_tokens
+
+    def _keep_within(self, section: Section, limit: Optional[int]):
+        ordered = section.items if section.keep == "first" else list(reversed(section.items))
+        kept, used = [], 0
+        for item in ordered:
+            tokens = self._item_tokens(item)
+            if limit is not None and used + tokens > limit:
+                if not kept and limit > settings.PROMPT_MESSAGE_OVERHEAD + 1:
+                    item = self._truncate_item(item, limit)
+                    kept.append(item)
+                    used += self._item_tokens(item)
+                break
+            kept.append(item)
+            used += tokens
+        section.kept = kept if section.keep == "first" else list(reversed(kept))
+        section.tokens = used
+
+    # ---------- 组装 ----------
+
+    def fit(self, sections: List[Section], fixed: List[Any] = ()) -> Dict[str, Section]:
+        """
+        把各分段约束到预算内 (原地更新 section.kept)，返回 {name: section}
+        :param fixed: 不可裁剪的部分 (模板、用户输入、工具定义 JSON 等)，只参与计数
+        """
+        fixed_tokens = sum(self._item_tokens(part) for part in fixed if part)
+        for section in sections:
+            self._fit_section(section, section.budget)
+
+        overflow = fixed_tokens + sum(s.tokens for s in sections) - self.target
+        for section in sorted(sections, key=lambda s: -s.priority):
+            if overflow <= 0:
+                break
+            before = section.tokens
+            self._fit_section(section, max(0, before - overflow))
+            overflow -= before - section.tokens
+
+        total = fixed_tokens + sum(s.tokens for s in sections)
+        self.last_report = {
+            "site": self.site, "provider": self.provider, "target": self.target,
+            "total": total, "fixed": fixed_tokens,
+            "sections": {s.name: {"tokens": s.tokens, "kept": len(s.kept), "dropped": s.dropped} for s in sections},
+        }
+        self._log()
+        return {s.name: s for s in sections}
+
+    def _log(self):
+        report = self.last_report
+        parts = ", ".join(
+            f"{name} {info['tokens']}" + (f" (-{info['dropped']})" if info["dropped"] else "")
+            for name, info in report["sections"].items()
+        )
+        logger.info(
+            f"[PromptBudget] {report['site']}: ~{report['total']}/{report['target']} tokens "
+            f"(固定 {report['fixed']}, {parts})"
+        )
@@ -0,0 +1,66 @@
+"""
+组件就绪状态 (Readiness)
+分阶段启动时，非关键组件在后台预热；调用方通过 is_ready 判断是否可用，未就绪时走降级路径。
+
+状态流转: pending -> warming -> ready / failed
+"""
+
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+from xingchen.utils.logger import logger
+
+
+class ReadyState(str, Enum):
+    PENDING = "pending"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class Readiness:
+    """
+    单个组件的就绪状态 (线程安全，可等待)
+    - run(fn): 执行预热函数并记录状态与耗时 (异常只记录为 failed，不向外抛)
+    - wait(timeout): 阻塞到预热结束 (ready 或 failed)，返回是否 ready
+    """
+
+    def __init__(self, name: str, ready: bool = False):
+        self.name = name
+        self.state = ReadyState.READY if ready else ReadyState.PENDING
+        self.error: Optional[str] = None
+        self.elapsed_ms: Optional[float] = None
+        self._done = threading.Event()
+        if ready:
+            self._done.set()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == ReadyState.READY
+
+    def wait(self, timeout: float = None) -> bool:
+        self._done.wait(timeout)
+        return self.is_ready
+
+    def run(self, fn: Callable[[], Any]) -> Any:
+        self.state = ReadyState.WARMING
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self.error = str(e)
+            self.state = ReadyState.FAILED
+            logger.error(f"[Warmup] {self.name} 预热失败: {e}", exc_info=True)
+            return None
+        finally:
+            self.elapsed_ms = (time.perf_counter() - start) * 1000
+            if self.state == ReadyState.WARMING:
+                self.state = ReadyState.READY
+            self._done.set()
+        logger.info(f"[Warmup] {self.name} 已就绪 ({self.elapsed_ms:.0f} ms)")
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"state": self.state.value, "elapsed_ms": self.elapsed_ms, "error": self.error}
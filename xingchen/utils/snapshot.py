@@ -0,0 +1,259 @@
+"""
+启动快照 (Startup Snapshot)
+把启动时需要重建的派生内存结构 (长期记忆缓存、别名表、图谱 CSR、情绪规则等) 存进 data/ 下的一个二进制文件，
+下次启动时按段懒加载，省掉逐行查询 SQLite / 解析 YAML。
+
+文件格式 (版本号见 SNAPSHOT_FORMAT):
+    MAGIC(8) | format(u32) | manifest 长度(u32) | manifest(JSON) | 各段数据 (按 64 字节对齐)
+    manifest: {"sections": {name: {"stamp", "object": [offset, length], "arrays": {key: [offset, dtype, shape]}}}}
+
+- 每段带一个 stamp (如数据库变更计数、文件 mtime)，读取时与当前值不一致即视为过期，由调用方重建
+- 读取用 mmap: 启动只解析 manifest，段数据在首次访问时才从页缓存反序列化
+- 写入先写临时文件再原子替换；未注册采集器 (或本次无需更新) 的段原样沿用旧文件中的字节
+"""
+
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from xingchen.config.settings import settings
+from xingchen.utils.logger import logger
+from xingchen.utils.proxy import lazy_proxy
+
+SNAPSHOT_FORMAT = 1
+_MAGIC = b"XCSNAP\x00\x00"
+_HEADER = struct.Struct("<8sII")
+_ALIGN = 64
+
+# 段内容: (stamp, 可 pickle 的对象, {名称: numpy 数组})
+SectionPayload = Tuple[Any, Any, Dict[str, np.ndarray]]
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class StartupSnapshot:
+    """
+    启动快照文件
+    - load(name, stamp): 取一段 (stamp 不一致或文件损坏时返回 None)
+    - register(name, stamp_fn, build_fn): 登记一段的采集器，save() 时 stamp 变化才调用 build_fn 重新生成
+    - start_autosave() / save(): 周期性与关闭时写盘
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.STARTUP_SNAPSHOT_PATH
+        self._lock = threading.RLock()
+        self._mm: Optional[mmap.mmap] = None
+        self._manifest: Optional[Dict] = None
+        self._collectors: Dict[str, Tuple[Callable[[], Any], Callable[[], Optional[SectionPayload]]]] = {}
+        self._autosave_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.stats = {"hits": 0, "misses": 0, "saves": 0}
+
+    # ---------------- 读取 ----------------
+
+    def _open(self) -> Optional[Dict]:
+        """映射文件并解析 manifest (只做一次；文件缺失、版本不符或损坏时返回 None)"""
+        if self._manifest is not None:
+            return self._manifest
+        if not settings.STARTUP_SNAPSHOT_ENABLED or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, fmt, manifest_len = _HEADER.unpack_from(mm, 0)
+            if magic != _MAGIC or fmt != SNAPSHOT_FORMAT:
+                mm.close()
+                logger.info(f"[Snapshot] 快照版本不符 (format={fmt})，忽略")
+                return None
+            manifest = json.loads(mm[_HEADER.size:_HEADER.size + manifest_len].decode("utf-8"))
+        except Exception as e:
+            logger.warning(f"[Snapshot] 快照文件无法读取，忽略: {e}")
+            return None
+        self._mm, self._manifest = mm, manifest
+        return manifest
+
+    def load(self, name: str, stamp: Any) -> Optional[Tuple[Any, Dict[str, np.ndarray]]]:
+        """
+        读取一段 (对象 + 数组)
+        数组从映射区复制出来 (一次 memcpy)，调用方可以原地修改，快照文件也可以随时被替换
+        """
+        with self._lock:
+            section = (self._open() or {}).get("sections", {}).get(name)
+            if section is None or section.get("stamp") != _normalize(stamp):
+                self.stats["misses"] += 1
+                return None
+            try:
+                obj = None
+                if section.get("object"):
+                    offset, length = section["object"]
+                    obj = pickle.loads(self._mm[offset:offset + length])
+                arrays = {}
+                for key, (offset, dtype, shape) in section.get("arrays", {}).items():
+                    count = int(np.prod(shape)) if shape else 1
+                    arrays[key] = np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset).reshape(shape).copy()
+            except Exception as e:
+                logger.warning(f"[Snapshot] 快照段 {name} 损坏，改为重建: {e}")
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return obj, arrays
+
+    def close(self):
+        """释放映射 (替换文件前必须调用，Windows 下映射中的文件不能被覆盖)"""
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+            self._mm, self._manifest = None, None
+
+    # ---------------- 写入 ----------------
+
+    def register(self, name: str, stamp_fn: Callable[[], Any], build_fn: Callable[[], Optional[SectionPayload]]):
+        """
+        登记一段的采集器
+        :param stamp_fn: 返回当前数据源的版本戳 (应当很便宜)
+        :param build_fn: 返回 (stamp, obj, arrays)；数据在构建期间发生变化等情况下返回 None (沿用旧段)
+        """
+        with self._lock:
+            self._collectors[name] = (stamp_fn, build_fn)
+
+    def save(self) -> bool:
+        """写出快照: 版本戳未变的段直接复制旧字节，其余段重新构建"""
+        if not settings.STARTUP_SNAPSHOT_ENABLED:
+            return False
+        with self._lock:
+            t0 = time.perf_counter()
+            old_sections = (self._open() or {}).get("sections", {})
+            blobs = {}  # name -> (stamp, object_bytes, {key: array})
+            rebuilt = 0
+            for name, (stamp_fn, build_fn) in self._collectors.items():
+                try:
+                    if name in old_sections and old_sections[name].get("stamp") == _normalize(stamp_fn()):
+                        continue
+                    payload = build_fn()
+                except Exception as e:
+                    logger.warning(f"[Snapshot] 采集快照段 {name} 失败: {e}")
+                    continue
+                if payload is not None:
+                    stamp, obj, arrays = payload
+                    blobs[name] = (_normalize(stamp), pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL),
+                                   {k: np.ascontiguousarray(v) for k, v in (arrays or {}).items()})
+                    rebuilt += 1
+            if not rebuilt and self._manifest is not None:
+                return False
+
+            # 沿用的旧段: 把字节从映射区读出来
+            for name, section in old_sections.items():
+                if name in blobs:
+                    continue
+                obj_bytes = b""
+                if section.get("object"):
+                    offset, length = section["object"]
+                    obj_bytes = self._mm[offset:offset + length]
+                arrays = {
+                    key: np.frombuffer(self._mm, dtype=dtype, count=int(np.prod(shape)) if shape else 1,
+                                       offset=offset).reshape(shape).copy()
+                    for key, (offset, dtype, shape) in section.get("arrays", {}).items()
+                }
+                blobs[name] = (section.get("stamp"), obj_bytes, arrays)
+
+            data = self._serialize(blobs)
+            self.close()
+            tmp_path = self.path + ".tmp"
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.stats["saves"] += 1
+            logger.info(
+                f"[Snapshot] 启动快照已写出: {len(blobs)} 段 (重建 {rebuilt} 段), "
+                f"{len(data) / 1024:.0f} KB, 耗时 {(time.perf_counter() - t0) * 1000:.0f} ms"
+            )
+            return True
+
+    @staticmethod
+    def _serialize(blobs: Dict[str, Tuple[Any, bytes, Dict[str, np.ndarray]]]) -> bytes:
+        """两遍布局: 先按估计的 manifest 长度排布偏移，manifest 变长时放大预留区重排"""
+        reserve = 4096
+        while True:
+            sections, chunks = {}, []
+            offset = _align(_HEADER.size + reserve)
+            for name, (stamp, obj_bytes, arrays) in blobs.items():
+                entry = {"stamp": stamp, "arrays": {}}
+                if obj_bytes:
+                    entry["object"] = [offset, len(obj_bytes)]
+                    chunks.append((offset, obj_bytes))
+                    offset = _align(offset + len(obj_bytes))
+                for key, array in arrays.items():
+                    entry["arrays"][key] = [offset, array.dtype.str, list(array.shape)]
+                    chunks.append((offset, array.tobytes()))
+                    offset = _align(offset + array.nbytes)
+                sections[name] = entry
+            manifest = json.dumps({"sections": sections, "created_at": time.time()}).encode("utf-8")
+            if len(manifest) <= reserve:
+                break
+            reserve = _align(len(manifest) * 2)
+
+        buf = bytearray(offset)
+        _HEADER.pack_into(buf, 0, _MAGIC, SNAPSHOT_FORMAT, len(manifest))
+        buf[_HEADER.size:_HEADER.size + len(manifest)] = manifest
+        for start, chunk in chunks:
+            buf[start:start + len(chunk)] = chunk
+        return bytes(buf)
+
+    # ---------------- 周期写盘 ----------------
+
+    def start_autosave(self, interval: float = None):
+        """后台每隔 interval 秒保存一次 (没有段需要更新时不写盘)"""
+        interval = interval or settings.STARTUP_SNAPSHOT_INTERVAL
+        if self._autosave_thread and self._autosave_thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def loop():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.save()
+                except Exception as e:
+                    logger.warning(f"[Snapshot] 周期保存失败: {e}")
+
+        self._autosave_thread = threading.Thread(target=loop, name="startup-snapshot", daemon=True)
+        self._autosave_thread.start()
+
+    def shutdown(self):
+        """停止周期保存并写出最终快照"""
+        self._stop_event.set()
+        try:
+            self.save()
+        except Exception as e:
+            logger.warning(f"[Snapshot] 关闭时保存快照失败: {e}")
+        self.close()
+
+
+def _normalize(stamp: Any) -> Any:
+    """统一成 JSON 往返后的形态 (元组变列表)，保证与 manifest 中的值可比"""
+    return json.loads(json.dumps(stamp))
+
+
+_startup_snapshot_instance: Optional[StartupSnapshot] = None
+
+
+def get_startup_snapshot() -> StartupSnapshot:
+    """获取全局 StartupSnapshot 实例（延迟初始化）。"""
+    global _startup_snapshot_instance
+    if _startup_snapshot_instance is None:
+        _startup_snapshot_instance = StartupSnapshot()
+    return _startup_snapshot_instance
+
+
+startup_snapshot = lazy_proxy(get_startup_snapshot, StartupSnapshot)
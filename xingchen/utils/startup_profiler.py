@@ -0,0 +1,158 @@
+"""
+启动耗时剖析 (Startup Profiler)
+`python -m xingchen.main cli --profile-startup` 时启用，打印 XingChenApp.initialize 的耗时树:
+- 组件节点: 由 phase("名称") 包裹的初始化步骤
+- 模块节点: 期间首次导入的模块 (包装 loader.exec_module 计时，嵌套导入挂在父模块之下)
+
+未启用时 phase() 只是一个空的上下文管理器，不安装导入钩子，对正常启动没有影响。
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+from typing import List, Optional
+
+from xingchen.utils.proxy import lazy_proxy
+
+
+class _Node:
+    __slots__ = ("label", "kind", "start", "elapsed", "children")
+
+    def __init__(self, label: str, kind: str):
+        self.label = label
+        self.kind = kind  # "phase" | "import" | "root"
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        self.children: List["_Node"] = []
+
+
+class _TimingFinder(MetaPathFinder):
+    """排在 sys.meta_path 最前的查找器: 委托后续查找器定位模块，再给 loader 套上计时"""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                self._wrap(spec)
+                return spec
+        return None
+
+    def _wrap(self, spec):
+        loader = spec.loader
+        # 内置/冻结模块的 loader 是类本身，改它会影响全局，跳过
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return
+        if getattr(loader, "_xc_timed", False):
+            return
+        exec_module = loader.exec_module
+        profiler = self.profiler
+
+        def timed_exec_module(module):
+            with profiler.span(f"import {spec.name}", "import"):
+                exec_module(module)
+
+        try:
+            loader.exec_module = timed_exec_module
+            loader._xc_timed = True
+        except (AttributeError, TypeError):
+            pass
+
+
+class StartupProfiler:
+    """
+    启动耗时剖析器
+    - enable(): 开始记录 (安装导入钩子)
+    - phase(name): 组件计时 (未启用时为空操作)
+    - report(min_ms, max_depth): 停止记录并返回耗时树文本
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._root: Optional[_Node] = None
+        self._stack: List[_Node] = []
+        self._finder: Optional[_TimingFinder] = None
+        self._thread_id: Optional[int] = None
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._root = _Node("startup", "root")
+        self._stack = [self._root]
+        self._thread_id = threading.get_ident()
+        self._finder = _TimingFinder(self)
+        sys.meta_path.insert(0, self._finder)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+        if self._root is not None:
+            self._root.elapsed = time.perf_counter() - self._root.start
+
+    @contextmanager
+    def span(self, label: str, kind: str = "phase"):
+        # 只记录主线程上的调用栈 (后台线程的导入/初始化不会污染树结构)
+        if not self.enabled or threading.get_ident() != self._thread_id:
+            yield
+            return
+        node = _Node(label, kind)
+        self._stack[-1].children.append(node)
+        self._stack.append(node)
+        try:
+            yield
+        finally:
+            node.elapsed = time.perf_counter() - node.start
+            if self._stack and self._stack[-1] is node:
+                self._stack.pop()
+
+    def phase(self, name: str):
+        """组件计时"""
+        return self.span(name, "phase")
+
+    def report(self, min_ms: float = 20.0, max_depth: int = 6) -> str:
+        """停止记录并渲染耗时树 (低于 min_ms 的节点折叠，超过 max_depth 层不再展开)"""
+        self.disable()
+        if self._root is None:
+            return ""
+        lines = [f"[Startup] 启动耗时 {self._root.elapsed * 1000:.0f} ms"]
+        self._render(self._root, "", lines, min_ms, max_depth)
+        return "\n".join(lines)
+
+    def _render(self, node: _Node, prefix: str, lines: List[str], min_ms: float, depth: int):
+        if depth <= 0:
+            return
+        shown = [c for c in node.children if c.elapsed * 1000 >= min_ms]
+        folded = [c for c in node.children if c.elapsed * 1000 < min_ms]
+        folded_ms = sum(c.elapsed for c in folded) * 1000
+        show_folded = bool(folded) and folded_ms >= min_ms
+        for i, child in enumerate(shown):
+            last = i == len(shown) - 1 and not show_folded
+            lines.append(f"{prefix}{'└─ ' if last else '├─ '}{child.label}  {child.elapsed * 1000:.1f} ms")
+            self._render(child, prefix + ("   " if last else "│  "), lines, min_ms, depth - 1)
+        if show_folded:
+            lines.append(f"{prefix}└─ (其余 {len(folded)} 项)  {folded_ms:.1f} ms")
+
+
+_startup_profiler_instance: Optional[StartupProfiler] = None
+
+
+def get_startup_profiler() -> StartupProfiler:
+    """获取全局 StartupProfiler 实例（延迟初始化）。"""
+    global _startup_profiler_instance
+    if _startup_profiler_instance is None:
+        _startup_profiler_instance = StartupProfiler()
+    return _startup_profiler_instance
+
+
+startup_profiler = lazy_proxy(get_startup_profiler, StartupProfiler)
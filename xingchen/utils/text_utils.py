@@ -0,0 +1,52 @@
+"""
+文本工具模块 (Text Utilities)
+提供无需分词器的轻量检索词抽取: 中文按二元组 (bigram) 切分，英文/数字按单词切分
+"""
+import re
+from typing import List
+
+
+# 连续的中日韩字符 / 连续的字母数字
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+_WORD_RUN = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_\-\.]*")
+
+# 高频但几乎不携带信息的中文二元组
+CJK_STOP_BIGRAMS = {
+    "我们", "你们", "他们", "什么", "怎么", "这个", "那个", "一个", "没有", "就是",
+    "可以", "还是", "因为", "所以", "但是", "如果", "的话", "知道", "觉得", "现在",
+}
+
+
+def extract_terms(text: str, max_terms: int = 16) -> List[str]:
+    """
+    抽取检索词 (保持出现顺序、去重)
+    - 中文: 长度为 1 的片段保留单字，其余按重叠二元组切分
+    - 英文/数字: 小写化，丢弃单个字符
+    """
+    if not text:
+        return []
+
+    terms: List[str] = []
+    seen = set()
+
+    def _add(term: str):
+        if term not in seen:
+            seen.add(term)
+            terms.append(term)
+
+    for match in _WORD_RUN.finditer(text):
+        word = match.group().strip("-.").lower()
+        if len(word) > 1:
+            _add(word)
+
+    for match in _CJK_RUN.finditer(text):
+        run = match.group()
+        if len(run) == 1:
+            _add(run)
+            continue
+        for i in range(len(run) - 1):
+            bigram = run[i:i + 2]
+            if bigram not in CJK_STOP_BIGRAMS:
+                _add(bigram)
+
+    return terms[:max_terms]